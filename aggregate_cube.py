@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Cube d'agrégats précalculés pour les tableaux de bord « Statistiques générales »
+
+Le dataset est agrégé une seule fois par (ville, cuisine principale, gamme de
+prix, sentiment, émotion): nombre d'avis, somme et somme des carrés des notes,
+histogramme des notes. Les restaurants ne sont jamais stockés avis par avis:
+
+- restaurants uniques: chaque cellule garde une esquisse HyperLogLog des noms
+  (SKETCH_REGISTERS octets, fusionnée par maximum sur les cellules filtrées);
+  le nombre exact est précalculé sans filtre et pour chaque valeur de chaque
+  dimension (cas d'un seul filtre à une valeur)
+- top restaurants: les TOP_K restaurants les plus commentés de chaque cellule,
+  additionnés sur les cellules filtrées (un restaurant absent du top d'une
+  cellule n'y compte pas: classement exact tant qu'une cellule a au plus
+  TOP_K restaurants)
+
+Toutes les tables sont bornées par la taille du cube et sauvegardées à côté
+du dataset (dataset.cube.npz); les tableaux de bord filtrent le cube: chaque
+interaction coûte O(taille du cube) au lieu de O(nombre d'avis).
+"""
+
+import ast
+import hashlib
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+CUBE_VERSION = 3
+DIMENSIONS = ("City", "Cuisine", "Price Range", "sentiment", "emotion")
+UNKNOWN = "Inconnu"
+# Notes de l'histogramme (pas de 0.5, comme sur TripAdvisor)
+RATING_BINS = tuple(np.arange(1.0, 5.01, 0.5))
+RATING_COLUMNS = tuple(f"n_rating_{r:g}" for r in RATING_BINS)
+# Esquisse HyperLogLog par cellule: 2**8 registres (erreur type ~6.5%, exacte en petit nombre)
+SKETCH_PRECISION = 8
+SKETCH_REGISTERS = 1 << SKETCH_PRECISION
+# Restaurants gardés par cellule pour top_restaurants
+TOP_K = 20
+ALL = "*"
+
+
+def primary_cuisine(style) -> str:
+    """Première cuisine de 'Cuisine Style' (ex: "['French', 'Bar']" -> French)"""
+    text = str(style).strip()
+    if not text or text == "nan":
+        return UNKNOWN
+    try:
+        styles = ast.literal_eval(text)
+        if isinstance(styles, (list, tuple)):
+            return str(styles[0]).strip() if styles else UNKNOWN
+    except (ValueError, SyntaxError):
+        pass
+    return text.strip("[]'\" ").split(",")[0].strip("'\" ") or UNKNOWN
+
+
+def cube_path_for(csv_path: str) -> str:
+    """Chemin du cube associé à un dataset (ex: dataset.cube.npz)"""
+    root, _ = os.path.splitext(csv_path)
+    return f"{root}.cube.npz"
+
+
+def _dimension_frame(df):
+    """Colonnes de dimensions (+ Name et Rating) calculées pour chaque avis"""
+    import pandas as pd
+    from balance_dataset import LABEL_TO_SENTIMENT, rating_to_label
+    from emotion_detection import SimpleEmotionDetector
+
+    def text_column(name):
+        if name not in df.columns:
+            return pd.Series(UNKNOWN, index=df.index)
+        return df[name].astype(str).replace({"nan": UNKNOWN, "": UNKNOWN})
+
+    ratings = pd.to_numeric(df["Rating"], errors="coerce") if "Rating" in df.columns \
+        else pd.Series(np.nan, index=df.index)
+    if "sentiment" in df.columns:
+        sentiment = df["sentiment"].astype(str)
+    else:
+        sentiment = ratings.map(lambda r: LABEL_TO_SENTIMENT[rating_to_label(r)] if r == r else UNKNOWN)
+
+    review_column = "Review" if "Review" in df.columns else "Review_clean"
+    detector = SimpleEmotionDetector()
+    emotions = [e for e, _ in detector.get_main_emotions(df[review_column].astype(str).tolist())]
+
+    return pd.DataFrame({
+        "City": text_column("City"),
+        "Cuisine": df["Cuisine Style"].map(primary_cuisine) if "Cuisine Style" in df.columns else UNKNOWN,
+        "Price Range": text_column("Price Range"),
+        "sentiment": sentiment.values,
+        "emotion": emotions,
+        "Name": text_column("Name"),
+        "Rating": ratings.values,
+    }, index=df.index)
+
+
+def _name_hashes(names) -> np.ndarray:
+    """Hachage 64 bits stable des noms (un calcul par nom distinct)"""
+    import pandas as pd
+
+    codes, uniques = pd.factorize(names)
+    hashes = np.array([int.from_bytes(hashlib.blake2b(str(n).encode("utf-8"), digest_size=8).digest(), "little")
+                       for n in uniques], dtype=np.uint64)
+    return hashes[codes]
+
+
+def _hll_registers(hashes: np.ndarray):
+    """Registre (bits de poids fort) et rang (premier bit à 1 des bits restants) de chaque hachage"""
+    width = 64 - SKETCH_PRECISION
+    index = (hashes >> np.uint64(width)).astype(np.int64)
+    rest = hashes & np.uint64((1 << width) - 1)
+    bit_length = np.zeros(len(rest), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = rest >= np.uint64(1 << shift)
+        rest = np.where(high, rest >> np.uint64(shift), rest)
+        bit_length += high * shift
+    bit_length += rest > 0
+    return index, (width - bit_length + 1).astype(np.uint8)
+
+
+def estimate_distinct(registers: np.ndarray) -> float:
+    """Estimation HyperLogLog (comptage linéaire pour les petits ensembles)"""
+    m = len(registers)
+    if not registers.any():
+        return 0.0
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int((registers == 0).sum())
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return float(estimate)
+
+
+def build_cube(df) -> Dict:
+    """
+    Agrège le dataset
+
+    Returns:
+        Dictionnaire {"cube": DataFrame, "sketches": registres HyperLogLog [cellules, SKETCH_REGISTERS],
+        "top": DataFrame (cell, Name, n_reviews), au plus TOP_K lignes par cellule,
+        "restaurant_counts": DataFrame (dimension, value, n_restaurants) exacts}
+    """
+    import pandas as pd
+
+    dims = _dimension_frame(df)
+    rated = dims["Rating"].notna()
+    # Note arrondie au pas de 0.5 le plus proche, pour l'histogramme
+    bins = np.clip(np.round((dims["Rating"].fillna(1.0) - 1.0) * 2).astype(int), 0, len(RATING_BINS) - 1)
+    for i, column in enumerate(RATING_COLUMNS):
+        dims[column] = ((bins == i) & rated).astype(np.int64)
+    dims["n_reviews"] = 1
+    dims["n_rated"] = rated.astype(np.int64)
+    dims["rating_sum"] = dims["Rating"].fillna(0.0)
+    dims["rating_sq_sum"] = dims["Rating"].fillna(0.0) ** 2
+
+    measures = ["n_reviews", "n_rated", "rating_sum", "rating_sq_sum", *RATING_COLUMNS]
+    grouped = dims.groupby(list(DIMENSIONS), sort=True)
+    cube = grouped[measures].sum().reset_index()
+    # Indice de la cellule de chaque avis (même ordre que le cube)
+    dims["cell"] = grouped.ngroup()
+
+    known = dims[dims["Name"] != UNKNOWN]
+    sketches = np.zeros((len(cube), SKETCH_REGISTERS), dtype=np.uint8)
+    index, rank = _hll_registers(_name_hashes(known["Name"]))
+    np.maximum.at(sketches, (known["cell"].to_numpy(), index), rank)
+
+    top = known.groupby(["cell", "Name"]).size().rename("n_reviews").reset_index()
+    top = top.sort_values(["cell", "n_reviews", "Name"], ascending=[True, False, True])
+    top = top.groupby("cell").head(TOP_K).reset_index(drop=True)
+
+    counts = [(ALL, ALL, known["Name"].nunique())]
+    for dimension in DIMENSIONS:
+        counts.extend((dimension, str(value), n) for value, n in known.groupby(dimension)["Name"].nunique().items())
+    restaurant_counts = pd.DataFrame(counts, columns=["dimension", "value", "n_restaurants"])
+    return {"cube": cube, "sketches": sketches, "top": top, "restaurant_counts": restaurant_counts}
+
+
+def _source_signature(csv_path: str) -> str:
+    from emotion_lexicon import get_matcher
+
+    stat = os.stat(csv_path)
+    # La dimension emotion vient des lexiques: le cube est périmé quand ils changent
+    return f"v{CUBE_VERSION}|{stat.st_size}|{stat.st_mtime_ns}|{get_matcher().signature}"
+
+
+def save_cube(tables: Dict, path: str, signature: str):
+    """Sauvegarde les tables (une entrée npz par colonne ou par tableau, sans pickle)"""
+    arrays = {"signature": np.array(signature)}
+    for table_name, table in tables.items():
+        if isinstance(table, np.ndarray):
+            arrays[table_name] = table
+            continue
+        for column in table.columns:
+            values = table[column].to_numpy()
+            arrays[f"{table_name}/{column}"] = values.astype(str) if values.dtype == object else values
+    np.savez_compressed(path, **arrays)
+
+
+def load_cube(path: str) -> Dict:
+    """Charge les tables sauvegardées par save_cube"""
+    import pandas as pd
+
+    columns: Dict[str, Dict[str, np.ndarray]] = {}
+    arrays: Dict[str, np.ndarray] = {}
+    with np.load(path, allow_pickle=False) as saved:
+        signature = str(saved["signature"])
+        for key in saved.files:
+            if "/" in key:
+                table_name, column = key.split("/", 1)
+                columns.setdefault(table_name, {})[column] = saved[key]
+            elif key != "signature":
+                arrays[key] = saved[key]
+    tables = {name: pd.DataFrame(cols) for name, cols in columns.items()}
+    tables.update(arrays)
+    tables["signature"] = signature
+    return tables
+
+
+def load_or_build_cube(csv_path: str, df=None, rebuild: bool = False) -> Dict:
+    """
+    Charge le cube d'un dataset, ou le (re)construit si absent ou si le CSV a changé
+
+    Args:
+        csv_path: Chemin du dataset CSV
+        df: DataFrame déjà chargé (évite de relire le CSV en cas de reconstruction)
+        rebuild: Forcer la reconstruction
+
+    Returns:
+        Dictionnaire {"cube", "sketches", "top", "restaurant_counts"}
+    """
+    import pandas as pd
+
+    path = cube_path_for(csv_path)
+    signature = _source_signature(csv_path)
+    if not rebuild and os.path.exists(path):
+        tables = load_cube(path)
+        if tables.get("signature") == signature:
+            return tables
+        print(f"[INFO] Cube perime ({path}), reconstruction...")
+
+    if df is None:
+        df = pd.read_csv(csv_path)
+    tables = build_cube(df)
+    save_cube(tables, path, signature)
+    print(f"[OK] Cube sauvegarde: {path} ({len(tables['cube'])} cellules, "
+          f"{len(tables['top'])} lignes top restaurants)")
+    tables["signature"] = signature
+    return tables
+
+
+def filter_mask(table, filters: Optional[Dict[str, Sequence[str]]] = None) -> np.ndarray:
+    """Cellules du cube correspondant aux filtres {dimension: valeurs}"""
+    mask = np.ones(len(table), dtype=bool)
+    for dimension, values in (filters or {}).items():
+        if values:
+            mask &= table[dimension].isin(list(values)).to_numpy()
+    return mask
+
+
+def filter_table(table, filters: Optional[Dict[str, Sequence[str]]] = None):
+    """Lignes du cube correspondant aux filtres {dimension: valeurs}"""
+    if not filters:
+        return table
+    return table[filter_mask(table, filters)]
+
+
+def count_restaurants(tables: Dict, filters: Optional[Dict[str, Sequence[str]]] = None) -> int:
+    """Restaurants uniques d'une sélection: exact sans filtre ou pour une seule valeur, sinon HyperLogLog"""
+    active = {d: list(v) for d, v in (filters or {}).items() if v}
+    counts = tables["restaurant_counts"]
+    if not active or (len(active) == 1 and len(next(iter(active.values()))) == 1):
+        dimension, values = next(iter(active.items())) if active else (ALL, [ALL])
+        exact = counts.loc[(counts["dimension"] == dimension) & (counts["value"] == str(values[0])),
+                           "n_restaurants"]
+        return int(exact.iloc[0]) if len(exact) else 0
+    registers = tables["sketches"][filter_mask(tables["cube"], active)]
+    return int(round(estimate_distinct(registers.max(axis=0)))) if len(registers) else 0
+
+
+def summarize(tables: Dict, filters: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, float]:
+    """Indicateurs d'une sélection: avis, restaurants, villes, note moyenne et écart-type"""
+    cube = filter_table(tables["cube"], filters)
+    n_reviews = int(cube["n_reviews"].sum())
+    n_rated = int(cube["n_rated"].sum())
+    mean = float(cube["rating_sum"].sum() / n_rated) if n_rated else float("nan")
+    variance = float(cube["rating_sq_sum"].sum() / n_rated - mean ** 2) if n_rated else float("nan")
+    known_cities = cube.loc[(cube["n_reviews"] > 0) & (cube["City"] != UNKNOWN), "City"]
+    return {
+        "n_reviews": n_reviews,
+        "n_restaurants": count_restaurants(tables, filters),
+        "n_cities": int(known_cities.nunique()),
+        "rating_mean": mean,
+        "rating_std": float(np.sqrt(max(variance, 0.0))) if n_rated else float("nan"),
+    }
+
+
+def counts_by(tables: Dict, dimension: str, filters: Optional[Dict[str, Sequence[str]]] = None):
+    """Nombre d'avis par valeur d'une dimension (Series triée décroissante)"""
+    cube = filter_table(tables["cube"], filters)
+    return cube.groupby(dimension)["n_reviews"].sum().sort_values(ascending=False)
+
+
+def rating_histogram(tables: Dict, filters: Optional[Dict[str, Sequence[str]]] = None):
+    """Nombre d'avis par note (Series indexée par la note)"""
+    import pandas as pd
+
+    cube = filter_table(tables["cube"], filters)
+    return pd.Series(cube[list(RATING_COLUMNS)].sum().to_numpy(), index=list(RATING_BINS), name="n_reviews")
+
+
+def top_restaurants(tables: Dict, k: int = 10, filters: Optional[Dict[str, Sequence[str]]] = None):
+    """Les k restaurants avec le plus d'avis dans la sélection (tops par cellule additionnés)"""
+    cells = np.flatnonzero(filter_mask(tables["cube"], filters))
+    top = tables["top"]
+    top = top[top["cell"].isin(cells)]
+    return top.groupby("Name")["n_reviews"].sum().sort_values(ascending=False, kind="stable").head(k)
+
+
+def dimension_values(tables: Dict, dimension: str):
+    """Valeurs présentes d'une dimension (pour les filtres)"""
+    return sorted(tables["cube"][dimension].astype(str).unique().tolist())
+
+
+def render_cube_filters(container, tables: Dict, key: str, dimensions: Sequence[str] = DIMENSIONS) -> Dict:
+    """
+    Filtres multisélection (une par dimension ayant plusieurs valeurs)
+
+    Returns:
+        Dictionnaire {dimension: valeurs sélectionnées}
+    """
+    labels = {"City": "Ville", "Cuisine": "Cuisine", "Price Range": "Gamme de prix",
+              "sentiment": "Sentiment", "emotion": "Émotion"}
+    useful = [d for d in dimensions if len(dimension_values(tables, d)) > 1]
+    filters = {}
+    if not useful:
+        return filters
+    columns = container.columns(len(useful))
+    for column, dimension in zip(columns, useful):
+        selected = column.multiselect(labels.get(dimension, dimension), dimension_values(tables, dimension),
+                                      key=f"{key}_{dimension}")
+        if selected:
+            filters[dimension] = selected
+    return filters
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Construit le cube d'agregats d'un dataset")
+    parser.add_argument("--csv", default="TA_restaurants_ML_clean_cleaned.csv", help="Dataset CSV")
+    parser.add_argument("--rebuild", action="store_true", help="Forcer la reconstruction")
+    args = parser.parse_args()
+
+    tables = load_or_build_cube(args.csv, rebuild=args.rebuild)
+    stats = summarize(tables)
+    print(f"\nAvis: {stats['n_reviews']}, restaurants: {stats['n_restaurants']}, "
+          f"villes: {stats['n_cities']}, note moyenne: {stats['rating_mean']:.2f}")
+    for dimension in DIMENSIONS:
+        print(f"   {dimension}: {len(dimension_values(tables, dimension))} valeurs")
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+File d'analyse en arrière-plan pour le chatbot
+
+Un thread worker, partagé par toutes les sessions Streamlit (st.cache_resource),
+reçoit les avis soumis, les regroupe en lots (jusqu'à max_batch avis arrivés
+pendant max_wait secondes, toutes sessions confondues) et exécute un seul
+forward par lot. Le script Streamlit ne bloque plus sur l'inférence: il soumet
+l'avis, affiche « analyse en cours » et rafraîchit la zone de chat (st.fragment
+avec run_every) jusqu'à ce que le résultat soit disponible. Chaque job porte un
+rappel on_done, appelé dans le thread worker hors du verrou de la file (ex:
+enregistrement de l'échange dans review_store): pendant les rappels d'un lot,
+ses jobs sont « persisting » et restent listés par pending(). Le nombre d'avis en attente (soumis, pas encore pris par
+le worker) est exposé par la jauge review_analysis_queue_pending.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence
+
+from prometheus_metrics import QUEUE_PENDING
+
+DEFAULT_MAX_BATCH = 16
+# Fenêtre de regroupement (s) après l'arrivée du premier avis d'un lot
+DEFAULT_MAX_WAIT = 0.02
+
+# États d'un job
+PENDING = "pending"
+# Analysé, rappel on_done en cours
+PERSISTING = "persisting"
+DONE = "done"
+ERROR = "error"
+
+SENTIMENT_LABELS = {0: "Négatif", 1: "Neutre", 2: "Positif"}
+
+
+class AnalysisQueue:
+    """
+    File de jobs d'analyse traitée par lots dans un thread worker
+    """
+
+    def __init__(self, analyze_batch: Callable[[List[str]], List[Dict]],
+                 max_batch: int = DEFAULT_MAX_BATCH, max_wait: float = DEFAULT_MAX_WAIT):
+        """
+        Args:
+            analyze_batch: Fonction (textes) -> liste de résultats (un dictionnaire par texte)
+            max_batch: Nombre maximal d'avis par lot
+            max_wait: Attente maximale (s) pour compléter un lot
+        """
+        self.analyze_batch = analyze_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._stats = {"submitted": 0, "processed": 0, "batches": 0, "errors": 0}
+        self._worker = threading.Thread(target=self._run, name="analysis-queue", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str, session_id: Optional[str] = None,
+               on_done: Optional[Callable[[Dict], None]] = None) -> str:
+        """
+        Ajoute un avis à la file
+
+        Args:
+            text: Avis à analyser
+            session_id: Session qui a soumis l'avis (voir pending)
+            on_done: Appelée dans le thread worker avec le job terminé (clés "result" ou "error")
+
+        Returns:
+            Identifiant du job
+        """
+        job = {"id": uuid.uuid4().hex, "text": text, "session_id": session_id, "on_done": on_done,
+               "status": PENDING, "submitted_at": time.time(), "result": None, "error": None}
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._stats["submitted"] += 1
+        QUEUE_PENDING.inc()
+        self._queue.put(job)
+        return job["id"]
+
+    def pending(self, session_id: Optional[str] = None) -> List[Dict]:
+        """Jobs en attente ou en cours (d'une session), dans l'ordre de soumission"""
+        with self._lock:
+            jobs = [j for j in self._jobs.values()
+                    if j["status"] in (PENDING, PERSISTING) and (session_id is None or j["session_id"] == session_id)]
+        return sorted(jobs, key=lambda j: j["submitted_at"])
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        """Job terminé (retiré de la file), ou None s'il est encore en attente"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] in (PENDING, PERSISTING):
+                return None
+            return self._jobs.pop(job_id)
+
+    def stats(self) -> Dict[str, float]:
+        """Compteurs: avis soumis/traités, lots, erreurs, taille moyenne des lots"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_batch"] = stats["processed"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def close(self, timeout: float = 5.0):
+        """Arrête le worker après les jobs déjà soumis"""
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def _collect(self, first: Dict) -> List[Dict]:
+        """Complète un lot avec les jobs arrivés pendant la fenêtre de regroupement"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=max(remaining, 0.0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)
+                break
+            QUEUE_PENDING.dec()
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            QUEUE_PENDING.dec()
+            batch = self._collect(first)
+            try:
+                results = list(self.analyze_batch([job["text"] for job in batch]))
+                error = None
+                if len(results) != len(batch):
+                    raise ValueError(f"{len(results)} résultats pour {len(batch)} avis")
+            except Exception as e:
+                results, error = [None] * len(batch), f"{type(e).__name__}: {e}"
+
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["processed"] += len(batch)
+                self._stats["errors"] += len(batch) if error else 0
+                for job, result in zip(batch, results):
+                    job["result"], job["error"] = result, error
+                    job["status"] = PERSISTING
+            # Rappels hors verrou: submit/pending/result des autres sessions ne les attendent pas
+            callbacks = [job.pop("on_done") for job in batch]
+            for job, callback in zip(batch, callbacks):
+                if callback is not None:
+                    try:
+                        callback(job)
+                    except Exception as e:
+                        print(f"[ERREUR] Rappel du job {job['id']}: {e}")
+            with self._lock:
+                for job, callback in zip(batch, callbacks):
+                    job["status"] = ERROR if error else DONE
+                    if callback is not None:
+                        # Résultat transmis au rappel: rien à garder en mémoire
+                        self._jobs.pop(job["id"], None)
+
+
+def make_chat_analyzer(tokenizer, model, device, emotion_detector, max_length: int = 128,
+                       model_name: str = "sentiment",
+                       aggregation: Optional[str] = None) -> Callable[[Sequence[str]], List[Dict]]:
+    """
+    Analyse par lots du chatbot: sentiment (un forward par lot) puis émotions
+
+    Avec aggregation ("mean", "max", "confidence", "attention"), les avis longs sont analysés
+    en entier par fenêtres glissantes (long_document) au lieu d'être tronqués.
+
+    Returns:
+        Fonction (textes) -> [{"sentiment", "sentiment_conf", "emotion", "emotion_conf",
+        "emotion_scores", "latency_ms"}] (latence du lot, partagée par ses avis)
+    """
+    from batch_inference import run_batched_inference
+    from latency_tracker import get_tracker
+    from long_document import predict_long
+    from prometheus_metrics import track_inference
+
+    tracker = get_tracker()
+
+    def analyze(texts: Sequence[str]) -> List[Dict]:
+        import numpy as np
+
+        start = time.perf_counter()
+        with track_inference(model_name, f"torch-{device.type}", "sentiment", items=len(texts)), \
+                tracker.stage("forward"):
+            if aggregation:
+                probs, _ = predict_long(list(texts), tokenizer, model, device, max_length=max_length,
+                                        batch_size=32, aggregation=aggregation)
+            else:
+                logits, _ = run_batched_inference(list(texts), tokenizer, model, device,
+                                                  batch_size=len(texts), max_length=max_length)
+                probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+                probs /= probs.sum(axis=1, keepdims=True)
+        with tracker.stage("emotion_detection"):
+            emotion_scores = emotion_detector.predict_emotions(texts, aggregation=aggregation)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        results = []
+        for row, scores in zip(probs, emotion_scores):
+            pred_id = int(row.argmax())
+            emotion, emotion_conf = max(scores.items(), key=lambda x: x[1])
+            results.append({
+                "sentiment": SENTIMENT_LABELS.get(pred_id, "Neutre"),
+                "sentiment_conf": float(row[pred_id]),
+                "emotion": emotion,
+                "emotion_conf": float(emotion_conf),
+                "emotion_scores": scores,
+                "latency_ms": latency_ms,
+            })
+        return results
+
+    return analyze
@@ -1,11 +1,19 @@
 import streamlit as st
-import torch
 import os
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
+import time
+import numpy as np
 from emotion_detection import SimpleEmotionDetector
+from latency_tracker import get_tracker, render_latency_panel
+from prometheus_metrics import start_metrics_server, track_inference
+from model_store import load_sequence_classifier, model_version, resolve_model_source, warm_up
+from review_store import get_store
+from long_document import AGGREGATIONS, predict_long
+from aspect_sentiment import AspectSentimentAnalyzer, make_model_scorer
+from tfidf_sentiment import LinearSentimentModel
+
+tracker = get_tracker()
+start_metrics_server()
+store = get_store()
 
 # ==================== CONFIGURATION ====================
 st.set_page_config(
@@ -60,46 +68,92 @@ st.markdown("---")
 
 # ==================== CONFIGURATION DU MODÈLE ====================
 # Modèle Hugging Face (meilleure solution pour Streamlit Cloud)
-MODEL_NAME = "distilbert-base-uncased"  # Modèle de base DistilBERT
+# Modèle de base DistilBERT; SENTIMENT_MODEL permet de servir un autre modèle de MODELS_DIR
+# (ex: l'étudiant distillé "sentiment-student", voir distill.py)
+MODEL_NAME = os.environ.get("SENTIMENT_MODEL", "distilbert-base-uncased")
 # Alternative: "nlptown/bert-base-multilingual-uncased-sentiment" pour sentiment pré-entraîné
+BACKENDS = {"DistilBERT": "transformer", "TF-IDF + régression logistique": "linear"}
 
 # ==================== SIDEBAR ====================
 with st.sidebar:
     st.markdown("### ⚙️ Configuration")
+    BACKEND = BACKENDS[st.selectbox("🧠 Modèle de sentiment", list(BACKENDS),
+                                    help="TF-IDF: modèle linéaire CPU très rapide (python tfidf_sentiment.py train)")]
     MAX_LEN = st.slider("📏 Longueur maximale", 32, 256, 128, 16)
+    LONG_DOCUMENT = st.checkbox("📜 Avis longs (fenêtres glissantes)", value=False,
+                                disabled=BACKEND == "linear",
+                                help="Analyse tout l'avis par fenêtres de MAX_LEN tokens au lieu de le tronquer")
+    AGGREGATION = st.selectbox("Agrégation des fenêtres", AGGREGATIONS, disabled=not LONG_DOCUMENT)
     st.markdown("---")
-    device_name = "🖥️ GPU" if torch.cuda.is_available() else "💻 CPU"
+    if BACKEND == "linear":
+        # Backend TF-IDF: CPU uniquement, torch n'est jamais importé
+        device_name = "💻 CPU"
+    else:
+        import torch
+        device_name = "🖥️ GPU" if torch.cuda.is_available() else "💻 CPU"
     st.info(f"{device_name}")
-    st.caption(f"Modèle: {MODEL_NAME}")
+    if BACKEND == "linear":
+        st.caption("Modèle: TF-IDF + régression logistique")
+    else:
+        st.caption(f"Modèle: {MODEL_NAME}")
+        if resolve_model_source(MODEL_NAME)[1]:
+            st.caption("📦 Modèle pré-installé (hors ligne)")
 
 # ==================== FONCTIONS ====================
 @st.cache_resource
 def load_model(model_name):
-    """Charge le modèle depuis Hugging Face"""
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    """Charge le modèle (pré-installé dans MODELS_DIR, sinon depuis Hugging Face) puis le préchauffe"""
+    tracker.cache_miss("load_model")
+    start = time.perf_counter()
     # Charger avec 3 labels pour sentiment (Négatif, Neutre, Positif)
-    model = AutoModelForSequenceClassification.from_pretrained(
-        model_name,
-        num_labels=3
-    )
-    model.to(device)
-    model.eval()
+    tokenizer, model, device = load_sequence_classifier(model_name, num_labels=3)
+    tracker.record_load(model_name, time.perf_counter() - start)
+    # Warm-up: le premier utilisateur ne paie pas le premier forward à froid
+    start = time.perf_counter()
+    warm_up(tokenizer, model, device, max_length=MAX_LEN)
+    tracker.record_load("warm-up", time.perf_counter() - start)
     return tokenizer, model, device
 
+@st.cache_resource
+def load_linear_model():
+    """Modèle TF-IDF + régression logistique (MODELS_DIR/tfidf-sentiment)"""
+    tracker.cache_miss("load_linear_model")
+    start = time.perf_counter()
+    linear = LinearSentimentModel.load()
+    tracker.record_load(linear.name, time.perf_counter() - start)
+    return linear
+
+@st.cache_resource
+def load_aspect_analyzer(_tokenizer, _model, _device, model_name):
+    """Sentiment par aspect avec le modèle chargé (cache des propositions partagé par les sessions)"""
+    if isinstance(_model, LinearSentimentModel):
+        return AspectSentimentAnalyzer(_model)
+    return AspectSentimentAnalyzer(make_model_scorer(_tokenizer, _model, _device))
+
 @st.cache_resource
 def load_emotion_detector():
     return SimpleEmotionDetector()
 
 # ==================== CHARGEMENT DES MODÈLES ====================
-try:
-    with st.spinner("⏳ Chargement du modèle BERT depuis Hugging Face..."):
-        tokenizer, model, device = load_model(MODEL_NAME)
-    st.sidebar.success("✅ Modèle BERT chargé depuis Hugging Face")
-except Exception as e:
-    st.error(f"❌ Erreur lors du chargement: {e}")
-    st.info("💡 Le modèle sera téléchargé automatiquement depuis Hugging Face")
-    st.stop()
+if BACKEND == "linear":
+    try:
+        tracker.cache_lookup("load_linear_model")
+        model = load_linear_model()
+        tokenizer, device, MODEL_NAME = None, None, model.name
+        st.sidebar.success("✅ Modèle TF-IDF chargé")
+    except Exception as e:
+        st.error(f"❌ Erreur lors du chargement: {e}")
+        st.stop()
+else:
+    try:
+        with st.spinner("⏳ Chargement du modèle BERT depuis Hugging Face..."):
+            tracker.cache_lookup("load_model")
+            tokenizer, model, device = load_model(MODEL_NAME)
+        st.sidebar.success("✅ Modèle BERT chargé depuis Hugging Face")
+    except Exception as e:
+        st.error(f"❌ Erreur lors du chargement: {e}")
+        st.info("💡 Le modèle sera téléchargé automatiquement depuis Hugging Face")
+        st.stop()
 
 try:
     emotion_detector = load_emotion_detector()
@@ -126,10 +180,14 @@ if run_btn:
         st.warning("⚠️ Veuillez entrer un avis à analyser.")
     else:
         with st.spinner("🔄 Analyse en cours..."):
+            analysis_start = time.perf_counter()
+            decided_by = type(emotion_detector).__name__ if emotion_detector else MODEL_NAME
             # Analyse d'émotions d'abord
             if emotion_detector:
-                emotion_scores = emotion_detector.predict_emotion(text)
-                main_emotion, emotion_conf = emotion_detector.get_main_emotion(text)
+                with tracker.stage("emotion_detection"), \
+                        track_inference(type(emotion_detector).__name__, "keywords", "emotion"):
+                    emotion_scores = emotion_detector.predict_emotion(text)
+                    main_emotion, emotion_conf = emotion_detector.get_main_emotion(text)
             else:
                 emotion_scores = {}
                 main_emotion, emotion_conf = "neutre", 0.0
@@ -149,20 +207,35 @@ if run_btn:
                 conf = emotion_conf  # Utiliser la confiance de l'émotion
                 # Calculer les probabilités approximatives pour les graphiques
                 if sentiment == "Positif":
-                    probs = torch.tensor([0.1, 0.1, 0.8])  # [Négatif, Neutre, Positif]
+                    probs = np.array([0.1, 0.1, 0.8])  # [Négatif, Neutre, Positif]
                 elif sentiment == "Négatif":
-                    probs = torch.tensor([0.8, 0.1, 0.1])
+                    probs = np.array([0.8, 0.1, 0.1])
                 else:
-                    probs = torch.tensor([0.2, 0.6, 0.2])
+                    probs = np.array([0.2, 0.6, 0.2])
             else:
                 # Si l'émotion n'est pas très confiante, utiliser le modèle BERT
-                inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=MAX_LEN)
-                inputs = {k: v.to(device) for k, v in inputs.items()}
-                with torch.no_grad():
-                    outputs = model(**inputs)
-                    probs = torch.softmax(outputs.logits, dim=-1)[0]
-                    pred_id = torch.argmax(probs).item()
-                    conf = float(probs[pred_id].item())
+                decided_by = MODEL_NAME
+                backend_label = "sklearn-cpu" if BACKEND == "linear" else f"torch-{device.type}"
+                with track_inference(MODEL_NAME, backend_label, "sentiment"):
+                    if BACKEND == "linear":
+                        # TF-IDF: tout l'avis est pris en compte, pas de limite de tokens
+                        with tracker.stage("forward"):
+                            probs = model.predict_proba([text])[0]
+                    elif LONG_DOCUMENT:
+                        # Fenêtres de MAX_LEN tokens sur tout l'avis, logits agrégés
+                        with tracker.stage("forward"):
+                            window_probs, _ = predict_long([text], tokenizer, model, device,
+                                                           max_length=MAX_LEN, aggregation=AGGREGATION)
+                        probs = window_probs[0]
+                    else:
+                        with tracker.stage("tokenization"):
+                            inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=MAX_LEN)
+                            inputs = {k: v.to(device) for k, v in inputs.items()}
+                        with torch.no_grad(), tracker.stage("forward"):
+                            outputs = model(**inputs)
+                            probs = torch.softmax(outputs.logits, dim=-1)[0].cpu().numpy()
+                    pred_id = int(np.argmax(probs))
+                    conf = float(probs[pred_id])
                 
                 label_map = {0: "Négatif", 1: "Neutre", 2: "Positif"}
                 sentiment = label_map.get(pred_id, "Neutre")
@@ -174,6 +247,21 @@ if run_btn:
                     if sentiment != expected_sentiment and emotion_conf > 0.5:
                         sentiment = expected_sentiment
                         conf = max(conf, emotion_conf * 0.8)  # Ajuster la confiance
+            
+            # Enregistrement (par lots) dans la base des avis analysés
+            store.record_analysis({
+                "source": "app",
+                "text": text,
+                "sentiment": sentiment,
+                "sentiment_conf": float(conf),
+                "emotion": main_emotion,
+                "emotion_conf": float(emotion_conf),
+                "emotion_scores": emotion_scores,
+                "model_name": decided_by,
+                "model_version": (model.version if BACKEND == "linear" else model_version(decided_by))
+                if decided_by == MODEL_NAME else decided_by,
+                "latency_ms": (time.perf_counter() - analysis_start) * 1000,
+            })
         
         st.markdown("---")
         st.markdown("### 📌 Résultats de l'Analyse")
@@ -235,42 +323,61 @@ if run_btn:
         
         st.markdown("<br>", unsafe_allow_html=True)
         
-        # Graphiques
-        st.markdown("### 📊 Analyse de Sentiment")
-        labels = ["Négatif", "Neutre", "Positif"]
-        # S'assurer que probs est un tensor avec 3 valeurs
-        if isinstance(probs, torch.Tensor):
-            values = [float(probs[0]), float(probs[1]), float(probs[2])]
-        else:
+        # Graphiques (temps de construction + rendu Plotly mesuré)
+        with tracker.stage("plotly_render"):
+            import plotly.graph_objects as go
+            import plotly.express as px
+
+            st.markdown("### 📊 Analyse de Sentiment")
+            labels = ["Négatif", "Neutre", "Positif"]
+            # probs: tableau numpy de 3 valeurs [Négatif, Neutre, Positif]
             values = [float(probs[0]), float(probs[1]), float(probs[2])]
-        colors = ["#ef4444", "#f59e0b", "#10b981"]
+            colors = ["#ef4444", "#f59e0b", "#10b981"]
         
-        col1, col2 = st.columns(2)
-        with col1:
-            fig = go.Figure(data=[go.Bar(x=labels, y=values, marker_color=colors, text=[f"{v*100:.2f}%" for v in values], textposition='auto')])
-            fig.update_layout(yaxis_title="Probabilité", yaxis_range=[0, 1], height=400, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                fig = go.Figure(data=[go.Bar(x=labels, y=values, marker_color=colors, text=[f"{v*100:.2f}%" for v in values], textposition='auto')])
+                fig.update_layout(yaxis_title="Probabilité", yaxis_range=[0, 1], height=400, showlegend=False)
+                st.plotly_chart(fig, use_container_width=True)
         
-        with col2:
-            fig_pie = px.pie(values=values, names=labels, color_discrete_sequence=colors, hole=0.4)
-            fig_pie.update_layout(height=400)
-            st.plotly_chart(fig_pie, use_container_width=True)
+            with col2:
+                fig_pie = px.pie(values=values, names=labels, color_discrete_sequence=colors, hole=0.4)
+                fig_pie.update_layout(height=400)
+                st.plotly_chart(fig_pie, use_container_width=True)
         
-        # Émotions
-        if emotion_detector and emotion_scores:
-            st.markdown("### 😊 Analyse d'Émotions")
-            emotion_labels = list(emotion_scores.keys())
-            emotion_values = list(emotion_scores.values())
-            emotion_colors = {'joie': '#10b981', 'tristesse': '#3b82f6', 'colère': '#ef4444', 'surprise': '#f59e0b', 'neutre': '#6b7280'}
-            colors_emotion = [emotion_colors.get(em, '#6b7280') for em in emotion_labels]
+            # Émotions
+            if emotion_detector and emotion_scores:
+                st.markdown("### 😊 Analyse d'Émotions")
+                emotion_labels = list(emotion_scores.keys())
+                emotion_values = list(emotion_scores.values())
+                emotion_colors = {'joie': '#10b981', 'tristesse': '#3b82f6', 'colère': '#ef4444', 'surprise': '#f59e0b', 'neutre': '#6b7280'}
+                colors_emotion = [emotion_colors.get(em, '#6b7280') for em in emotion_labels]
             
-            col1, col2 = st.columns(2)
-            with col1:
-                fig_emotion = go.Figure(data=[go.Bar(x=[em.capitalize() for em in emotion_labels], y=emotion_values, marker_color=colors_emotion, text=[f"{v*100:.2f}%" for v in emotion_values], textposition='auto')])
-                fig_emotion.update_layout(yaxis_title="Score", yaxis_range=[0, 1], height=400, showlegend=False)
-                st.plotly_chart(fig_emotion, use_container_width=True)
+                col1, col2 = st.columns(2)
+                with col1:
+                    fig_emotion = go.Figure(data=[go.Bar(x=[em.capitalize() for em in emotion_labels], y=emotion_values, marker_color=colors_emotion, text=[f"{v*100:.2f}%" for v in emotion_values], textposition='auto')])
+                    fig_emotion.update_layout(yaxis_title="Score", yaxis_range=[0, 1], height=400, showlegend=False)
+                    st.plotly_chart(fig_emotion, use_container_width=True)
             
-            with col2:
-                fig_pie_emotion = px.pie(values=emotion_values, names=[em.capitalize() for em in emotion_labels], color_discrete_sequence=colors_emotion, hole=0.4)
-                fig_pie_emotion.update_layout(height=400)
-                st.plotly_chart(fig_pie_emotion, use_container_width=True)
+                with col2:
+                    fig_pie_emotion = px.pie(values=emotion_values, names=[em.capitalize() for em in emotion_labels], color_discrete_sequence=colors_emotion, hole=0.4)
+                    fig_pie_emotion.update_layout(height=400)
+                    st.plotly_chart(fig_pie_emotion, use_container_width=True)
+        
+        # Sentiment par aspect (propositions de l'avis évaluées en un lot)
+        st.markdown("### 🍽️ Sentiment par Aspect")
+        with tracker.stage("aspects"):
+            aspects = load_aspect_analyzer(tokenizer, model, device, MODEL_NAME).analyze([text])[0]
+        if aspects:
+            aspect_icons = {"nourriture": "🍝", "service": "🧑‍🍳", "prix": "💶", "ambiance": "🕯️"}
+            for column, (aspect, value) in zip(st.columns(len(aspects)), aspects.items()):
+                column.markdown(
+                    f"**{aspect_icons.get(aspect, '')} {aspect.capitalize()}**  \n"
+                    f"{emoji_map.get(value['sentiment'], '❓')} {value['sentiment']} "
+                    f"({value['confidence']*100:.1f}%)"
+                )
+        else:
+            st.caption("Aucun aspect (nourriture, service, prix, ambiance) mentionné dans cet avis.")
+
+# ==================== PERFORMANCES ====================
+render_latency_panel(st.sidebar)
@@ -6,18 +6,24 @@ Auteur: Oumaima AYADI
 """
 
 import streamlit as st
-import torch
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from wordcloud import WordCloud
+import time
 from collections import Counter
-import plotly.express as px
-import plotly.graph_objects as go
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+# torch, transformers, pandas, plotly et wordcloud sont importés
+# dans les fonctions qui les utilisent (démarrage plus rapide)
 from emotion_detection import get_emotion_detector, SimpleEmotionDetector
+from latency_tracker import get_tracker, render_latency_panel
+from chunked_analysis import render_emotion_job
+from aggregate_cube import (load_or_build_cube, rating_histogram, render_cube_filters,
+                            summarize, top_restaurants)
+from token_index import (FACETS, facet_values, load_or_update_token_index,
+                         wordcloud_cache_dir, wordcloud_png)
+from tfidf_sentiment import LinearSentimentModel, default_model_dir
+from embedding_index import DEFAULT_NPROBE, EmbeddingIndex, META_FILE, embed_texts, index_dir_for
+
+DATASET_PATH = "TA_restaurants_ML_clean_cleaned.csv"
+
+tracker = get_tracker()
 
 # Configuration de la page
 st.set_page_config(
@@ -54,9 +60,15 @@ st.markdown("---")
 st.sidebar.header("⚙️ Configuration")
 
 # Choix du modèle de sentiment
+SENTIMENT_BACKEND = st.sidebar.selectbox(
+    "Type de modèle de sentiment",
+    ["DistilBERT", "TF-IDF + régression logistique"],
+    help="TF-IDF: modèle linéaire CPU très rapide (python tfidf_sentiment.py train)"
+)
+USE_LINEAR_MODEL = SENTIMENT_BACKEND != "DistilBERT"
 SENTIMENT_MODEL_PATH = st.sidebar.text_input(
     "Chemin du modèle de sentiment",
-    value="distilbert-base-uncased",
+    value=default_model_dir() if USE_LINEAR_MODEL else "distilbert-base-uncased",
     help="Chemin vers le modèle fine-tuné ou nom du modèle HuggingFace"
 )
 
@@ -67,38 +79,59 @@ USE_EMOTION_MODEL = st.sidebar.checkbox(
     help="Si désactivé, utilise un détecteur basé sur mots-clés"
 )
 
+# Routage multilingue: langue de chaque avis, puis mots-clés / modèle de cette langue
+MULTILINGUAL = st.sidebar.checkbox(
+    "🌍 Avis multilingues",
+    value=False,
+    help="Identifie la langue de chaque avis et utilise le détecteur d'émotions de cette langue"
+)
+
 MAX_LENGTH = st.sidebar.slider("Longueur max du texte", 32, 256, 128, step=16)
 
 # Chargement des modèles
 @st.cache_resource
-def load_sentiment_model(model_path: str):
-    """Charge le modèle de sentiment"""
+def load_sentiment_model(model_path: str, linear: bool = False):
+    """Charge le modèle de sentiment (tokenizer et device à None pour le modèle TF-IDF)"""
+    tracker.cache_miss("load_sentiment_model")
     try:
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
-        model = AutoModelForSequenceClassification.from_pretrained(model_path)
-        model.to(device)
-        model.eval()
+        start = time.perf_counter()
+        if linear:
+            model = LinearSentimentModel.load(model_path)
+            tracker.record_load(model.name, time.perf_counter() - start)
+            return None, model, None
+        from model_store import load_sequence_classifier, warm_up
+
+        tokenizer, model, device = load_sequence_classifier(model_path)
+        tracker.record_load(model_path, time.perf_counter() - start)
+        start = time.perf_counter()
+        warm_up(tokenizer, model, device)
+        tracker.record_load("warm-up", time.perf_counter() - start)
         return tokenizer, model, device
     except Exception as e:
         st.error(f"Erreur lors du chargement du modèle: {e}")
         return None, None, None
 
 @st.cache_resource
-def load_emotion_detector(use_model: bool):
+def load_emotion_detector(use_model: bool, multilingual: bool = False):
     """Charge le détecteur d'émotions"""
+    tracker.cache_miss("load_emotion_detector")
     try:
-        return get_emotion_detector(use_model=use_model)
+        start = time.perf_counter()
+        detector = get_emotion_detector(use_model=use_model, multilingual=multilingual)
+        tracker.record_load(type(detector).__name__, time.perf_counter() - start)
+        return detector
     except Exception as e:
         st.warning(f"Erreur lors du chargement du détecteur d'émotions: {e}")
         return SimpleEmotionDetector()
 
 # Chargement
 with st.spinner("Chargement des modèles..."):
-    tokenizer, sentiment_model, device = load_sentiment_model(SENTIMENT_MODEL_PATH)
-    emotion_detector = load_emotion_detector(USE_EMOTION_MODEL)
+    tracker.cache_lookup("load_sentiment_model")
+    tokenizer, sentiment_model, device = load_sentiment_model(SENTIMENT_MODEL_PATH, USE_LINEAR_MODEL)
+    tracker.cache_lookup("load_emotion_detector")
+    emotion_detector = load_emotion_detector(USE_EMOTION_MODEL, MULTILINGUAL)
 
-if tokenizer is None or sentiment_model is None:
+if sentiment_model is None:
     st.error("❌ Impossible de charger le modèle de sentiment. Vérifiez le chemin.")
     st.stop()
 
@@ -107,22 +140,31 @@ st.sidebar.success("✅ Modèles chargés")
 # Fonctions de prédiction
 def predict_sentiment(text: str, tokenizer, model, device, max_len: int):
     """Prédit le sentiment (Positif/Négatif/Neutre)"""
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=max_len
-    )
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    label_map = {0: "Négatif", 1: "Neutre", 2: "Positif"}
+    if isinstance(model, LinearSentimentModel):
+        with tracker.stage("forward"):
+            probs = model.predict_proba([text])[0]
+        pred_id = int(probs.argmax())
+        return label_map[pred_id], float(probs[pred_id]), probs
+    
+    import torch
+
+    with tracker.stage("tokenization"):
+        inputs = tokenizer(
+            text,
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=max_len
+        )
+        inputs = {k: v.to(device) for k, v in inputs.items()}
     
-    with torch.no_grad():
+    with torch.no_grad(), tracker.stage("forward"):
         outputs = model(**inputs)
         probs = torch.softmax(outputs.logits, dim=-1)[0]
         pred_id = torch.argmax(probs).item()
         conf = float(probs[pred_id].item())
     
-    label_map = {0: "Négatif", 1: "Neutre", 2: "Positif"}
     return label_map.get(pred_id, "Neutre"), conf, probs.detach().cpu().numpy()
 
 # Interface principale
@@ -167,8 +209,9 @@ with tab1:
                 )
                 
                 # Analyse d'émotions
-                emotion_scores = emotion_detector.predict_emotion(text_input)
-                main_emotion, emotion_conf = emotion_detector.get_main_emotion(text_input)
+                with tracker.stage("emotion_detection"):
+                    emotion_scores = emotion_detector.predict_emotion(text_input)
+                    main_emotion, emotion_conf = emotion_detector.get_main_emotion(text_input)
                 
                 # Affichage des résultats
                 st.markdown("---")
@@ -214,43 +257,46 @@ with tab1:
                     st.metric("Satisfaction", satisfaction)
                 
                 # Graphiques
-                col1, col2 = st.columns(2)
+                with tracker.stage("plotly_render"):
+                    import plotly.graph_objects as go
+
+                    col1, col2 = st.columns(2)
                 
-                with col1:
-                    st.subheader("📊 Probabilités de Sentiment")
-                    fig_sent = go.Figure(data=[
-                        go.Bar(
-                            x=["Négatif", "Neutre", "Positif"],
-                            y=[sent_probs[0], sent_probs[1], sent_probs[2]],
-                            marker_color=['#ef4444', '#f59e0b', '#10b981']
+                    with col1:
+                        st.subheader("📊 Probabilités de Sentiment")
+                        fig_sent = go.Figure(data=[
+                            go.Bar(
+                                x=["Négatif", "Neutre", "Positif"],
+                                y=[sent_probs[0], sent_probs[1], sent_probs[2]],
+                                marker_color=['#ef4444', '#f59e0b', '#10b981']
+                            )
+                        ])
+                        fig_sent.update_layout(
+                            yaxis_title="Probabilité",
+                            height=300,
+                            showlegend=False
                         )
-                    ])
-                    fig_sent.update_layout(
-                        yaxis_title="Probabilité",
-                        height=300,
-                        showlegend=False
-                    )
-                    st.plotly_chart(fig_sent, use_container_width=True)
+                        st.plotly_chart(fig_sent, use_container_width=True)
                 
-                with col2:
-                    st.subheader("📊 Distribution des Émotions")
-                    emotions_list = list(emotion_scores.keys())
-                    values_list = list(emotion_scores.values())
-                    colors = ['#10b981', '#3b82f6', '#ef4444', '#f59e0b', '#6b7280']
+                    with col2:
+                        st.subheader("📊 Distribution des Émotions")
+                        emotions_list = list(emotion_scores.keys())
+                        values_list = list(emotion_scores.values())
+                        colors = ['#10b981', '#3b82f6', '#ef4444', '#f59e0b', '#6b7280']
                     
-                    fig_emotion = go.Figure(data=[
-                        go.Bar(
-                            x=emotions_list,
-                            y=values_list,
-                            marker_color=colors[:len(emotions_list)]
+                        fig_emotion = go.Figure(data=[
+                            go.Bar(
+                                x=emotions_list,
+                                y=values_list,
+                                marker_color=colors[:len(emotions_list)]
+                            )
+                        ])
+                        fig_emotion.update_layout(
+                            yaxis_title="Score",
+                            height=300,
+                            showlegend=False
                         )
-                    ])
-                    fig_emotion.update_layout(
-                        yaxis_title="Score",
-                        height=300,
-                        showlegend=False
-                    )
-                    st.plotly_chart(fig_emotion, use_container_width=True)
+                        st.plotly_chart(fig_emotion, use_container_width=True)
                 
                 # Détails
                 with st.expander("🔍 Détails de l'analyse"):
@@ -274,13 +320,39 @@ with tab2:
     # Chargement du dataset
     @st.cache_data
     def load_dataset():
+        import pandas as pd
+
         try:
-            df = pd.read_csv("TA_restaurants_ML_clean_cleaned.csv")
+            df = pd.read_csv(DATASET_PATH)
             return df
         except FileNotFoundError:
             st.error("Fichier dataset non trouvé!")
             return None
     
+    @st.cache_resource
+    def load_cube(csv_path: str):
+        return load_or_build_cube(csv_path, df=load_dataset())
+    
+    @st.cache_resource
+    def load_token_index(csv_path: str):
+        return load_or_update_token_index(csv_path, df=load_dataset())
+    
+    @st.cache_resource
+    def load_embedding_index(directory: str, meta_mtime: float):
+        # meta_mtime: l'index est rouvert quand il a été complété par la CLI
+        return EmbeddingIndex(directory)
+    
+    @st.cache_resource
+    def load_embedder(model_name: str):
+        from model_store import load_sequence_classifier
+
+        return load_sequence_classifier(model_name)
+    
+    @st.cache_data(max_entries=64)
+    def cached_wordcloud(version: str, facet: str, value: str):
+        return wordcloud_png(load_token_index(DATASET_PATH), facet, value,
+                             cache_dir=wordcloud_cache_dir(DATASET_PATH))
+    
     df = load_dataset()
     
     if df is not None:
@@ -289,40 +361,46 @@ with tab2:
         # Options d'analyse
         analysis_option = st.radio(
             "Type d'analyse:",
-            ["Statistiques générales", "Analyse par émotions", "Nuage de mots"],
+            ["Statistiques générales", "Analyse par émotions", "Nuage de mots", "Avis similaires"],
             horizontal=True
         )
         
         if analysis_option == "Statistiques générales":
+            # Requêtes sur le cube d'agrégats (O(taille du cube) par interaction)
+            cube = load_cube(DATASET_PATH)
+            filters = render_cube_filters(st, cube, key="stats_filters")
+            stats = summarize(cube, filters)
+            
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Total d'avis", len(df))
+                st.metric("Total d'avis", stats["n_reviews"])
             with col2:
-                st.metric("Restaurants uniques", df['Name'].nunique())
+                st.metric("Restaurants uniques", stats["n_restaurants"])
             with col3:
-                st.metric("Villes", df['City'].nunique())
+                st.metric("Villes", stats["n_cities"])
             with col4:
-                avg_rating = df['Rating'].mean()
-                st.metric("Note moyenne", f"{avg_rating:.2f}")
+                st.metric("Note moyenne", f"{stats['rating_mean']:.2f}" if stats["n_reviews"] else "-")
             
+            import plotly.express as px
+
             # Distribution des notes
             st.subheader("Distribution des Notes")
-            fig_rating = px.histogram(
-                df,
-                x='Rating',
-                nbins=10,
+            rating_counts = rating_histogram(cube, filters)
+            fig_rating = px.bar(
+                x=rating_counts.index,
+                y=rating_counts.values,
                 title="Distribution des notes (1-5)",
-                labels={'Rating': 'Note', 'count': 'Nombre d\'avis'}
+                labels={'x': 'Note', 'y': 'Nombre d\'avis'}
             )
             st.plotly_chart(fig_rating, use_container_width=True)
             
             # Top restaurants
             st.subheader("Top 10 Restaurants par Nombre d'Avis")
-            top_restaurants = df['Name'].value_counts().head(10)
+            top = top_restaurants(cube, 10, filters)
             fig_top = px.bar(
-                x=top_restaurants.values,
-                y=top_restaurants.index,
+                x=top.values,
+                y=top.index,
                 orientation='h',
                 labels={'x': 'Nombre d\'avis', 'y': 'Restaurant'}
             )
@@ -331,22 +409,25 @@ with tab2:
         elif analysis_option == "Analyse par émotions":
             st.info("💡 Cette fonctionnalité nécessite d'analyser tous les avis. Cela peut prendre du temps.")
             
-            if st.button("🚀 Lancer l'analyse d'émotions sur un échantillon"):
-                sample_size = st.slider("Taille de l'échantillon", 10, 1000, 100)
+            # Le slider est hors du bouton: sa valeur est connue au moment du clic
+            sample_size = st.slider("Taille de l'échantillon", 10, 1000, 100)
+            
+            def sample_reviews():
                 sample_df = df.sample(min(sample_size, len(df)))
-                
-                progress_bar = st.progress(0)
-                emotions_list = []
-                
-                for idx, row in sample_df.iterrows():
-                    review = str(row.get('Review_clean', row.get('Review', '')))
-                    if review and review != 'nan':
-                        emotion, _ = emotion_detector.get_main_emotion(review)
-                        emotions_list.append(emotion)
-                    progress_bar.progress((idx + 1) / len(sample_df))
-                
+                review_col = 'Review_clean' if 'Review_clean' in sample_df.columns else 'Review'
+                return [r for r in sample_df[review_col].astype(str) if r and r != 'nan']
+            
+            job = render_emotion_job(
+                st, emotion_detector, sample_reviews,
+                key="dataset_emotion_job",
+                start_label="🚀 Lancer l'analyse d'émotions sur un échantillon"
+            )
+            
+            if job is not None and job["emotions"]:
+                import plotly.express as px
+
                 # Graphique de distribution
-                emotion_counts = Counter(emotions_list)
+                emotion_counts = Counter(job["emotions"])
                 fig_emotions = px.pie(
                     values=list(emotion_counts.values()),
                     names=list(emotion_counts.keys()),
@@ -357,21 +438,76 @@ with tab2:
         elif analysis_option == "Nuage de mots":
             st.subheader("Nuage de Mots des Avis")
             
-            # Collecter tous les textes
-            all_texts = " ".join(df['Review_clean'].dropna().astype(str).tolist())
+            # Index des fréquences: construit une fois, complété quand le dataset grandit
+            index = load_token_index(DATASET_PATH)
+            
+            facet_labels = {"all": "Tous les avis", "sentiment": "Par sentiment",
+                            "city": "Par ville", "emotion": "Par émotion"}
+            facets = ["all"] + [f for f in FACETS if facet_values(index, f)]
+            facet = st.selectbox("Avis à inclure", facets, format_func=facet_labels.get)
+            value = "*"
+            if facet != "all":
+                value = st.selectbox("Valeur", facet_values(index, facet))
+            
+            # Image générée depuis les fréquences et mise en cache (disque + mémoire)
+            png = cached_wordcloud(index["version"], facet, value)
+            if png:
+                st.image(png, use_container_width=True)
+            else:
+                st.info("Aucun mot pour cette sélection.")
+        
+        elif analysis_option == "Avis similaires":
+            st.subheader("🔎 Avis Similaires")
             
-            if all_texts:
-                wordcloud = WordCloud(
-                    width=800,
-                    height=400,
-                    background_color='white',
-                    max_words=100
-                ).generate(all_texts)
+            # Index d'embeddings construit hors de l'application (CLI), recherche en millisecondes
+            index_dir = index_dir_for(DATASET_PATH)
+            if not EmbeddingIndex.exists(index_dir):
+                st.info("Index d'embeddings absent. Construisez-le avec: "
+                        f"`python embedding_index.py build --csv {DATASET_PATH}`")
+            else:
+                import os
+
+                index = load_embedding_index(index_dir, os.path.getmtime(os.path.join(index_dir, META_FILE)))
+                text_column = index.meta["text_column"]
                 
-                fig, ax = plt.subplots(figsize=(10, 5))
-                ax.imshow(wordcloud, interpolation='bilinear')
-                ax.axis('off')
-                st.pyplot(fig)
+                query_mode = st.radio("Requête", ["Avis du dataset", "Texte libre"], horizontal=True)
+                col1, col2 = st.columns(2)
+                with col1:
+                    k = st.slider("Nombre d'avis similaires", 1, 50, 10)
+                with col2:
+                    use_ivf = st.checkbox("Recherche approchée (IVF)", value=index.has_ivf,
+                                          disabled=not index.has_ivf)
+                nprobe = DEFAULT_NPROBE if use_ivf else None
+                
+                results = None
+                start = time.perf_counter()
+                if query_mode == "Avis du dataset":
+                    row = st.number_input("Numéro de l'avis", 0, index.n_rows - 1, 0)
+                    st.markdown(f"> {df[text_column].iloc[int(row)]}")
+                    start = time.perf_counter()
+                    results = index.similar_to_row(int(row), k, nprobe)
+                else:
+                    query = st.text_area("Avis de référence", placeholder="Ex: The food was cold and the waiter rude")
+                    if query.strip():
+                        try:
+                            with st.spinner("Encodage de la requête..."):
+                                embedder = load_embedder(index.meta["model"])
+                            start = time.perf_counter()
+                            vector = embed_texts([query], *embedder, max_length=index.meta["max_length"])
+                            scores, ids = index.search(vector, k, nprobe)
+                            results = scores[0], ids[0][ids[0] >= 0]
+                        except Exception as e:
+                            st.error(f"Modèle d'embedding indisponible ({index.meta['model']}): {e}")
+                
+                if results is not None:
+                    scores, ids = results
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    st.caption(f"{len(ids)} avis parmi {index.n_rows} en {elapsed_ms:.1f} ms "
+                               f"({'IVF' if nprobe else 'recherche exacte'})")
+                    columns = [c for c in ("Name", "City", "Rating") if c in df.columns]
+                    similar = df.iloc[ids][columns + [text_column]].copy()
+                    similar.insert(0, "Similarité", scores[:len(ids)].round(3))
+                    st.dataframe(similar, use_container_width=True, hide_index=True)
 
 # TAB 3: À propos
 with tab3:
@@ -428,6 +564,9 @@ with tab3:
     - Dataset: Kaggle Restaurant Reviews
     """)
 
+# Panneau de performances
+render_latency_panel(st.sidebar)
+
 # Footer
 st.markdown("---")
 st.caption("Projet NLP - Analyse de Sentiments & Détection d'Émotions | Oumaima AYADI")
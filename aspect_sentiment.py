@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Sentiment par aspect (nourriture, service, prix, ambiance)
+
+Un avis comme « The food was amazing but the service was slow » reçoit un seul
+label mélangé avec le modèle de sentiment. Ici, chaque avis est découpé en
+propositions (ponctuation et conjonctions d'opposition: but, however, mais...;
+une virgule ne coupe pas une énumération d'aspects),
+chaque proposition reçoit les aspects dont un mot-clé du lexique apparaît, puis
+les propositions de tous les avis sont évaluées ensemble par le modèle de
+sentiment (lots communs triés par longueur). Les propositions déjà vues
+(normalisées) sont servies par un cache LRU: les formulations répétées d'un
+job en masse ne passent qu'une fois dans le modèle. Un analyseur peut être
+partagé par les sessions Streamlit: le cache est protégé par un verrou.
+
+Utilisation:
+    python aspect_sentiment.py --csv TA_restaurants_balanced.csv --model model --limit 2000
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+SENTIMENT_LABELS = ("Négatif", "Neutre", "Positif")
+
+# Lexique des aspects (anglais et français), mots entiers
+ASPECT_KEYWORDS = {
+    "nourriture": [
+        "food", "dish", "dishes", "meal", "meals", "taste", "tasty", "flavor", "flavour", "menu",
+        "pizza", "pasta", "steak", "fish", "meat", "dessert", "desserts", "wine", "breakfast",
+        "lunch", "dinner", "portion", "portions", "cooked", "delicious", "bland",
+        "nourriture", "plat", "plats", "repas", "cuisine", "goût", "saveur", "vin", "dessert",
+        "délicieux", "portion", "menu",
+    ],
+    "service": [
+        "service", "staff", "waiter", "waiters", "waitress", "server", "servers", "waiting",
+        "wait", "rude", "friendly", "attentive", "slow", "owner", "manager", "host", "welcome",
+        "serveur", "serveuse", "personnel", "accueil", "attente", "lent", "aimable", "patron",
+    ],
+    "prix": [
+        "price", "prices", "priced", "expensive", "cheap", "value", "cost", "bill", "overpriced",
+        "affordable", "money", "worth",
+        "prix", "cher", "chère", "addition", "tarif", "tarifs", "abordable", "rapport",
+    ],
+    "ambiance": [
+        "ambience", "ambiance", "atmosphere", "decor", "music", "noisy", "noise", "quiet", "cozy",
+        "cosy", "view", "terrace", "place", "setting", "interior", "romantic",
+        "atmosphère", "décor", "musique", "bruyant", "calme", "cadre", "terrasse", "vue",
+    ],
+}
+ASPECTS = tuple(ASPECT_KEYWORDS)
+
+# Séparateurs de propositions: ponctuation forte et conjonctions d'opposition
+# (« yet » après une négation ou « have » n'oppose rien: « not yet tried the desserts »)
+CLAUSE_SPLIT = re.compile(
+    r"[.!?;\n]+|\b(?:but|however|although|though|whereas|"
+    r"(?<!not\s)(?<!n't\s)(?<!never\s)(?<!have\s)(?<!has\s)yet|"
+    r"mais|cependant|pourtant|par contre|en revanche)\b",
+    re.IGNORECASE
+)
+# Virgules: séparent des propositions, sauf dans une énumération (voir split_clauses)
+COMMA_SPLIT = re.compile(r",\s*(?=\w)")
+_ASPECT_PATTERNS = {
+    aspect: re.compile(r"\b(?:" + "|".join(sorted(map(re.escape, set(words)), key=len, reverse=True)) + r")\b",
+                       re.IGNORECASE)
+    for aspect, words in ASPECT_KEYWORDS.items()
+}
+
+DEFAULT_CACHE_SIZE = 50_000
+
+
+def split_clauses(text: str) -> List[str]:
+    """
+    Découpe un avis en propositions (au moins deux mots)
+
+    Un fragment d'un seul mot avant une virgule est un élément d'énumération: il
+    reste attaché à la suite (« Food, service and prices were great » garde la
+    nourriture), et un dernier fragment d'un mot à la proposition précédente.
+    """
+    clauses = []
+    for part in CLAUSE_SPLIT.split(str(text)):
+        part_clauses, fragment = [], ""
+        for piece in COMMA_SPLIT.split(part):
+            fragment = f"{fragment}, {piece.strip()}" if fragment else piece
+            if len(piece.split()) >= 2:
+                part_clauses.append(fragment)
+                fragment = ""
+        if fragment and part_clauses:
+            part_clauses[-1] = f"{part_clauses[-1]}, {fragment.strip()}"
+        elif fragment:
+            part_clauses.append(fragment)
+        clauses.extend(c.strip(" ,:-\t") for c in part_clauses)
+    return [c for c in clauses if len(c.split()) >= 2]
+
+
+def clause_aspects(clause: str) -> List[str]:
+    """Aspects mentionnés dans une proposition (lexique de mots-clés)"""
+    return [aspect for aspect, pattern in _ASPECT_PATTERNS.items() if pattern.search(clause)]
+
+
+def normalize_clause(clause: str) -> str:
+    """Clé de cache d'une proposition (minuscules, espaces réduits)"""
+    return " ".join(clause.lower().split())
+
+
+def make_model_scorer(tokenizer, model, device, max_length: int = 64,
+                      batch_size: int = 64) -> Callable[[Sequence[str]], np.ndarray]:
+    """
+    Évaluation des propositions par le modèle de sentiment (lots triés par longueur)
+
+    Returns:
+        Fonction (propositions) -> probabilités [n, 3] (Négatif, Neutre, Positif)
+    """
+    from batch_inference import run_batched_inference
+
+    def score(clauses: Sequence[str]) -> np.ndarray:
+        logits, _ = run_batched_inference(list(clauses), tokenizer, model, device,
+                                          batch_size=batch_size, max_length=max_length)
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    return score
+
+
+def make_keyword_scorer(detector=None) -> Callable[[Sequence[str]], np.ndarray]:
+    """Évaluation sans modèle: émotions par mots-clés regroupées en sentiments"""
+    from emotion_detection import SimpleEmotionDetector, EMOTION_TO_SENTIMENT
+
+    detector = detector or SimpleEmotionDetector()
+
+    def score(clauses: Sequence[str]) -> np.ndarray:
+        probs = np.zeros((len(clauses), len(SENTIMENT_LABELS)), dtype=np.float32)
+        for i, scores in enumerate(detector.predict_emotions(clauses)):
+            for emotion, value in scores.items():
+                probs[i, SENTIMENT_LABELS.index(EMOTION_TO_SENTIMENT[emotion])] += value
+        return probs
+
+    return score
+
+
+class AspectSentimentAnalyzer:
+    """
+    Sentiment par aspect d'une liste d'avis, propositions évaluées par lots avec cache
+    """
+
+    def __init__(self, scorer: Callable[[Sequence[str]], np.ndarray], cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            scorer: Fonction (propositions) -> probabilités [n, 3]
+            cache_size: Nombre maximal de propositions gardées en cache
+        """
+        self.scorer = scorer
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Analyseur partagé par les sessions: verrou autour du cache et des statistiques
+        # (le modèle est appelé hors verrou)
+        self._lock = threading.Lock()
+        self.stats = {"clauses": 0, "scored": 0, "cache_hits": 0, "scorer_calls": 0}
+
+    def _probabilities(self, clauses: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Probabilités des propositions (clés normalisées): cache, puis un seul appel pour les autres"""
+        keys = [normalize_clause(c) for c in clauses]
+        found = {}
+        missing = OrderedDict()
+        with self._lock:
+            for key, clause in zip(keys, clauses):
+                if key in found or key in missing:
+                    self.stats["cache_hits"] += 1
+                elif key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+                    self.stats["cache_hits"] += 1
+                else:
+                    missing[key] = clause
+            self.stats["clauses"] += len(clauses)
+        if missing:
+            probs = np.asarray(self.scorer(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                self.stats["scorer_calls"] += 1
+                self.stats["scored"] += len(missing)
+                for key, row in zip(missing, probs):
+                    found[key] = self._cache[key] = row
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return found
+
+    def analyze(self, texts: Sequence[str]) -> List[Dict[str, Dict]]:
+        """
+        Sentiment de chaque aspect mentionné dans chaque avis
+
+        Returns:
+            Pour chaque avis: {aspect: {"sentiment", "confidence", "probs", "clauses"}}
+            (probabilités moyennes des propositions de l'aspect)
+        """
+        mentions = []  # (avis, aspect, proposition)
+        for doc, text in enumerate(texts):
+            for clause in split_clauses(text):
+                for aspect in clause_aspects(clause):
+                    mentions.append((doc, aspect, clause))
+
+        probabilities = self._probabilities([clause for _, _, clause in mentions])
+        grouped: List[Dict[str, List[np.ndarray]]] = [{} for _ in texts]
+        for doc, aspect, clause in mentions:
+            grouped[doc].setdefault(aspect, []).append(probabilities[normalize_clause(clause)])
+
+        results = []
+        for aspects in grouped:
+            result = {}
+            for aspect in ASPECTS:
+                if aspect in aspects:
+                    mean = np.mean(aspects[aspect], axis=0)
+                    label = int(mean.argmax())
+                    result[aspect] = {"sentiment": SENTIMENT_LABELS[label], "confidence": float(mean[label]),
+                                      "probs": mean.tolist(), "clauses": len(aspects[aspect])}
+            results.append(result)
+        return results
+
+    def cache_hit_rate(self) -> Optional[float]:
+        return self.stats["cache_hits"] / self.stats["clauses"] if self.stats["clauses"] else None
+
+
+def aspect_summary(results: Sequence[Dict[str, Dict]]) -> Dict[str, Dict[str, int]]:
+    """Nombre d'avis par aspect et par sentiment"""
+    summary = {aspect: {label: 0 for label in SENTIMENT_LABELS} for aspect in ASPECTS}
+    for result in results:
+        for aspect, value in result.items():
+            summary[aspect][value["sentiment"]] += 1
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Sentiment par aspect d'un dataset d'avis")
+    parser.add_argument("--csv", default="TA_restaurants_balanced.csv", help="Dataset CSV")
+    parser.add_argument("--model", default=None, help="Modele de sentiment (defaut: mots-cles)")
+    parser.add_argument("--limit", type=int, default=2000, help="Nombre d'avis analyses")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv).head(args.limit)
+    texts = df["Review"].astype(str).tolist()
+    if args.model:
+        from model_store import load_sequence_classifier
+
+        tokenizer, model, device = load_sequence_classifier(args.model, num_labels=3)
+        scorer = make_model_scorer(tokenizer, model, device, batch_size=args.batch_size)
+    else:
+        scorer = make_keyword_scorer()
+
+    analyzer = AspectSentimentAnalyzer(scorer)
+    start = time.perf_counter()
+    results = analyzer.analyze(texts)
+    elapsed = time.perf_counter() - start
+
+    print(f"[OK] {len(texts)} avis en {elapsed:.2f} s ({len(texts) / max(elapsed, 1e-9):.0f} avis/s)")
+    print(f"   Propositions: {analyzer.stats['clauses']}, evaluees par le modele: {analyzer.stats['scored']}, "
+          f"cache: {analyzer.cache_hit_rate() or 0:.1%}")
+    for aspect, counts in aspect_summary(results).items():
+        print(f"   {aspect:<11} " + "  ".join(f"{label}: {n:>5}" for label, n in counts.items()))
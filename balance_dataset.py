@@ -7,6 +7,18 @@ import pandas as pd
 import numpy as np
 import random
 
+# Label de sentiment -> nom
+LABEL_TO_SENTIMENT = {0: 'Négatif', 1: 'Neutre', 2: 'Positif'}
+
+def rating_to_label(r):
+    """Note (1-5) -> label de sentiment (0: Négatif, 1: Neutre, 2: Positif)"""
+    if r <= 2:
+        return 0  # Négatif
+    elif r == 3:
+        return 1  # Neutre
+    else:
+        return 2  # Positif
+
 def create_balanced_dataset(input_file, output_file, target_size_per_class=None, random_seed=42):
     """
     Crée un dataset équilibré avec échantillonnage aléatoire
@@ -43,16 +55,8 @@ def create_balanced_dataset(input_file, output_file, target_size_per_class=None,
     df = df.dropna(subset=['Rating'])
     
     # Créer les labels de sentiment
-    def rating_to_label(r):
-        if r <= 2:
-            return 0  # Négatif
-        elif r == 3:
-            return 1  # Neutre
-        else:
-            return 2  # Positif
-    
     df['label'] = df['Rating'].apply(rating_to_label)
-    df['sentiment'] = df['label'].map({0: 'Négatif', 1: 'Neutre', 2: 'Positif'})
+    df['sentiment'] = df['label'].map(LABEL_TO_SENTIMENT)
     
     # Nettoyer les reviews
     df['Review'] = df['Review'].astype(str).str.strip()
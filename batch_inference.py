@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur d'inférence par lots pour les modèles Transformers
+
+- Les textes sont triés par longueur pour minimiser le padding dans chaque lot
+- La tokenisation du lot suivant se fait dans un thread pendant le forward du lot courant
+- Les sorties sont écrites dans un tableau numpy préalloué, dans l'ordre d'origine
+- Les temps de chaque étape sont mesurés (tokenize / forward)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def length_sorted_batches(texts: Sequence[str], batch_size: int) -> List[np.ndarray]:
+    """
+    Découpe les textes en lots d'indices, triés par longueur (en caractères)
+
+    Args:
+        texts: Liste des textes
+        batch_size: Taille des lots
+
+    Returns:
+        Liste de tableaux d'indices (positions dans texts)
+    """
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    order = np.argsort(lengths, kind='stable')
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def logits_forward(model, inputs):
+    """Forward par défaut: retourne les logits du modèle de classification"""
+    return model(**inputs).logits
+
+
+def run_batched_inference(
+    texts: Sequence[str],
+    tokenizer,
+    model,
+    device,
+    batch_size: int = 32,
+    max_length: int = 128,
+    forward_fn: Optional[Callable] = None,
+    prefetch: bool = True,
+    batches: Optional[List[np.ndarray]] = None,
+    encodings: Optional[List[dict]] = None
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Exécute le modèle sur une liste de textes, par lots triés par longueur
+
+    Args:
+        texts: Liste des textes
+        tokenizer: Tokenizer HuggingFace
+        model: Modèle PyTorch (en mode eval)
+        device: Device PyTorch
+        batch_size: Taille des lots
+        max_length: Longueur maximale (tokens)
+        forward_fn: Fonction (model, inputs) -> tensor [batch, dim] (par défaut: logits)
+        prefetch: Tokeniser le lot suivant dans un thread pendant le forward
+        batches: Lots d'indices déjà calculés (voir pretokenize)
+        encodings: Encodages déjà calculés pour ces lots (la tokenisation est alors sautée)
+
+    Returns:
+        Tuple (sorties float32 [n, dim] dans l'ordre de texts, temps par étape en secondes)
+    """
+    import torch
+
+    forward_fn = forward_fn or logits_forward
+    if batches is None:
+        batches = length_sorted_batches(texts, batch_size)
+    timings = {"tokenize": 0.0, "tokenize_wait": 0.0, "forward": 0.0,
+               "batches": float(len(batches)), "tokens": 0.0, "padded_tokens": 0.0}
+
+    def tokenize(batch_idx):
+        start = time.perf_counter()
+        encoded = tokenizer(
+            [texts[i] for i in batch_idx],
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=max_length
+        )
+        timings["tokenize"] += time.perf_counter() - start
+        return encoded
+
+    executor = None
+    pending = {}
+    if prefetch and encodings is None and len(batches) > 1:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tokenize")
+
+    def get_encoding(k):
+        """Encodage du lot k; lance la tokenisation du lot k+1 en arrière-plan"""
+        if encodings is not None:
+            return encodings[k]
+        if executor is None:
+            encoded = tokenize(batches[k])
+            timings["tokenize_wait"] = timings["tokenize"]
+            return encoded
+        future = pending.pop(k, None) or executor.submit(tokenize, batches[k])
+        if k + 1 < len(batches):
+            pending[k + 1] = executor.submit(tokenize, batches[k + 1])
+        wait_start = time.perf_counter()
+        encoded = future.result()
+        timings["tokenize_wait"] += time.perf_counter() - wait_start
+        return encoded
+
+    outputs = None
+    try:
+        with torch.inference_mode():
+            for k, batch_idx in enumerate(batches):
+                encoded = get_encoding(k)
+                mask = encoded["attention_mask"]
+                timings["tokens"] += float(mask.sum())
+                timings["padded_tokens"] += float(mask.numel())
+
+                start = time.perf_counter()
+                inputs = {key: value.to(device) for key, value in encoded.items()}
+                batch_out = forward_fn(model, inputs).float().cpu().numpy()
+                timings["forward"] += time.perf_counter() - start
+
+                if outputs is None:
+                    outputs = np.empty((len(texts), batch_out.shape[1]), dtype=np.float32)
+                outputs[batch_idx] = batch_out
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    if outputs is None:
+        outputs = np.empty((0, 0), dtype=np.float32)
+    return outputs, timings
+
+
+
+def pretokenize(
+    texts: Sequence[str],
+    tokenizer,
+    batch_size: int = 32,
+    max_length: int = 128
+) -> Tuple[List[np.ndarray], List[dict], float]:
+    """
+    Tokenise tous les lots une seule fois, pour réutiliser les encodages sur
+    plusieurs modèles partageant le même tokenizer
+
+    Returns:
+        Tuple (lots d'indices, encodages, temps de tokenisation en secondes)
+    """
+    batches = length_sorted_batches(texts, batch_size)
+    start = time.perf_counter()
+    encodings = [
+        tokenizer(
+            [texts[i] for i in batch_idx],
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=max_length
+        )
+        for batch_idx in batches
+    ]
+    return batches, encodings, time.perf_counter() - start
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """
+    Identifiant du comportement d'un tokenizer (vocabulaire, normalisation...):
+    deux tokenizers de même empreinte produisent les mêmes encodages
+    """
+    import hashlib
+
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        content = backend.to_str()
+    else:
+        content = repr(sorted(tokenizer.get_vocab().items()))
+    content += f"|{type(tokenizer).__name__}|{tokenizer.padding_side}|{tokenizer.truncation_side}"
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de performance du projet
+
+Sous-commandes:
+    python benchmark.py imports            # temps d'import au démarrage (python -X importtime)
+    python benchmark.py imports --check    # code de sortie 1 en cas de régression
+    python benchmark.py compiled           # inférence TorchScript / torch.compile vs eager
+
+Le démarrage à froid d'une application Streamlit est dominé par ses imports de
+premier niveau. Pour chaque cible, les imports de premier niveau du fichier sont
+extraits (ast) puis exécutés dans un processus Python neuf avec -X importtime:
+on mesure ainsi le coût réel de l'en-tête sans lancer Streamlit. Les modules
+lourds interdits (torch, transformers, matplotlib...) et un budget en ms par
+cible servent de garde-fous contre les régressions.
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modes comparés à eager par la sous-commande compiled
+COMPILE_BENCH_MODES = ("trace", "compile")
+
+# Cible -> modules lourds qui ne doivent pas être importés au démarrage, budget (ms).
+# Les modules (sans Streamlit) sont importés entièrement; pour les apps, seul
+# l'en-tête est exécuté. plotly.express est ciblé car streamlit importe déjà
+# une petite partie de plotly.
+IMPORT_TARGETS = {
+    "emotion_detection.py": {
+        "forbidden": ("torch", "transformers", "pandas", "matplotlib"),
+        "budget_ms": 300,
+        "module": True,
+    },
+    "streamlit_app.py": {
+        "forbidden": ("torch", "transformers", "matplotlib", "seaborn", "wordcloud"),
+        "budget_ms": 3000,
+    },
+    "chatbot_app.py": {
+        "forbidden": ("torch", "transformers", "pandas", "matplotlib", "plotly.express"),
+        "budget_ms": 1500,
+    },
+    "app_emotions.py": {
+        "forbidden": ("torch", "transformers", "pandas", "matplotlib", "seaborn", "wordcloud", "plotly.express"),
+        "budget_ms": 1500,
+    },
+    # torch seulement pour le backend DistilBERT (mots-clés et TF-IDF sans torch)
+    "app.py": {
+        "forbidden": ("torch", "transformers", "sklearn", "pandas", "matplotlib", "plotly.express"),
+        "budget_ms": 1500,
+    },
+}
+
+
+def header_imports(path: str) -> str:
+    """
+    Extrait les imports de premier niveau d'un fichier (sans exécuter le reste du script)
+
+    Args:
+        path: Chemin du fichier Python
+
+    Returns:
+        Code source contenant uniquement les instructions import/from ... import
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    nodes = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in nodes)
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Analyse la sortie de -X importtime
+
+    Returns:
+        Liste de {"module", "self_ms", "cumulative_ms", "depth"} dans l'ordre d'import
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+            entries.append({
+                "module": name.strip(),
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cumulative_us) / 1000.0,
+                "depth": depth,
+            })
+        except ValueError:
+            continue
+    return entries
+
+
+def _importtime(code: str, python: str) -> List[Dict]:
+    """Exécute du code dans un processus neuf avec -X importtime"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Echec des imports:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def profile_imports(target: str, module: bool = False, python: str = sys.executable) -> Dict:
+    """
+    Mesure le coût des imports de premier niveau d'une cible dans un processus neuf
+
+    Args:
+        target: Fichier du projet (ex: chatbot_app.py)
+        module: Importer le module entier plutôt que son seul en-tête
+        python: Interpréteur à utiliser
+
+    Returns:
+        Dictionnaire {"target", "total_ms", "top", "modules"}
+    """
+    if module:
+        code = f"import {os.path.splitext(target)[0]}"
+    else:
+        code = header_imports(os.path.join(PROJECT_DIR, target))
+    # Les modules chargés au démarrage de l'interpréteur (site, encodings...) ne comptent pas
+    startup = {e["module"] for e in _importtime("pass", python)}
+    entries = [e for e in _importtime(code, python) if e["module"] not in startup]
+    roots = [e for e in entries if e["depth"] == 0]
+    return {
+        "target": target,
+        "total_ms": round(sum(e["cumulative_ms"] for e in roots), 1),
+        "top": sorted(roots, key=lambda e: e["cumulative_ms"], reverse=True)[:5],
+        "modules": sorted({e["module"] for e in entries}),
+    }
+
+
+def check_imports(report: Dict, forbidden, budget_ms: float) -> List[str]:
+    """Liste des régressions d'une cible (modules interdits chargés, budget dépassé)"""
+    loaded = report["modules"]
+    problems = [
+        f"module lourd importe au demarrage: {m}" for m in forbidden
+        if any(name == m or name.startswith(m + ".") for name in loaded)
+    ]
+    if report["total_ms"] > budget_ms:
+        problems.append(f"budget depasse: {report['total_ms']:.0f} ms > {budget_ms:.0f} ms")
+    return problems
+
+
+def run_imports_benchmark(targets=None, check: bool = False, output: str = None) -> int:
+    """Sous-commande imports: affiche le rapport et retourne le code de sortie"""
+    targets = targets or list(IMPORT_TARGETS)
+    print("=" * 60)
+    print("TEMPS D'IMPORT AU DEMARRAGE (python -X importtime)")
+    print("=" * 60)
+
+    reports = []
+    failures = 0
+    for target in targets:
+        spec = IMPORT_TARGETS.get(target, {"forbidden": (), "budget_ms": float("inf")})
+        report = profile_imports(target, module=spec.get("module", False))
+        problems = check_imports(report, spec["forbidden"], spec["budget_ms"])
+        report["problems"] = problems
+        reports.append(report)
+
+        print(f"\n{target}: {report['total_ms']:.1f} ms")
+        for entry in report["top"]:
+            print(f"   {entry['module']:<30} {entry['cumulative_ms']:>9.1f} ms")
+        for problem in problems:
+            print(f"   [REGRESSION] {problem}")
+        failures += bool(problems)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({r["target"]: {"total_ms": r["total_ms"], "problems": r["problems"]} for r in reports},
+                      f, indent=2)
+        print(f"\n[OK] Resultats sauvegardes: {output}")
+
+    if failures:
+        print(f"\n[ERREUR] {failures} cible(s) en regression")
+    else:
+        print("\n[OK] Aucune regression")
+    return 1 if (check and failures) else 0
+
+
+def run_compiled_benchmark(model_name: str, modes=COMPILE_BENCH_MODES, batch_size: int = 32,
+                           n_texts: int = 256, repeats: int = 20, csv_path: str = None,
+                           output: str = None) -> int:
+    """
+    Sous-commande compiled: compare eager et modèles compilés (compiled_model)
+
+    Requête seule: latence médiane d'un avis par palier (textes un peu plus courts que
+    le palier, donc complétés). Lots: débit de run_batched_inference sur des avis du
+    dataset, et écart maximal des logits avec eager.
+    """
+    import numpy as np
+    import torch
+    from batch_inference import run_batched_inference
+    from compiled_model import BUCKETS, compile_classifier
+    from model_store import load_sequence_classifier
+    from thread_tuning import DEFAULT_CSV, sample_texts
+
+    print("=" * 60)
+    print("INFERENCE COMPILEE VS EAGER")
+    print("=" * 60)
+    tokenizer, eager, device = load_sequence_classifier(model_name, compile_mode="")
+    texts = sample_texts(csv_path or DEFAULT_CSV, n_texts)
+    models = {"eager": eager}
+    compile_seconds = {"eager": 0.0}
+    for mode in modes:
+        start = time.perf_counter()
+        models[mode] = compile_classifier(eager, mode, batch_sizes=(1, batch_size))
+        compile_seconds[mode] = time.perf_counter() - start
+
+    lengths = [bucket * 3 // 4 for bucket in BUCKETS]
+    results, reference = {}, None
+    for name, model in models.items():
+        row = {"compile_s": compile_seconds[name], "single_ms": {}}
+        with torch.inference_mode():
+            for length in lengths:
+                inputs = tokenizer([" ".join(["good"] * (length - 2))], return_tensors="pt",
+                                   truncation=True, max_length=max(BUCKETS))
+                inputs = {k: v.to(device) for k, v in inputs.items()}
+                model(**inputs)
+                samples = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    model(**inputs)
+                    samples.append(time.perf_counter() - start)
+                row["single_ms"][str(length)] = float(np.median(samples) * 1000)
+        start = time.perf_counter()
+        logits, _ = run_batched_inference(texts, tokenizer, model, device, batch_size=batch_size,
+                                          max_length=max(BUCKETS))
+        row["batch_reviews_per_s"] = len(texts) / (time.perf_counter() - start)
+        reference = logits if reference is None else reference
+        row["max_logit_diff"] = float(np.abs(logits - reference).max())
+        results[name] = row
+
+    header = "".join(f"{f'{length} tok':>10}" for length in lengths)
+    print(f"\n{'Mode':<10}{'Compil.':>9}{header}{'Lots avis/s':>13}{'Gain':>7}{'Ecart':>10}")
+    base = results["eager"]["batch_reviews_per_s"]
+    for name, row in results.items():
+        singles = "".join(f"{row['single_ms'][str(length)]:>8.2f}ms" for length in lengths)
+        print(f"{name:<10}{row['compile_s']:>8.1f}s{singles}{row['batch_reviews_per_s']:>13.1f}"
+              f"{row['batch_reviews_per_s'] / base:>6.2f}x{row['max_logit_diff']:>10.1e}")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[OK] Resultats sauvegardes: {output}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de performance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    imports_parser = subparsers.add_parser("imports", help="Temps d'import au demarrage")
+    imports_parser.add_argument("targets", nargs="*", help="Fichiers a profiler (defaut: toutes les apps)")
+    imports_parser.add_argument("--check", action="store_true", help="Code de sortie 1 en cas de regression")
+    imports_parser.add_argument("--output", help="Fichier JSON de resultats")
+
+    compiled_parser = subparsers.add_parser("compiled", help="Inference compilee (trace, compile) vs eager")
+    compiled_parser.add_argument("--model", default="distilbert-base-uncased")
+    compiled_parser.add_argument("--modes", default=",".join(COMPILE_BENCH_MODES),
+                                 help="Modes compares a eager (trace, compile)")
+    compiled_parser.add_argument("--batch-size", type=int, default=32)
+    compiled_parser.add_argument("--n-texts", type=int, default=256, help="Avis du test par lots")
+    compiled_parser.add_argument("--repeats", type=int, default=20, help="Mesures par requete seule")
+    compiled_parser.add_argument("--csv", help="Dataset des avis (defaut: celui de thread_tuning)")
+    compiled_parser.add_argument("--output", help="Fichier JSON de resultats")
+
+    args = parser.parse_args(argv)
+    if args.command == "imports":
+        return run_imports_benchmark(args.targets, check=args.check, output=args.output)
+    if args.command == "compiled":
+        return run_compiled_benchmark(args.model, [m for m in args.modes.split(",") if m], args.batch_size,
+                                      args.n_texts, args.repeats, args.csv, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
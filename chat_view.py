@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Rendu de l'historique du chatbot par fenêtre, avec fragments HTML précalculés
+
+Seuls les CHAT_WINDOW derniers messages sont lus depuis la base (review_store)
+et affichés; « Charger les messages précédents » élargit la fenêtre. Le HTML
+de chaque message est formaté une seule fois puis gardé dans un cache de
+session borné (CHAT_MEMORY_CAP fragments, les plus anciens sont évincés et
+relus depuis la base si besoin). La fenêtre est affichée en un seul élément
+markdown: le coût d'un rerun ne dépend que de la taille de la fenêtre, pas
+de la longueur de la conversation.
+"""
+
+import html
+from collections import OrderedDict
+from typing import Dict, Sequence
+
+# Nombre de messages affichés (et ajoutés par « charger plus »)
+CHAT_WINDOW = 20
+# Nombre maximal de fragments HTML gardés en mémoire par session
+CHAT_MEMORY_CAP = 200
+
+
+def get_emotion_icon(emotion: str) -> str:
+    """Retourne l'icône correspondant à l'émotion"""
+    icons = {
+        "joie": "😊",
+        "tristesse": "😢",
+        "colère": "😠",
+        "surprise": "😲",
+        "neutre": "😐"
+    }
+    return icons.get(emotion, "😐")
+
+
+def get_sentiment_icon(sentiment: str) -> str:
+    """Retourne l'icône correspondant au sentiment"""
+    icons = {
+        "Positif": "✅",
+        "Négatif": "❌",
+        "Neutre": "➖"
+    }
+    return icons.get(sentiment, "➖")
+
+
+def message_html(message: Dict) -> str:
+    """
+    Fragment markdown/HTML d'un message (en-tête HTML sur une ligne, réponse du bot en markdown)
+
+    Args:
+        message: Message de review_store.chat_page
+    """
+    if message["role"] == "user":
+        content = html.escape(message["content"]).replace("\n", "<br>")
+        return (
+            '<div class="chat-message user-message"><div class="message-content">'
+            f'<strong>Vous:</strong><br>{content}'
+            f'<div class="message-time">{message["time"]}</div></div></div>'
+        )
+
+    sentiment = message.get("sentiment", "N/A")
+    emotion = message.get("emotion", "N/A")
+    sent_conf = message.get("sentiment_conf", 0)
+    emotion_conf = message.get("emotion_conf", 0)
+    header = (
+        '<div class="chat-message bot-message"><div class="message-content">'
+        '<strong>🤖 Assistant:</strong><br>'
+        f'<b>Sentiment:</b> {get_sentiment_icon(sentiment)} '
+        f'<span class="sentiment-{sentiment.lower()}">{sentiment}</span> ({sent_conf*100:.1f}%)<br>'
+        f'<b>Émotion:</b> {get_emotion_icon(emotion)} '
+        f'<span class="emotion-{emotion}">{emotion.capitalize()}</span> ({emotion_conf*100:.1f}%)<br>'
+        f'<div class="message-time">{message["time"]}</div></div></div>'
+    )
+    # Lignes vides autour: le markdown de la réponse est interprété après le bloc HTML
+    return f"{header}\n\n{message.get('content', '')}"
+
+
+class FragmentCache:
+    """
+    Fragments HTML des messages, indexés par identifiant, bornés en nombre (LRU)
+    """
+
+    def __init__(self, cap: int = CHAT_MEMORY_CAP):
+        self.cap = cap
+        self._fragments: "OrderedDict[int, str]" = OrderedDict()
+        self.formatted = 0
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def render(self, messages: Sequence[Dict]) -> str:
+        """Markdown de la fenêtre: seuls les messages absents du cache sont formatés"""
+        parts = []
+        for message in messages:
+            fragment = self._fragments.get(message["id"])
+            if fragment is None:
+                fragment = self._fragments[message["id"]] = message_html(message)
+                self.formatted += 1
+            self._fragments.move_to_end(message["id"])
+            parts.append(fragment)
+        while len(self._fragments) > self.cap:
+            self._fragments.popitem(last=False)
+        return "\n\n".join(parts)
+
+    def clear(self):
+        self._fragments.clear()
+
+
+def render_chat_window(container, store, session_id: str, state, window_key: str = "chat_window",
+                       cache_key: str = "chat_fragments"):
+    """
+    Affiche les derniers messages d'une session et le bouton « charger plus »
+
+    Args:
+        container: Conteneur Streamlit
+        store: ReviewStore (count_messages, chat_page)
+        session_id: Identifiant de la conversation
+        state: st.session_state (taille de la fenêtre et cache des fragments)
+    """
+    import streamlit as st
+
+    if window_key not in state:
+        state[window_key] = CHAT_WINDOW
+    if cache_key not in state:
+        state[cache_key] = FragmentCache()
+
+    n_messages = store.count_messages(session_id)
+    messages = store.chat_page(session_id, page=0, page_size=state[window_key])
+    hidden = n_messages - len(messages)
+    if hidden > 0:
+        if container.button(f"⬆️ Charger les messages précédents ({hidden} restants)",
+                            use_container_width=True, key=f"{window_key}_more"):
+            state[window_key] += CHAT_WINDOW
+            st.rerun()
+    if messages:
+        container.markdown(state[cache_key].render(messages), unsafe_allow_html=True)
@@ -6,11 +6,22 @@ Auteur: Oumaima AYADI
 """
 
 import streamlit as st
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from emotion_detection import get_emotion_detector, SimpleEmotionDetector
+from latency_tracker import get_tracker, render_latency_panel
+from prometheus_metrics import start_metrics_server
+from review_store import get_store
+from chat_view import render_chat_window, message_html, CHAT_WINDOW
+import re
 import time
-from datetime import datetime
+import uuid
+from functools import partial
+
+tracker = get_tracker()
+start_metrics_server()
+store = get_store()
+
+# Intervalle (s) de rafraîchissement de la zone de chat pendant une analyse
+POLL_INTERVAL = 0.5
 
 # Configuration de la page
 st.set_page_config(
@@ -74,14 +85,31 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialisation de la session
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+# L'historique est dans la base SQLite, indexé par l'identifiant de session: il reste dans
+# st.session_state (jamais dans l'URL, qui donnerait accès à l'historique à qui la reçoit)
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "session" in st.query_params:
+    # Anciens liens ?session=...: le paramètre est ignoré et retiré de l'URL
+    del st.query_params["session"]
+
+# Reprise explicite d'une conversation (après un redémarrage) avec son code de session
+with st.sidebar.expander("🔑 Reprendre une session"):
+    st.caption("Code de cette conversation (donne accès à l'historique: ne le partagez pas)")
+    st.code(st.session_state.session_id, language=None)
+    resume_code = st.text_input("Code de session", key="resume_code").strip().lower()
+    if st.button("Reprendre", disabled=not resume_code):
+        if re.fullmatch(r"[0-9a-f]{32}", resume_code):
+            st.session_state.session_id = resume_code
+            st.session_state.chat_window = CHAT_WINDOW
+            if 'chat_fragments' in st.session_state:
+                st.session_state.chat_fragments.clear()
+            st.rerun()
+        else:
+            st.error("❌ Code de session invalide")
 
-if 'sentiment_model' not in st.session_state:
-    st.session_state.sentiment_model = None
-    st.session_state.tokenizer = None
-    st.session_state.device = None
-    st.session_state.emotion_detector = None
+if 'analysis_queue' not in st.session_state:
+    st.session_state.analysis_queue = None
 
 # Sidebar - Configuration
 st.sidebar.header("⚙️ Configuration")
@@ -100,140 +128,206 @@ USE_EMOTION_MODEL = st.sidebar.checkbox(
     help="Si désactivé, utilise un détecteur basé sur mots-clés"
 )
 
+# Routage multilingue: langue de chaque avis, puis mots-clés / modèle de cette langue
+MULTILINGUAL = st.sidebar.checkbox(
+    "🌍 Avis multilingues",
+    value=False,
+    help="Identifie la langue de chaque avis et utilise le détecteur d'émotions de cette langue"
+)
+
 MAX_LENGTH = st.sidebar.slider("Longueur max du texte", 32, 256, 128, step=16)
 
+# Mode documents longs: fenêtres glissantes agrégées au lieu de la troncature
+LONG_DOCUMENT = st.sidebar.checkbox(
+    "📜 Avis longs (fenêtres glissantes)",
+    value=False,
+    help="Analyse tout l'avis par fenêtres de tokens qui se chevauchent (logits moyennés)"
+)
+
+@st.cache_resource(show_spinner=False)
+def get_analysis_queue(model_path: str, use_emotion_model: bool, max_length: int, long_document: bool = False,
+                       multilingual: bool = False):
+    """
+    Modèles et file d'analyse en arrière-plan, partagés par toutes les sessions
+    ayant la même configuration (les avis de plusieurs utilisateurs sont traités par lots)
+    """
+    # Import différé: torch/transformers ne sont chargés qu'au premier chargement du modèle
+    from analysis_queue import DEFAULT_MAX_BATCH, AnalysisQueue, make_chat_analyzer
+    from thread_tuning import tuned_batch_size
+    from model_store import load_sequence_classifier, warm_up
+
+    tracker.cache_miss("get_analysis_queue")
+    start = time.perf_counter()
+    tokenizer, model, device = load_sequence_classifier(model_path)
+    tracker.record_load(model_path, time.perf_counter() - start)
+    start = time.perf_counter()
+    warm_up(tokenizer, model, device, max_length=max_length)
+    tracker.record_load("warm-up", time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        emotion_detector = get_emotion_detector(use_model=use_emotion_model, multilingual=multilingual)
+        tracker.record_load(type(emotion_detector).__name__, time.perf_counter() - start)
+    except Exception as e:
+        print(f"[ATTENTION] Erreur detecteur d'emotions: {e}")
+        emotion_detector = SimpleEmotionDetector()
+
+    analyze = make_chat_analyzer(tokenizer, model, device, emotion_detector, max_length, model_path,
+                                 aggregation="mean" if long_document else None)
+    return AnalysisQueue(analyze, max_batch=tuned_batch_size("sentiment", DEFAULT_MAX_BATCH))
+
 # Bouton pour charger les modèles
 if st.sidebar.button("🔄 Charger/Recharger les Modèles"):
     with st.sidebar.spinner("Chargement des modèles..."):
         try:
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL_PATH)
-            model = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL_PATH)
-            model.to(device)
-            model.eval()
-            
-            st.session_state.tokenizer = tokenizer
-            st.session_state.sentiment_model = model
-            st.session_state.device = device
-            
-            st.sidebar.success("✅ Modèle de sentiment chargé")
+            tracker.cache_lookup("get_analysis_queue")
+            st.session_state.analysis_queue = get_analysis_queue(
+                SENTIMENT_MODEL_PATH, USE_EMOTION_MODEL, MAX_LENGTH, LONG_DOCUMENT, MULTILINGUAL)
+            st.session_state.sentiment_model_name = SENTIMENT_MODEL_PATH
+            st.sidebar.success("✅ Modèles chargés")
         except Exception as e:
             st.sidebar.error(f"❌ Erreur: {e}")
-        
-        try:
-            emotion_detector = get_emotion_detector(use_model=USE_EMOTION_MODEL)
-            st.session_state.emotion_detector = emotion_detector
-            st.sidebar.success("✅ Détecteur d'émotions chargé")
-        except Exception as e:
-            st.sidebar.warning(f"⚠️ Erreur détecteur d'émotions: {e}")
-            st.session_state.emotion_detector = SimpleEmotionDetector()
+
+# Panneau de performances (mesures de tout le processus)
+render_latency_panel(st.sidebar)
+if st.session_state.analysis_queue is not None:
+    queue_stats = st.session_state.analysis_queue.stats()
+    st.sidebar.caption(
+        f"📥 File d'analyse: {queue_stats['submitted'] - queue_stats['processed']} en attente · "
+        f"{queue_stats['processed']} traités · {queue_stats['mean_batch']:.1f} avis/lot"
+    )
 
 # Vérification que les modèles sont chargés
-if st.session_state.sentiment_model is None:
+analysis_queue = st.session_state.analysis_queue
+if analysis_queue is None:
     st.warning("⚠️ Veuillez charger les modèles depuis la barre latérale (bouton 'Charger/Recharger les Modèles')")
     st.stop()
 
-# Fonction de prédiction de sentiment
-def predict_sentiment(text: str):
-    """Prédit le sentiment (Positif/Négatif/Neutre)"""
-    tokenizer = st.session_state.tokenizer
-    model = st.session_state.sentiment_model
-    device = st.session_state.device
+# Réponse personnalisée selon le sentiment et l'émotion détectés
+def build_response(sentiment: str, sent_conf: float, main_emotion: str, emotion_conf: float) -> str:
+    """Génère la réponse détaillée du chatbot"""
+    if sentiment == "Positif" and main_emotion == "joie":
+        response = f"""Excellent ! 🎉 Votre avis exprime une satisfaction claire. 
+
+**Analyse détaillée:**
+- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
+- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
+- **Interprétation:** L'émotion de joie indique que vous avez vraiment apprécié votre expérience. C'est un excellent signe pour le restaurant !
+
+**Recommandation:** Le restaurant devrait continuer dans cette direction et peut-être mettre en avant ces points positifs dans sa communication."""
     
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=MAX_LENGTH
-    )
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    elif sentiment == "Négatif" and main_emotion == "colère":
+        response = f"""Je comprends votre frustration. 😔
+
+**Analyse détaillée:**
+- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
+- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
+- **Interprétation:** Votre avis exprime de la colère, ce qui indique une insatisfaction importante. Il serait crucial d'améliorer les points mentionnés.
+
+**Recommandation pour le restaurant:** 
+- Analyser les points spécifiques mentionnés
+- Prendre des mesures correctives immédiates
+- Contacter le client pour s'excuser et proposer une solution"""
+    
+    elif sentiment == "Négatif" and main_emotion == "tristesse":
+        response = f"""Je comprends votre déception. 😢
+
+**Analyse détaillée:**
+- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
+- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
+- **Interprétation:** Votre avis montre une déception. Nous comprenons votre frustration et espérons pouvoir améliorer votre expérience.
+
+**Recommandation pour le restaurant:**
+- Identifier les causes de la déception
+- Améliorer les processus concernés
+- Proposer une compensation si approprié"""
+    
+    elif sentiment == "Positif" and main_emotion == "surprise":
+        response = f"""Fantastique ! Votre avis exprime une surprise positive ! 😲✨
+
+**Analyse détaillée:**
+- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
+- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
+- **Interprétation:** C'est excellent de voir que l'expérience a dépassé vos attentes ! La surprise positive est un indicateur très fort de satisfaction.
+
+**Recommandation:** Le restaurant devrait capitaliser sur ces éléments qui ont créé cette surprise positive."""
     
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = torch.softmax(outputs.logits, dim=-1)[0]
-        pred_id = torch.argmax(probs).item()
-        conf = float(probs[pred_id].item())
+    elif sentiment == "Positif":
+        response = f"""Très bien ! Votre avis est positif. 👍
+
+**Analyse détaillée:**
+- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
+- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
+- **Interprétation:** Vous semblez satisfait de votre expérience. C'est un bon signe pour le restaurant.
+
+**Recommandation:** Continuer à maintenir la qualité du service."""
     
-    label_map = {0: "Négatif", 1: "Neutre", 2: "Positif"}
-    sentiment = label_map.get(pred_id, "Neutre")
+    elif sentiment == "Négatif":
+        response = f"""Je comprends votre insatisfaction. 😞
+
+**Analyse détaillée:**
+- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
+- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
+- **Interprétation:** Votre avis indique une insatisfaction. Il serait important d'améliorer les points mentionnés.
+
+**Recommandation pour le restaurant:**
+- Analyser les problèmes mentionnés
+- Mettre en place des actions correctives
+- Suivre avec le client"""
     
-    return sentiment, conf, probs.detach().cpu().numpy()
-
-# Fonction pour obtenir l'icône d'émotion
-def get_emotion_icon(emotion: str) -> str:
-    """Retourne l'icône correspondant à l'émotion"""
-    icons = {
-        "joie": "😊",
-        "tristesse": "😢",
-        "colère": "😠",
-        "surprise": "😲",
-        "neutre": "😐"
-    }
-    return icons.get(emotion, "😐")
-
-# Fonction pour obtenir l'icône de sentiment
-def get_sentiment_icon(sentiment: str) -> str:
-    """Retourne l'icône correspondant au sentiment"""
-    icons = {
-        "Positif": "✅",
-        "Négatif": "❌",
-        "Neutre": "➖"
-    }
-    return icons.get(sentiment, "➖")
+    else:
+        response = f"""Votre avis a été analysé. 📊
+
+**Analyse détaillée:**
+- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
+- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
+- **Interprétation:** Votre avis est neutre, ni particulièrement positif ni négatif.
+
+**Recommandation:** Le restaurant pourrait chercher à améliorer l'expérience pour créer plus d'émotions positives."""
+    return response
+
+def persist_exchange(session_id: str, model_name: str, job: dict):
+    """Rappel du worker d'analyse: enregistre l'échange (message, réponse, analyse) dans la base"""
+    from model_store import model_version
+
+    if job["error"]:
+        response = f"❌ Erreur lors de l'analyse: {job['error']}"
+        analysis = {"model_name": model_name}
+    else:
+        result = job["result"]
+        response = build_response(result["sentiment"], result["sentiment_conf"],
+                                  result["emotion"], result["emotion_conf"])
+        analysis = {**result, "model_name": model_name, "model_version": model_version(model_name)}
+    store.add_chat_exchange(session_id, job["text"], response, analysis)
 
 # Titre principal
 st.title("🤖 Chatbot d'Analyse de Sentiments & Émotions")
 st.markdown("**Analysez vos avis de restaurants en temps réel**")
 st.markdown("---")
 
-# Zone de chat
-chat_container = st.container()
-
-# Afficher l'historique du chat
-with chat_container:
-    for message in st.session_state.chat_history:
-        if message['role'] == 'user':
-            st.markdown(f"""
-                <div class="chat-message user-message">
-                    <div class="message-content">
-                        <strong>Vous:</strong><br>
-                        {message['content']}
-                        <div class="message-time">{message['time']}</div>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-        else:
-            # Message du bot avec analyse
-            sentiment = message.get('sentiment', 'N/A')
-            emotion = message.get('emotion', 'N/A')
-            emotion_conf = message.get('emotion_conf', 0)
-            sent_conf = message.get('sentiment_conf', 0)
-            
-            sentiment_icon = get_sentiment_icon(sentiment)
-            emotion_icon = get_emotion_icon(emotion)
-            
-            # Afficher la réponse détaillée du bot
-            bot_response = message.get('content', '')
-            
-            # Afficher les métriques
-            st.markdown(f"""
-                <div class="chat-message bot-message">
-                    <div class="message-content">
-                        <strong>🤖 Assistant:</strong><br>
-                        <b>Sentiment:</b> {sentiment_icon} <span class="sentiment-{sentiment.lower()}">{sentiment}</span> ({sent_conf*100:.1f}%)<br>
-                        <b>Émotion:</b> {emotion_icon} <span class="emotion-{emotion}">{emotion.capitalize()}</span> ({emotion_conf*100:.1f}%)<br>
-                        <div class="message-time">{message['time']}</div>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            # Afficher la réponse détaillée avec markdown
-            st.markdown("""
-                <div style="margin: 10px 0; padding: 15px; background-color: #f8f9fa; border-radius: 8px; border-left: 4px solid #1f77b4;">
-            """, unsafe_allow_html=True)
-            st.markdown(bot_response)
-            st.markdown("</div>", unsafe_allow_html=True)
+# Afficher l'historique du chat: fenêtre des derniers messages, fragments HTML en cache,
+# puis les avis encore dans la file d'analyse
+def render_chat_area():
+    chat_container = st.container()
+    render_chat_window(chat_container, store, st.session_state.session_id, st.session_state)
+    pending = analysis_queue.pending(st.session_state.session_id)
+    for job in pending:
+        submitted = time.strftime("%H:%M:%S", time.localtime(job["submitted_at"]))
+        chat_container.markdown(message_html({"role": "user", "content": job["text"], "time": submitted}),
+                                unsafe_allow_html=True)
+        chat_container.info("🤔 Analyse en cours...")
+    if st.session_state.get("awaiting_analysis") and not pending:
+        # Résultats disponibles: rerun complet (arrête le rafraîchissement périodique)
+        st.session_state.awaiting_analysis = False
+        st.rerun()
+
+st.session_state.awaiting_analysis = bool(analysis_queue.pending(st.session_state.session_id))
+fragment = getattr(st, "fragment", None)
+if fragment is not None:
+    # Seule la zone de chat est rafraîchie, tant qu'une analyse est en attente
+    fragment(run_every=POLL_INTERVAL if st.session_state.awaiting_analysis else None)(render_chat_area)()
+else:
+    render_chat_area()
 
 # Zone de saisie
 st.markdown("---")
@@ -315,133 +409,29 @@ if st.session_state.get('auto_analyze', False) and user_input.strip():
     should_analyze = True
     st.session_state.auto_analyze = False
 
-# Traitement de l'analyse
+# Traitement de l'analyse: l'avis est soumis à la file, le script n'attend pas le résultat
 if should_analyze and user_input.strip():
-    # Ajouter le message de l'utilisateur à l'historique
-    current_time = datetime.now().strftime("%H:%M:%S")
-    st.session_state.chat_history.append({
-        'role': 'user',
-        'content': user_input,
-        'time': current_time
-    })
+    model_name = st.session_state.get('sentiment_model_name', SENTIMENT_MODEL_PATH)
+    analysis_queue.submit(
+        user_input, st.session_state.session_id,
+        on_done=partial(persist_exchange, st.session_state.session_id, model_name)
+    )
+    st.session_state.chat_window = CHAT_WINDOW
     
-    # Analyser l'avis
-    with st.spinner("🤔 Analyse en cours..."):
-        # Analyse de sentiment
-        sentiment, sent_conf, sent_probs = predict_sentiment(user_input)
-        
-        # Analyse d'émotions
-        if st.session_state.emotion_detector:
-            emotion_scores = st.session_state.emotion_detector.predict_emotion(user_input)
-            main_emotion, emotion_conf = st.session_state.emotion_detector.get_main_emotion(user_input)
-        else:
-            emotion_detector = SimpleEmotionDetector()
-            emotion_scores = emotion_detector.predict_emotion(user_input)
-            main_emotion, emotion_conf = emotion_detector.get_main_emotion(user_input)
-        
-        # Générer une réponse personnalisée et détaillée
-        if sentiment == "Positif" and main_emotion == "joie":
-            response = f"""Excellent ! 🎉 Votre avis exprime une satisfaction claire. 
-
-**Analyse détaillée:**
-- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
-- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
-- **Interprétation:** L'émotion de joie indique que vous avez vraiment apprécié votre expérience. C'est un excellent signe pour le restaurant !
-
-**Recommandation:** Le restaurant devrait continuer dans cette direction et peut-être mettre en avant ces points positifs dans sa communication."""
-        
-        elif sentiment == "Négatif" and main_emotion == "colère":
-            response = f"""Je comprends votre frustration. 😔
-
-**Analyse détaillée:**
-- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
-- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
-- **Interprétation:** Votre avis exprime de la colère, ce qui indique une insatisfaction importante. Il serait crucial d'améliorer les points mentionnés.
-
-**Recommandation pour le restaurant:** 
-- Analyser les points spécifiques mentionnés
-- Prendre des mesures correctives immédiates
-- Contacter le client pour s'excuser et proposer une solution"""
-        
-        elif sentiment == "Négatif" and main_emotion == "tristesse":
-            response = f"""Je comprends votre déception. 😢
-
-**Analyse détaillée:**
-- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
-- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
-- **Interprétation:** Votre avis montre une déception. Nous comprenons votre frustration et espérons pouvoir améliorer votre expérience.
-
-**Recommandation pour le restaurant:**
-- Identifier les causes de la déception
-- Améliorer les processus concernés
-- Proposer une compensation si approprié"""
-        
-        elif sentiment == "Positif" and main_emotion == "surprise":
-            response = f"""Fantastique ! Votre avis exprime une surprise positive ! 😲✨
-
-**Analyse détaillée:**
-- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
-- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
-- **Interprétation:** C'est excellent de voir que l'expérience a dépassé vos attentes ! La surprise positive est un indicateur très fort de satisfaction.
-
-**Recommandation:** Le restaurant devrait capitaliser sur ces éléments qui ont créé cette surprise positive."""
-        
-        elif sentiment == "Positif":
-            response = f"""Très bien ! Votre avis est positif. 👍
-
-**Analyse détaillée:**
-- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
-- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
-- **Interprétation:** Vous semblez satisfait de votre expérience. C'est un bon signe pour le restaurant.
-
-**Recommandation:** Continuer à maintenir la qualité du service."""
-        
-        elif sentiment == "Négatif":
-            response = f"""Je comprends votre insatisfaction. 😞
-
-**Analyse détaillée:**
-- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
-- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
-- **Interprétation:** Votre avis indique une insatisfaction. Il serait important d'améliorer les points mentionnés.
-
-**Recommandation pour le restaurant:**
-- Analyser les problèmes mentionnés
-- Mettre en place des actions correctives
-- Suivre avec le client"""
-        
-        else:
-            response = f"""Votre avis a été analysé. 📊
-
-**Analyse détaillée:**
-- **Sentiment:** {sentiment} ({sent_conf*100:.1f}% de confiance)
-- **Émotion principale:** {main_emotion.capitalize()} ({emotion_conf*100:.1f}% de confiance)
-- **Interprétation:** Votre avis est neutre, ni particulièrement positif ni négatif.
-
-**Recommandation:** Le restaurant pourrait chercher à améliorer l'expérience pour créer plus d'émotions positives."""
-        
-        # Ajouter la réponse du bot à l'historique
-        st.session_state.chat_history.append({
-            'role': 'bot',
-            'content': response,
-            'sentiment': sentiment,
-            'emotion': main_emotion,
-            'sentiment_conf': sent_conf,
-            'emotion_conf': emotion_conf,
-            'time': current_time
-        })
-        
-        # Réinitialiser l'input
-        st.session_state.example_input = ''
-        
-        # Recharger la page pour afficher le nouveau message
-        st.rerun()
+    # Réinitialiser l'input
+    st.session_state.example_input = ''
+    
+    # Recharger la page pour afficher le message en attente
+    st.rerun()
 
 # Bouton pour effacer l'historique
 st.markdown("---")
 col1, col2, col3 = st.columns([1, 1, 1])
 with col2:
     if st.button("🗑️ Effacer l'historique", use_container_width=True):
-        st.session_state.chat_history = []
+        store.clear_chat(st.session_state.session_id)
+        st.session_state.chat_window = CHAT_WINDOW
+        st.session_state.chat_fragments.clear()
         st.rerun()
 
 # Informations supplémentaires
@@ -467,3 +457,8 @@ with st.expander("ℹ️ Informations sur l'analyse"):
 # Footer
 st.markdown("---")
 st.caption("🤖 Chatbot NLP - Analyse de Sentiments & Détection d'Émotions | Projet Oumaima AYADI")
+
+# Streamlit sans st.fragment: rafraîchissement de toute la page pendant une analyse
+if fragment is None and st.session_state.awaiting_analysis:
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Analyse d'émotions d'un échantillon du dataset, par blocs
+
+Les avis sont traités par blocs via les méthodes par lots des détecteurs
+(get_main_emotions); la barre de progression n'est mise à jour qu'une fois par
+bloc, avec la fraction réelle d'avis traités. L'état du traitement est gardé
+dans st.session_state: un clic sur « Arrêter » (ou toute autre interaction qui
+relance le script) interrompt le calcul entre deux blocs, les résultats
+partiels restent affichables et le traitement peut reprendre où il s'est arrêté.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_CHUNK_SIZE = 64
+
+# États d'un traitement
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+
+def new_job(texts: Sequence[str]) -> Dict:
+    """Crée un traitement: textes à analyser, émotions déjà calculées, état"""
+    return {"texts": list(texts), "emotions": [], "status": RUNNING}
+
+
+def run_job(
+    job: Dict,
+    detector,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    Analyse les textes restants d'un traitement, bloc par bloc
+
+    Args:
+        job: Traitement (voir new_job), complété sur place
+        detector: Détecteur d'émotions (get_main_emotions)
+        chunk_size: Nombre d'avis par bloc
+        on_progress: Appelée après chaque bloc avec (avis traités, total)
+
+    Returns:
+        Le traitement (état DONE, ou inchangé s'il a été annulé entre deux blocs)
+    """
+    texts = job["texts"]
+    total = len(texts)
+    while len(job["emotions"]) < total and job["status"] == RUNNING:
+        start = len(job["emotions"])
+        chunk = texts[start:start + chunk_size]
+        job["emotions"].extend(emotion for emotion, _ in detector.get_main_emotions(chunk))
+        if on_progress is not None:
+            on_progress(len(job["emotions"]), total)
+    if len(job["emotions"]) >= total:
+        job["status"] = DONE
+    return job
+
+
+def render_emotion_job(
+    container,
+    detector,
+    texts_fn: Callable[[], List[str]],
+    key: str,
+    start_label: str = "🚀 Lancer l'analyse d'émotions",
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Optional[Dict]:
+    """
+    Boutons lancer / arrêter / reprendre et exécution par blocs avec progression
+
+    Args:
+        container: Conteneur Streamlit
+        detector: Détecteur d'émotions
+        texts_fn: Retourne les avis à analyser (appelée au lancement)
+        key: Clé du traitement dans st.session_state
+        start_label: Libellé du bouton de lancement
+        chunk_size: Nombre d'avis par bloc
+
+    Returns:
+        Le traitement (résultats complets ou partiels), ou None si jamais lancé
+    """
+    import streamlit as st
+
+    job = st.session_state.get(key)
+    col_start, col_stop = container.columns([3, 1])
+    start = col_start.button(start_label, type="primary", key=f"{key}_start")
+    stop = col_stop.button("⏹️ Arrêter", key=f"{key}_stop")
+
+    if start:
+        job = st.session_state[key] = new_job(texts_fn())
+    elif job is not None and job["status"] == RUNNING:
+        # Le run précédent a été interrompu (Arrêter ou autre interaction)
+        job["status"] = CANCELLED if stop else INTERRUPTED
+
+    resume = False
+    if job is not None and job["status"] in (CANCELLED, INTERRUPTED):
+        done, total = len(job["emotions"]), len(job["texts"])
+        container.warning(f"Analyse arrêtée: {done}/{total} avis analysés (résultats partiels).")
+        resume = container.button("▶️ Reprendre l'analyse", key=f"{key}_resume")
+        if resume:
+            job["status"] = RUNNING
+
+    if job is not None and job["status"] == RUNNING and (start or resume):
+        total = len(job["texts"])
+        progress = container.progress(
+            len(job["emotions"]) / total if total else 1.0,
+            text=f"{len(job['emotions'])}/{total} avis analysés"
+        )
+        run_job(
+            job, detector, chunk_size,
+            on_progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} avis analysés")
+        )
+        progress.empty()
+    return job
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Inférence compilée (TorchScript ou torch.compile) avec longueurs par paliers
+
+En mode eager, chaque forward d'AutoModelForSequenceClassification exécute le
+code Python de HuggingFace couche par couche. Un graphe compilé supprime ce
+surcoût, mais il est spécialisé sur la longueur des séquences: les entrées sont
+donc complétées (padding) jusqu'au palier supérieur (32/64/128/256, les pas du
+slider des applications) et chaque palier est compilé une fois au chargement.
+
+- "trace": torch.jit.trace, un graphe par palier (taille de lot libre)
+- "compile": torch.compile (inductor), taille de lot marquée dynamique; les lots
+  d'un seul avis ont leur propre graphe, compilé aussi au warm-up
+
+CompiledClassifier s'utilise comme le modèle (model(**inputs).logits), donc
+partout où les applications appellent le modèle. Au-delà du dernier palier,
+ou avec d'autres entrées que input_ids/attention_mask, le modèle eager est
+utilisé.
+
+Activation: load_sequence_classifier(..., compile_mode="trace") ou variable
+MODEL_COMPILE=trace|compile. Comparaison avec eager: python benchmark.py compiled
+"""
+
+import os
+import time
+from typing import Dict, Optional, Sequence
+
+BUCKETS = (32, 64, 128, 256)
+COMPILE_MODES = ("trace", "compile")
+
+
+def compile_mode_default() -> Optional[str]:
+    """Mode compilé demandé par la variable MODEL_COMPILE (None si absente ou vide)"""
+    return os.environ.get("MODEL_COMPILE") or None
+
+
+def bucket_length(length: int, buckets: Sequence[int] = BUCKETS) -> Optional[int]:
+    """Plus petit palier >= length (None au-delà du dernier palier)"""
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return None
+
+
+class CompiledClassifier:
+    """
+    Modèle de classification compilé par paliers de longueur, utilisable comme le modèle eager
+    """
+
+    def __init__(self, model, mode: str = "trace", buckets: Sequence[int] = BUCKETS):
+        """
+        Args:
+            model: Modèle HuggingFace de classification (en mode eval)
+            mode: "trace" (TorchScript) ou "compile" (torch.compile)
+            buckets: Longueurs (tokens) des paliers
+        """
+        import torch
+
+        if mode not in COMPILE_MODES:
+            raise ValueError(f"Mode inconnu: {mode} (attendu: {COMPILE_MODES})")
+        self.model = model
+        self.mode = mode
+        self.buckets = tuple(sorted(buckets))
+        self.pad_token_id = model.config.pad_token_id or 0
+        self._traced = {}
+        self._compiled = torch.compile(model) if mode == "compile" else None
+
+    def __getattr__(self, name):
+        # config, device, base_model... : ceux du modèle eager
+        return getattr(self.__dict__["model"], name)
+
+    def _dummy_inputs(self, batch_size: int, length: int):
+        import torch
+
+        device = next(self.model.parameters()).device
+        input_ids = torch.full((batch_size, length), self.pad_token_id, dtype=torch.long, device=device)
+        return input_ids, torch.ones_like(input_ids)
+
+    def warm_up(self, batch_sizes: Sequence[int] = (1, 8)) -> Dict[str, float]:
+        """
+        Compile chaque palier (et chaque taille de lot pour torch.compile)
+
+        Returns:
+            Dictionnaire "lot x palier" -> durée en secondes
+        """
+        import torch
+
+        timings = {}
+        with torch.no_grad():
+            for bucket in self.buckets:
+                for batch_size in batch_sizes:
+                    start = time.perf_counter()
+                    if self.mode == "trace" and bucket not in self._traced:
+                        # Lot de 2: évite qu'une dimension 1 soit figée dans le graphe
+                        self._traced[bucket] = torch.jit.trace(
+                            self.model, self._dummy_inputs(2, bucket), strict=False)
+                    self._forward(*self._dummy_inputs(batch_size, bucket))
+                    timings[f"{batch_size}x{bucket}"] = time.perf_counter() - start
+        return timings
+
+    def _forward(self, input_ids, attention_mask):
+        if self.mode == "trace":
+            return self._traced[input_ids.shape[1]](input_ids, attention_mask)["logits"]
+        import torch
+
+        # Taille de lot dynamique: un graphe par palier (dynamo spécialise toujours les
+        # lots d'un avis, qui ont donc leur propre graphe)
+        if input_ids.shape[0] > 1:
+            torch._dynamo.mark_dynamic(input_ids, 0)
+            torch._dynamo.mark_dynamic(attention_mask, 0)
+        return self._compiled(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    def __call__(self, input_ids=None, attention_mask=None, **kwargs):
+        import torch
+        import torch.nn.functional as F
+        from transformers.modeling_outputs import SequenceClassifierOutput
+
+        length = input_ids.shape[1]
+        bucket = bucket_length(length, self.buckets)
+        extra = any(value is not None for value in kwargs.values())
+        if bucket is None or extra or (self.mode == "trace" and bucket not in self._traced):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        if bucket > length:
+            input_ids = F.pad(input_ids, (0, bucket - length), value=self.pad_token_id)
+            attention_mask = F.pad(attention_mask, (0, bucket - length), value=0)
+        return SequenceClassifierOutput(logits=self._forward(input_ids, attention_mask))
+
+
+def compile_classifier(model, mode: str = "trace", buckets: Sequence[int] = BUCKETS,
+                       batch_sizes: Sequence[int] = (1, 8)) -> CompiledClassifier:
+    """Compile le modèle pour chaque palier et le retourne prêt à l'emploi"""
+    compiled = CompiledClassifier(model, mode, buckets)
+    start = time.perf_counter()
+    compiled.warm_up(batch_sizes)
+    print(f"[OK] Modele compile ({mode}, paliers {list(compiled.buckets)}) en {time.perf_counter() - start:.1f} s")
+    return compiled
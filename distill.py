@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Distillation du modèle de sentiment vers un petit étudiant DistilBERT (service CPU)
+
+Même boucle d'entraînement que projet_nlp19 (AdamW, warmup linéaire, meilleur
+modèle sur la validation), mais la cible est le professeur (modèle fine-tuné):
+
+- perte = alpha * KL(étudiant / T || professeur / T) * T² + (1 - alpha) * CE(labels)
+- les logits du professeur sont calculés une seule fois, par lots triés par
+  longueur (batch_inference), sur le split train de TA_restaurants_balanced.csv
+  et sur des avis non étiquetés (TA_restaurants_ML_clean_cleaned.csv, sans les
+  avis de val/test): sur ces avis, seule la perte de distillation compte
+- l'étudiant est un DistilBERT réduit (2 à 4 couches, dimension optionnellement
+  plus petite) avec le tokenizer du professeur; à dimension égale, il est
+  initialisé avec les embeddings et des couches régulièrement espacées du
+  professeur
+
+L'étudiant est sauvegardé comme un modèle pré-installé (save_pretrained +
+prebake.json) dans MODELS_DIR/sentiment-student: load_sequence_classifier
+("sentiment-student") le charge comme n'importe quel modèle (app.py via
+SENTIMENT_MODEL, chatbot_app.py via le chemin du modèle). Le rapport compare
+professeur et étudiant sur le split de test: paramètres, accuracy, F1 macro,
+latence par avis et débit par lots.
+
+Utilisation:
+    python distill.py --teacher model --layers 2 --epochs 3
+    python distill.py --teacher model --layers 4 --dim 384 --max-unlabeled 50000
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_STUDENT_NAME = "sentiment-student"
+DEFAULT_TEMPERATURE = 2.0
+DEFAULT_ALPHA = 0.7
+# Label des avis non étiquetés (ignoré par la perte CE)
+UNLABELED = -1
+
+
+def count_parameters(model) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+def student_layer_ids(teacher_layers: int, student_layers: int) -> List[int]:
+    """Couches du professeur copiées dans l'étudiant (régulièrement espacées, la dernière incluse)"""
+    return np.linspace(0, teacher_layers - 1, student_layers).round().astype(int).tolist()
+
+
+def build_student(teacher, n_layers: int = 2, dim: Optional[int] = None, n_heads: Optional[int] = None):
+    """
+    Crée l'étudiant DistilBERT (même vocabulaire et mêmes labels que le professeur)
+
+    Args:
+        teacher: Modèle de classification professeur
+        n_layers: Nombre de couches de l'étudiant
+        dim: Dimension cachée (défaut: celle du professeur)
+        n_heads: Têtes d'attention (défaut: celles du professeur, ou dim / 64 si la dimension change)
+    """
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification
+
+    t_config = teacher.config
+    t_dim = getattr(t_config, "dim", None) or t_config.hidden_size
+    t_hidden = getattr(t_config, "hidden_dim", None) or t_config.intermediate_size
+    t_heads = getattr(t_config, "n_heads", None) or t_config.num_attention_heads
+    dim = dim or t_dim
+    n_heads = n_heads or (t_heads if dim == t_dim else max(1, dim // 64))
+    config = DistilBertConfig(
+        vocab_size=t_config.vocab_size,
+        max_position_embeddings=getattr(t_config, "max_position_embeddings", 512),
+        dim=dim, hidden_dim=t_hidden * dim // t_dim, n_layers=n_layers, n_heads=n_heads,
+        num_labels=t_config.num_labels, id2label=t_config.id2label, label2id=t_config.label2id,
+        pad_token_id=t_config.pad_token_id or 0,
+    )
+    student = DistilBertForSequenceClassification(config)
+
+    # Initialisation depuis le professeur (DistilBERT de même dimension)
+    if t_config.model_type == "distilbert" and dim == t_dim and n_heads == t_heads:
+        student.distilbert.embeddings.load_state_dict(teacher.distilbert.embeddings.state_dict())
+        teacher_layers = teacher.distilbert.transformer.layer
+        for s_layer, t_id in zip(student.distilbert.transformer.layer,
+                                 student_layer_ids(len(teacher_layers), n_layers)):
+            s_layer.load_state_dict(teacher_layers[t_id].state_dict())
+        student.pre_classifier.load_state_dict(teacher.pre_classifier.state_dict())
+        student.classifier.load_state_dict(teacher.classifier.state_dict())
+    return student
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature: float = DEFAULT_TEMPERATURE,
+                      alpha: float = DEFAULT_ALPHA):
+    """
+    Perte de distillation (KL sur les logits adoucis) + CE sur les avis étiquetés
+
+    Pondération par avis: alpha * KL + (1 - alpha) * CE (CE nulle sans label),
+    moyennée sur le lot. Un avis non étiqueté pèse donc autant dans un lot sans
+    label que dans un lot mixte.
+
+    Args:
+        student_logits: Logits de l'étudiant [batch, n_classes]
+        teacher_logits: Logits du professeur [batch, n_classes]
+        labels: Labels (UNLABELED pour les avis non étiquetés)
+    """
+    import torch
+    import torch.nn.functional as F
+
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=-1),
+        F.softmax(teacher_logits / temperature, dim=-1),
+        reduction="none"
+    ).sum(dim=-1) * temperature ** 2
+    labeled = labels != UNLABELED
+    hard = torch.zeros_like(soft)
+    if labeled.any():
+        hard[labeled] = F.cross_entropy(student_logits[labeled], labels[labeled], reduction="none")
+    return (alpha * soft + (1 - alpha) * hard).mean()
+
+
+def load_distillation_data(csv_path: str = "TA_restaurants_balanced.csv",
+                           unlabeled_csv: Optional[str] = "TA_restaurants_ML_clean_cleaned.csv",
+                           max_unlabeled: int = 20_000, seed: int = 42) -> Dict:
+    """
+    Textes d'entraînement (train étiqueté + avis non étiquetés) et splits val/test
+
+    Les avis non étiquetés présents dans val/test (même avis normalisé) sont exclus.
+
+    Returns:
+        {"train_texts", "train_labels", "val_texts", "val_labels", "test_texts", "test_labels",
+         "n_unlabeled"}
+    """
+    import pandas as pd
+    from split_dataset import load_or_build_split, review_group_keys
+
+    df, split = load_or_build_split(csv_path, seed=seed)
+    texts = df["Review"].astype(str).tolist()
+    labels = df["label"].astype(int).to_numpy()
+    data = {f"{name}_texts": [texts[i] for i in split[name]] for name in ("train", "val", "test")}
+    data.update({f"{name}_labels": labels[split[name]] for name in ("train", "val", "test")})
+
+    unlabeled = []
+    if unlabeled_csv and max_unlabeled > 0:
+        if os.path.exists(unlabeled_csv):
+            column = "Review_clean" if "Review_clean" in pd.read_csv(unlabeled_csv, nrows=0).columns else "Review"
+            extra = pd.read_csv(unlabeled_csv, usecols=[column])[column].dropna().astype(str)
+            extra = extra[extra.str.strip() != ""].drop_duplicates()
+            held_out = set(review_group_keys(data["val_texts"] + data["test_texts"]).tolist())
+            keep = ~np.isin(review_group_keys(extra.tolist()), list(held_out))
+            extra = extra[keep]
+            unlabeled = extra.sample(min(max_unlabeled, len(extra)), random_state=seed).tolist()
+        else:
+            print(f"[INFO] Avis non etiquetes absents ({unlabeled_csv}): distillation sur le train seul")
+
+    data["train_texts"] = data["train_texts"] + unlabeled
+    data["train_labels"] = np.concatenate([data["train_labels"], np.full(len(unlabeled), UNLABELED)])
+    data["n_unlabeled"] = len(unlabeled)
+    return data
+
+
+def evaluate_classifier(texts: Sequence[str], labels: np.ndarray, tokenizer, model, device,
+                        batch_size: int = 64, max_length: int = 64) -> Dict[str, float]:
+    """Accuracy, F1 macro et débit (avis/s) par lots triés par longueur"""
+    from sklearn.metrics import accuracy_score, f1_score
+    from batch_inference import run_batched_inference
+
+    model.eval()
+    start = time.perf_counter()
+    logits, _ = run_batched_inference(list(texts), tokenizer, model, device,
+                                      batch_size=batch_size, max_length=max_length)
+    elapsed = time.perf_counter() - start
+    predictions = logits.argmax(axis=1)
+    return {
+        "accuracy": float(accuracy_score(labels, predictions)),
+        "f1_macro": float(f1_score(labels, predictions, average="macro")),
+        "reviews_per_second": len(texts) / max(elapsed, 1e-9),
+    }
+
+
+def single_latency_ms(texts: Sequence[str], tokenizer, model, device, max_length: int = 64,
+                      n: int = 50) -> float:
+    """Latence médiane (ms) d'un avis seul (cas du chatbot)"""
+    import torch
+
+    model.eval()
+    timings = []
+    with torch.inference_mode():
+        for text in list(texts)[:n]:
+            start = time.perf_counter()
+            inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length).to(device)
+            model(**inputs)
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000) if timings else 0.0
+
+
+def distill(
+    teacher_path: str = "model",
+    output_dir: Optional[str] = None,
+    csv_path: str = "TA_restaurants_balanced.csv",
+    unlabeled_csv: Optional[str] = "TA_restaurants_ML_clean_cleaned.csv",
+    n_layers: int = 2,
+    dim: Optional[int] = None,
+    epochs: int = 3,
+    batch_size: int = 32,
+    lr: float = 5e-5,
+    temperature: float = DEFAULT_TEMPERATURE,
+    alpha: float = DEFAULT_ALPHA,
+    max_length: int = 64,
+    max_unlabeled: int = 20_000,
+    seed: int = 42
+) -> Dict:
+    """
+    Entraîne l'étudiant sur les logits du professeur et le sauvegarde
+
+    Args:
+        teacher_path: Modèle fine-tuné (chemin ou nom, voir load_sequence_classifier)
+        output_dir: Dossier de l'étudiant (défaut: MODELS_DIR/sentiment-student)
+        csv_path: Dataset étiqueté (split sauvegardé)
+        unlabeled_csv: Avis non étiquetés ajoutés au train (None: aucun)
+        n_layers: Couches de l'étudiant
+        dim: Dimension cachée de l'étudiant (défaut: celle du professeur)
+        temperature: Température de la distillation
+        alpha: Poids de la perte de distillation (1 - alpha pour la CE)
+        max_length: Longueur maximale (tokens), comme projet_nlp19
+        max_unlabeled: Nombre maximal d'avis non étiquetés
+
+    Returns:
+        Rapport {"teacher": {...}, "student": {...}, "epochs": [...]}
+    """
+    import torch
+    from transformers import get_linear_schedule_with_warmup
+    from batch_inference import run_batched_inference
+    from model_store import MANIFEST_NAME, load_sequence_classifier, local_model_dir
+
+    torch.manual_seed(seed)
+    output_dir = output_dir or local_model_dir(DEFAULT_STUDENT_NAME)
+    # Modèle eager: ses couches initialisent l'étudiant
+    tokenizer, teacher, device = load_sequence_classifier(teacher_path, num_labels=3, compile_mode="")
+    data = load_distillation_data(csv_path, unlabeled_csv, max_unlabeled, seed)
+    train_texts, train_labels = data["train_texts"], data["train_labels"]
+    print(f"[INFO] Train: {len(train_texts)} avis dont {data['n_unlabeled']} non etiquetes")
+
+    # Logits du professeur calculés une fois pour toutes les époques
+    start = time.perf_counter()
+    teacher_logits, _ = run_batched_inference(train_texts, tokenizer, teacher, device,
+                                              batch_size=64, max_length=max_length)
+    print(f"[OK] Logits du professeur: {len(train_texts)} avis en {time.perf_counter() - start:.1f} s")
+    teacher_logits = torch.from_numpy(teacher_logits)
+    labels = torch.from_numpy(np.asarray(train_labels, dtype=np.int64))
+
+    student = build_student(teacher, n_layers=n_layers, dim=dim).to(device)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr, weight_decay=0.01)
+    steps_per_epoch = (len(train_texts) + batch_size - 1) // batch_size
+    scheduler = get_linear_schedule_with_warmup(
+        optimizer, num_warmup_steps=int(0.1 * steps_per_epoch * epochs),
+        num_training_steps=steps_per_epoch * epochs
+    )
+
+    generator = torch.Generator().manual_seed(seed)
+    best_val_acc, history = -1.0, []
+    for epoch in range(epochs):
+        student.train()
+        total_loss = 0.0
+        order = torch.randperm(len(train_texts), generator=generator)
+        for step in range(steps_per_epoch):
+            idx = order[step * batch_size:(step + 1) * batch_size]
+            inputs = tokenizer([train_texts[i] for i in idx.tolist()], return_tensors="pt", truncation=True,
+                               padding=True, max_length=max_length)
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+            optimizer.zero_grad()
+            logits = student(**inputs).logits
+            loss = distillation_loss(logits, teacher_logits[idx].to(device), labels[idx].to(device),
+                                     temperature, alpha)
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            total_loss += loss.item()
+
+        val = evaluate_classifier(data["val_texts"], data["val_labels"], tokenizer, student, device,
+                                  max_length=max_length)
+        history.append({"epoch": epoch + 1, "loss": total_loss / max(steps_per_epoch, 1),
+                        "val_accuracy": val["accuracy"]})
+        print(f"   Epoch {epoch + 1}/{epochs} | loss {history[-1]['loss']:.4f} | "
+              f"val accuracy {val['accuracy'] * 100:.2f}%")
+        # Meilleur étudiant sur la validation
+        if val["accuracy"] > best_val_acc:
+            best_val_acc = val["accuracy"]
+            student.save_pretrained(output_dir, safe_serialization=True)
+            tokenizer.save_pretrained(output_dir)
+
+    # Rapport professeur / étudiant sur le test
+    from transformers import AutoModelForSequenceClassification
+
+    student = AutoModelForSequenceClassification.from_pretrained(output_dir).to(device)
+    report = {"epochs": history, "n_unlabeled": data["n_unlabeled"]}
+    for name, model in (("teacher", teacher), ("student", student)):
+        metrics = evaluate_classifier(data["test_texts"], data["test_labels"], tokenizer, model, device,
+                                      max_length=max_length)
+        metrics["parameters"] = count_parameters(model)
+        metrics["latency_ms"] = single_latency_ms(data["test_texts"], tokenizer, model, device, max_length)
+        report[name] = metrics
+
+    manifest = {
+        "model_name": DEFAULT_STUDENT_NAME,
+        "num_labels": student.config.num_labels,
+        "variants": ["default"],
+        "prebaked_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "distilled_from": teacher_path,
+        "params": {"n_layers": n_layers, "dim": student.config.dim, "temperature": temperature,
+                   "alpha": alpha, "epochs": epochs, "max_length": max_length},
+        "report": report,
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return report
+
+
+def print_report(report: Dict):
+    """Tableau vitesse / qualité professeur vs étudiant"""
+    print(f"\n{'':<10}{'Parametres':>12}{'Accuracy':>10}{'F1 macro':>10}{'ms/avis':>10}{'avis/s':>10}")
+    for name, label in (("teacher", "Professeur"), ("student", "Etudiant")):
+        m = report[name]
+        print(f"{label:<10}{m['parameters'] / 1e6:>11.1f}M{m['accuracy'] * 100:>9.2f}%"
+              f"{m['f1_macro'] * 100:>9.2f}%{m['latency_ms']:>10.2f}{m['reviews_per_second']:>10.0f}")
+    t, s = report["teacher"], report["student"]
+    print(f"\n[INFO] Etudiant: {t['parameters'] / max(s['parameters'], 1):.1f}x moins de parametres, "
+          f"{t['latency_ms'] / max(s['latency_ms'], 1e-9):.1f}x plus rapide par avis, "
+          f"{(s['accuracy'] - t['accuracy']) * 100:+.2f} points d'accuracy")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distillation du modele de sentiment vers un petit etudiant")
+    parser.add_argument("--teacher", default="model", help="Modele fine-tune (professeur)")
+    parser.add_argument("--output", default=None, help="Dossier de l'etudiant (defaut: MODELS_DIR/sentiment-student)")
+    parser.add_argument("--csv", default="TA_restaurants_balanced.csv", help="Dataset etiquete")
+    parser.add_argument("--unlabeled", default="TA_restaurants_ML_clean_cleaned.csv",
+                        help="Avis non etiquetes ('' pour aucun)")
+    parser.add_argument("--max-unlabeled", type=int, default=20_000)
+    parser.add_argument("--layers", type=int, default=2, help="Couches de l'etudiant (2 a 4)")
+    parser.add_argument("--dim", type=int, default=None, help="Dimension cachee (defaut: celle du professeur)")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, default=5e-5)
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    parser.add_argument("--max-length", type=int, default=64)
+    args = parser.parse_args()
+
+    report = distill(
+        args.teacher, args.output, args.csv, args.unlabeled or None,
+        n_layers=args.layers, dim=args.dim, epochs=args.epochs, batch_size=args.batch_size,
+        lr=args.lr, temperature=args.temperature, alpha=args.alpha, max_length=args.max_length,
+        max_unlabeled=args.max_unlabeled
+    )
+    print_report(report)
+    print(f"[OK] Etudiant sauvegarde -> {args.output or DEFAULT_STUDENT_NAME} "
+          f"(load_sequence_classifier(\"{args.output or DEFAULT_STUDENT_NAME}\"))")
@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+"""
+Index d'embeddings du dataset pour la recherche d'avis similaires
+
+Chaque avis est encodé par DistilBERT (moyenne des états cachés pondérée par
+le masque d'attention, puis normalisation L2), par lots triés par longueur
+(batch_inference). Les vecteurs sont stockés en float16 dans un fichier brut
+mappé en mémoire à côté du dataset (dataset.emb/embeddings.f16), avec un
+fichier meta.json (modèle, dimension, nombre de lignes, empreinte des lignes
+indexées). Quand des avis sont ajoutés à la fin du CSV, seules les nouvelles
+lignes sont encodées et ajoutées au fichier; un build interrompu reprend au
+dernier bloc écrit.
+
+Recherche des k plus proches voisins (similarité cosinus = produit scalaire):
+
+- exacte: produit matriciel numpy par blocs de lignes (matrice float32 gardée
+  en mémoire si elle est assez petite, sinon blocs lus depuis le fichier mappé)
+- approchée (optionnelle, pour des millions d'avis): index IVF (k-means
+  sphérique sur un échantillon); seules les listes des nprobe centroïdes les
+  plus proches sont comparées à la requête. Les avis ajoutés après la
+  construction de l'IVF sont affectés à leur centroïde le plus proche.
+
+Utilisation:
+    python embedding_index.py build --csv TA_restaurants_ML_clean_cleaned.csv --ivf
+    python embedding_index.py query --csv TA_restaurants_ML_clean_cleaned.csv --text "cold food, rude waiter"
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+INDEX_VERSION = 1
+DEFAULT_MODEL = "distilbert-base-uncased"
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_LENGTH = 128
+# Avis encodés entre deux écritures sur disque (reprise d'un build interrompu)
+CHUNK_ROWS = 4096
+# Lignes par bloc de la recherche exacte
+SEARCH_BLOCK_ROWS = 32768
+# Taille maximale (Mo) de la copie float32 gardée en mémoire pour la recherche
+MAX_MEMORY_MB = 512
+DEFAULT_NPROBE = 8
+
+VECTORS_FILE = "embeddings.f16"
+META_FILE = "meta.json"
+IVF_FILE = "ivf.npz"
+
+
+def index_dir_for(csv_path: str) -> str:
+    """Répertoire de l'index associé à un dataset (ex: dataset.emb)"""
+    root, _ = os.path.splitext(csv_path)
+    return f"{root}.emb"
+
+
+def mean_pool_forward(model, inputs):
+    """Forward d'embedding: moyenne des états cachés sur les tokens réels, normalisée (L2)"""
+    import torch
+
+    base = getattr(model, "base_model", model)
+    hidden = base(**inputs).last_hidden_state
+    mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+    return torch.nn.functional.normalize(pooled, dim=1)
+
+
+def embed_texts(texts: Sequence[str], tokenizer, model, device, batch_size: int = DEFAULT_BATCH_SIZE,
+                max_length: int = DEFAULT_MAX_LENGTH) -> np.ndarray:
+    """
+    Embeddings normalisés d'une liste de textes
+
+    Returns:
+        Matrice float32 [n, dim] dans l'ordre de texts
+    """
+    from batch_inference import run_batched_inference
+
+    vectors, _ = run_batched_inference(list(texts), tokenizer, model, device, batch_size=batch_size,
+                                       max_length=max_length, forward_fn=mean_pool_forward)
+    return vectors
+
+
+def make_embedder(tokenizer, model, device, batch_size: int = DEFAULT_BATCH_SIZE,
+                  max_length: int = DEFAULT_MAX_LENGTH) -> Callable[[Sequence[str]], np.ndarray]:
+    """Fonction (textes) -> embeddings float32 normalisés"""
+    def embed(texts: Sequence[str]) -> np.ndarray:
+        return embed_texts(texts, tokenizer, model, device, batch_size, max_length)
+
+    return embed
+
+
+def _hash_update(h, texts):
+    for text in texts:
+        h.update(str(text).encode("utf-8"))
+        h.update(b"\x00")
+    return h
+
+
+def _write_meta(directory: str, meta: Dict):
+    """Écrit meta.json de façon atomique (jamais de méta à moitié écrite)"""
+    path = os.path.join(directory, META_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _read_meta(directory: str) -> Optional[Dict]:
+    path = os.path.join(directory, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """k meilleurs scores par ligne (triés par score décroissant)"""
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        ids = np.take_along_axis(ids, part, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+def spherical_kmeans(vectors: np.ndarray, n_lists: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    k-means sur vecteurs normalisés (affectation par produit scalaire maximal)
+
+    Returns:
+        Centroïdes normalisés float32 [n_lists, dim]
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iters):
+        assign = (vectors @ centroids.T).argmax(axis=1)
+        counts = np.bincount(assign, minlength=n_lists)
+        # Sommes par liste sur les vecteurs triés par liste (reduceat, bien plus rapide que add.at)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        # Une liste vide reprend un vecteur au hasard
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+class EmbeddingIndex:
+    """
+    Index d'embeddings float16 mappé en mémoire, recherche exacte par blocs ou IVF
+    """
+
+    def __init__(self, directory: str, max_memory_mb: float = MAX_MEMORY_MB):
+        """
+        Args:
+            directory: Répertoire de l'index (voir index_dir_for)
+            max_memory_mb: Taille maximale de la copie float32 en mémoire (0: toujours lire le fichier)
+        """
+        self.directory = directory
+        self.meta = _read_meta(directory)
+        if self.meta is None:
+            raise FileNotFoundError(f"Index d'embeddings absent: {directory} (python embedding_index.py build)")
+        self.n_rows = int(self.meta["n_rows"])
+        self.dim = int(self.meta["dim"])
+        self.vectors = (
+            np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.float16, mode="r",
+                      shape=(self.n_rows, self.dim))
+            if self.n_rows else np.empty((0, self.dim), dtype=np.float16)
+        )
+        self._dense = None
+        if self.n_rows * self.dim * 4 <= max_memory_mb * 1024 * 1024:
+            self._dense = np.asarray(self.vectors, dtype=np.float32)
+        self._load_ivf()
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return _read_meta(directory) is not None
+
+    # ---------- IVF ----------
+
+    def _load_ivf(self):
+        self.centroids = None
+        path = os.path.join(self.directory, IVF_FILE)
+        if not os.path.exists(path):
+            return
+        with np.load(path) as data:
+            if str(data["build_id"]) != self.meta["build_id"]:
+                return
+            self.centroids = data["centroids"]
+            assignments = data["assignments"]
+        self._set_lists(assignments)
+
+    def _set_lists(self, assignments: np.ndarray):
+        """Lignes regroupées par liste: rows[offsets[l]:offsets[l + 1]] appartiennent à la liste l"""
+        self.assignments = assignments
+        self.list_rows = np.argsort(assignments, kind="stable").astype(np.int64)
+        self.list_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(assignments, minlength=len(self.centroids))))
+        ).astype(np.int64)
+
+    @property
+    def has_ivf(self) -> bool:
+        return self.centroids is not None
+
+    def build_ivf(self, n_lists: Optional[int] = None, iters: int = 10, sample_size: int = 100_000,
+                  seed: int = 0):
+        """
+        Construit l'index IVF (k-means sur un échantillon, puis affectation de toutes les lignes)
+
+        Args:
+            n_lists: Nombre de listes (défaut: ~4 * racine du nombre de lignes)
+            iters: Itérations du k-means
+            sample_size: Taille de l'échantillon d'apprentissage des centroïdes
+        """
+        if self.n_rows == 0:
+            raise ValueError("Index vide: rien a partitionner")
+        n_lists = min(n_lists or max(1, int(4 * np.sqrt(self.n_rows))), self.n_rows)
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(self.n_rows, min(sample_size, self.n_rows), replace=False))
+        self.centroids = spherical_kmeans(self._rows(sample), n_lists, iters, seed)
+        self._set_lists(self._assign(0, self.n_rows))
+        self._save_ivf()
+
+    def update_ivf(self) -> int:
+        """Affecte à leur centroïde les lignes ajoutées depuis la construction de l'IVF"""
+        if not self.has_ivf:
+            return 0
+        start = len(self.assignments)
+        if start < self.n_rows:
+            self._set_lists(np.concatenate([self.assignments, self._assign(start, self.n_rows)]))
+            self._save_ivf()
+        return self.n_rows - start
+
+    def _assign(self, start: int, stop: int) -> np.ndarray:
+        parts = [
+            (self._rows(slice(i, min(i + SEARCH_BLOCK_ROWS, stop))) @ self.centroids.T).argmax(axis=1)
+            for i in range(start, stop, SEARCH_BLOCK_ROWS)
+        ]
+        return np.concatenate(parts).astype(np.int32) if parts else np.empty(0, dtype=np.int32)
+
+    def _save_ivf(self):
+        # L'IVF reste valide tant que l'index n'est que complété (même build_id)
+        path = os.path.join(self.directory, IVF_FILE)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments, build_id=self.meta["build_id"])
+        os.replace(path + ".tmp", path)
+
+    # ---------- Recherche ----------
+
+    def _rows(self, index) -> np.ndarray:
+        """Lignes en float32 (copie en mémoire ou lecture du fichier mappé)"""
+        if self._dense is not None:
+            return self._dense[index]
+        return np.asarray(self.vectors[index], dtype=np.float32)
+
+    def search(self, queries: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               exclude: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k avis les plus similaires (cosinus) à chaque requête
+
+        Args:
+            queries: Embeddings normalisés [m, dim] (ou [dim])
+            k: Nombre de voisins
+            nprobe: Nombre de listes IVF explorées (None: recherche exacte)
+            exclude: Ligne à exclure pour chaque requête (ex: l'avis lui-même)
+
+        Returns:
+            Tuple (similarités [m, k], indices des lignes [m, k]), du plus similaire au moins
+            similaire (indice -1 si l'IVF a moins de k candidats)
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k_search = min(k + (1 if exclude is not None else 0), self.n_rows)
+        if nprobe and self.has_ivf:
+            scores, ids = self._search_ivf(queries, k_search, nprobe)
+        else:
+            scores, ids = self._search_exact(queries, k_search)
+        if exclude is not None:
+            keep = ids != np.asarray(exclude, dtype=np.int64)[:, None]
+            # Une seule ligne exclue par requête: on retire le dernier voisin si elle est absente
+            keep[keep.all(axis=1), -1] = False
+            scores = scores[keep].reshape(len(queries), -1)
+            ids = ids[keep].reshape(len(queries), -1)
+        return scores[:, :k], ids[:, :k]
+
+    def _search_exact(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.n_rows, SEARCH_BLOCK_ROWS):
+            block = self._rows(slice(start, start + SEARCH_BLOCK_ROWS))
+            scores = queries @ block.T
+            ids = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int64), scores.shape)
+            best_scores, best_ids = _top_k(np.concatenate([best_scores, scores], axis=1),
+                                           np.concatenate([best_ids, ids], axis=1), k)
+        return best_scores, best_ids
+
+    def _search_ivf(self, queries: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        # Lignes ajoutées depuis la dernière affectation: toujours comparées
+        tail = np.arange(len(self.assignments), self.n_rows, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for q, lists in enumerate(probes):
+            candidates = np.sort(np.concatenate(
+                [self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists] + [tail]
+            ))
+            scores = self._rows(candidates) @ queries[q]
+            top_scores, top_ids = _top_k(scores[None, :], candidates[None, :], k)
+            all_scores[q, :top_scores.shape[1]] = top_scores[0]
+            all_ids[q, :top_ids.shape[1]] = top_ids[0]
+        return all_scores, all_ids
+
+    def similar_to_row(self, row: int, k: int = 10, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Avis les plus similaires à un avis du dataset (lui-même exclu)"""
+        scores, ids = self.search(self._rows(slice(row, row + 1)), k, nprobe, exclude=[row])
+        found = ids[0] >= 0
+        return scores[0][found], ids[0][found]
+
+
+def build_or_update_index(
+    csv_path: str,
+    embed: Callable[[Sequence[str]], np.ndarray],
+    model_name: str = DEFAULT_MODEL,
+    text_column: Optional[str] = None,
+    max_length: int = DEFAULT_MAX_LENGTH,
+    rebuild: bool = False,
+    df=None,
+    chunk_rows: int = CHUNK_ROWS
+) -> EmbeddingIndex:
+    """
+    Construit l'index d'embeddings, en n'encodant que les lignes ajoutées depuis sa création
+
+    Args:
+        csv_path: Chemin du dataset CSV
+        embed: Fonction (textes) -> embeddings normalisés (voir make_embedder)
+        model_name: Modèle d'embedding (enregistré dans meta.json avec sa version)
+        text_column: Colonne des avis (défaut: Review_clean si présente, sinon Review)
+        max_length: Longueur maximale des avis (tokens)
+        rebuild: Forcer la reconstruction complète
+        df: DataFrame déjà chargé (évite de relire le CSV)
+        chunk_rows: Avis encodés entre deux écritures (le build reprend au dernier bloc écrit)
+
+    Returns:
+        Index ouvert (IVF complété avec les nouvelles lignes s'il existe)
+    """
+    import pandas as pd
+    from model_store import model_version
+
+    if df is None:
+        df = pd.read_csv(csv_path)
+    if text_column is None:
+        text_column = "Review_clean" if "Review_clean" in df.columns else "Review"
+    texts = df[text_column].astype(str).tolist()
+    params = f"v{INDEX_VERSION}|{model_version(model_name)}|{text_column}|{max_length}"
+    directory = index_dir_for(csv_path)
+    os.makedirs(directory, exist_ok=True)
+    vectors_path = os.path.join(directory, VECTORS_FILE)
+
+    meta = None if rebuild else _read_meta(directory)
+    hasher = hashlib.blake2b(digest_size=16)
+    if meta is not None:
+        n_rows = meta["n_rows"]
+        if (meta["params"] != params or n_rows > len(texts)
+                or _hash_update(hasher, texts[:n_rows]).hexdigest() != meta["prefix_hash"]):
+            print(f"[INFO] Index d'embeddings perime ({directory}), reconstruction...")
+            meta = None
+            hasher = hashlib.blake2b(digest_size=16)
+    if meta is None:
+        meta = {"params": params, "model": model_name, "text_column": text_column, "max_length": max_length,
+                "dim": None, "n_rows": 0, "prefix_hash": hasher.hexdigest(), "build_id": uuid.uuid4().hex}
+        for name in (VECTORS_FILE, IVF_FILE):
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+
+    start_row = meta["n_rows"]
+    if start_row < len(texts):
+        # Octets écrits après la dernière méta (build interrompu): ignorés
+        if os.path.exists(vectors_path) and meta["dim"]:
+            os.truncate(vectors_path, start_row * meta["dim"] * 2)
+        start = time.perf_counter()
+        with open(vectors_path, "ab") as f:
+            for chunk_start in range(start_row, len(texts), chunk_rows):
+                chunk = texts[chunk_start:chunk_start + chunk_rows]
+                vectors = embed(chunk)
+                f.write(np.ascontiguousarray(vectors, dtype=np.float16).tobytes())
+                f.flush()
+                _hash_update(hasher, chunk)
+                meta.update(dim=int(vectors.shape[1]), n_rows=chunk_start + len(chunk),
+                            prefix_hash=hasher.hexdigest())
+                _write_meta(directory, meta)
+                print(f"   {meta['n_rows']}/{len(texts)} avis encodes "
+                      f"({(meta['n_rows'] - start_row) / (time.perf_counter() - start):.0f} avis/s)")
+        print(f"[OK] Index d'embeddings: {len(texts) - start_row} avis ajoutes -> {directory}")
+    elif meta["dim"] is None:
+        raise ValueError(f"Aucun avis dans {csv_path}")
+
+    index = EmbeddingIndex(directory)
+    added = index.update_ivf()
+    if added:
+        print(f"[OK] IVF complete: {added} avis affectes")
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index d'embeddings pour la recherche d'avis similaires")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Construire ou completer l'index")
+    build_parser.add_argument("--csv", default="TA_restaurants_ML_clean_cleaned.csv", help="Dataset CSV")
+    build_parser.add_argument("--model", default=DEFAULT_MODEL, help="Modele d'embedding")
+    build_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    build_parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_LENGTH)
+    build_parser.add_argument("--rebuild", action="store_true", help="Reconstruction complete")
+    build_parser.add_argument("--ivf", action="store_true", help="(Re)construire l'index IVF approche")
+    build_parser.add_argument("--lists", type=int, default=None, help="Nombre de listes IVF")
+
+    query_parser = subparsers.add_parser("query", help="Avis les plus similaires")
+    query_parser.add_argument("--csv", default="TA_restaurants_ML_clean_cleaned.csv", help="Dataset CSV")
+    group = query_parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--text", help="Texte de la requete")
+    group.add_argument("--row", type=int, help="Ligne du dataset servant de requete")
+    query_parser.add_argument("-k", type=int, default=5)
+    query_parser.add_argument("--nprobe", type=int, default=None, help="Recherche IVF (defaut: exacte)")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    df = pd.read_csv(args.csv)
+    if args.command == "build":
+        from model_store import load_sequence_classifier
+
+        tokenizer, model, device = load_sequence_classifier(args.model)
+        index = build_or_update_index(args.csv, make_embedder(tokenizer, model, device, args.batch_size,
+                                                              args.max_length),
+                                      model_name=args.model, max_length=args.max_length,
+                                      rebuild=args.rebuild, df=df)
+        if args.ivf:
+            start = time.perf_counter()
+            index.build_ivf(args.lists)
+            print(f"[OK] IVF: {len(index.centroids)} listes en {time.perf_counter() - start:.1f} s")
+    else:
+        index = EmbeddingIndex(index_dir_for(args.csv))
+        if args.text is not None:
+            from model_store import load_sequence_classifier
+
+            tokenizer, model, device = load_sequence_classifier(index.meta["model"])
+            query = embed_texts([args.text], tokenizer, model, device, max_length=index.meta["max_length"])
+            start = time.perf_counter()
+            scores, ids = index.search(query, args.k, args.nprobe)
+            scores, ids = scores[0], ids[0]
+        else:
+            start = time.perf_counter()
+            scores, ids = index.similar_to_row(args.row, args.k, args.nprobe)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        mode = f"IVF nprobe={args.nprobe}" if args.nprobe and index.has_ivf else "exacte"
+        print(f"[INFO] Recherche {mode} sur {index.n_rows} avis: {elapsed_ms:.1f} ms")
+        text_column = index.meta["text_column"]
+        for score, row in zip(scores, ids):
+            print(f"   {score:.3f}  [{row}] {str(df[text_column].iloc[row])[:120]}")
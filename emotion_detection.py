@@ -2,12 +2,77 @@
 """
 Module de détection d'émotions spécifiques
 Émotions ciblées: joie/excitation, tristesse/déception, colère/frustration, surprise/étonnement
+
+torch et transformers ne sont importés que par EmotionDetector: le détecteur
+par mots-clés (SimpleEmotionDetector) se charge sans eux.
 """
 
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import re
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+from prometheus_metrics import track_inference
+
+# Mapping des émotions des modèles pré-entraînés vers nos catégories
+EMOTION_MAPPING = {
+    'joy': 'joie',
+    'happiness': 'joie',
+    'excitement': 'joie',
+    'sadness': 'tristesse',
+    'disappointment': 'tristesse',
+    'anger': 'colère',
+    'frustration': 'colère',
+    'annoyance': 'colère',
+    'surprise': 'surprise',
+    'amazement': 'surprise',
+    'neutral': 'neutre'
+}
+
+# Catégories finales
+EMOTION_CATEGORIES = ['joie', 'tristesse', 'colère', 'surprise', 'neutre']
+
+# Sentiment dérivé de l'émotion principale
+EMOTION_TO_SENTIMENT = {
+    'joie': 'Positif',
+    'tristesse': 'Négatif',
+    'colère': 'Négatif',
+    'surprise': 'Neutre',  # Surprise peut être positive ou négative
+    'neutre': 'Neutre'
+}
+
+
+def map_model_label(label: str):
+    """
+    Retourne notre catégorie pour un label du modèle (ou None si non mappé)
+    
+    Args:
+        label: Label du modèle (id2label)
+    """
+    label = label.lower()
+    for key, value in EMOTION_MAPPING.items():
+        if key in label:
+            return value
+    return None
+
+
+def emotion_category_matrix(id2label: Dict, categories: Sequence[str] = EMOTION_CATEGORIES):
+    """
+    Matrice [labels du modèle x catégories] (1 si le label est mappé sur la catégorie)
+    
+    Calculée une fois par modèle: les scores par catégorie d'un lot sont alors
+    un seul produit matriciel probabilités @ matrice.
+    
+    Args:
+        id2label: Labels du modèle (config.id2label)
+        categories: Catégories (ordre des colonnes)
+    """
+    import numpy as np
+    
+    matrix = np.zeros((len(id2label), len(categories)), dtype=np.float32)
+    for idx, label in id2label.items():
+        category = map_model_label(label)
+        if category in categories:
+            matrix[int(idx), list(categories).index(category)] = 1.0
+    return matrix
+
 
 class EmotionDetector:
     """
@@ -21,29 +86,23 @@ class EmotionDetector:
         Args:
             model_name: Nom du modèle HuggingFace à utiliser
         """
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
-        self.model.to(self.device)
-        self.model.eval()
+        from model_store import load_sequence_classifier
+        
+        self.model_name = model_name
+        # Modèle pré-installé dans MODELS_DIR si disponible (aucun accès réseau)
+        self.tokenizer, self.model, self.device = load_sequence_classifier(model_name)
         
         # Mapping des émotions du modèle vers nos catégories
-        self.emotion_mapping = {
-            'joy': 'joie',
-            'happiness': 'joie',
-            'excitement': 'joie',
-            'sadness': 'tristesse',
-            'disappointment': 'tristesse',
-            'anger': 'colère',
-            'frustration': 'colère',
-            'annoyance': 'colère',
-            'surprise': 'surprise',
-            'amazement': 'surprise',
-            'neutral': 'neutre'
-        }
+        self.emotion_mapping = EMOTION_MAPPING
         
         # Catégories finales
-        self.categories = ['joie', 'tristesse', 'colère', 'surprise', 'neutre']
+        self.categories = EMOTION_CATEGORIES
+        
+        # Labels du modèle -> catégories, compilé une fois (numpy pour les lots, torch pour un avis)
+        import torch
+        
+        self.category_matrix = emotion_category_matrix(self.model.config.id2label, self.categories)
+        self._category_matrix_t = torch.from_numpy(self.category_matrix).to(self.device)
     
     def predict_emotion(self, text: str) -> Dict[str, float]:
         """
@@ -55,43 +114,90 @@ class EmotionDetector:
         Returns:
             Dictionnaire avec les probabilités pour chaque émotion
         """
-        # Tokenisation
-        inputs = self.tokenizer(
-            text,
-            return_tensors="pt",
-            truncation=True,
-            padding=True,
-            max_length=128
-        )
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        
-        # Prédiction
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            probs = torch.softmax(outputs.logits, dim=-1)[0]
-            
-        # Récupérer les labels du modèle
-        emotion_labels = self.model.config.id2label
+        import torch
         
-        # Mapper vers nos catégories
-        emotion_scores = {cat: 0.0 for cat in self.categories}
+        with track_inference(self.model_name, f"torch-{self.device.type}", "emotion"):
+            # Tokenisation
+            inputs = self.tokenizer(
+                text,
+                return_tensors="pt",
+                truncation=True,
+                padding=True,
+                max_length=128
+            )
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            
+            # Prédiction et regroupement par catégorie sur le device (un seul transfert)
+            with torch.no_grad():
+                outputs = self.model(**inputs)
+                probs = torch.softmax(outputs.logits.float(), dim=-1)
+                scores = probs @ self._category_matrix_t
+                scores = scores / scores.sum(dim=-1, keepdim=True).clamp_min(1e-12)
+            
+        return dict(zip(self.categories, scores[0].tolist()))
+    
+    def _category_scores(self, probs):
+        """
+        Regroupe les probabilités des labels du modèle dans nos catégories, pour tout un lot
         
-        for idx, prob in enumerate(probs):
-            label = emotion_labels[idx].lower()
-            prob_value = float(prob.item())
+        Args:
+            probs: Probabilités [n, labels du modèle] (numpy)
             
-            # Mapper l'émotion du modèle vers nos catégories
-            for key, value in self.emotion_mapping.items():
-                if key in label:
-                    emotion_scores[value] += prob_value
-                    break
+        Returns:
+            Scores normalisés [n, catégories]
+        """
+        import numpy as np
         
-        # Normaliser (au cas où)
-        total = sum(emotion_scores.values())
-        if total > 0:
-            emotion_scores = {k: v/total for k, v in emotion_scores.items()}
+        scores = np.asarray(probs, dtype=np.float32) @ self.category_matrix
+        total = scores.sum(axis=1, keepdims=True)
+        return np.divide(scores, total, out=np.zeros_like(scores), where=total > 0)
+    
+    def _scores_from_probs(self, probs: Sequence[float]) -> Dict[str, float]:
+        """Regroupe les probabilités d'un texte dans nos catégories"""
+        import numpy as np
         
-        return emotion_scores
+        return dict(zip(self.categories, self._category_scores(np.asarray(probs)[None, :])[0].tolist()))
+    
+    def predict_emotions(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                         aggregation: Optional[str] = None) -> List[Dict[str, float]]:
+        """
+        Prédit les émotions d'une liste de textes, par lots triés par longueur
+        
+        Args:
+            texts: Textes à analyser
+            batch_size: Taille des lots (défaut: celle d'autotune, sinon 32)
+            aggregation: Mode documents longs ("mean", "max", "confidence" ou "attention", voir
+                long_document); None = troncature à 128 tokens
+            
+        Returns:
+            Liste de dictionnaires de probabilités (dans l'ordre de texts)
+        """
+        import numpy as np
+        from batch_inference import run_batched_inference
+        from thread_tuning import tuned_batch_size
+        
+        if len(texts) == 0:
+            return []
+        batch_size = batch_size or tuned_batch_size("emotion", 32)
+        with track_inference(self.model_name, f"torch-{self.device.type}", "emotion", items=len(texts)):
+            if aggregation:
+                from long_document import predict_long
+                probs, _ = predict_long(list(texts), self.tokenizer, self.model, self.device,
+                                        max_length=128, batch_size=batch_size, aggregation=aggregation)
+            else:
+                logits, _ = run_batched_inference(
+                    list(texts), self.tokenizer, self.model, self.device,
+                    batch_size=batch_size, max_length=128
+                )
+                probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+                probs /= probs.sum(axis=1, keepdims=True)
+        return [dict(zip(self.categories, row)) for row in self._category_scores(probs).tolist()]
+    
+    def get_main_emotions(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                          aggregation: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Émotion principale et confiance de chaque texte (version par lots de get_main_emotion)"""
+        return [max(scores.items(), key=lambda x: x[1])
+                for scores in self.predict_emotions(texts, batch_size, aggregation)]
     
     def get_main_emotion(self, text: str) -> Tuple[str, float]:
         """
@@ -114,81 +220,50 @@ class SimpleEmotionDetector:
     Alternative simple si le modèle n'est pas disponible
     """
     
-    def __init__(self):
-        # Dictionnaires d'émotions (en anglais et français)
-        self.emotion_keywords = {
-            'joie': [
-                'excellent', 'amazing', 'wonderful', 'great', 'fantastic', 'love', 'perfect',
-                'excellent', 'merveilleux', 'génial', 'fantastique', 'adorable', 'parfait',
-                'superbe', 'délicieux', 'satisfait', 'content', 'heureux', 'ravie'
-            ],
-            'tristesse': [
-                'disappointed', 'sad', 'bad', 'terrible', 'awful', 'worst', 'poor',
-                'déçu', 'triste', 'mauvais', 'terrible', 'affreux', 'pire', 'médiocre',
-                'décevant', 'tristesse', 'regret'
-            ],
-            'colère': [
-                'angry', 'frustrated', 'annoyed', 'horrible', 'disgusting', 'hate', 'slow',
-                'en colère', 'frustré', 'énervé', 'horrible', 'dégoûtant', 'déteste', 'lent',
-                'frustration', 'colère', 'mécontent'
-            ],
-            'surprise': [
-                'surprised', 'unexpected', 'wow', 'incredible', 'unbelievable', 'shocked',
-                'surpris', 'inattendu', 'incroyable', 'impressionnant', 'étonnant', 'choqué'
-            ]
-        }
-        
-        # Compter les occurrences
-        for emotion in self.emotion_keywords:
-            self.emotion_keywords[emotion] = [word.lower() for word in self.emotion_keywords[emotion]]
-    
-    def predict_emotion(self, text: str) -> Dict[str, float]:
+    def __init__(self, language: Optional[str] = None):
         """
-        Prédit l'émotion basée sur les mots-clés
-        
         Args:
-            text: Texte à analyser
-            
-        Returns:
-            Dictionnaire avec les scores pour chaque émotion
+            language: Code de langue d'un lexique (lexicons/emotions.<langue>.json);
+                défaut: lexiques de toutes les langues
         """
-        text_lower = text.lower()
+        from emotion_lexicon import get_matcher
         
-        # Compter les occurrences
-        scores = {emotion: 0 for emotion in self.emotion_keywords.keys()}
+        self.language = language
+        # Lexique compilé une fois par processus (voir emotion_lexicon)
+        self.matcher = get_matcher(language)
+        self.emotion_keywords = self.matcher.keywords()
+    
+    def _scores_from_counts(self, counts: Dict[str, int]) -> Dict[str, float]:
+        """Normalise les nombres de termes trouvés (neutre si aucun)"""
+        scores = dict(counts)
         scores['neutre'] = 0
         
-        total_matches = 0
-        
-        for emotion, keywords in self.emotion_keywords.items():
-            count = sum(1 for keyword in keywords if keyword in text_lower)
-            scores[emotion] = count
-            total_matches += count
+        total = sum(scores.values())
         
         # Si aucun mot-clé trouvé, retourner neutre
-        if total_matches == 0:
+        if total == 0:
             scores['neutre'] = 1.0
             return scores
         
         # Normaliser en probabilités
-        total = sum(scores.values())
-        if total > 0:
-            scores = {k: v/total for k, v in scores.items()}
-        
-        return scores
+        return {k: v/total for k, v in scores.items()}
     
-    def get_main_emotion(self, text: str) -> Tuple[str, float]:
+    def predict_emotion(self, text: str) -> Dict[str, float]:
         """
-        Retourne l'émotion principale et sa confiance
+        Prédit l'émotion basée sur les mots-clés
         
         Args:
             text: Texte à analyser
             
         Returns:
-            Tuple (émotion, confiance)
+            Dictionnaire avec les scores pour chaque émotion
         """
-        emotions = self.predict_emotion(text)
-        # Exclure neutre pour trouver la vraie émotion
+        # Termes distincts de chaque émotion présents dans le texte (toutes formes confondues)
+        return self._scores_from_counts(self.matcher.count(text))
+    
+    @staticmethod
+    def _main_from_scores(emotions: Dict[str, float]) -> Tuple[str, float]:
+        """Émotion principale, hors neutre sauf si aucun mot-clé n'a été trouvé"""
         non_neutral = {k: v for k, v in emotions.items() if k != 'neutre'}
         
         if non_neutral and max(non_neutral.values()) > 0:
@@ -196,18 +271,48 @@ class SimpleEmotionDetector:
             return main_emotion[0], main_emotion[1]
         else:
             return 'neutre', emotions.get('neutre', 0.0)
+    
+    def get_main_emotion(self, text: str) -> Tuple[str, float]:
+        """
+        Retourne l'émotion principale et sa confiance
+        
+        Args:
+            text: Texte à analyser
+            
+        Returns:
+            Tuple (émotion, confiance)
+        """
+        return self._main_from_scores(self.predict_emotion(text))
+    
+    def predict_emotions(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                         aggregation: Optional[str] = None) -> List[Dict[str, float]]:
+        """Scores d'émotions d'une liste de textes, termes cherchés pour tout le lot à la fois
+        (même interface que EmotionDetector; aggregation est ignoré)"""
+        counts = self.matcher.count_batch(list(texts)).tolist()
+        return [self._scores_from_counts(dict(zip(self.matcher.emotions, row))) for row in counts]
+    
+    def get_main_emotions(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                          aggregation: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Émotion principale et confiance de chaque texte"""
+        return [self._main_from_scores(scores) for scores in self.predict_emotions(texts)]
 
 
-def get_emotion_detector(use_model: bool = True) -> EmotionDetector | SimpleEmotionDetector:
+def get_emotion_detector(use_model: bool = True, multilingual: bool = False):
     """
     Factory function pour obtenir un détecteur d'émotions
     
     Args:
         use_model: Si True, utilise le modèle pré-entraîné, sinon utilise le détecteur simple
+        multilingual: Identifier la langue de chaque avis et utiliser le détecteur de cette
+            langue (voir language_routing)
         
     Returns:
         Instance du détecteur d'émotions
     """
+    if multilingual:
+        from language_routing import MultilingualEmotionDetector
+        
+        return MultilingualEmotionDetector(use_model=use_model)
     if use_model:
         try:
             return EmotionDetector()
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+Lexiques d'émotions par langue, compilés en une table de formes
+
+Les mots-clés de SimpleEmotionDetector sont des fichiers de données versionnés,
+un par langue (lexicons/emotions.<langue>.json):
+
+    {"version": 1, "language": "fr",
+     "emotions": {"joie": ["heureux", ...], "colère": ["en colère", "détester|déteste|détesté"]}}
+
+Un terme peut être une expression de plusieurs mots; "lemme|forme|forme"
+ajoute des formes irrégulières. À la compilation, chaque terme d'un mot est
+étendu par des règles de flexion simples de sa langue (INFLECTORS: pluriel,
+féminin, -ed/-ing...), puis les termes sont dédupliqués par émotion et toutes
+les formes sont rangées dans des tableaux numpy (formes triées -> terme ->
+émotion), sauvegardés à côté des sources (emotions.<clé>.compiled.npz, sans
+pickle). Le chargement ne fait que lire ces tableaux: quelques millisecondes,
+même pour des dizaines de milliers de termes. Le fichier compilé est
+reconstruit quand une source ou les règles de flexion changent (empreinte du
+contenu, aussi utilisée comme clé par les caches qui stockent des émotions).
+
+La recherche découpe le texte en mots, puis cherche chaque mot et chaque
+n-gramme (jusqu'au nombre de mots du plus long terme) dans les formes triées,
+par dichotomie et pour tout un lot à la fois: le coût dépend de la longueur des
+avis, pas (ou peu) de la taille du lexique. Chaque terme compte une fois par
+texte, quelle que soit la forme trouvée.
+
+Utilisation:
+    python emotion_lexicon.py compile
+    python emotion_lexicon.py show --language fr
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+LEXICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicons")
+COMPILED_VERSION = 2
+# Clé du lexique réunissant toutes les langues
+ALL_LANGUAGES = "all"
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots en minuscules (lettres et chiffres, accents compris)"""
+    return _WORD.findall(text.lower())
+
+
+def _inflect_en(word: str) -> Set[str]:
+    """Pluriel / 3e personne, -ed, -ing, adverbe en -ly, comparatif et superlatif, noms en -er/-ness"""
+    if word.endswith("ed"):
+        # Participe: adjectif en -ing de même racine (surprised -> surprising, surprisingly)
+        stem = word[:-2]
+        forms = {word + "ly", stem + "ing", stem + "ingly"}
+        return forms | {word[:-1]} if stem.endswith(("s", "t", "v", "z", "c", "g")) else forms
+    if word.endswith("ing"):
+        return {word + "ly"}
+    if word.endswith("y") and len(word) > 2 and word[-2] not in "aeiou":
+        stem = word[:-1]
+        return {stem + "ies", stem + "ied", word + "ing", stem + "ier", stem + "iest", stem + "ily"}
+    if word.endswith("le"):
+        return {word + "s", word[:-1] + "y"}
+    if word.endswith("e"):
+        # love -> loves, loved, loving, lovely, lover(s), nicer, nicest
+        return {word + "s", word + "d", word[:-1] + "ing", word + "ly", word + "r", word + "rs", word + "st"}
+    if word.endswith(("s", "x", "ch", "sh")):
+        return {word + "es", word + "ed", word + "ing", word + "er", word + "est"}
+    return {word + "s", word + "ed", word + "ing", word + "ly", word + "er", word + "est", word + "ness"}
+
+
+def _inflect_fr(word: str) -> Set[str]:
+    """Féminin et pluriel des adjectifs et participes"""
+    if word.endswith("eux"):
+        return {word[:-1] + "se", word[:-1] + "ses"}
+    if word.endswith("if"):
+        return {word + "s", word[:-1] + "ve", word[:-1] + "ves"}
+    if word.endswith(("el", "en")):
+        return {word + "s", word + "le", word + "les"}
+    if word.endswith("er"):
+        return {word + "s", word[:-2] + "ère", word[:-2] + "ères"}
+    if word.endswith("e"):
+        return {word + "s"}
+    if word.endswith(("s", "x")):
+        return {word + "e", word + "es"}
+    return {word + "e", word + "s", word + "es"}
+
+
+# Règles de flexion par langue (les langues absentes ne sont pas étendues)
+INFLECTORS: Dict[str, Callable[[str], Set[str]]] = {
+    "en": _inflect_en,
+    "fr": _inflect_fr,
+}
+
+
+def lexicon_path(language: str, root: Optional[str] = None) -> str:
+    """Fichier source du lexique d'une langue"""
+    return os.path.join(root or LEXICON_DIR, f"emotions.{language}.json")
+
+
+def compiled_path(key: str, root: Optional[str] = None) -> str:
+    """Fichier compilé d'une langue (ou de ALL_LANGUAGES)"""
+    return os.path.join(root or LEXICON_DIR, f"emotions.{key}.compiled.npz")
+
+
+def lexicon_languages(root: Optional[str] = None) -> List[str]:
+    """Langues ayant un fichier de lexique"""
+    root = root or LEXICON_DIR
+    if not os.path.isdir(root):
+        return []
+    return sorted(name[len("emotions."):-len(".json")] for name in os.listdir(root)
+                  if name.startswith("emotions.") and name.endswith(".json"))
+
+
+def read_lexicon(language: str, root: Optional[str] = None) -> Dict:
+    """Lit le fichier source d'une langue (version, emotions)"""
+    with open(lexicon_path(language, root), encoding="utf-8") as f:
+        lexicon = json.load(f)
+    if lexicon.get("language", language) != language:
+        raise ValueError(f"Lexique {lexicon_path(language, root)}: langue {lexicon['language']} != {language}")
+    return lexicon
+
+
+def expand_term(entry: str, language: str) -> Tuple[str, Set[str]]:
+    """
+    Lemme et formes d'une entrée de lexique
+
+    Args:
+        entry: "terme", "expression de plusieurs mots" ou "lemme|forme|forme"
+        language: Langue (règles de INFLECTORS)
+
+    Returns:
+        Tuple (lemme normalisé, ensemble des formes normalisées, lemme compris)
+    """
+    variants = [" ".join(tokenize(part)) for part in entry.split("|")]
+    variants = [variant for variant in variants if variant]
+    if not variants:
+        raise ValueError(f"Terme vide dans le lexique {language}: {entry!r}")
+    forms = set(variants)
+    inflect = INFLECTORS.get(language)
+    if inflect:
+        for variant in variants:
+            if " " not in variant:
+                forms |= inflect(variant)
+    return variants[0], forms
+
+
+def _source_signature(languages: Sequence[str], root: Optional[str]) -> str:
+    """Empreinte du contenu des sources et des règles de flexion (ce module)"""
+    digest = hashlib.blake2b(digest_size=12)
+    for path in [os.path.abspath(__file__), *(lexicon_path(language, root) for language in languages)]:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return f"v{COMPILED_VERSION}|{'+'.join(languages)}|{digest.hexdigest()}"
+
+
+class LexiconMatcher:
+    """
+    Table forme -> terme -> émotion, compilée depuis les lexiques d'une ou plusieurs langues
+
+    Les formes restent un tableau trié: une recherche dichotomique (np.searchsorted)
+    remplace le dictionnaire, il n'y a donc rien à reconstruire au chargement.
+    """
+
+    def __init__(self, emotions: Sequence[str], terms: Sequence[str], term_emotion: np.ndarray,
+                 forms: np.ndarray, form_term: np.ndarray, max_words: int = 1, signature: str = ""):
+        """
+        Args:
+            emotions: Émotions (ordre des fichiers sources)
+            terms: Lemmes dédupliqués
+            term_emotion: Indice d'émotion de chaque terme
+            forms: Formes triées (mots ou expressions normalisés)
+            form_term: Indice de terme de chaque forme
+            max_words: Nombre de mots de la plus longue forme
+            signature: Signature des sources compilées
+        """
+        self.emotions = list(emotions)
+        self.terms = np.asarray(terms)
+        self.term_emotion = np.asarray(term_emotion, dtype=np.int32)
+        self.forms = np.asarray(forms)
+        self.form_term = np.asarray(form_term, dtype=np.int32)
+        self.max_words = int(max_words)
+        self.signature = signature
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def keywords(self) -> Dict[str, List[str]]:
+        """Lemmes de chaque émotion"""
+        return {emotion: self.terms[self.term_emotion == idx].tolist()
+                for idx, emotion in enumerate(self.emotions)}
+
+    def _candidates(self, text: str) -> List[str]:
+        """Mots du texte et n-grammes de mots jusqu'à max_words"""
+        words = tokenize(text)
+        candidates = list(words)
+        for n in range(2, min(self.max_words, len(words)) + 1):
+            candidates.extend(" ".join(words[start:start + n]) for start in range(len(words) - n + 1))
+        return candidates
+
+    def count_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Nombre de termes distincts de chaque émotion présents dans chaque texte
+
+        Les candidats de tout le lot sont cherchés en un seul appel à np.searchsorted.
+
+        Returns:
+            Tableau [n textes, émotions] d'entiers
+        """
+        counts = np.zeros((len(texts), len(self.emotions)), dtype=np.int64)
+        candidates, owners = [], []
+        for idx, text in enumerate(texts):
+            found = self._candidates(text)
+            candidates.extend(found)
+            owners.extend([idx] * len(found))
+        if not candidates or len(self.forms) == 0:
+            return counts
+        candidates = np.array(candidates)
+        positions = np.searchsorted(self.forms, candidates).clip(max=len(self.forms) - 1)
+        hits = self.forms[positions] == candidates
+        # Chaque terme compte une fois par texte, quelle que soit la forme trouvée
+        keys = np.unique(np.asarray(owners, dtype=np.int64)[hits] * len(self.terms)
+                         + self.form_term[positions[hits]])
+        np.add.at(counts, (keys // len(self.terms), self.term_emotion[keys % len(self.terms)]), 1)
+        return counts
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Nombre de termes distincts de chaque émotion présents dans le texte"""
+        return dict(zip(self.emotions, self.count_batch([text])[0].tolist()))
+
+    def save(self, path: str):
+        """Sauvegarde la table (npz non compressé, sans pickle)"""
+        with open(path, "wb") as f:
+            np.savez(f, emotions=np.array(self.emotions), terms=self.terms, term_emotion=self.term_emotion,
+                     forms=self.forms, form_term=self.form_term, max_words=np.array(self.max_words),
+                     signature=np.array(self.signature))
+
+    @classmethod
+    def load(cls, path: str) -> "LexiconMatcher":
+        """Charge une table sauvegardée par save"""
+        with np.load(path, allow_pickle=False) as saved:
+            return cls(saved["emotions"].tolist(), saved["terms"], saved["term_emotion"], saved["forms"],
+                       saved["form_term"], int(saved["max_words"]), str(saved["signature"]))
+
+
+def compile_lexicons(languages: Sequence[str], root: Optional[str] = None) -> LexiconMatcher:
+    """
+    Compile les lexiques des langues en une seule table
+
+    Un même lemme dans plusieurs langues (ou deux fois dans un fichier) donne un seul
+    terme par émotion; une forme déjà attribuée garde son premier terme.
+    """
+    emotions: List[str] = []
+    terms: List[str] = []
+    term_emotion: List[int] = []
+    term_ids: Dict[Tuple[int, str], int] = {}
+    form_term: Dict[str, int] = {}
+    for language in languages:
+        for emotion, entries in read_lexicon(language, root)["emotions"].items():
+            if emotion not in emotions:
+                emotions.append(emotion)
+            emotion_idx = emotions.index(emotion)
+            for entry in entries:
+                lemma, forms = expand_term(entry, language)
+                term = term_ids.get((emotion_idx, lemma))
+                if term is None:
+                    term = term_ids[(emotion_idx, lemma)] = len(terms)
+                    terms.append(lemma)
+                    term_emotion.append(emotion_idx)
+                for form in sorted(forms):
+                    form_term.setdefault(form, term)
+    forms = sorted(form_term)
+    return LexiconMatcher(emotions, terms, np.array(term_emotion, dtype=np.int32), np.array(forms),
+                          np.array([form_term[form] for form in forms], dtype=np.int32),
+                          max((form.count(" ") + 1 for form in forms), default=1),
+                          _source_signature(languages, root))
+
+
+def load_or_compile(language: Optional[str] = None, root: Optional[str] = None,
+                    rebuild: bool = False) -> LexiconMatcher:
+    """
+    Table compilée d'une langue (None: toutes les langues), recompilée si une source a changé
+
+    Args:
+        language: Code de langue (fichier lexicons/emotions.<langue>.json)
+        root: Répertoire des lexiques (défaut: LEXICON_DIR)
+        rebuild: Forcer la compilation
+    """
+    languages = [language] if language else lexicon_languages(root)
+    if not languages:
+        raise FileNotFoundError(f"Aucun lexique dans {root or LEXICON_DIR}")
+    path = compiled_path(language or ALL_LANGUAGES, root)
+    signature = _source_signature(languages, root)
+    if not rebuild and os.path.exists(path):
+        matcher = LexiconMatcher.load(path)
+        if matcher.signature == signature:
+            return matcher
+    matcher = compile_lexicons(languages, root)
+    try:
+        matcher.save(path)
+    except OSError as e:
+        # Répertoire en lecture seule: la table reste en mémoire pour ce processus
+        print(f"[ATTENTION] Lexique compile non sauvegarde ({path}): {e}")
+    return matcher
+
+
+@lru_cache(maxsize=None)
+def get_matcher(language: Optional[str] = None, root: Optional[str] = None) -> LexiconMatcher:
+    """Table d'une langue partagée par tous les détecteurs du processus"""
+    return load_or_compile(language, root)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Lexiques d'emotions par langue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("compile", "Compiler les lexiques (chaque langue et toutes les langues)"),
+                            ("show", "Statistiques d'un lexique compile")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--language", help="Code de langue (defaut: toutes les langues)")
+        sub.add_argument("--root", help="Repertoire des lexiques (defaut: lexicons/)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        keys = [args.language] if args.language else [*lexicon_languages(args.root), None]
+        for key in keys:
+            start = time.perf_counter()
+            matcher = load_or_compile(key, args.root, rebuild=True)
+            print(f"[OK] {key or ALL_LANGUAGES}: {len(matcher)} termes, {len(matcher.forms)} formes "
+                  f"({(time.perf_counter() - start) * 1000:.1f} ms) -> {compiled_path(key or ALL_LANGUAGES, args.root)}")
+        return 0
+
+    start = time.perf_counter()
+    matcher = load_or_compile(args.language, args.root)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Lexique {args.language or ALL_LANGUAGES}: {len(matcher)} termes, {len(matcher.forms)} formes, "
+          f"charge en {elapsed:.1f} ms")
+    for emotion, terms in matcher.keywords().items():
+        print(f"  {emotion}: {len(terms)} termes ({', '.join(terms[:8])}{', ...' if len(terms) > 8 else ''})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
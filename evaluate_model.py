@@ -3,49 +3,98 @@
 Script pour évaluer l'accuracy du modèle sur le dataset équilibré
 """
 
+import time
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, f1_score, classification_report, confusion_matrix
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from emotion_detection import SimpleEmotionDetector
+from emotion_detection import (SimpleEmotionDetector, EMOTION_CATEGORIES, EMOTION_TO_SENTIMENT,
+                               emotion_category_matrix)
+from split_dataset import load_or_build_split, count_leaked_groups
+from batch_inference import run_batched_inference, pretokenize, tokenizer_fingerprint
+from long_document import AGGREGATIONS, DEFAULT_STRIDE, predict_long
+from tfidf_sentiment import (DEFAULT_CONFIDENCE, LinearSentimentModel, cascade_predict, default_model_dir,
+                             is_linear_model_dir)
+from thread_tuning import apply_thread_config
 
-def evaluate_sentiment_model():
-    """Évalue le modèle de sentiment sur le dataset équilibré"""
+DEFAULT_MODEL_PATH = "distilbert-base-uncased"
+DEFAULT_EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+SENTIMENT_LABEL_IDS = {"Négatif": 0, "Neutre": 1, "Positif": 2}
+
+def print_timing_report(timings, n_samples):
+    """Affiche le temps passé dans chaque étape de l'évaluation"""
+    print("\nTemps par etape:")
+    total = timings["tokenize_wait"] + timings["forward"] + timings["metrics"]
+    for stage, key in [("tokenize", "tokenize"), ("  dont attente", "tokenize_wait"),
+                       ("forward", "forward"), ("metrics", "metrics")]:
+        print(f"   {stage:<15} {timings[key]*1000:10.1f} ms")
+    print(f"   {'total':<15} {total*1000:10.1f} ms "
+          f"({total/max(n_samples, 1)*1000:.2f} ms/avis, {n_samples/max(total, 1e-9):.1f} avis/s)")
+    if timings["padded_tokens"]:
+        print(f"   Efficacite du padding: {timings['tokens']/timings['padded_tokens']*100:.1f}% "
+              f"({int(timings['batches'])} lots)")
+
+def evaluate_sentiment_model(model_path=DEFAULT_MODEL_PATH, batch_size=32, max_length=128,
+                             aggregation=None, stride=DEFAULT_STRIDE,
+                             csv_path="TA_restaurants_balanced.csv", first_stage=None,
+                             confidence=DEFAULT_CONFIDENCE):
+    """
+    Évalue le modèle de sentiment sur le split de test du dataset équilibré
+    
+    Args:
+        model_path: Chemin du modèle fine-tuné, nom du modèle HuggingFace ou
+            dossier d'un modèle TF-IDF (tfidf_sentiment)
+        batch_size: Taille des lots
+        max_length: Longueur maximale (tokens)
+        aggregation: Mode documents longs (fenêtres glissantes agrégées: mean, max,
+            confidence, attention); None = troncature à max_length
+        stride: Chevauchement des fenêtres (tokens)
+        csv_path: Dataset équilibré (split de test sauvegardé à côté)
+        first_stage: Dossier d'un modèle TF-IDF utilisé en premier étage: seuls les
+            avis sous le seuil de confiance passent par le transformer
+        confidence: Seuil de confiance du premier étage
+    """
     print("=" * 60)
     print("EVALUATION DU MODELE DE SENTIMENT")
     print("=" * 60)
     
-    # Charger le dataset équilibré
+    # Charger le dataset équilibré et le split sauvegardé (sans fuite entre train et test)
     print("\nChargement du dataset equilibre...")
-    df = pd.read_csv("TA_restaurants_balanced.csv")
+    df, split = load_or_build_split(csv_path)
     print(f"Dataset charge: {len(df)} echantillons")
     
     # Préparer les données
     texts = df['Review'].astype(str).tolist()
-    labels = df['label'].astype(int).tolist()
+    labels = df['label'].astype(int).to_numpy()
     
-    # Split train/test
-    train_texts, test_texts, train_labels, test_labels = train_test_split(
-        texts, labels,
-        test_size=0.2,
-        random_state=42,
-        stratify=labels
-    )
+    test_texts = [texts[i] for i in split['test']]
+    test_labels = labels[split['test']]
     
-    print(f"\nTrain: {len(train_texts)} echantillons")
+    print(f"\nTrain: {len(split['train'])} echantillons")
+    print(f"Validation: {len(split['val'])} echantillons")
     print(f"Test: {len(test_texts)} echantillons")
+    print(f"Doublons partages entre splits: {count_leaked_groups(texts, split)}")
+    
+    if is_linear_model_dir(model_path):
+        # Modèle TF-IDF + régression logistique: pas de tokenisation ni de lots
+        linear = LinearSentimentModel.load(model_path)
+        print(f"\nModele TF-IDF charge: {linear.version}")
+        start = time.perf_counter()
+        probs = linear.predict_proba(test_texts)
+        timings = {"tokenize": 0.0, "tokenize_wait": 0.0, "forward": time.perf_counter() - start,
+                   "batches": 1.0, "tokens": 0.0, "padded_tokens": 0.0}
+        return report_sentiment_metrics(test_labels, probs.argmax(axis=1), timings)
     
     # Charger le modèle
-    print("\nChargement du modele DistilBERT...")
+    print(f"\nChargement du modele: {model_path}")
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model_name = "distilbert-base-uncased"
+    apply_thread_config()
     
     try:
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
         model = AutoModelForSequenceClassification.from_pretrained(
-            model_name,
+            model_path,
             num_labels=3
         )
         model.to(device)
@@ -56,30 +105,52 @@ def evaluate_sentiment_model():
         print("Utilisation d'une evaluation basique...")
         return evaluate_basic_accuracy(df)
     
-    # Prédire sur le test set
+    # Prédire sur le test set (lots triés par longueur, tokenisation en arrière-plan)
     print("\nPrediction sur le test set...")
-    predictions = []
-    batch_size = 32
-    
-    for i in range(0, len(test_texts), batch_size):
-        batch_texts = test_texts[i:i+batch_size]
-        inputs = tokenizer(
-            batch_texts,
-            return_tensors="pt",
-            truncation=True,
-            padding=True,
-            max_length=128
-        )
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-        
-        with torch.no_grad():
-            outputs = model(**inputs)
-            preds = torch.argmax(outputs.logits, dim=1)
-            predictions.extend(preds.cpu().numpy())
-    
+    timings = {"tokenize": 0.0, "tokenize_wait": 0.0, "forward": 0.0,
+               "batches": 0.0, "tokens": 0.0, "padded_tokens": 0.0}
+
+    def transformer_probs(batch_texts):
+        if aggregation:
+            probs, stage_timings = predict_long(
+                batch_texts, tokenizer, model, device,
+                max_length=max_length, stride=stride, batch_size=batch_size, aggregation=aggregation
+            )
+            print(f"Mode documents longs ({aggregation}): {int(stage_timings['windows'])} fenetres, "
+                  f"{int(stage_timings['windowed_texts'])} avis depassant {max_length} tokens")
+        else:
+            logits, stage_timings = run_batched_inference(
+                batch_texts,
+                tokenizer,
+                model,
+                device,
+                batch_size=batch_size,
+                max_length=max_length
+            )
+            probs = torch.softmax(torch.from_numpy(logits), dim=-1).numpy()
+        timings.update(stage_timings)
+        return probs
+
+    if first_stage:
+        # Premier étage TF-IDF: le transformer ne voit que les avis peu sûrs
+        linear = LinearSentimentModel.load(first_stage)
+        start = time.perf_counter()
+        probs, confident = cascade_predict(test_texts, linear, transformer_probs, threshold=confidence)
+        elapsed = time.perf_counter() - start
+        print(f"Premier etage {linear.version}: {confident.mean()*100:.1f}% des avis gardes "
+              f"(confiance >= {confidence}), {int((~confident).sum())} envoyes au transformer, "
+              f"{len(test_texts)/max(elapsed, 1e-9):.1f} avis/s au total")
+    else:
+        probs = transformer_probs(test_texts)
+    return report_sentiment_metrics(test_labels, probs.argmax(axis=1), timings)
+
+def report_sentiment_metrics(test_labels, predictions, timings):
+    """Affiche accuracy, F1, rapport de classification, matrice de confusion et temps par étape"""
     # Calculer les métriques
+    start = time.perf_counter()
     accuracy = accuracy_score(test_labels, predictions)
     f1 = f1_score(test_labels, predictions, average='weighted')
+    timings["metrics"] = time.perf_counter() - start
     
     print("\n" + "=" * 60)
     print("RESULTATS")
@@ -92,14 +163,17 @@ def evaluate_sentiment_model():
     print(classification_report(
         test_labels,
         predictions,
+        labels=[0, 1, 2],
         target_names=["Negatif", "Neutre", "Positif"]
     ))
     
     # Matrice de confusion
     print("\nMatrice de confusion:")
-    cm = confusion_matrix(test_labels, predictions)
+    cm = confusion_matrix(test_labels, predictions, labels=[0, 1, 2])
     print(cm)
     
+    print_timing_report(timings, len(test_labels))
+    
     return accuracy, f1
 
 def evaluate_basic_accuracy(df):
@@ -156,14 +230,198 @@ def evaluate_emotion_detector():
     
     return accuracy
 
+def default_comparison_specs(finetuned_path="model", emotion_model=DEFAULT_EMOTION_MODEL):
+    """Modèles comparés par défaut (kind: sentiment, emotion, keywords ou linear)"""
+    return [
+        {"name": "DistilBERT (non entraine)", "kind": "sentiment", "path": DEFAULT_MODEL_PATH},
+        {"name": "DistilBERT fine-tune", "kind": "sentiment", "path": finetuned_path},
+        {"name": "Emotions -> sentiment", "kind": "emotion", "path": emotion_model},
+        {"name": "Mots-cles (SimpleEmotionDetector)", "kind": "keywords"},
+        {"name": "TF-IDF + regression logistique", "kind": "linear", "path": default_model_dir()},
+    ]
+
+def emotion_to_sentiment_matrix(id2label):
+    """Matrice [labels du modèle x 3 sentiments] pour agréger les probabilités d'émotions"""
+    category_to_sentiment = np.zeros((len(EMOTION_CATEGORIES), len(SENTIMENT_LABEL_IDS)), dtype=np.float32)
+    for i, category in enumerate(EMOTION_CATEGORIES):
+        category_to_sentiment[i, SENTIMENT_LABEL_IDS[EMOTION_TO_SENTIMENT[category]]] = 1.0
+    return emotion_category_matrix(id2label) @ category_to_sentiment
+
+def load_comparison_model(spec, device):
+    """Charge un modèle décrit par une spec de default_comparison_specs"""
+    if spec["kind"] == "keywords":
+        return {"detector": SimpleEmotionDetector()}
+    if spec["kind"] == "linear":
+        return {"linear": LinearSentimentModel.load(spec["path"])}
+    
+    apply_thread_config()
+    tokenizer = AutoTokenizer.from_pretrained(spec["path"])
+    kwargs = {"num_labels": 3} if spec["kind"] == "sentiment" else {}
+    model = AutoModelForSequenceClassification.from_pretrained(spec["path"], **kwargs)
+    model.to(device)
+    model.eval()
+    return {
+        "tokenizer": tokenizer,
+        "model": model,
+        "tokenizer_key": tokenizer_fingerprint(tokenizer)
+    }
+
+def compare_models(model_specs=None, csv_path="TA_restaurants_balanced.csv", batch_size=32, max_length=128):
+    """
+    Compare plusieurs modèles sur le même split de test
+    
+    Les modèles qui partagent le même tokenizer réutilisent les mêmes encodages:
+    le split de test n'est tokenisé qu'une fois par tokenizer.
+    
+    Args:
+        model_specs: Liste de specs {name, kind, path} (défaut: default_comparison_specs());
+            kind: sentiment, emotion, keywords ou linear (TF-IDF)
+        csv_path: Dataset CSV
+        batch_size: Taille des lots
+        max_length: Longueur maximale (tokens)
+        
+    Returns:
+        DataFrame de comparaison (accuracy, F1 macro, latence, débit)
+    """
+    print("=" * 60)
+    print("COMPARAISON DES MODELES")
+    print("=" * 60)
+    
+    model_specs = model_specs or default_comparison_specs()
+    df, split = load_or_build_split(csv_path)
+    texts = df['Review'].astype(str).tolist()
+    labels = df['label'].astype(int).to_numpy()
+    test_texts = [texts[i] for i in split['test']]
+    test_labels = labels[split['test']]
+    n = len(test_texts)
+    print(f"\nTest: {n} echantillons")
+    
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    shared_encodings = {}
+    rows = []
+    
+    for spec in model_specs:
+        print(f"\n--- {spec['name']} ---")
+        try:
+            start = time.perf_counter()
+            loaded = load_comparison_model(spec, device)
+            load_time = time.perf_counter() - start
+        except Exception as e:
+            print(f"[ATTENTION] Modele ignore ({spec.get('path', spec['kind'])}): {e}")
+            continue
+        
+        tokenize_time = 0.0
+        start = time.perf_counter()
+        if spec["kind"] == "keywords":
+            detector = loaded["detector"]
+            predictions = np.fromiter(
+                (SENTIMENT_LABEL_IDS[EMOTION_TO_SENTIMENT[detector.get_main_emotion(t)[0]]] for t in test_texts),
+                dtype=np.int64,
+                count=n
+            )
+            inference_time = time.perf_counter() - start
+        elif spec["kind"] == "linear":
+            predictions = loaded["linear"].predict_proba(test_texts).argmax(axis=1)
+            inference_time = time.perf_counter() - start
+        else:
+            key = loaded["tokenizer_key"]
+            if key not in shared_encodings:
+                shared_encodings[key] = pretokenize(test_texts, loaded["tokenizer"], batch_size, max_length)
+            else:
+                print("Tokenisation partagee avec un modele precedent")
+            batches, encodings, tokenize_time = shared_encodings[key]
+            
+            logits, timings = run_batched_inference(
+                test_texts,
+                loaded["tokenizer"],
+                loaded["model"],
+                device,
+                batches=batches,
+                encodings=encodings
+            )
+            if spec["kind"] == "emotion":
+                probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+                probs /= probs.sum(axis=1, keepdims=True)
+                matrix = emotion_to_sentiment_matrix(loaded["model"].config.id2label)
+                predictions = (probs @ matrix).argmax(axis=1)
+            else:
+                predictions = logits.argmax(axis=1)
+            # Coût de la tokenisation compté pour chaque modèle (comme s'il tournait seul)
+            inference_time = time.perf_counter() - start + tokenize_time
+        
+        accuracy = accuracy_score(test_labels, predictions)
+        macro_f1 = f1_score(test_labels, predictions, average='macro')
+        print(f"Accuracy: {accuracy*100:.2f}% | F1 macro: {macro_f1*100:.2f}%")
+        rows.append({
+            "Modele": spec["name"],
+            "Accuracy (%)": round(accuracy * 100, 2),
+            "F1 macro (%)": round(macro_f1 * 100, 2),
+            "Latence (ms/avis)": round(inference_time / max(n, 1) * 1000, 3),
+            "Debit (avis/s)": round(n / max(inference_time, 1e-9), 1),
+            "Chargement (s)": round(load_time, 2),
+            "Tokenisation (s)": round(tokenize_time, 3)
+        })
+    
+    table = pd.DataFrame(rows)
+    print("\n" + "=" * 60)
+    print("TABLEAU COMPARATIF")
+    print("=" * 60)
+    print(table.to_string(index=False) if len(table) else "Aucun modele evalue")
+    return table
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Evaluation du projet")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH,
+                        help="Modele fine-tune (dossier) ou nom du modele HuggingFace")
+    parser.add_argument("--backend", choices=("transformer", "linear"), default="transformer",
+                        help="linear: modele TF-IDF + regression logistique (--model-path: son dossier, "
+                             "defaut MODELS_DIR/tfidf-sentiment)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--long-document", choices=AGGREGATIONS, default=None,
+                        help="Fenetres glissantes au lieu de la troncature, avec cette agregation")
+    parser.add_argument("--stride", type=int, default=DEFAULT_STRIDE,
+                        help="Chevauchement des fenetres (tokens) en mode --long-document")
+    parser.add_argument("--first-stage", nargs="?", const=default_model_dir(), default=None,
+                        help="Cascade: modele TF-IDF en premier etage (defaut MODELS_DIR/tfidf-sentiment), "
+                             "seuls les avis peu surs passent par le transformer")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE,
+                        help="Seuil de confiance du premier etage (--first-stage)")
+    parser.add_argument("--compare", action="store_true",
+                        help="Comparer plusieurs modeles sur le meme split de test")
+    parser.add_argument("--finetuned-path", default="model",
+                        help="Modele fine-tune utilise par --compare")
+    parser.add_argument("--emotion-model", default=DEFAULT_EMOTION_MODEL,
+                        help="Modele d'emotions utilise par --compare")
+    args = parser.parse_args()
+    if args.backend == "linear" and args.model_path == DEFAULT_MODEL_PATH:
+        args.model_path = default_model_dir()
+    
+    if args.compare:
+        compare_models(
+            default_comparison_specs(args.finetuned_path, args.emotion_model),
+            batch_size=args.batch_size,
+            max_length=args.max_length
+        )
+        raise SystemExit(0)
+    
     print("\n" + "=" * 60)
     print("EVALUATION COMPLETE DU PROJET")
     print("=" * 60)
     
     # Évaluer le modèle de sentiment
     try:
-        sent_accuracy, sent_f1 = evaluate_sentiment_model()
+        sent_accuracy, sent_f1 = evaluate_sentiment_model(
+            args.model_path,
+            batch_size=args.batch_size,
+            max_length=args.max_length,
+            aggregation=args.long_document,
+            stride=args.stride,
+            first_stage=args.first_stage,
+            confidence=args.confidence
+        )
     except Exception as e:
         print(f"\nErreur lors de l'evaluation du modele de sentiment: {e}")
         print("Evaluation basique...")
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+Routage multilingue: identification de la langue puis détecteur par langue
+
+Les avis TripAdvisor couvrent de nombreuses villes, mais les modèles
+transformers du projet sont anglais et les mots-clés de SimpleEmotionDetector
+mélangeaient anglais et français. Chaque avis d'un lot passe donc d'abord par
+un identifiant de langue rapide, puis par le détecteur de sa langue:
+
+- LanguageIdentifier: trigrammes de caractères (hachés, chiffres et ponctuation
+  retirés) et Bayes naïf multinomial, entraîné au premier usage sur un petit
+  corpus intégré (SEED_CORPUS, aucun accès réseau). Un lot entier est vectorisé
+  et classé en une seule opération. Les titres d'avis sont très courts et
+  pleins de noms propres et d'emprunts (pizza, tapas, bouchon): une autre
+  langue que DEFAULT_LANGUAGE n'est retenue qu'avec assez de trigrammes
+  (MIN_TRIGRAMS) et une marge de log-vraisemblance suffisante, en absolu
+  (MIN_MARGIN) et par trigramme (MIN_MARGIN_PER_TRIGRAM). Réglage sur les
+  3138 titres du dataset équilibré (anglais): 8 quittent l'anglais (0.25%),
+  dont plusieurs réellement français ou espagnols.
+- MultilingualEmotionDetector: regroupe les avis d'un lot par langue et appelle
+  une fois par groupe le détecteur de la langue (modèle de LANGUAGE_MODELS si
+  demandé, sinon mots-clés de la langue). Chaque modèle reçoit ainsi des lots
+  complets, même quand le trafic mélange les langues. Même interface que
+  EmotionDetector / SimpleEmotionDetector.
+
+Utilisation:
+    python language_routing.py "Le service était lent" "The food was great"
+"""
+
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Langue retenue quand l'avis est trop court, ambigu ou sans lettres
+DEFAULT_LANGUAGE = "en"
+# Nombre minimal de trigrammes de lettres pour quitter DEFAULT_LANGUAGE
+MIN_TRIGRAMS = 6
+# Marge (log-vraisemblance) exigée pour quitter DEFAULT_LANGUAGE, en absolu et par trigramme
+MIN_MARGIN = 6.0
+MIN_MARGIN_PER_TRIGRAM = 0.5
+# Nombre de features du HashingVectorizer (n-grammes de caractères)
+HASHING_FEATURES = 2 ** 16
+
+_NON_LETTERS = re.compile(r"[\W\d_]+")
+
+# Modèle d'émotions par langue (les autres langues utilisent leurs mots-clés)
+LANGUAGE_MODELS = {
+    "en": "j-hartmann/emotion-english-distilroberta-base",
+}
+
+# Corpus d'entraînement de l'identifiant (avis de restaurant et mots fréquents)
+SEED_CORPUS = {
+    "en": [
+        "The food was amazing and the staff were very friendly.",
+        "We waited almost an hour for our table, which was disappointing.",
+        "Great place for a quick lunch with friends, I would definitely come back.",
+        "The waiter was rude and the soup was cold when it arrived.",
+        "Nice atmosphere, reasonable prices and a good selection of wines.",
+        "I have been to this restaurant several times and it never disappoints.",
+        "Not worth the money, the portions were small and the service slow.",
+        "Best burger in town", "Lovely dinner with a view", "Overpriced and overrated",
+        "Friendly staff, tasty food", "Worst service ever", "Hidden gem near the station",
+        "Good value for money", "Would not recommend", "Perfect spot for breakfast", "Really nice evening",
+        "Awful experience, never again", "Quick and tasty lunch", "Highly recommended",
+        "Delicious food and great wine", "Nothing special but okay", "Absolutely loved it",
+        "Rude staff and dirty tables", "Great cocktails and a fun atmosphere", "Fresh fish cooked perfectly",
+        "Small portions, big bill", "Cosy little place", "Excellent meal as always", "Cheap and cheerful",
+        "Disappointing experience", "Brilliant food, slow service", "Must visit when in town",
+        "the and of to in is was with for that this it they we you but have not",
+        # Vocabulaire des titres anglais partagé avec les langues romanes (excellent, cuisine, ...)
+        "excellent decent terrible horrible avoid favourite favorite simple classic complete typical traditional",
+        "service restaurant place cafe bar pub dinner lunch breakfast brunch meal menu food value price staff",
+        "amazing awesome fantastic lovely nice good great best worst poor average overpriced tasty delicious fresh",
+    ],
+    "fr": [
+        "La cuisine était excellente et le personnel très accueillant.",
+        "Nous avons attendu presque une heure avant d'être servis, quelle déception.",
+        "Un endroit sympathique pour déjeuner entre amis, nous reviendrons.",
+        "Le serveur était désagréable et la soupe est arrivée froide.",
+        "Bonne ambiance, prix raisonnables et une belle carte des vins.",
+        "Je suis venu plusieurs fois dans ce restaurant et je n'ai jamais été déçu.",
+        "Ça ne vaut pas le prix, les portions sont petites et le service lent.",
+        "Meilleur burger de la ville", "Dîner agréable avec vue", "Trop cher pour ce que c'est",
+        "Personnel souriant, plats savoureux", "Le pire service de ma vie", "Une pépite près de la gare",
+        "Bon rapport qualité prix", "Je ne recommande pas", "Parfait pour le petit déjeuner",
+        "Très bonne soirée", "Expérience affreuse, plus jamais", "Déjeuner rapide et bon",
+        "À recommander vivement", "Cuisine délicieuse et bon vin", "Rien de spécial mais correct",
+        "On a adoré", "Serveurs désagréables et tables sales", "Cocktails géniaux et ambiance festive",
+        "Poisson frais parfaitement cuit", "Petites portions, grosse addition", "Petit endroit cosy",
+        "Excellent repas comme toujours", "Pas cher et sympa", "Expérience décevante",
+        "Cuisine top, service lent", "À faire absolument",
+        "le la les de des du et est était avec pour que qui nous vous mais pas très",
+    ],
+    "es": [
+        "La comida estaba buenísima y el personal fue muy amable.",
+        "Esperamos casi una hora para conseguir mesa, una decepción.",
+        "Un sitio estupendo para comer con amigos, volveremos sin duda.",
+        "El camarero fue muy antipático y la sopa llegó fría.",
+        "Buen ambiente, precios razonables y una buena carta de vinos.",
+        "He estado en este restaurante varias veces y nunca decepciona.",
+        "No vale lo que cuesta, las raciones son pequeñas y el servicio lento.",
+        "La mejor hamburguesa de la ciudad", "Cena agradable con vistas", "Caro y sobrevalorado",
+        "Personal amable, comida sabrosa", "El peor servicio de mi vida",
+        "Una joya escondida cerca de la estación", "Buena relación calidad precio", "No lo recomiendo",
+        "Perfecto para desayunar", "Una noche muy agradable", "Experiencia horrible, nunca más",
+        "Almuerzo rápido y rico", "Muy recomendable", "Comida deliciosa y buen vino",
+        "Nada especial pero correcto", "Nos encantó", "Camareros maleducados y mesas sucias",
+        "Cócteles geniales y buen ambiente", "Pescado fresco en su punto",
+        "Raciones pequeñas, cuenta grande", "Un sitio acogedor", "Excelente comida como siempre",
+        "Barato y alegre", "Experiencia decepcionante", "Comida buenísima, servicio lento",
+        "Visita obligada",
+        "el la los las de del y es fue con para que por pero no muy una mesa",
+    ],
+    "it": [
+        "Il cibo era ottimo e il personale molto gentile.",
+        "Abbiamo aspettato quasi un'ora per avere un tavolo, che delusione.",
+        "Un posto perfetto per pranzare con gli amici, torneremo sicuramente.",
+        "Il cameriere era scortese e la zuppa è arrivata fredda.",
+        "Bella atmosfera, prezzi onesti e una buona scelta di vini.",
+        "Sono stato in questo ristorante diverse volte e non delude mai.",
+        "Non vale il prezzo, le porzioni sono piccole e il servizio lento.",
+        "Il miglior hamburger della città", "Cena piacevole con vista", "Caro e sopravvalutato",
+        "Personale cordiale, cibo gustoso", "Il peggior servizio di sempre",
+        "Una perla vicino alla stazione", "Buon rapporto qualità prezzo", "Non lo consiglio",
+        "Perfetto per la colazione", "Serata davvero piacevole", "Esperienza pessima, mai più",
+        "Pranzo veloce e buono", "Consigliatissimo", "Cibo delizioso e ottimo vino",
+        "Niente di speciale ma discreto", "Ci è piaciuto tantissimo", "Camerieri scortesi e tavoli sporchi",
+        "Cocktail ottimi e bella atmosfera", "Pesce fresco cucinato alla perfezione",
+        "Porzioni piccole, conto salato", "Locale accogliente", "Ottimo pasto come sempre",
+        "Economico e simpatico", "Esperienza deludente", "Cibo buonissimo, servizio lento", "Da non perdere",
+        "il lo la gli le di del della e è era con per che non ma molto questo",
+    ],
+    "de": [
+        "Das Essen war hervorragend und das Personal sehr freundlich.",
+        "Wir haben fast eine Stunde auf unseren Tisch gewartet, sehr enttäuschend.",
+        "Ein toller Ort für ein schnelles Mittagessen mit Freunden, wir kommen wieder.",
+        "Der Kellner war unhöflich und die Suppe kam kalt an.",
+        "Schöne Atmosphäre, faire Preise und eine gute Weinauswahl.",
+        "Ich war schon mehrmals in diesem Restaurant und wurde nie enttäuscht.",
+        "Das Geld nicht wert, die Portionen waren klein und der Service langsam.",
+        "Bester Burger der Stadt", "Schönes Abendessen mit Aussicht", "Überteuert und überbewertet",
+        "Freundliches Personal, leckeres Essen", "Schlechtester Service überhaupt",
+        "Ein Geheimtipp in Bahnhofsnähe", "Gutes Preis-Leistungs-Verhältnis", "Nicht zu empfehlen",
+        "Perfekt zum Frühstücken", "Wirklich schöner Abend", "Schreckliches Erlebnis, nie wieder",
+        "Schnelles und leckeres Mittagessen", "Sehr empfehlenswert", "Köstliches Essen und guter Wein",
+        "Nichts Besonderes, aber okay", "Hat uns sehr gut gefallen",
+        "Unfreundliche Kellner und schmutzige Tische", "Tolle Cocktails und gute Stimmung",
+        "Frischer Fisch perfekt zubereitet", "Kleine Portionen, hohe Rechnung", "Gemütliches kleines Lokal",
+        "Ausgezeichnetes Essen wie immer", "Günstig und gut", "Enttäuschendes Erlebnis",
+        "Super Essen, langsamer Service", "Unbedingt besuchen",
+        "der die das und ist war mit für nicht ein eine sehr auch aber wir ich",
+    ],
+    "pt": [
+        "A comida estava ótima e os funcionários muito simpáticos.",
+        "Esperamos quase uma hora por uma mesa, foi uma decepção.",
+        "Um lugar ótimo para almoçar com amigos, voltaremos com certeza.",
+        "O empregado foi mal-educado e a sopa chegou fria.",
+        "Bom ambiente, preços razoáveis e uma boa carta de vinhos.",
+        "Já estive neste restaurante várias vezes e nunca desilude.",
+        "Não vale o preço, as doses são pequenas e o serviço lento.",
+        "O melhor hambúrguer da cidade", "Jantar agradável com vista", "Caro e sobrevalorizado",
+        "Pessoal simpático, comida saborosa", "O pior serviço de sempre", "Uma pérola perto da estação",
+        "Boa relação qualidade preço", "Não recomendo", "Perfeito para o pequeno-almoço",
+        "Uma noite muito agradável", "Experiência horrível, nunca mais", "Almoço rápido e saboroso",
+        "Recomendo vivamente", "Comida deliciosa e bom vinho", "Nada de especial mas razoável", "Adorámos",
+        "Empregados antipáticos e mesas sujas", "Cocktails ótimos e bom ambiente", "Peixe fresco no ponto",
+        "Doses pequenas, conta grande", "Espaço acolhedor", "Excelente refeição como sempre",
+        "Barato e simpático", "Experiência dececionante", "Comida excelente, serviço demorado",
+        "Visita obrigatória",
+        "o a os as de do da e é foi com para que não mas muito uma em",
+    ],
+    "nl": [
+        "Het eten was heerlijk en het personeel erg vriendelijk.",
+        "We hebben bijna een uur op een tafel gewacht, erg teleurstellend.",
+        "Een leuke plek om met vrienden te lunchen, we komen zeker terug.",
+        "De ober was onbeleefd en de soep was koud.",
+        "Gezellige sfeer, redelijke prijzen en een goede wijnkaart.",
+        "Ik ben hier al een paar keer geweest en het valt nooit tegen.",
+        "Het is het geld niet waard, de porties zijn klein en de bediening traag.",
+        "Beste burger van de stad", "Gezellig diner met uitzicht", "Te duur en overschat",
+        "Vriendelijk personeel, lekker eten", "Slechtste service ooit", "Verborgen parel bij het station",
+        "Goede prijs-kwaliteitverhouding", "Niet aan te raden", "Perfect voor het ontbijt",
+        "Echt een leuke avond", "Vreselijke ervaring, nooit meer", "Snelle en lekkere lunch",
+        "Zeker een aanrader", "Heerlijk eten en goede wijn", "Niets bijzonders maar prima",
+        "We vonden het geweldig", "Onvriendelijke obers en vieze tafels",
+        "Geweldige cocktails en leuke sfeer", "Verse vis perfect bereid", "Kleine porties, hoge rekening",
+        "Knus klein restaurant", "Uitstekende maaltijd zoals altijd", "Goedkoop en gezellig",
+        "Teleurstellende ervaring", "Top eten, trage bediening", "Moet je bezoeken",
+        "de het een en van is was met voor dat niet maar ook zeer wij ik",
+    ],
+}
+
+
+def letters_only(text: str) -> str:
+    """Minuscules, chiffres et ponctuation remplacés par des espaces (dates des titres...)"""
+    return _NON_LETTERS.sub(" ", text.lower())
+
+
+class LanguageIdentifier:
+    """
+    Identifiant de langue par trigrammes de caractères et Bayes naïf multinomial
+    """
+
+    def __init__(self, alpha: float = 1.0, min_margin: float = MIN_MARGIN,
+                 min_margin_per_trigram: float = MIN_MARGIN_PER_TRIGRAM,
+                 min_trigrams: int = MIN_TRIGRAMS, default: str = DEFAULT_LANGUAGE):
+        """
+        Args:
+            alpha: Lissage de Laplace du Bayes naïf
+            min_margin: Marge de log-vraisemblance exigée pour préférer une autre langue à default
+            min_margin_per_trigram: Même marge rapportée au nombre de trigrammes du texte
+            min_trigrams: Nombre minimal de trigrammes de lettres pour quitter default
+            default: Langue retenue par défaut (textes courts, ambigus ou sans lettres)
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+
+        # char_wb: n-grammes limités aux mots (bordés d'espaces), sans normalisation
+        self.vectorizer = HashingVectorizer(analyzer="char_wb", ngram_range=(3, 3), preprocessor=letters_only,
+                                            n_features=HASHING_FEATURES, alternate_sign=False, norm=None)
+        self.classifier = MultinomialNB(alpha=alpha)
+        self.min_margin = min_margin
+        self.min_margin_per_trigram = min_margin_per_trigram
+        self.min_trigrams = min_trigrams
+        self.default = default
+        self.languages: Tuple[str, ...] = ()
+
+    def fit(self, texts: Sequence[str], languages: Sequence[str]) -> "LanguageIdentifier":
+        """Entraîne l'identifiant sur des textes étiquetés par code de langue"""
+        self.classifier.fit(self.vectorizer.transform(texts), list(languages))
+        self.languages = tuple(str(language) for language in self.classifier.classes_)
+        return self
+
+    def predict(self, texts: Sequence[str]) -> List[str]:
+        """
+        Langue de chaque texte (un seul passage pour tout le lot)
+
+        Args:
+            texts: Textes à classer
+
+        Returns:
+            Liste de codes de langue (dans l'ordre de texts)
+        """
+        import numpy as np
+
+        if len(texts) == 0:
+            return []
+        counts = self.vectorizer.transform(texts)
+        log_probs = self.classifier.predict_log_proba(counts)
+        best = log_probs.argmax(axis=1)
+        if self.default in self.languages:
+            default_idx = self.languages.index(self.default)
+            # norm=None, alternate_sign=False: la somme d'une ligne est son nombre de trigrammes
+            n_trigrams = np.asarray(counts.sum(axis=1)).ravel()
+            margin = log_probs[np.arange(len(best)), best] - log_probs[:, default_idx]
+            best[(n_trigrams < self.min_trigrams) | (margin < self.min_margin) |
+                 (margin < self.min_margin_per_trigram * n_trigrams)] = default_idx
+        return [self.languages[idx] if any(c.isalpha() for c in text) else self.default
+                for text, idx in zip(texts, best.tolist())]
+
+
+@lru_cache(maxsize=1)
+def default_identifier() -> LanguageIdentifier:
+    """Identifiant entraîné sur SEED_CORPUS (une fois par processus, quelques ms)"""
+    texts = [text for sentences in SEED_CORPUS.values() for text in sentences]
+    languages = [language for language, sentences in SEED_CORPUS.items() for _ in sentences]
+    return LanguageIdentifier().fit(texts, languages)
+
+
+def group_by_language(languages: Sequence[str]) -> Dict[str, List[int]]:
+    """Indices des textes de chaque langue (dans l'ordre d'apparition)"""
+    groups: Dict[str, List[int]] = {}
+    for idx, language in enumerate(languages):
+        groups.setdefault(language, []).append(idx)
+    return groups
+
+
+class MultilingualEmotionDetector:
+    """
+    Détecteur d'émotions qui route chaque avis vers le détecteur de sa langue
+    """
+
+    def __init__(self, use_model: bool = True, models: Optional[Dict[str, str]] = None,
+                 identifier: Optional[LanguageIdentifier] = None):
+        """
+        Args:
+            use_model: Charger le modèle des langues de models (sinon mots-clés seulement)
+            models: Modèle d'émotions par langue (défaut: LANGUAGE_MODELS)
+            identifier: Identifiant de langue (défaut: default_identifier())
+        """
+        self.use_model = use_model
+        self.models = LANGUAGE_MODELS if models is None else models
+        self.identifier = identifier or default_identifier()
+        # Détecteurs créés au premier avis de chaque langue; un modèle partagé entre langues
+        self._detectors: Dict[str, object] = {}
+        self._by_model: Dict[str, object] = {}
+
+    def detector_for(self, language: str):
+        """Détecteur de la langue (modèle si configuré et chargeable, sinon mots-clés)"""
+        if language in self._detectors:
+            return self._detectors[language]
+        from emotion_detection import EmotionDetector, SimpleEmotionDetector
+        from emotion_lexicon import lexicon_languages
+
+        detector = None
+        model_name = self.models.get(language) if self.use_model else None
+        if model_name:
+            detector = self._by_model.get(model_name)
+            if detector is None:
+                try:
+                    detector = self._by_model[model_name] = EmotionDetector(model_name)
+                except Exception as e:
+                    print(f"[ATTENTION] Modele {model_name} indisponible ({language}): {e}")
+        if detector is None:
+            # Langue sans lexique: tous les mots-clés
+            detector = SimpleEmotionDetector(language if language in lexicon_languages() else None)
+        self._detectors[language] = detector
+        return detector
+
+    def detect_languages(self, texts: Sequence[str]) -> List[str]:
+        """Langue de chaque texte"""
+        return self.identifier.predict(list(texts))
+
+    def _route(self, method: str, texts: Sequence[str], *args) -> list:
+        """Appelle method une fois par langue sur le groupe de ses textes, résultats dans l'ordre"""
+        texts = list(texts)
+        results = [None] * len(texts)
+        for language, indices in group_by_language(self.detect_languages(texts)).items():
+            outputs = getattr(self.detector_for(language), method)([texts[i] for i in indices], *args)
+            for idx, output in zip(indices, outputs):
+                results[idx] = output
+        return results
+
+    def predict_emotions(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                         aggregation: Optional[str] = None) -> List[Dict[str, float]]:
+        """Scores d'émotions de chaque texte, un appel par langue présente dans le lot"""
+        return self._route("predict_emotions", texts, batch_size, aggregation)
+
+    def get_main_emotions(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                          aggregation: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Émotion principale et confiance de chaque texte"""
+        return self._route("get_main_emotions", texts, batch_size, aggregation)
+
+    def predict_emotion(self, text: str) -> Dict[str, float]:
+        """Scores d'émotions d'un texte"""
+        return self.predict_emotions([text])[0]
+
+    def get_main_emotion(self, text: str) -> Tuple[str, float]:
+        """Émotion principale et confiance d'un texte"""
+        return self.get_main_emotions([text])[0]
+
+
+def main(argv=None) -> int:
+    texts = sys.argv[1:] if argv is None else argv
+    detector = MultilingualEmotionDetector(use_model=False)
+    for text, language, (emotion, conf) in zip(texts, detector.detect_languages(texts),
+                                               detector.get_main_emotions(texts)):
+        print(f"[{language}] {emotion} ({conf * 100:.1f}%) - {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure de la latence des étapes d'analyse (tokenisation, forward, émotions, graphiques)
+
+Les durées sont enregistrées en mémoire dans le processus: un histogramme cumulé
+par étape (buckets fixes) et une fenêtre des dernières mesures pour les
+percentiles p50/p95. Le tracker est partagé par toutes les sessions Streamlit
+du processus (voir get_tracker).
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Bornes supérieures des buckets de l'histogramme (en millisecondes)
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+
+class LatencyTracker:
+    """
+    Enregistre la durée des étapes, les accès aux caches et les temps de chargement
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Nombre de mesures récentes conservées par étape (pour les percentiles)
+        """
+        self._lock = threading.Lock()
+        self._window = window
+        self._recent = defaultdict(lambda: deque(maxlen=self._window))
+        self._histograms = defaultdict(lambda: np.zeros(len(HISTOGRAM_BUCKETS_MS), dtype=np.int64))
+        self._counts = defaultdict(int)
+        self._totals = defaultdict(float)
+        self._cache_lookups = defaultdict(int)
+        self._cache_misses = defaultdict(int)
+        self._load_times = {}
+
+    def record(self, stage: str, seconds: float):
+        """Enregistre une durée (en secondes) pour une étape"""
+        ms = seconds * 1000.0
+        bucket = int(np.searchsorted(HISTOGRAM_BUCKETS_MS, ms))
+        with self._lock:
+            self._recent[stage].append(ms)
+            self._histograms[stage][bucket] += 1
+            self._counts[stage] += 1
+            self._totals[stage] += ms
+
+    @contextmanager
+    def stage(self, name: str):
+        """Context manager qui mesure la durée du bloc"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: Optional[str] = None):
+        """Décorateur qui mesure la durée de chaque appel de la fonction"""
+        def decorator(func):
+            stage_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def cache_lookup(self, name: str):
+        """À appeler à chaque appel d'une fonction en cache (st.cache_resource...)"""
+        with self._lock:
+            self._cache_lookups[name] += 1
+
+    def cache_miss(self, name: str):
+        """À appeler dans le corps de la fonction en cache (exécuté seulement si absent du cache)"""
+        with self._lock:
+            self._cache_misses[name] += 1
+
+    def record_load(self, name: str, seconds: float):
+        """Enregistre le temps de chargement d'un modèle"""
+        with self._lock:
+            self._load_times[name] = seconds
+
+    def percentile(self, stage: str, q: float) -> float:
+        """Percentile q (0-100) des mesures récentes d'une étape, en millisecondes"""
+        with self._lock:
+            samples = list(self._recent.get(stage, ()))
+        return float(np.percentile(samples, q)) if samples else 0.0
+
+    def histogram(self, stage: str) -> Dict[str, int]:
+        """Histogramme cumulé d'une étape: borne supérieure (ms) -> nombre de mesures"""
+        with self._lock:
+            counts = self._histograms[stage].copy() if stage in self._histograms else None
+        if counts is None:
+            return {}
+        return {("+inf" if np.isinf(b) else f"{b:g}"): int(c) for b, c in zip(HISTOGRAM_BUCKETS_MS, counts)}
+
+    def cache_hit_rate(self, name: str) -> Optional[float]:
+        """Taux de succès du cache (None si aucun appel)"""
+        with self._lock:
+            lookups = self._cache_lookups.get(name, 0)
+            misses = self._cache_misses.get(name, 0)
+        if lookups == 0:
+            return None
+        return max(lookups - misses, 0) / lookups
+
+    def summary(self) -> List[Dict[str, float]]:
+        """Résumé par étape: nombre d'appels, p50, p95, moyenne et max (ms)"""
+        with self._lock:
+            stages = {name: list(samples) for name, samples in self._recent.items()}
+            counts = dict(self._counts)
+            totals = dict(self._totals)
+        rows = []
+        for name, samples in sorted(stages.items()):
+            if not samples:
+                continue
+            rows.append({
+                "Etape": name,
+                "Appels": counts[name],
+                "p50 (ms)": round(float(np.percentile(samples, 50)), 2),
+                "p95 (ms)": round(float(np.percentile(samples, 95)), 2),
+                "Moyenne (ms)": round(totals[name] / counts[name], 2),
+                "Max (ms)": round(max(samples), 2)
+            })
+        return rows
+
+    def cache_summary(self) -> Dict[str, Optional[float]]:
+        """Taux de succès de chaque cache suivi"""
+        with self._lock:
+            names = list(self._cache_lookups)
+        return {name: self.cache_hit_rate(name) for name in names}
+
+    def load_times(self) -> Dict[str, float]:
+        """Temps de chargement des modèles (secondes)"""
+        with self._lock:
+            return dict(self._load_times)
+
+    def reset(self):
+        """Efface toutes les mesures"""
+        with self._lock:
+            self._recent.clear()
+            self._histograms.clear()
+            self._counts.clear()
+            self._totals.clear()
+            self._cache_lookups.clear()
+            self._cache_misses.clear()
+            self._load_times.clear()
+
+
+_tracker = LatencyTracker()
+
+
+def get_tracker() -> LatencyTracker:
+    """Tracker partagé par tout le processus (toutes les sessions Streamlit)"""
+    return _tracker
+
+
+def render_latency_panel(container, tracker: Optional[LatencyTracker] = None):
+    """
+    Affiche le panneau de performances (p50/p95 par étape, caches, chargements, mémoire)
+
+    Args:
+        container: Conteneur Streamlit (st.sidebar, st, une colonne...)
+        tracker: Tracker à afficher (défaut: tracker du processus)
+    """
+    tracker = tracker or get_tracker()
+    panel = container.expander("⏱️ Performances")
+    rows = tracker.summary()
+    if rows:
+        panel.dataframe(
+            [{k: v for k, v in row.items() if k != "Max (ms)"} for row in rows],
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        panel.caption("Aucune mesure pour l'instant.")
+
+    for name, rate in tracker.cache_summary().items():
+        if rate is not None:
+            panel.caption(f"Cache `{name}`: {rate*100:.0f}% de succes")
+    for name, seconds in tracker.load_times().items():
+        panel.caption(f"Chargement `{name}`: {seconds:.2f} s")
+
+    from model_store import memory_report
+
+    memory = memory_report()
+    if memory:
+        panel.caption(
+            f"Mémoire du processus: {memory['rss']:.0f} Mo RSS "
+            f"({memory['private']:.0f} Mo privée, {memory['shared']:.0f} Mo partagée)"
+        )
+
+    if panel.button("Reinitialiser les mesures", key="reset_latency_metrics"):
+        tracker.reset()
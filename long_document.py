@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Mode « documents longs »: fenêtres glissantes de tokens et agrégation des logits
+
+Au lieu de tronquer un avis à max_length tokens (la fin, souvent la plainte,
+est perdue), chaque avis est découpé en fenêtres de max_length tokens qui se
+chevauchent de stride tokens (tokenizer rapide, return_overflowing_tokens).
+Les fenêtres de tous les avis sont triées par longueur et regroupées dans des
+lots communs (un forward par lot, pas par avis), puis les logits des fenêtres
+d'un même avis sont agrégés:
+
+- mean: moyenne des logits des fenêtres
+- max: maximum par classe des logits des fenêtres
+- confidence: moyenne des probabilités pondérée par la confiance de chaque
+  fenêtre (probabilité maximale): les fenêtres sans opinion pèsent peu
+- attention: pooling d'attention sur les fenêtres d'un avis, sans paramètre
+  appris: le score d'une fenêtre est sa certitude (entropie négative de ses
+  probabilités), les poids sont le softmax de ces scores sur les fenêtres de
+  l'avis (température ATTENTION_TEMPERATURE) et les logits sont moyennés avec
+  ces poids. Une attention entraînée (requête apprise sur les états cachés des
+  fenêtres) demanderait une tête supplémentaire et un fine-tuning: ce mode en
+  est l'approximation sans entraînement.
+"""
+
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+AGGREGATIONS = ("mean", "max", "confidence", "attention")
+DEFAULT_STRIDE = 32
+# Température du softmax des scores d'attention (entropie entre 0 et ln(n_classes))
+ATTENTION_TEMPERATURE = 0.25
+
+
+def split_windows(texts: Sequence[str], tokenizer, max_length: int = 128,
+                  stride: int = DEFAULT_STRIDE) -> Tuple[List[List[int]], np.ndarray]:
+    """
+    Découpe les textes en fenêtres de tokens qui se chevauchent
+
+    Args:
+        texts: Textes à découper
+        tokenizer: Tokenizer HuggingFace rapide
+        max_length: Longueur d'une fenêtre (tokens spéciaux compris)
+        stride: Nombre de tokens communs à deux fenêtres consécutives
+
+    Returns:
+        Tuple (input_ids de chaque fenêtre, indice du texte de chaque fenêtre)
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError("Le mode documents longs necessite un tokenizer rapide (return_overflowing_tokens)")
+    if len(texts) == 0:
+        return [], np.empty(0, dtype=np.int64)
+    encoded = tokenizer(
+        list(texts),
+        truncation=True,
+        max_length=max_length,
+        stride=stride,
+        return_overflowing_tokens=True,
+        padding=False
+    )
+    return encoded["input_ids"], np.asarray(encoded["overflow_to_sample_mapping"], dtype=np.int64)
+
+
+def pack_windows(windows: Sequence[List[int]], tokenizer, batch_size: int = 32) -> Tuple[List[np.ndarray], List[dict]]:
+    """
+    Regroupe les fenêtres (de tous les textes) en lots triés par longueur, avec padding par lot
+
+    Returns:
+        Tuple (lots d'indices de fenêtres, encodages PyTorch des lots)
+    """
+    lengths = np.fromiter((len(w) for w in windows), dtype=np.int64, count=len(windows))
+    order = np.argsort(lengths, kind="stable")
+    batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+    encodings = [
+        tokenizer.pad(
+            {"input_ids": [windows[i] for i in batch_idx],
+             "attention_mask": [[1] * len(windows[i]) for i in batch_idx]},
+            return_tensors="pt"
+        )
+        for batch_idx in batches
+    ]
+    return batches, encodings
+
+
+def aggregate_logits(logits: np.ndarray, owners: np.ndarray, n_texts: int,
+                     method: str = "mean") -> np.ndarray:
+    """
+    Agrège les logits des fenêtres par texte
+
+    Args:
+        logits: Logits des fenêtres [n_fenêtres, n_classes]
+        owners: Indice du texte de chaque fenêtre
+        n_texts: Nombre de textes
+        method: "mean", "max", "confidence" ou "attention"
+
+    Returns:
+        Probabilités par texte [n_texts, n_classes]
+    """
+    if method not in AGGREGATIONS:
+        raise ValueError(f"Agregation inconnue: {method} (choix: {', '.join(AGGREGATIONS)})")
+    n_classes = logits.shape[1] if logits.ndim == 2 else 0
+    counts = np.bincount(owners, minlength=n_texts).astype(np.float64)[:, None]
+
+    def softmax(x):
+        x = np.exp(x - x.max(axis=1, keepdims=True))
+        return x / x.sum(axis=1, keepdims=True)
+
+    if method == "confidence":
+        probs = softmax(logits)
+        weights = probs.max(axis=1, keepdims=True)
+        summed = np.zeros((n_texts, n_classes))
+        np.add.at(summed, owners, probs * weights)
+        total = np.zeros((n_texts, 1))
+        np.add.at(total, owners, weights)
+        return (summed / np.maximum(total, 1e-12)).astype(np.float32)
+
+    if method == "attention":
+        probs = softmax(logits)
+        scores = (probs * np.log(np.maximum(probs, 1e-12))).sum(axis=1) / ATTENTION_TEMPERATURE
+        # Softmax des scores par avis (score maximal de l'avis retiré pour la stabilité)
+        best = np.full(n_texts, -np.inf)
+        np.maximum.at(best, owners, scores)
+        weights = np.exp(scores - best[owners])[:, None]
+        combined = np.zeros((n_texts, n_classes))
+        np.add.at(combined, owners, logits * weights)
+        total = np.zeros((n_texts, 1))
+        np.add.at(total, owners, weights)
+        return softmax(combined / np.maximum(total, 1e-12)).astype(np.float32)
+
+    if method == "max":
+        combined = np.full((n_texts, n_classes), -np.inf)
+        np.maximum.at(combined, owners, logits)
+    else:
+        combined = np.zeros((n_texts, n_classes))
+        np.add.at(combined, owners, logits)
+        combined /= np.maximum(counts, 1.0)
+    return softmax(combined).astype(np.float32)
+
+
+def predict_long(
+    texts: Sequence[str],
+    tokenizer,
+    model,
+    device,
+    max_length: int = 128,
+    stride: int = DEFAULT_STRIDE,
+    batch_size: int = 32,
+    aggregation: str = "mean"
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Probabilités par texte, sans troncature (fenêtres glissantes agrégées)
+
+    Returns:
+        Tuple (probabilités [n_texts, n_classes], temps et compteurs par étape comme
+        run_batched_inference, plus "windows" et "windowed_texts")
+    """
+    from batch_inference import run_batched_inference
+
+    start = time.perf_counter()
+    windows, owners = split_windows(texts, tokenizer, max_length, stride)
+    batches, encodings = pack_windows(windows, tokenizer, batch_size)
+    tokenize_time = time.perf_counter() - start
+
+    # Les encodages sont fournis: seule la longueur de la séquence des fenêtres est utilisée
+    logits, timings = run_batched_inference(
+        windows, tokenizer, model, device, batch_size=batch_size, max_length=max_length,
+        batches=batches, encodings=encodings
+    )
+    timings["tokenize"] = timings["tokenize_wait"] = tokenize_time
+    timings["windows"] = float(len(windows))
+    timings["windowed_texts"] = float(np.count_nonzero(np.bincount(owners, minlength=len(texts)) > 1))
+    return aggregate_logits(logits, owners, len(texts), aggregation), timings
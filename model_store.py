@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+"""
+Modèles pré-installés (pré-baking), chargement hors ligne et warm-up
+
+- prebake_model: télécharge un modèle HuggingFace une fois (build Docker) et le
+  sauvegarde dans MODELS_DIR (safetensors), avec des variantes optionnelles
+  quantifiée (int8 dynamique) et ONNX
+- load_sequence_classifier: charge un modèle depuis MODELS_DIR s'il y a été
+  pré-installé, sans aucun accès réseau (local_files_only); en mode hors ligne
+  (MODEL_OFFLINE=1 ou HF_HUB_OFFLINE=1), un modèle absent est une erreur
+  au lieu d'un téléchargement
+- mmap: sur CPU, les poids safetensors d'un modèle local sont mappés en mémoire
+  (copie à l'écriture) au lieu d'être copiés: les pages en lecture seule sont
+  partagées par le cache de pages de l'OS entre les répliques du même nœud
+  (memory_report / "python model_store.py memory" mesurent RSS privée vs partagée)
+- compile_mode (ou MODEL_COMPILE): modèle TorchScript / torch.compile compilé
+  par paliers de longueur au chargement (compiled_model)
+- threads: la configuration de thread_tuning (autotune) est appliquée au
+  premier chargement
+- warm_up: quelques lots factices de longueurs représentatives avant que
+  l'application ne se déclare prête (allocations, noyaux, caches du tokenizer)
+
+Utilisation:
+    python model_store.py prebake --model distilbert-base-uncased --num-labels 3 --quantize --onnx
+    python model_store.py warmup --model distilbert-base-uncased
+    python model_store.py memory --model distilbert-base-uncased --processes 3
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+DEFAULT_MODELS_DIR = "models"
+MANIFEST_NAME = "prebake.json"
+QUANTIZED_WEIGHTS = "model_quantized.pt"
+ONNX_FILE = "model.onnx"
+VARIANTS = ("default", "quantized")
+
+# dtypes safetensors -> noms d'attributs torch
+SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+# Longueurs (en tokens) et tailles de lot utilisées pour le warm-up
+WARMUP_LENGTHS = (16, 64, 128)
+WARMUP_BATCH_SIZES = (1, 8)
+
+
+def models_dir() -> str:
+    """Répertoire des modèles pré-installés (variable MODELS_DIR, défaut: ./models)"""
+    return os.environ.get("MODELS_DIR", DEFAULT_MODELS_DIR)
+
+
+def offline_mode() -> bool:
+    """Vrai si le réseau est interdit pour charger les modèles"""
+    return any(os.environ.get(var, "0") == "1"
+               for var in ("MODEL_OFFLINE", "HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE"))
+
+
+def local_model_dir(model_name: str, root: Optional[str] = None) -> str:
+    """Chemin local d'un modèle pré-installé (ex: models/j-hartmann--emotion-english-distilroberta-base)"""
+    return os.path.join(root or models_dir(), model_name.strip("/").replace("/", "--"))
+
+
+def resolve_model_source(model_name: str, root: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    Trouve d'où charger un modèle
+
+    Returns:
+        Tuple (chemin ou nom HuggingFace, True si la source est locale)
+    """
+    if os.path.isdir(model_name):
+        return model_name, True
+    local_dir = local_model_dir(model_name, root)
+    if os.path.isfile(os.path.join(local_dir, "config.json")):
+        return local_dir, True
+    return model_name, False
+
+
+def read_manifest(model_dir: str) -> Dict:
+    """Manifeste écrit par prebake_model (vide si absent)"""
+    path = os.path.join(model_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def model_version(model_name: str, root: Optional[str] = None) -> str:
+    """Version d'un modèle pour la traçabilité: nom, suivi de la date de pré-installation si local"""
+    source, is_local = resolve_model_source(model_name, root)
+    prebaked_at = read_manifest(source).get("prebaked_at") if is_local else None
+    return f"{model_name}@{prebaked_at}" if prebaked_at else model_name
+
+
+def _quantize(model):
+    """Quantification dynamique int8 des couches linéaires (CPU)"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _export_onnx(model, tokenizer, path: str):
+    """Export ONNX avec axes dynamiques (lot, séquence)"""
+    import torch
+
+    sample = tokenizer(["warm up"], return_tensors="pt")
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=17,
+        dynamo=False,
+    )
+
+
+def prebake_model(
+    model_name: str,
+    root: Optional[str] = None,
+    num_labels: Optional[int] = None,
+    quantize: bool = False,
+    onnx: bool = False
+) -> str:
+    """
+    Matérialise un modèle dans le répertoire local (étape de build)
+
+    Args:
+        model_name: Nom HuggingFace (ou chemin local) du modèle
+        root: Répertoire des modèles (défaut: MODELS_DIR)
+        num_labels: Nombre de labels de la tête de classification (None = celui du modèle)
+        quantize: Sauvegarder aussi une variante quantifiée int8
+        onnx: Exporter aussi une variante ONNX
+
+    Returns:
+        Chemin du répertoire du modèle
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    target = local_model_dir(model_name, root)
+    os.makedirs(target, exist_ok=True)
+    kwargs = {"num_labels": num_labels} if num_labels else {}
+
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # Seed fixe: une tête de classification non entraînée est identique dans toutes les répliques
+    torch.manual_seed(0)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, **kwargs)
+    model.eval()
+    tokenizer.save_pretrained(target)
+    model.save_pretrained(target, safe_serialization=True)
+
+    variants = ["default"]
+    if quantize:
+        torch.save(_quantize(model).state_dict(), os.path.join(target, QUANTIZED_WEIGHTS))
+        variants.append("quantized")
+    if onnx:
+        try:
+            _export_onnx(model, tokenizer, os.path.join(target, ONNX_FILE))
+            variants.append("onnx")
+        except Exception as e:
+            print(f"[ATTENTION] Export ONNX impossible: {e}")
+
+    manifest = {
+        "model_name": model_name,
+        "num_labels": model.config.num_labels,
+        "variants": variants,
+        "prebaked_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(target, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"[OK] {model_name} -> {target} ({', '.join(variants)}) en {time.perf_counter() - start:.1f} s")
+    return target
+
+
+def mmap_use_default() -> bool:
+    """Chargement mappé en mémoire activé par défaut (MODEL_MMAP=0 pour le désactiver)"""
+    return os.environ.get("MODEL_MMAP", "1") == "1"
+
+
+def safetensors_files(model_dir: str):
+    """Fichiers safetensors d'un modèle local (un seul fichier ou plusieurs shards)"""
+    return sorted(
+        os.path.join(model_dir, name) for name in os.listdir(model_dir)
+        if name.endswith(".safetensors")
+    )
+
+
+def load_mmap_state_dict(paths):
+    """
+    Lit des fichiers safetensors sans copier les poids: chaque tenseur est une vue
+    sur un mmap en copie à l'écriture (ACCESS_COPY) du fichier
+
+    Args:
+        paths: Chemins des fichiers safetensors
+
+    Returns:
+        Tuple (state_dict, liste des mmaps à garder en vie)
+    """
+    import torch
+
+    state_dict = {}
+    maps = []
+    for path in paths:
+        with open(path, "rb") as f:
+            header_size = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_size))
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        maps.append(buffer)
+        data_start = 8 + header_size
+        for name, info in header.items():
+            if name == "__metadata__":
+                continue
+            dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+            begin, end = info["data_offsets"]
+            count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+            if count == 0:
+                tensor = torch.empty(info["shape"], dtype=dtype)
+            else:
+                tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin)
+            state_dict[name] = tensor.reshape(info["shape"])
+    return state_dict, maps
+
+
+def _load_mmap_model(source: str):
+    """
+    Construit le modèle depuis sa config et y branche les poids mappés (load_state_dict assign=True)
+
+    Les paramètres sont créés sur le device "meta" (init_empty_weights): aucun poids
+    n'est alloué ni initialisé aléatoirement avant d'être remplacé par sa vue mappée.
+    Les buffers (non persistants: position_ids...) sont eux matérialisés normalement.
+
+    Returns:
+        Le modèle, ou None si les poids ne couvrent pas tous les paramètres
+    """
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+
+    state_dict, maps = load_mmap_state_dict(safetensors_files(source))
+    config = AutoConfig.from_pretrained(source, local_files_only=True)
+    with init_empty_weights(include_buffers=False):
+        model = AutoModelForSequenceClassification.from_config(config)
+    missing, unexpected = model.load_state_dict(state_dict, strict=False, assign=True)
+    if hasattr(model, "tie_weights"):
+        model.tie_weights()
+
+    # Les clés manquantes ne sont acceptables que si elles pointent (poids liés) vers un poids mappé:
+    # un paramètre resté sur "meta" n'a pas de valeur
+    mapped = {t.data_ptr() for t in state_dict.values()}
+    parameters = dict(model.named_parameters(remove_duplicate=False))
+    untied = [k for k, p in parameters.items()
+              if p.is_meta or (k in missing and p.data_ptr() not in mapped)]
+    if unexpected or untied:
+        print(f"[ATTENTION] Chargement mmap impossible ({len(untied)} manquants, "
+              f"{len(unexpected)} inattendus), chargement classique")
+        return None
+    model._weights_mmaps = maps
+    return model
+
+
+def load_sequence_classifier(
+    model_name: str,
+    num_labels: Optional[int] = None,
+    variant: str = "default",
+    offline: Optional[bool] = None,
+    device=None,
+    root: Optional[str] = None,
+    use_mmap: Optional[bool] = None,
+    compile_mode: Optional[str] = None
+):
+    """
+    Charge un tokenizer et un modèle de classification, depuis MODELS_DIR si possible
+
+    Args:
+        model_name: Nom HuggingFace ou chemin local
+        num_labels: Nombre de labels (ignoré si le modèle local le fixe déjà)
+        variant: "default" ou "quantized" (CPU)
+        offline: Interdire le réseau (défaut: variables MODEL_OFFLINE/HF_HUB_OFFLINE)
+        device: Device PyTorch (défaut: cuda si disponible)
+        root: Répertoire des modèles (défaut: MODELS_DIR)
+        use_mmap: Mapper les poids safetensors en mémoire sur CPU (défaut: MODEL_MMAP, activé)
+        compile_mode: "trace" ou "compile" pour un modèle compilé par paliers de longueur
+            (voir compiled_model; défaut: MODEL_COMPILE, désactivé)
+
+    Returns:
+        Tuple (tokenizer, model, device)
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    from compiled_model import compile_classifier, compile_mode_default
+    from thread_tuning import apply_thread_config
+
+    if variant not in VARIANTS:
+        raise ValueError(f"Variante inconnue: {variant} (attendu: {VARIANTS})")
+    # Threads retenus par "python thread_tuning.py autotune" (une fois par processus)
+    apply_thread_config()
+    offline = offline_mode() if offline is None else offline
+    source, is_local = resolve_model_source(model_name, root)
+    if offline and not is_local:
+        raise FileNotFoundError(
+            f"Modele '{model_name}' absent de {root or models_dir()} et reseau interdit. "
+            f"Lancez: python model_store.py prebake --model {model_name}"
+        )
+
+    local_kwargs = {"local_files_only": True} if is_local else {}
+    # Un modèle pré-installé a déjà sa tête de classification (num_labels figé au build)
+    model_kwargs = dict(local_kwargs)
+    if num_labels and not (is_local and read_manifest(source)):
+        model_kwargs["num_labels"] = num_labels
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    use_mmap = mmap_use_default() if use_mmap is None else use_mmap
+    tokenizer = AutoTokenizer.from_pretrained(source, **local_kwargs)
+
+    model = None
+    # Les poids mappés ne servent que sur CPU (sur GPU ils sont copiés de toute façon)
+    if (use_mmap and is_local and variant == "default" and torch.device(device).type == "cpu"
+            and "num_labels" not in model_kwargs and safetensors_files(source)):
+        model = _load_mmap_model(source)
+    if model is None:
+        model = AutoModelForSequenceClassification.from_pretrained(source, **model_kwargs)
+    model.eval()
+
+    if variant == "quantized":
+        weights = os.path.join(source, QUANTIZED_WEIGHTS)
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"Variante quantifiee absente: {weights} (prebake --quantize)")
+        model = _quantize(model)
+        model.load_state_dict(torch.load(weights, map_location="cpu"))
+        device = torch.device("cpu")
+
+    model.to(device)
+    compile_mode = compile_mode_default() if compile_mode is None else compile_mode
+    if compile_mode:
+        model = compile_classifier(model, compile_mode)
+    return tokenizer, model, device
+
+
+def memory_report(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Mémoire d'un processus (Linux, /proc/<pid>/smaps_rollup), en Mo
+
+    Returns:
+        Dictionnaire rss, pss, private (pages propres au processus) et shared
+        (pages partagées avec d'autres processus, ex: poids mappés); vide hors Linux
+    """
+    path = f"/proc/{pid or 'self'}/smaps_rollup"
+    if not os.path.exists(path):
+        return {}
+    fields = {}
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024.0
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+    }
+
+
+def _memory_worker(model_name, root, use_mmap, ready, release, results):
+    """Processus de mesure: charge le modèle, fait un forward, publie sa mémoire"""
+    tokenizer, model, device = load_sequence_classifier(
+        model_name, offline=True, device="cpu", root=root, use_mmap=use_mmap)
+    warm_up(tokenizer, model, device, lengths=(16,), batch_sizes=(1,))
+    ready.wait()
+    results.put(memory_report())
+    release.wait()
+
+
+def compare_memory(model_name: str, processes: int = 3, root: Optional[str] = None):
+    """
+    Lance N processus qui chargent le même modèle, avec et sans mmap, et
+    affiche leur mémoire privée / partagée pendant qu'ils sont tous en vie
+    """
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'Mode':<8} {'RSS (Mo)':>10} {'PSS (Mo)':>10} {'Privee (Mo)':>12} {'Partagee (Mo)':>14}")
+    for use_mmap in (False, True):
+        ready, release = ctx.Barrier(processes + 1), ctx.Barrier(processes + 1)
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_memory_worker, args=(model_name, root, use_mmap, ready, release, results))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        ready.wait()
+        reports = [results.get() for _ in workers]
+        release.wait()
+        for worker in workers:
+            worker.join()
+
+        mode = "mmap" if use_mmap else "copie"
+        for report in reports:
+            print(f"{mode:<8} {report['rss']:>10.1f} {report['pss']:>10.1f} "
+                  f"{report['private']:>12.1f} {report['shared']:>14.1f}")
+        total_pss = sum(r["pss"] for r in reports)
+        print(f"{mode:<8} total PSS pour {processes} processus: {total_pss:.1f} Mo\n")
+
+
+def warm_up(
+    tokenizer,
+    model,
+    device,
+    lengths: Sequence[int] = WARMUP_LENGTHS,
+    batch_sizes: Sequence[int] = WARMUP_BATCH_SIZES,
+    max_length: int = 128
+) -> Dict[str, float]:
+    """
+    Exécute quelques lots factices pour que le premier vrai appel ne paie pas le démarrage à froid
+
+    Args:
+        tokenizer: Tokenizer HuggingFace
+        model: Modèle PyTorch (en mode eval)
+        device: Device PyTorch
+        lengths: Longueurs des textes factices (en tokens)
+        batch_sizes: Tailles de lot testées
+        max_length: Longueur maximale (troncature)
+
+    Returns:
+        Dictionnaire "lot x longueur" -> durée en secondes
+    """
+    import torch
+
+    timings = {}
+    with torch.inference_mode():
+        for length in lengths:
+            # ~1 token par mot avec les tokenizers WordPiece/BPE sur des mots courants
+            text = " ".join(["good"] * max(length - 2, 1))
+            for batch_size in batch_sizes:
+                start = time.perf_counter()
+                inputs = tokenizer(
+                    [text] * batch_size,
+                    return_tensors="pt",
+                    truncation=True,
+                    padding=True,
+                    max_length=max_length
+                )
+                model(**{k: v.to(device) for k, v in inputs.items()})
+                timings[f"{batch_size}x{length}"] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-installation et warm-up des modeles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prebake_parser = subparsers.add_parser("prebake", help="Telecharger et sauvegarder un modele en local")
+    prebake_parser.add_argument("--model", action="append", required=True, help="Nom du modele (repetable)")
+    prebake_parser.add_argument("--num-labels", type=int, help="Nombre de labels de la tete")
+    prebake_parser.add_argument("--quantize", action="store_true", help="Variante quantifiee int8")
+    prebake_parser.add_argument("--onnx", action="store_true", help="Variante ONNX")
+    prebake_parser.add_argument("--models-dir", help="Repertoire des modeles (defaut: MODELS_DIR)")
+
+    warmup_parser = subparsers.add_parser("warmup", help="Charger hors ligne et executer le warm-up")
+    warmup_parser.add_argument("--model", default="distilbert-base-uncased")
+    warmup_parser.add_argument("--variant", default="default", choices=VARIANTS)
+    warmup_parser.add_argument("--models-dir", help="Repertoire des modeles (defaut: MODELS_DIR)")
+
+    memory_parser = subparsers.add_parser("memory", help="Memoire privee/partagee de N processus (mmap vs copie)")
+    memory_parser.add_argument("--model", default="distilbert-base-uncased")
+    memory_parser.add_argument("--processes", type=int, default=3)
+    memory_parser.add_argument("--models-dir", help="Repertoire des modeles (defaut: MODELS_DIR)")
+
+    args = parser.parse_args()
+    if args.command == "memory":
+        compare_memory(args.model, args.processes, args.models_dir)
+    elif args.command == "prebake":
+        for name in args.model:
+            prebake_model(name, args.models_dir, num_labels=args.num_labels,
+                          quantize=args.quantize, onnx=args.onnx)
+    else:
+        start = time.perf_counter()
+        tokenizer, model, device = load_sequence_classifier(
+            args.model, variant=args.variant, offline=True, root=args.models_dir)
+        print(f"[OK] Modele charge hors ligne en {time.perf_counter() - start:.2f} s")
+        for shape, seconds in warm_up(tokenizer, model, device).items():
+            print(f"   {shape:<8} {seconds * 1000:8.1f} ms")
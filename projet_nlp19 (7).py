@@ -98,25 +98,22 @@ print("After drop_duplicates:", df.shape)
 texts = df["Review"].astype(str).tolist()
 labels = df["label"].astype(int).tolist()
 
-from sklearn.model_selection import train_test_split
+from split_dataset import build_grouped_split
 
 # texts & labels
 texts = df["Review"].astype(str).tolist()
 labels = df["label"].astype(int).tolist()
 
-train_texts, temp_texts, train_labels, temp_labels = train_test_split(
-    texts, labels,
-    test_size=0.2,
-    random_state=42,
-    stratify=labels
-)
+# Split 80/10/10 groupé par avis normalisé: un même avis (ex: même texte avec une
+# date différente) ne peut pas se retrouver à la fois dans train et dans test
+split = build_grouped_split(texts, labels, ratios=(0.8, 0.1, 0.1), seed=42)
 
-val_texts, test_texts, val_labels, test_labels = train_test_split(
-    temp_texts, temp_labels,
-    test_size=0.5,
-    random_state=42,
-    stratify=temp_labels
-)
+train_texts = [texts[i] for i in split["train"]]
+train_labels = [labels[i] for i in split["train"]]
+val_texts = [texts[i] for i in split["val"]]
+val_labels = [labels[i] for i in split["val"]]
+test_texts = [texts[i] for i in split["test"]]
+test_labels = [labels[i] for i in split["test"]]
 
 print("Train:", len(train_texts), "Val:", len(val_texts), "Test:", len(test_texts))
 
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Métriques d'inférence au format texte Prometheus
+
+Compteurs, jauges et histogrammes avec labels (modèle, backend, étape de la
+cascade), exposés sur /metrics par un petit serveur HTTP lancé dans un thread
+en arrière-plan. Aucune dépendance externe.
+
+Utilisation:
+    from prometheus_metrics import track_inference, start_metrics_server
+
+    start_metrics_server()          # port METRICS_PORT (défaut 9100)
+    with track_inference("distilbert-base-uncased", "torch-cpu", "sentiment"):
+        ...
+
+    curl http://localhost:9100/metrics
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+DEFAULT_PORT = 9100
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INFERENCE_LABELS = ("model", "backend", "stage")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Base commune: un nom, une aide, des noms de labels et une valeur par combinaison de labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels attendus {self.labelnames}, recus {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return "\n".join(lines)
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Compteur monotone (requêtes, erreurs, avis traités...)"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError("Un compteur ne peut pas diminuer")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return float(self._values.get(self._key(labels), 0.0))
+
+
+class Gauge(_Metric):
+    """Valeur instantanée (requêtes en cours, profondeur de file...)"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return float(self._values.get(self._key(labels), 0.0))
+
+
+class Histogram(_Metric):
+    """Histogramme cumulatif (buckets, somme et nombre d'observations)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_sample(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """Ensemble de métriques rendues ensemble sur /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+INFERENCE_REQUESTS = REGISTRY.register(Counter(
+    "review_inference_requests_total", "Nombre d'appels d'inference", INFERENCE_LABELS))
+INFERENCE_ITEMS = REGISTRY.register(Counter(
+    "review_inference_items_total", "Nombre d'avis traites (debit)", INFERENCE_LABELS))
+INFERENCE_ERRORS = REGISTRY.register(Counter(
+    "review_inference_errors_total", "Nombre d'appels d'inference en erreur", INFERENCE_LABELS))
+INFERENCE_IN_FLIGHT = REGISTRY.register(Gauge(
+    "review_inference_in_flight", "Appels d'inference en cours (profondeur de file)", INFERENCE_LABELS))
+INFERENCE_LATENCY = REGISTRY.register(Histogram(
+    "review_inference_latency_seconds", "Duree des appels d'inference", INFERENCE_LABELS))
+QUEUE_PENDING = REGISTRY.register(Gauge(
+    "review_analysis_queue_pending", "Avis en attente dans la file d'analyse (pas encore pris par le worker)"))
+QUEUE_PENDING.set(0)
+
+
+@contextmanager
+def track_inference(model: str, backend: str, stage: str, items: int = 1):
+    """
+    Mesure un appel d'inférence: requêtes, avis traités, erreurs, appels en cours et latence
+
+    Args:
+        model: Nom ou chemin du modèle
+        backend: Backend d'exécution (ex: torch-cpu, torch-cuda, keywords)
+        stage: Étape de la cascade (ex: emotion, sentiment)
+        items: Nombre d'avis traités par l'appel
+    """
+    labels = {"model": model, "backend": backend, "stage": stage}
+    INFERENCE_REQUESTS.inc(**labels)
+    INFERENCE_IN_FLIGHT.inc(**labels)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        INFERENCE_ERRORS.inc(**labels)
+        raise
+    else:
+        INFERENCE_ITEMS.inc(items, **labels)
+    finally:
+        INFERENCE_LATENCY.observe(time.perf_counter() - start, **labels)
+        INFERENCE_IN_FLIGHT.dec(**labels)
+
+
+def _make_handler(registry: Registry):
+    """Handler HTTP servant le registre sur /metrics (http.server importé à la demande)"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, addr: str = "0.0.0.0"):
+    """
+    Lance le serveur /metrics dans un thread daemon (une seule fois par processus)
+
+    Args:
+        port: Port d'écoute (défaut: variable METRICS_PORT ou 9100; 0 = port libre)
+        addr: Adresse d'écoute
+
+    Returns:
+        Le serveur HTTP, ou None si le port est déjà utilisé (autre réplique sur le nœud)
+    """
+    from http.server import ThreadingHTTPServer
+
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        if port is None:
+            port = int(os.environ.get("METRICS_PORT", DEFAULT_PORT))
+        try:
+            server = ThreadingHTTPServer((addr, port), _make_handler(REGISTRY))
+        except OSError as e:
+            print(f"[ATTENTION] Serveur de metriques non demarre (port {port}): {e}")
+            return None
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+        thread.start()
+        _server = server
+        return server
+
+
+def stop_metrics_server():
+    """Arrête le serveur /metrics (utile pour les tests)"""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+if __name__ == "__main__":
+    server = start_metrics_server()
+    if server is not None:
+        host, port = server.server_address[:2]
+        print(f"Metriques disponibles sur http://localhost:{port}/metrics (Ctrl+C pour arreter)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            stop_metrics_server()
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Élagage structuré du modèle de sentiment: couches supérieures et têtes d'attention
+
+Pour chaque niveau d'élagage (couches retirées, part des têtes retirées):
+
+1. Importance des couches sur le split de validation: hausse de la perte quand
+   la couche est sautée; les couches les moins utiles sont retirées du modèle
+   (config.n_layers réduit: gain réel de latence)
+2. Importance des têtes (Michel et al., 2019): un masque multiplie la sortie de
+   chaque tête avant out_lin (hook), l'importance est la somme des |gradients|
+   de la perte par rapport au masque sur la validation, normalisée par couche
+3. Les têtes les moins importantes sont retirées physiquement (model.prune_heads:
+   q/k/v et out_lin rétrécis, config.pruned_heads réappliqué par from_pretrained);
+   si le modèle ne le permet pas, leurs lignes de q/k/v et leurs colonnes de
+   out_lin sont seulement mises à zéro
+4. Court fine-tuning de récupération sur le split train (les têtes mises à zéro
+   y restent après chaque pas), puis sauvegarde (save_pretrained +
+   prebake.json) et réévaluation avec evaluate_model.evaluate_sentiment_model
+
+Le rapport donne, par niveau, les paramètres (total et non nuls), la latence
+par avis, le débit et l'accuracy de test.
+
+Utilisation:
+    python prune_model.py --model model --levels 0:0.25,1:0.25,2:0.5
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_LEVELS = "0:0.25,1:0.25,2:0.5"
+PRUNED_PREFIX = "sentiment-pruned"
+
+
+def parse_levels(spec: str) -> List[Tuple[int, float]]:
+    """"1:0.25,2:0.5" -> [(couches retirées, part des têtes retirées), ...]"""
+    levels = []
+    for item in spec.split(","):
+        layers, heads = item.split(":")
+        levels.append((int(layers), float(heads)))
+    return levels
+
+
+def _batches(texts: Sequence[str], labels: np.ndarray, tokenizer, device, batch_size: int, max_length: int):
+    """Lots tokenisés (textes triés par longueur) avec leurs labels"""
+    import torch
+    from batch_inference import length_sorted_batches
+
+    for idx in length_sorted_batches(texts, batch_size):
+        inputs = tokenizer([texts[i] for i in idx], return_tensors="pt", truncation=True,
+                           padding=True, max_length=max_length)
+        yield {k: v.to(device) for k, v in inputs.items()}, torch.as_tensor(labels[idx], device=device)
+
+
+def validation_loss(model, batches) -> float:
+    """Perte moyenne (CE) sur des lots déjà tokenisés"""
+    import torch
+
+    model.eval()
+    total, count = 0.0, 0
+    with torch.inference_mode():
+        for inputs, labels in batches:
+            total += model(**inputs, labels=labels).loss.item() * len(labels)
+            count += len(labels)
+    return total / max(count, 1)
+
+
+def layer_importance(model, batches) -> np.ndarray:
+    """Hausse de la perte de validation quand chaque couche est sautée"""
+    import torch
+
+    transformer = model.distilbert.transformer
+    layers = transformer.layer
+    base = validation_loss(model, batches)
+    scores = []
+    try:
+        for i in range(len(layers)):
+            transformer.layer = torch.nn.ModuleList([layer for j, layer in enumerate(layers) if j != i])
+            scores.append(validation_loss(model, batches) - base)
+    finally:
+        transformer.layer = layers
+    return np.array(scores)
+
+
+def drop_layers(model, keep: Sequence[int]):
+    """Garde les couches keep (dans l'ordre) et met à jour la configuration"""
+    import torch
+
+    transformer = model.distilbert.transformer
+    transformer.layer = torch.nn.ModuleList([transformer.layer[i] for i in sorted(keep)])
+    transformer.n_layers = model.config.n_layers = len(transformer.layer)
+
+
+class HeadMask:
+    """
+    Masque des têtes d'attention appliqué à l'entrée de out_lin de chaque couche (hooks)
+    """
+
+    def __init__(self, model, requires_grad: bool = False):
+        import torch
+
+        self.layers = model.distilbert.transformer.layer
+        self.n_heads = model.config.n_heads
+        self.head_dim = model.config.dim // self.n_heads
+        device = next(model.parameters()).device
+        self.mask = torch.ones(len(self.layers), self.n_heads, device=device, requires_grad=requires_grad)
+        self._handles = []
+
+    def __enter__(self):
+        for i, layer in enumerate(self.layers):
+            self._handles.append(layer.attention.out_lin.register_forward_pre_hook(self._hook(i)))
+        return self
+
+    def __exit__(self, *exc):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+    def _hook(self, i):
+        def hook(module, args):
+            context = args[0]
+            shape = context.shape
+            masked = context.view(*shape[:-1], self.n_heads, self.head_dim) * self.mask[i][:, None]
+            return (masked.view(shape),) + tuple(args[1:])
+        return hook
+
+
+def head_importance(model, batches) -> np.ndarray:
+    """Importance [couches, têtes]: somme des |d perte / d masque|, normalisée (L2) par couche"""
+    model.eval()
+    importance = None
+    with HeadMask(model, requires_grad=True) as head_mask:
+        for inputs, labels in batches:
+            loss = model(**inputs, labels=labels).loss
+            loss.backward()
+            grad = head_mask.mask.grad.abs().detach()
+            importance = grad.clone() if importance is None else importance + grad
+            head_mask.mask.grad = None
+    model.zero_grad(set_to_none=True)
+    importance = importance.cpu().numpy()
+    return importance / np.maximum(np.linalg.norm(importance, axis=1, keepdims=True), 1e-12)
+
+
+def zero_heads(model, heads: Dict[int, List[int]]):
+    """Met à zéro les poids des têtes élaguées (lignes de q/k/v, colonnes de out_lin)"""
+    import torch
+
+    head_dim = model.config.dim // model.config.n_heads
+    with torch.no_grad():
+        for layer_id, head_ids in heads.items():
+            attention = model.distilbert.transformer.layer[layer_id].attention
+            for head in head_ids:
+                cols = slice(head * head_dim, (head + 1) * head_dim)
+                for lin in (attention.q_lin, attention.k_lin, attention.v_lin):
+                    lin.weight[cols] = 0.0
+                    lin.bias[cols] = 0.0
+                attention.out_lin.weight[:, cols] = 0.0
+
+
+def remove_heads(model, heads: Dict[int, List[int]]) -> bool:
+    """
+    Retire les têtes élaguées du modèle (prune_heads), ou les met à zéro à défaut
+
+    Returns:
+        True si les têtes ont été retirées physiquement
+    """
+    if heads and hasattr(model, "prune_heads"):
+        try:
+            model.prune_heads(heads)
+            return True
+        except NotImplementedError:
+            pass
+    zero_heads(model, heads)
+    return False
+
+
+def select_heads(importance: np.ndarray, fraction: float) -> Dict[int, List[int]]:
+    """Têtes les moins importantes (globalement), au moins une tête gardée par couche"""
+    n_layers, n_heads = importance.shape
+    to_prune = int(round(fraction * n_layers * n_heads))
+    pruned: Dict[int, List[int]] = {}
+    for flat in np.argsort(importance, axis=None):
+        if to_prune == 0:
+            break
+        layer, head = divmod(int(flat), n_heads)
+        if len(pruned.get(layer, [])) < n_heads - 1:
+            pruned.setdefault(layer, []).append(head)
+            to_prune -= 1
+    return {layer: sorted(heads) for layer, heads in sorted(pruned.items())}
+
+
+def count_nonzero_parameters(model) -> int:
+    return int(sum((p != 0).sum().item() for p in model.parameters()))
+
+
+def recovery_fine_tune(model, tokenizer, texts: Sequence[str], labels: np.ndarray, device,
+                       pruned_heads: Dict[int, List[int]], epochs: int = 1, batch_size: int = 16,
+                       lr: float = 2e-5, max_length: int = 64, seed: int = 42):
+    """Fine-tuning court (boucle de projet_nlp19); les têtes élaguées sont remises à zéro après chaque pas"""
+    import torch
+    from transformers import get_linear_schedule_with_warmup
+
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=0.01)
+    steps_per_epoch = (len(texts) + batch_size - 1) // batch_size
+    scheduler = get_linear_schedule_with_warmup(optimizer, int(0.1 * steps_per_epoch * epochs),
+                                                steps_per_epoch * epochs)
+    generator = torch.Generator().manual_seed(seed)
+    labels = torch.as_tensor(labels)
+    model.train()
+    for _ in range(epochs):
+        order = torch.randperm(len(texts), generator=generator)
+        for step in range(steps_per_epoch):
+            idx = order[step * batch_size:(step + 1) * batch_size]
+            inputs = tokenizer([texts[i] for i in idx.tolist()], return_tensors="pt", truncation=True,
+                               padding=True, max_length=max_length)
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+            optimizer.zero_grad()
+            loss = model(**inputs, labels=labels[idx].to(device)).loss
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            zero_heads(model, pruned_heads)
+    model.eval()
+
+
+def prune(
+    model_path: str = "model",
+    output_root: Optional[str] = None,
+    csv_path: str = "TA_restaurants_balanced.csv",
+    levels: Sequence[Tuple[int, float]] = parse_levels(DEFAULT_LEVELS),
+    recovery_epochs: int = 1,
+    batch_size: int = 16,
+    lr: float = 2e-5,
+    max_length: int = 64,
+    seed: int = 42
+) -> List[Dict]:
+    """
+    Élague le modèle à chaque niveau, le récupère, le sauvegarde et le réévalue
+
+    Args:
+        model_path: Modèle fine-tuné DistilBERT (chemin ou nom, voir load_sequence_classifier)
+        output_root: Dossier des modèles élagués (défaut: MODELS_DIR)
+        csv_path: Dataset étiqueté (split sauvegardé: val pour l'importance, train pour la récupération)
+        levels: Niveaux (couches retirées, part des têtes retirées)
+        recovery_epochs: Époques de récupération (0: aucune)
+
+    Returns:
+        Une ligne de rapport par niveau (niveau 0 = modèle d'origine)
+    """
+    import copy
+    import torch
+    from distill import single_latency_ms
+    from evaluate_model import evaluate_sentiment_model
+    from model_store import (MANIFEST_NAME, load_sequence_classifier, local_model_dir, models_dir,
+                             resolve_model_source)
+    from split_dataset import load_or_build_split
+
+    torch.manual_seed(seed)
+    # Modèle eager: il est modifié, ré-entraîné puis sauvegardé
+    tokenizer, base, device = load_sequence_classifier(model_path, num_labels=3, compile_mode="")
+    if base.config.model_type != "distilbert":
+        raise ValueError(f"Elagage prevu pour DistilBERT (modele: {base.config.model_type})")
+    df, split = load_or_build_split(csv_path, seed=seed)
+    texts = df["Review"].astype(str).tolist()
+    labels = df["label"].astype(int).to_numpy()
+    val_texts = [texts[i] for i in split["val"]]
+    val_batches = list(_batches(val_texts, labels[split["val"]], tokenizer, device, 32, max_length))
+    train_texts = [texts[i] for i in split["train"]]
+    test_texts = [texts[i] for i in split["test"]]
+
+    start = time.perf_counter()
+    layer_scores = layer_importance(base, val_batches)
+    print(f"[OK] Importance des couches ({time.perf_counter() - start:.1f} s): "
+          + ", ".join(f"{i}: {s:+.2e}" for i, s in enumerate(layer_scores)))
+
+    rows = []
+    for n_drop, head_fraction in [(0, 0.0)] + [tuple(level) for level in levels]:
+        name = f"{PRUNED_PREFIX}-l{n_drop}-h{int(round(head_fraction * 100))}"
+        model = copy.deepcopy(base)
+        keep = sorted(np.argsort(layer_scores)[n_drop:].tolist()) if n_drop else list(range(len(layer_scores)))
+        if n_drop:
+            if n_drop >= len(layer_scores):
+                print(f"[ATTENTION] Niveau ignore: {n_drop} couches a retirer sur {len(layer_scores)}")
+                continue
+            drop_layers(model, keep)
+        pruned_heads, removed = {}, False
+        if head_fraction > 0:
+            pruned_heads = select_heads(head_importance(model, val_batches), head_fraction)
+            removed = remove_heads(model, pruned_heads)
+        if n_drop or head_fraction > 0:
+            if recovery_epochs:
+                # Têtes retirées: plus rien à remettre à zéro pendant la récupération
+                recovery_fine_tune(model, tokenizer, train_texts, labels[split["train"]], device,
+                                   {} if removed else pruned_heads,
+                                   recovery_epochs, batch_size, lr, max_length, seed)
+            target = local_model_dir(name, output_root or models_dir())
+            model.save_pretrained(target, safe_serialization=True)
+            tokenizer.save_pretrained(target)
+        else:
+            target = resolve_model_source(model_path)[0]
+
+        print(f"\n--- {name}: couches gardees {keep}, "
+              f"{sum(len(h) for h in pruned_heads.values())} tetes elaguees ---")
+        accuracy, f1 = evaluate_sentiment_model(target, csv_path=csv_path, max_length=max_length)
+        row = {
+            "name": name,
+            "layers": len(keep),
+            "head_fraction": head_fraction,
+            "heads_removed": removed,
+            "parameters": int(sum(p.numel() for p in model.parameters())),
+            "nonzero_parameters": count_nonzero_parameters(model),
+            "latency_ms": single_latency_ms(test_texts, tokenizer, model, device, max_length),
+            "accuracy": float(accuracy),
+            "f1": float(f1),
+            "path": target,
+        }
+        rows.append(row)
+        if n_drop or head_fraction > 0:
+            manifest = {
+                "model_name": name,
+                "num_labels": model.config.num_labels,
+                "variants": ["default"],
+                "prebaked_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "pruned_from": model_path,
+                "kept_layers": keep,
+                "pruned_heads": {str(k): v for k, v in pruned_heads.items()},
+                "report": row,
+            }
+            with open(os.path.join(target, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+    return rows
+
+
+def print_report(rows: Sequence[Dict]):
+    """Paramètres, latence et accuracy par niveau d'élagage"""
+    print(f"\n{'Niveau':<28}{'Couches':>8}{'Tetes -':>8}{'Params':>9}{'Non nuls':>10}"
+          f"{'ms/avis':>9}{'Accuracy':>10}")
+    for row in rows:
+        print(f"{row['name']:<28}{row['layers']:>8}{row['head_fraction'] * 100:>7.0f}%"
+              f"{row['parameters'] / 1e6:>8.1f}M{row['nonzero_parameters'] / 1e6:>9.1f}M"
+              f"{row['latency_ms']:>9.2f}{row['accuracy'] * 100:>9.2f}%")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Elagage structure (couches et tetes) du modele de sentiment")
+    parser.add_argument("--model", default="model", help="Modele fine-tune DistilBERT")
+    parser.add_argument("--output", default=None, help="Dossier des modeles elagues (defaut: MODELS_DIR)")
+    parser.add_argument("--csv", default="TA_restaurants_balanced.csv", help="Dataset etiquete")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS,
+                        help="Niveaux 'couches:part_des_tetes' separes par des virgules")
+    parser.add_argument("--recovery-epochs", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--lr", type=float, default=2e-5)
+    parser.add_argument("--max-length", type=int, default=64)
+    args = parser.parse_args()
+
+    rows = prune(args.model, args.output, args.csv, parse_levels(args.levels), args.recovery_epochs,
+                 args.batch_size, args.lr, args.max_length)
+    print_report(rows)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Stockage persistant des avis analysés et de l'historique du chatbot (SQLite)
+
+Chaque analyse (texte, sentiment, scores d'émotions, modèle et sa version,
+durée) est enregistrée dans une base SQLite locale en mode WAL: les lectures
+(historique paginé, statistiques) ne bloquent pas les écritures des autres
+sessions. Les analyses de app.py sont mises en tampon et insérées par lots
+(executemany dans une seule transaction), au plus tard max_delay secondes
+après la première analyse du tampon (minuteur en arrière-plan); un échange du chatbot (message
+utilisateur + réponse + analyse) est écrit en une transaction. Les sessions
+ne gardent en mémoire que la page d'historique affichée.
+
+Utilisation:
+    python review_store.py stats --hours 24
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_DB_PATH = "reviews.db"
+DEFAULT_BATCH_SIZE = 32
+# Délai maximal (s) avant l'écriture d'analyses en tampon
+DEFAULT_MAX_DELAY = 5.0
+
+ANALYSIS_COLUMNS = (
+    "created_at", "source", "session_id", "text", "sentiment", "sentiment_conf",
+    "emotion", "emotion_conf", "emotion_scores", "model_name", "model_version", "latency_ms",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    session_id TEXT,
+    text TEXT NOT NULL,
+    sentiment TEXT,
+    sentiment_conf REAL,
+    emotion TEXT,
+    emotion_conf REAL,
+    emotion_scores TEXT,
+    model_name TEXT,
+    model_version TEXT,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_sentiment ON analyses (sentiment, created_at);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    analysis_id INTEGER REFERENCES analyses (id)
+);
+CREATE INDEX IF NOT EXISTS idx_chat_session ON chat_messages (session_id, id);
+"""
+
+
+def store_path() -> str:
+    """Chemin de la base (variable d'environnement REVIEW_STORE_PATH)"""
+    return os.environ.get("REVIEW_STORE_PATH", DEFAULT_DB_PATH)
+
+
+def _analysis_row(analysis: Dict) -> tuple:
+    """Ligne de la table analyses (scores d'émotions sérialisés en JSON)"""
+    values = dict(analysis)
+    values.setdefault("created_at", time.time())
+    values.setdefault("source", "app")
+    scores = values.get("emotion_scores")
+    if scores is not None and not isinstance(scores, str):
+        values["emotion_scores"] = json.dumps({k: float(v) for k, v in scores.items()}, ensure_ascii=False)
+    return tuple(values.get(column) for column in ANALYSIS_COLUMNS)
+
+
+class ReviewStore:
+    """
+    Base SQLite des analyses et des messages du chatbot, partagée par les threads du processus
+    """
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        """
+        Args:
+            path: Fichier SQLite (défaut: store_path())
+            batch_size: Nombre d'analyses en tampon déclenchant une écriture
+            max_delay: Âge maximal (s) du tampon avant écriture
+        """
+        self.path = path or store_path()
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Transactions explicites (BEGIN/COMMIT), connexion partagée sous verrou
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._pending_since: Optional[float] = None
+        self._flush_timer: Optional[threading.Timer] = None
+
+    # ---------- Écritures ----------
+
+    def _insert_pending(self):
+        """Insère le tampon (appelé sous verrou, dans une transaction)"""
+        if self._pending:
+            placeholders = ", ".join("?" * len(ANALYSIS_COLUMNS))
+            self._conn.executemany(
+                f"INSERT INTO analyses ({', '.join(ANALYSIS_COLUMNS)}) VALUES ({placeholders})",
+                self._pending
+            )
+        count = len(self._pending)
+        self._pending = []
+        self._pending_since = None
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        return count
+
+    def record_analysis(self, analysis: Dict):
+        """
+        Met une analyse en tampon; le tampon est écrit par lot quand il est plein ou trop ancien
+
+        Args:
+            analysis: Dictionnaire avec les clés de ANALYSIS_COLUMNS (created_at et source optionnels)
+        """
+        with self._lock:
+            self._pending.append(_analysis_row(analysis))
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+                if self.max_delay > 0:
+                    # Écrit le tampon même si aucune autre analyse n'arrive
+                    self._flush_timer = threading.Timer(self.max_delay, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+            due = (len(self._pending) >= self.batch_size
+                   or time.monotonic() - self._pending_since >= self.max_delay)
+        if due:
+            self.flush()
+
+    def add_analyses(self, analyses: Sequence[Dict]) -> int:
+        """Insère immédiatement un lot d'analyses (une transaction)"""
+        with self._lock:
+            self._pending.extend(_analysis_row(a) for a in analyses)
+        return self.flush()
+
+    def flush(self) -> int:
+        """Écrit les analyses en tampon; retourne le nombre de lignes insérées"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            self._conn.execute("BEGIN")
+            try:
+                count = self._insert_pending()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return count
+
+    def add_chat_exchange(self, session_id: str, user_text: str, response: str, analysis: Dict) -> int:
+        """
+        Enregistre un échange du chatbot (message, réponse et analyse) en une transaction
+
+        Returns:
+            Identifiant de l'analyse
+        """
+        now = time.time()
+        row = _analysis_row({**analysis, "created_at": now, "source": "chatbot",
+                             "session_id": session_id, "text": user_text})
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._insert_pending()
+                cursor = self._conn.execute(
+                    f"INSERT INTO analyses ({', '.join(ANALYSIS_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(ANALYSIS_COLUMNS))})", row
+                )
+                analysis_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO chat_messages (session_id, created_at, role, content, analysis_id) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(session_id, now, "user", user_text, None),
+                     (session_id, now, "bot", response, analysis_id)]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return analysis_id
+
+    def clear_chat(self, session_id: str):
+        """Efface l'historique d'une session (les analyses restent pour les statistiques)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+
+    # ---------- Lectures ----------
+
+    def count_messages(self, session_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def chat_page(self, session_id: str, page: int = 0, page_size: int = 20) -> List[Dict]:
+        """
+        Une page de l'historique (page 0 = messages les plus récents), dans l'ordre chronologique
+
+        Returns:
+            Messages {"id", "role", "content", "time", et pour le bot "sentiment", "emotion", ...}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT m.id, m.role, m.content, m.created_at, a.sentiment, a.sentiment_conf,
+                       a.emotion, a.emotion_conf
+                FROM chat_messages m LEFT JOIN analyses a ON a.id = m.analysis_id
+                WHERE m.session_id = ?
+                ORDER BY m.id DESC LIMIT ? OFFSET ?
+                """,
+                (session_id, page_size, page * page_size)
+            ).fetchall()
+        messages = []
+        for row in reversed(rows):
+            message = {
+                "id": row["id"],
+                "role": row["role"],
+                "content": row["content"],
+                "time": time.strftime("%H:%M:%S", time.localtime(row["created_at"])),
+            }
+            if row["role"] == "bot":
+                message.update(sentiment=row["sentiment"] or "N/A", sentiment_conf=row["sentiment_conf"] or 0.0,
+                               emotion=row["emotion"] or "N/A", emotion_conf=row["emotion_conf"] or 0.0)
+            messages.append(message)
+        return messages
+
+    def recent_analyses(self, limit: int = 100, sentiment: Optional[str] = None,
+                        since: Optional[float] = None) -> List[Dict]:
+        """Dernières analyses (filtrées par sentiment et/ou date via les index)"""
+        self.flush()
+        clauses, params = [], []
+        if sentiment:
+            clauses.append("sentiment = ?")
+            params.append(sentiment)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM analyses {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        analyses = []
+        for row in rows:
+            analysis = dict(row)
+            analysis["emotion_scores"] = json.loads(analysis["emotion_scores"]) if analysis["emotion_scores"] else {}
+            analyses.append(analysis)
+        return analyses
+
+    def stats(self, since: Optional[float] = None) -> Dict:
+        """Nombre d'analyses et latence moyenne par sentiment depuis une date"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sentiment, COUNT(*) AS n, AVG(latency_ms) AS latency_ms FROM analyses "
+                "WHERE created_at >= ? GROUP BY sentiment ORDER BY n DESC",
+                (since if since is not None else 0.0,)
+            ).fetchall()
+        return {row["sentiment"]: {"n": row["n"], "latency_ms": row["latency_ms"]} for row in rows}
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[ReviewStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ReviewStore:
+    """Base partagée par tout le processus (toutes les sessions Streamlit); le tampon est écrit à la sortie"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReviewStore()
+            atexit.register(_store.flush)
+        return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Statistiques des avis analyses")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="Analyses par sentiment")
+    stats_parser.add_argument("--hours", type=float, default=None, help="Fenetre (heures, defaut: tout)")
+    stats_parser.add_argument("--db", default=None, help="Fichier SQLite (defaut: REVIEW_STORE_PATH)")
+    args = parser.parse_args()
+
+    store = ReviewStore(args.db)
+    since = time.time() - args.hours * 3600 if args.hours else None
+    stats = store.stats(since)
+    total = sum(s["n"] for s in stats.values())
+    print(f"[INFO] {total} analyses dans {store.path}")
+    for sentiment, s in stats.items():
+        latency = f"{s['latency_ms']:.1f} ms" if s["latency_ms"] is not None else "n/a"
+        print(f"   {sentiment or 'N/A':<10} {s['n']:>7}   latence moyenne {latency}")
+    store.close()
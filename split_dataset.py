@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Split train/validation/test sans fuite de données
+
+Les avis identiques après normalisation (doublons issus du sur-échantillonnage
+dans TA_restaurants_balanced.csv, même avis avec une date différente...) sont
+regroupés et assignés en bloc à un seul split. L'assignation est déterministe
+et stratifiée par label. Le split est calculé une seule fois puis sauvegardé
+sous forme de tableaux d'indices entiers à côté du dataset.
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+SPLIT_NAMES = ("train", "val", "test")
+DEFAULT_RATIOS = (0.8, 0.1, 0.1)
+SPLIT_VERSION = 1
+
+_DATE_PATTERN = re.compile(r'\d{2}/\d{2}/\d{4}')
+_SPACES_PATTERN = re.compile(r'\s+')
+
+
+def normalize_review(text) -> str:
+    """
+    Normalise un avis pour la détection de doublons
+    (minuscules, dates supprimées, espaces et ponctuation finale normalisés)
+    """
+    text = str(text).lower()
+    text = _DATE_PATTERN.sub('', text)
+    text = _SPACES_PATTERN.sub(' ', text)
+    return text.strip().strip('.,!?;:').strip()
+
+
+def review_group_keys(texts: Sequence[str]) -> np.ndarray:
+    """
+    Calcule une clé de groupe (hash 64 bits du texte normalisé) par avis
+
+    Args:
+        texts: Liste des avis
+
+    Returns:
+        Tableau uint64 de même longueur que texts
+    """
+    keys = np.empty(len(texts), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        digest = hashlib.blake2b(normalize_review(text).encode('utf-8'), digest_size=8).digest()
+        keys[i] = int.from_bytes(digest, 'little')
+    return keys
+
+
+def _seeded_order(group_keys: np.ndarray, seed: int) -> np.ndarray:
+    """Ordre pseudo-aléatoire mais reproductible des groupes (indépendant de l'ordre des lignes)"""
+    salted = np.array(
+        [int.from_bytes(hashlib.blake2b(f"{seed}:{int(k)}".encode(), digest_size=8).digest(), 'little')
+         for k in group_keys],
+        dtype=np.uint64
+    )
+    return np.argsort(salted, kind='stable')
+
+
+def build_grouped_split(
+    texts: Sequence[str],
+    labels: Optional[Sequence[int]] = None,
+    ratios: Tuple[float, float, float] = DEFAULT_RATIOS,
+    seed: int = 42,
+    group_keys: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Construit un split train/val/test où chaque groupe de doublons est dans un seul split
+
+    Args:
+        texts: Liste des avis
+        labels: Labels (optionnel) pour stratifier le split
+        ratios: Proportions (train, val, test)
+        seed: Seed pour la reproductibilité
+        group_keys: Clés de groupe déjà calculées (optionnel)
+
+    Returns:
+        Dictionnaire {"train", "val", "test"} -> indices (int32, triés)
+    """
+    if len(ratios) != 3 or abs(sum(ratios) - 1.0) > 1e-6:
+        raise ValueError(f"Les ratios doivent etre 3 valeurs de somme 1, recu: {ratios}")
+
+    n = len(texts)
+    if group_keys is None:
+        group_keys = review_group_keys(texts)
+    labels_arr = np.zeros(n, dtype=np.int64) if labels is None else np.asarray(labels, dtype=np.int64)
+
+    # Regrouper les lignes par clé; le label d'un groupe est son label majoritaire
+    unique_keys, group_ids = np.unique(group_keys, return_inverse=True)
+    n_groups = len(unique_keys)
+    group_sizes = np.bincount(group_ids, minlength=n_groups)
+    n_classes = int(labels_arr.max()) + 1 if n else 1
+    votes = np.zeros((n_groups, n_classes), dtype=np.int64)
+    np.add.at(votes, (group_ids, labels_arr), 1)
+    group_labels = votes.argmax(axis=1)
+
+    # Dans chaque classe, parcourir les groupes dans un ordre reproductible et
+    # remplir train puis val puis test selon le nombre de lignes
+    group_split = np.empty(n_groups, dtype=np.int8)
+    bounds = np.cumsum(ratios)[:2]
+    for label in np.unique(group_labels):
+        members = np.flatnonzero(group_labels == label)
+        members = members[_seeded_order(unique_keys[members], seed)]
+        cumulative = np.cumsum(group_sizes[members])
+        # Position du milieu de chaque groupe, relative au total de la classe
+        position = (cumulative - group_sizes[members] / 2.0) / cumulative[-1]
+        group_split[members] = np.searchsorted(bounds, position, side='right')
+
+    row_split = group_split[group_ids]
+    return {
+        name: np.flatnonzero(row_split == i).astype(np.int32)
+        for i, name in enumerate(SPLIT_NAMES)
+    }
+
+
+def split_path_for(csv_path: str) -> str:
+    """Chemin du fichier d'indices associé à un dataset (ex: dataset.split.npz)"""
+    root, _ = os.path.splitext(csv_path)
+    return f"{root}.split.npz"
+
+
+def _fingerprint(group_keys: np.ndarray, labels: np.ndarray) -> str:
+    """Empreinte du contenu du dataset, pour détecter un fichier d'indices périmé"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(group_keys).tobytes())
+    h.update(np.ascontiguousarray(labels, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def load_or_build_split(
+    csv_path: str = "TA_restaurants_balanced.csv",
+    text_column: str = "Review",
+    label_column: Optional[str] = "label",
+    ratios: Tuple[float, float, float] = DEFAULT_RATIOS,
+    seed: int = 42,
+    rebuild: bool = False
+):
+    """
+    Charge le split sauvegardé à côté du dataset, ou le construit s'il est absent/périmé
+
+    Args:
+        csv_path: Chemin du dataset CSV
+        text_column: Colonne contenant les avis
+        label_column: Colonne des labels (None = pas de stratification)
+        ratios: Proportions (train, val, test)
+        seed: Seed pour la reproductibilité
+        rebuild: Forcer la reconstruction du split
+
+    Returns:
+        Tuple (DataFrame, dictionnaire {"train", "val", "test"} -> indices)
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    texts = df[text_column].astype(str).tolist()
+    labels = (df[label_column].astype(int).to_numpy() if label_column
+              else np.zeros(len(df), dtype=np.int64))
+    group_keys = review_group_keys(texts)
+    fingerprint = _fingerprint(group_keys, labels)
+    params = f"v{SPLIT_VERSION}|{ratios}|{seed}"
+    path = split_path_for(csv_path)
+
+    if not rebuild and os.path.exists(path):
+        with np.load(path, allow_pickle=False) as saved:
+            if str(saved['fingerprint']) == fingerprint and str(saved['params']) == params:
+                return df, {name: saved[name] for name in SPLIT_NAMES}
+        print(f"[INFO] Split perime ({path}), reconstruction...")
+
+    split = build_grouped_split(
+        texts,
+        labels if label_column else None,
+        ratios=ratios,
+        seed=seed,
+        group_keys=group_keys
+    )
+    np.savez(path, fingerprint=np.array(fingerprint), params=np.array(params), **split)
+    print(f"[OK] Split sauvegarde: {path}")
+    return df, split
+
+
+def count_leaked_groups(texts: Sequence[str], split: Dict[str, np.ndarray]) -> int:
+    """Nombre de groupes de doublons présents dans plusieurs splits (0 attendu)"""
+    keys = review_group_keys(texts)
+    seen = [set(keys[split[name]].tolist()) for name in SPLIT_NAMES]
+    leaked = (seen[0] & seen[1]) | (seen[0] & seen[2]) | (seen[1] & seen[2])
+    return len(leaked)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Construit le split train/val/test sans fuite")
+    parser.add_argument("--csv", default="TA_restaurants_balanced.csv", help="Dataset CSV")
+    parser.add_argument("--text-column", default="Review")
+    parser.add_argument("--label-column", default="label")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rebuild", action="store_true", help="Forcer la reconstruction")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SPLIT TRAIN/VAL/TEST SANS FUITE")
+    print("=" * 60)
+
+    df, split = load_or_build_split(
+        args.csv,
+        text_column=args.text_column,
+        label_column=args.label_column,
+        seed=args.seed,
+        rebuild=args.rebuild
+    )
+    texts = df[args.text_column].astype(str).tolist()
+    n_groups = len(np.unique(review_group_keys(texts)))
+
+    print(f"\nDataset: {len(df)} echantillons, {n_groups} avis uniques")
+    for name in SPLIT_NAMES:
+        part = df.iloc[split[name]]
+        dist = part[args.label_column].value_counts().sort_index().to_dict() if args.label_column else {}
+        print(f"   {name}: {len(part)} echantillons {dist}")
+    print(f"\nGroupes de doublons partages entre splits: {count_leaked_groups(texts, split)}")
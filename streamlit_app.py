@@ -5,13 +5,16 @@ Analyse de Sentiments et Détection d'Émotions sur les Avis de Restaurants
 Auteur: Oumaima AYADI
 """
 
+import os
 import streamlit as st
 import pandas as pd
-import numpy as np
 from emotion_detection import SimpleEmotionDetector
 import plotly.express as px
 import plotly.graph_objects as go
 from collections import Counter
+from chunked_analysis import render_emotion_job
+from aggregate_cube import (counts_by, load_or_build_cube, rating_histogram,
+                            render_cube_filters, summarize)
 
 # Configuration de la page
 st.set_page_config(
@@ -228,35 +231,48 @@ with tab2:
             except:
                 return None
     
+    def dataset_path():
+        """Fichier lu par load_dataset (le cube est associé à ce fichier)"""
+        for path in ("TA_restaurants_balanced.csv", "TA_restaurants_ML_clean_cleaned.csv"):
+            if os.path.exists(path):
+                return path
+    
+    @st.cache_resource
+    def load_cube(path):
+        return load_or_build_cube(path, df=load_dataset())
+    
     df = load_dataset()
     
     if df is not None:
         st.success(f"✅ Dataset chargé: {len(df)} avis")
         
-        # Statistiques générales
+        # Statistiques générales (requêtes sur le cube d'agrégats, pas sur les avis)
         st.subheader("📈 Statistiques Générales")
         
+        cube = load_cube(dataset_path())
+        filters = render_cube_filters(st, cube, key="stats_filters")
+        stats = summarize(cube, filters)
+        
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total d'avis", len(df))
+            st.metric("Total d'avis", stats["n_reviews"])
         
         with col2:
             if 'Name' in df.columns:
-                st.metric("Restaurants uniques", df['Name'].nunique())
+                st.metric("Restaurants uniques", stats["n_restaurants"])
             else:
                 st.metric("Colonnes", len(df.columns))
         
         with col3:
             if 'City' in df.columns:
-                st.metric("Villes", df['City'].nunique())
+                st.metric("Villes", stats["n_cities"])
             else:
-                st.metric("Lignes", len(df))
+                st.metric("Lignes", stats["n_reviews"])
         
         with col4:
-            if 'Rating' in df.columns:
-                avg_rating = df['Rating'].mean()
-                st.metric("Note moyenne", f"{avg_rating:.2f}")
+            if 'Rating' in df.columns and stats["n_reviews"]:
+                st.metric("Note moyenne", f"{stats['rating_mean']:.2f}")
             else:
                 st.metric("Dataset", "Équilibré")
         
@@ -264,7 +280,7 @@ with tab2:
         if 'sentiment' in df.columns:
             st.subheader("📊 Distribution des Sentiments")
             
-            sentiment_counts = df['sentiment'].value_counts()
+            sentiment_counts = counts_by(cube, "sentiment", filters)
             
             col1, col2 = st.columns(2)
             
@@ -294,12 +310,12 @@ with tab2:
         # Distribution des notes
         if 'Rating' in df.columns:
             st.subheader("📊 Distribution des Notes")
-            fig_rating = px.histogram(
-                df,
-                x='Rating',
-                nbins=10,
+            rating_counts = rating_histogram(cube, filters)
+            fig_rating = px.bar(
+                x=rating_counts.index,
+                y=rating_counts.values,
                 title="Distribution des Notes (1-5)",
-                labels={'Rating': 'Note', 'count': 'Nombre d\'avis'}
+                labels={'x': 'Note', 'y': 'Nombre d\'avis'}
             )
             st.plotly_chart(fig_rating, use_container_width=True)
         
@@ -329,67 +345,65 @@ with tab3:
             step=10
         )
         
-        if st.button("🚀 Lancer l'analyse d'émotions", type="primary"):
-            with st.spinner(f"Analyse de {sample_size} avis en cours..."):
-                # Échantillonner
-                sample_df = df.sample(min(sample_size, len(df)), random_state=42)
-                
-                # Analyser les émotions
-                progress_bar = st.progress(0)
-                emotions_list = []
-                
-                review_col = 'Review_clean' if 'Review_clean' in sample_df.columns else 'Review'
-                
-                for idx, row in sample_df.iterrows():
-                    review = str(row.get(review_col, ''))
-                    if review and review != 'nan' and len(review) > 10:
-                        emotion, _ = emotion_detector.get_main_emotion(review)
-                        emotions_list.append(emotion)
-                    progress_bar.progress((idx + 1) / len(sample_df))
-                
-                # Statistiques des émotions
-                emotion_counts = Counter(emotions_list)
-                
+        def sample_reviews():
+            """Avis de l'échantillon (les avis vides ou trop courts sont écartés avant l'analyse)"""
+            sample_df = df.sample(min(sample_size, len(df)), random_state=42)
+            review_col = 'Review_clean' if 'Review_clean' in sample_df.columns else 'Review'
+            reviews = sample_df[review_col].astype(str)
+            return [r for r in reviews if r != 'nan' and len(r) > 10]
+        
+        # Analyse par blocs (progression par bloc, arrêt/reprise, résultats partiels)
+        job = render_emotion_job(st, emotion_detector, sample_reviews, key="dataset_emotion_job")
+        
+        if job is not None and job["emotions"]:
+            emotions_list = job["emotions"]
+            
+            # Statistiques des émotions
+            emotion_counts = Counter(emotions_list)
+            
+            if job["status"] == "done":
                 st.success(f"✅ Analyse terminée: {len(emotions_list)} avis analysés")
-                
-                # Graphiques
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.subheader("📊 Distribution des Émotions")
-                    fig_bar = px.bar(
-                        x=list(emotion_counts.keys()),
-                        y=list(emotion_counts.values()),
-                        labels={'x': 'Émotion', 'y': 'Nombre d\'avis'},
-                        title="Nombre d'avis par Émotion",
-                        color=list(emotion_counts.keys()),
-                        color_discrete_map={
-                            'joie': '#10b981',
-                            'tristesse': '#3b82f6',
-                            'colère': '#ef4444',
-                            'surprise': '#f59e0b',
-                            'neutre': '#6b7280'
-                        }
-                    )
-                    st.plotly_chart(fig_bar, use_container_width=True)
-                
-                with col2:
-                    st.subheader("📊 Répartition en Pourcentage")
-                    fig_pie = px.pie(
-                        values=list(emotion_counts.values()),
-                        names=list(emotion_counts.keys()),
-                        title="Répartition des Émotions (%)"
-                    )
-                    st.plotly_chart(fig_pie, use_container_width=True)
-                
-                # Tableau récapitulatif
-                st.subheader("📋 Résumé")
-                summary_df = pd.DataFrame({
-                    'Émotion': list(emotion_counts.keys()),
-                    'Nombre': list(emotion_counts.values()),
-                    'Pourcentage': [f"{v/len(emotions_list)*100:.1f}%" for v in emotion_counts.values()]
-                })
-                st.dataframe(summary_df, use_container_width=True)
+            else:
+                st.info(f"Résultats partiels: {len(emotions_list)}/{len(job['texts'])} avis analysés")
+            
+            # Graphiques
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("📊 Distribution des Émotions")
+                fig_bar = px.bar(
+                    x=list(emotion_counts.keys()),
+                    y=list(emotion_counts.values()),
+                    labels={'x': 'Émotion', 'y': 'Nombre d\'avis'},
+                    title="Nombre d'avis par Émotion",
+                    color=list(emotion_counts.keys()),
+                    color_discrete_map={
+                        'joie': '#10b981',
+                        'tristesse': '#3b82f6',
+                        'colère': '#ef4444',
+                        'surprise': '#f59e0b',
+                        'neutre': '#6b7280'
+                    }
+                )
+                st.plotly_chart(fig_bar, use_container_width=True)
+            
+            with col2:
+                st.subheader("📊 Répartition en Pourcentage")
+                fig_pie = px.pie(
+                    values=list(emotion_counts.values()),
+                    names=list(emotion_counts.keys()),
+                    title="Répartition des Émotions (%)"
+                )
+                st.plotly_chart(fig_pie, use_container_width=True)
+            
+            # Tableau récapitulatif
+            st.subheader("📋 Résumé")
+            summary_df = pd.DataFrame({
+                'Émotion': list(emotion_counts.keys()),
+                'Nombre': list(emotion_counts.values()),
+                'Pourcentage': [f"{v/len(emotions_list)*100:.1f}%" for v in emotion_counts.values()]
+            })
+            st.dataframe(summary_df, use_container_width=True)
     else:
         st.error("❌ Impossible de charger le dataset.")
 
@@ -265,6 +265,1437 @@ def test_documentation():
     
     return all_exist
 
+def test_split_dataset():
+    """Test 7: Vérifier le split train/val/test sans fuite"""
+    print_header("TEST 7: Split Train/Val/Test sans Fuite")
+    
+    try:
+        from split_dataset import build_grouped_split, count_leaked_groups
+        
+        # Avis dupliqués (même texte, date différente) comme après sur-échantillonnage
+        texts = [f"Review number {i % 50} was fine 0{i % 9 + 1}/12/2016" for i in range(300)]
+        labels = [(i % 50) % 3 for i in range(300)]
+        
+        split = build_grouped_split(texts, labels, seed=42)
+        sizes = {name: len(idx) for name, idx in split.items()}
+        print(f"   - Tailles: {sizes}")
+        
+        all_ok = True
+        if sum(sizes.values()) != len(texts):
+            print("   [ERREUR] Certains avis ne sont dans aucun split")
+            all_ok = False
+        
+        leaked = count_leaked_groups(texts, split)
+        if leaked == 0:
+            print("   [OK] Aucun doublon partage entre splits")
+        else:
+            print(f"   [ERREUR] {leaked} groupes de doublons partages entre splits")
+            all_ok = False
+        
+        # Le split ne doit pas dépendre de l'ordre des lignes
+        reversed_split = build_grouped_split(texts[::-1], labels[::-1], seed=42)
+        n = len(texts)
+        if all(sorted(n - 1 - reversed_split[name]) == sorted(split[name]) for name in split):
+            print("   [OK] Split deterministe")
+        else:
+            print("   [ERREUR] Split non deterministe")
+            all_ok = False
+        
+        return all_ok
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test du split: {e}")
+        return False
+
+def test_prometheus_metrics():
+    """Test 8: Vérifier l'endpoint /metrics (format Prometheus)"""
+    print_header("TEST 8: Métriques Prometheus")
+    
+    try:
+        import urllib.request
+        from prometheus_metrics import start_metrics_server, stop_metrics_server, track_inference
+        
+        server = start_metrics_server(port=0, addr="127.0.0.1")
+        if server is None:
+            print("[ERREUR] Serveur de metriques non demarre")
+            return False
+        port = server.server_address[1]
+        
+        with track_inference("test-model", "torch-cpu", "sentiment", items=4):
+            pass
+        
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode("utf-8")
+        stop_metrics_server()
+        
+        expected = [
+            'review_inference_requests_total{model="test-model",backend="torch-cpu",stage="sentiment"}',
+            'review_inference_items_total{model="test-model",backend="torch-cpu",stage="sentiment"}',
+            'review_inference_latency_seconds_bucket{model="test-model",backend="torch-cpu",stage="sentiment",le="+Inf"}',
+            '# TYPE review_inference_in_flight gauge',
+            'review_analysis_queue_pending 0.0'
+        ]
+        missing = [line for line in expected if line not in body]
+        if missing:
+            print(f"   [ERREUR] Lignes manquantes: {missing}")
+            return False
+        
+        print(f"[OK] Metriques exposees sur le port {port}")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test des metriques: {e}")
+        return False
+
+def test_startup_imports():
+    """Test 9: Vérifier que les modules lourds ne sont pas importés au démarrage"""
+    print_header("TEST 9: Imports au Démarrage")
+    
+    try:
+        from benchmark import IMPORT_TARGETS, profile_imports, check_imports
+        
+        all_ok = True
+        for target, spec in IMPORT_TARGETS.items():
+            report = profile_imports(target, module=spec.get("module", False))
+            problems = check_imports(report, spec["forbidden"], float("inf"))
+            if problems:
+                print(f"   [ERREUR] {target}: {problems}")
+                all_ok = False
+            else:
+                print(f"[OK] {target}: {report['total_ms']:.0f} ms")
+        return all_ok
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test des imports: {e}")
+        return False
+
+def build_tiny_model(path, labels=("LABEL_0", "LABEL_1", "LABEL_2")):
+    """Crée un petit modèle DistilBERT local (aucun téléchargement) pour les tests"""
+    from transformers import BertTokenizerFast, DistilBertConfig, DistilBertForSequenceClassification
+    
+    os.makedirs(path, exist_ok=True)
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "good", "bad", "food"]))
+    BertTokenizerFast(vocab_file=vocab_file).save_pretrained(path)
+    config = DistilBertConfig(
+        vocab_size=8, dim=16, hidden_dim=32, n_layers=1, n_heads=2, num_labels=len(labels),
+        id2label=dict(enumerate(labels)), label2id={label: i for i, label in enumerate(labels)}
+    )
+    DistilBertForSequenceClassification(config).save_pretrained(path)
+    return path
+
+def test_model_store():
+    """Test 10: Vérifier le pré-baking, le chargement hors ligne et le warm-up"""
+    print_header("TEST 10: Modèles Pré-installés")
+    
+    try:
+        import tempfile
+        import torch
+        from transformers import DistilBertForSequenceClassification
+        from model_store import prebake_model, load_sequence_classifier, resolve_model_source, warm_up
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            source = build_tiny_model(os.path.join(tmp, "tiny"))
+            
+            models_root = os.path.join(tmp, "models")
+            prebake_model(source, models_root, quantize=True)
+            if not resolve_model_source(source.lstrip("/"), models_root)[1]:
+                print("   [ERREUR] Modele pre-installe introuvable")
+                return False
+            
+            tokenizer, model, device = load_sequence_classifier(
+                source.lstrip("/"), offline=True, root=models_root)
+            timings = warm_up(tokenizer, model, device, lengths=(8, 32), batch_sizes=(1, 4))
+            if len(timings) != 4:
+                print(f"   [ERREUR] Warm-up incomplet: {timings}")
+                return False
+            
+            inputs = tokenizer(["good food"], return_tensors="pt")
+            with torch.no_grad():
+                reference = DistilBertForSequenceClassification.from_pretrained(source)(**inputs).logits
+                logits = model(**inputs).logits
+            if not torch.allclose(reference, logits):
+                print("   [ERREUR] Les poids pre-installes different du modele source")
+                return False
+            
+            load_sequence_classifier(source.lstrip("/"), variant="quantized", offline=True, root=models_root)
+            print("[OK] Pre-baking, chargement hors ligne (normal + quantifie) et warm-up")
+            
+            try:
+                load_sequence_classifier("modele/inexistant", offline=True, root=models_root)
+                print("   [ERREUR] Le mode hors ligne a accepte un modele absent")
+                return False
+            except FileNotFoundError:
+                print("[OK] Modele absent refuse en mode hors ligne")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test des modeles pre-installes: {e}")
+        return False
+
+def test_mmap_loading():
+    """Test 11: Vérifier le chargement des poids safetensors mappés en mémoire"""
+    print_header("TEST 11: Poids Mappés en Mémoire")
+    
+    try:
+        import tempfile
+        import torch
+        from model_store import load_sequence_classifier, memory_report
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            source = build_tiny_model(os.path.join(tmp, "tiny"))
+            tokenizer, mapped, _ = load_sequence_classifier(source, offline=True, device="cpu", use_mmap=True)
+            _, copied, _ = load_sequence_classifier(source, offline=True, device="cpu", use_mmap=False)
+            
+            if not getattr(mapped, "_weights_mmaps", None):
+                print("   [ERREUR] Les poids n'ont pas ete mappes en memoire")
+                return False
+            inputs = tokenizer(["good food", "bad"], return_tensors="pt", padding=True)
+            with torch.no_grad():
+                if not torch.allclose(mapped(**inputs).logits, copied(**inputs).logits):
+                    print("   [ERREUR] Sorties differentes entre chargement mmap et classique")
+                    return False
+            print("[OK] Poids mappes identiques au chargement classique")
+            del mapped
+        
+        memory = memory_report()
+        if memory:
+            print(f"[OK] Memoire: {memory['rss']:.0f} Mo RSS, {memory['private']:.0f} Mo privee, "
+                  f"{memory['shared']:.0f} Mo partagee")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test du chargement mmap: {e}")
+        return False
+
+def test_chunked_analysis():
+    """Test 12: Vérifier l'analyse par blocs (progression, annulation, lots)"""
+    print_header("TEST 12: Analyse par Blocs")
+    
+    try:
+        import tempfile
+        from chunked_analysis import new_job, run_job, CANCELLED, DONE
+        from emotion_detection import SimpleEmotionDetector, EmotionDetector
+        
+        detector = SimpleEmotionDetector()
+        texts = ["The food was amazing", "Terrible and slow service", "Nothing special"] * 10
+        
+        progress = []
+        job = run_job(new_job(texts), detector, chunk_size=8, on_progress=lambda d, t: progress.append(d / t))
+        expected = [detector.get_main_emotion(t)[0] for t in texts]
+        if job["status"] != DONE or job["emotions"] != expected:
+            print("   [ERREUR] Resultats par blocs differents de l'analyse avis par avis")
+            return False
+        if progress != sorted(progress) or progress[-1] != 1.0 or len(progress) != 4:
+            print(f"   [ERREUR] Progression incorrecte: {progress}")
+            return False
+        print(f"[OK] {len(texts)} avis en {len(progress)} blocs, progression {progress}")
+        
+        # Annulation entre deux blocs puis reprise
+        job = new_job(texts)
+        def cancel_after_first(done, total):
+            job["status"] = CANCELLED
+        run_job(job, detector, chunk_size=8, on_progress=cancel_after_first)
+        if job["status"] != CANCELLED or len(job["emotions"]) != 8:
+            print("   [ERREUR] L'annulation n'a pas conserve le resultat partiel")
+            return False
+        job["status"] = "running"
+        run_job(job, detector, chunk_size=8)
+        if job["emotions"] != expected:
+            print("   [ERREUR] La reprise ne donne pas le meme resultat")
+            return False
+        print("[OK] Annulation (8 avis conserves) et reprise")
+        
+        # Méthodes par lots du détecteur à base de modèle
+        with tempfile.TemporaryDirectory() as tmp:
+            source = build_tiny_model(os.path.join(tmp, "emo"), labels=("anger", "joy", "neutral", "sadness", "surprise"))
+            model_detector = EmotionDetector(source)
+            batched = model_detector.predict_emotions(texts[:3], batch_size=2)
+            single = [model_detector.predict_emotion(t) for t in texts[:3]]
+            if any(abs(b[k] - s[k]) > 1e-5 for b, s in zip(batched, single) for k in s):
+                print("   [ERREUR] predict_emotions differe de predict_emotion")
+                return False
+        print("[OK] EmotionDetector.predict_emotions identique a predict_emotion")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de l'analyse par blocs: {e}")
+        return False
+
+def test_token_index():
+    """Test 13: Vérifier l'index incrémental des fréquences de tokens"""
+    print_header("TEST 13: Index des Fréquences de Tokens")
+    
+    try:
+        import tempfile
+        import pandas as pd
+        from token_index import (FACETS, facet_values, frequencies,
+                                 load_or_update_token_index, wordcloud_png)
+        
+        df = pd.read_csv("TA_restaurants_balanced.csv").head(600)
+        with tempfile.TemporaryDirectory() as tmp:
+            growing = os.path.join(tmp, "growing.csv")
+            full = os.path.join(tmp, "full.csv")
+            df.head(400).to_csv(growing, index=False)
+            load_or_update_token_index(growing)
+            df.to_csv(growing, index=False)
+            incremental = load_or_update_token_index(growing)
+            df.to_csv(full, index=False)
+            reference = load_or_update_token_index(full)
+            
+            for facet in ("all",) + FACETS:
+                for value in facet_values(reference, facet) or ["*"]:
+                    if frequencies(incremental, facet, value, 10**6) != frequencies(reference, facet, value, 10**6):
+                        print(f"   [ERREUR] Index incremental different pour {facet}={value}")
+                        return False
+            print(f"[OK] Mise a jour incrementale identique a une construction complete "
+                  f"({len(reference['vocab'])} mots)")
+            
+            cache_dir = os.path.join(tmp, "wordclouds")
+            png = wordcloud_png(reference, "sentiment", "Positif", width=200, height=100, cache_dir=cache_dir)
+            if not png or not png.startswith(b"\x89PNG") or len(os.listdir(cache_dir)) != 1:
+                print("   [ERREUR] Image du nuage de mots non generee ou non mise en cache")
+                return False
+            if wordcloud_png(reference, "sentiment", "Positif", width=200, height=100, cache_dir=cache_dir) != png:
+                print("   [ERREUR] Image en cache differente")
+                return False
+            print("[OK] Nuage de mots genere depuis les frequences et mis en cache")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de l'index de tokens: {e}")
+        return False
+
+def test_aggregate_cube():
+    """Test 14: Vérifier que le cube d'agrégats donne les mêmes statistiques que le dataset"""
+    print_header("TEST 14: Cube d'Agrégats")
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        import tempfile
+        from aggregate_cube import (build_cube, summarize, counts_by, rating_histogram,
+                                    top_restaurants, primary_cuisine, save_cube, load_cube, TOP_K)
+        
+        if primary_cuisine("['French', 'Bar']") != "French" or primary_cuisine(np.nan) != "Inconnu":
+            print("   [ERREUR] Cuisine principale mal extraite")
+            return False
+        
+        df = pd.read_csv("TA_restaurants_balanced.csv").head(900)
+        n = np.arange(len(df))
+        df["City"] = np.where(n % 2, "Paris", "Lyon")
+        df["Name"] = [f"R{i % 40}" for i in n]
+        df["Cuisine Style"] = np.where(n % 3, "['French', 'Bar']", "['Italian']")
+        df["Price Range"] = np.where(n % 4, "$$ - $$$", "$")
+        tables = build_cube(df)
+        
+        subset = df[(df["City"] == "Paris") & (df["sentiment"] == "Positif")]
+        filters = {"City": ["Paris"], "sentiment": ["Positif"]}
+        stats = summarize(tables, filters)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cube.npz")
+            save_cube(tables, path, "test")
+            loaded = load_cube(path)
+        # Restaurants: exacts pour une seule valeur, esquisse HyperLogLog sinon
+        paris = summarize(loaded, {"City": ["Paris"]})["n_restaurants"]
+        n_restaurants = subset["Name"].nunique()
+        checks = [
+            stats["n_reviews"] == len(subset),
+            abs(stats["n_restaurants"] - n_restaurants) <= max(1, 0.1 * n_restaurants),
+            paris == df.loc[df["City"] == "Paris", "Name"].nunique(),
+            summarize(loaded)["n_restaurants"] == df["Name"].nunique(),
+            abs(stats["rating_mean"] - subset["Rating"].mean()) < 1e-9,
+            counts_by(tables, "Cuisine").sum() == len(df),
+            rating_histogram(tables, filters).sum() == len(subset),
+            top_restaurants(loaded, 3, filters).tolist() == subset["Name"].value_counts().head(3).tolist(),
+            # Tables bornées par la taille du cube, pas par le nombre d'avis
+            tables["sketches"].shape[0] == len(tables["cube"]),
+            tables["top"].groupby("cell").size().max() <= TOP_K,
+        ]
+        if not all(checks):
+            print(f"   [ERREUR] Statistiques du cube differentes du dataset: {checks}")
+            return False
+        print(f"[OK] {len(df)} avis agreges en {len(tables['cube'])} cellules, statistiques identiques")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test du cube: {e}")
+        return False
+
+def test_review_store():
+    """Test 15: Vérifier la base SQLite des analyses et de l'historique du chatbot"""
+    print_header("TEST 15: Base des Avis Analysés")
+    
+    try:
+        import tempfile
+        import time
+        from review_store import ReviewStore
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "reviews.db")
+            store = ReviewStore(path, batch_size=3, max_delay=3600)
+            mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode != "wal":
+                print(f"   [ERREUR] Mode journal {mode} au lieu de WAL")
+                return False
+            
+            # Insertions par lots: rien n'est écrit avant que le tampon soit plein
+            analysis = {"text": "Great food", "sentiment": "Positif", "sentiment_conf": 0.9, "emotion": "joie",
+                        "emotion_conf": 0.8, "emotion_scores": {"joie": 0.8, "neutre": 0.2},
+                        "model_name": "m", "model_version": "m@1", "latency_ms": 12.0}
+            store.record_analysis(analysis)
+            store.record_analysis({**analysis, "sentiment": "Négatif"})
+            written = store._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            store.record_analysis(analysis)
+            if written != 0 or store._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] != 3:
+                print("   [ERREUR] Les analyses ne sont pas ecrites par lots")
+                return False
+            print("[OK] Mode WAL, 3 analyses ecrites en un lot")
+            
+            # Tampon incomplet: écrit par le minuteur après max_delay, sans nouvelle analyse
+            timed = ReviewStore(os.path.join(tmp, "timed.db"), batch_size=100, max_delay=0.2)
+            timed.record_analysis(analysis)
+            time.sleep(0.6)
+            if timed._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] != 1 or timed._pending:
+                print("   [ERREUR] Tampon non ecrit apres max_delay")
+                return False
+            timed.close()
+            print("[OK] Tampon ecrit par le minuteur apres max_delay")
+            
+            # Historique paginé (page 0 = messages les plus récents)
+            for i in range(5):
+                store.add_chat_exchange("s1", f"avis {i}", f"reponse {i}", {**analysis, "latency_ms": float(i)})
+            store.add_chat_exchange("s2", "autre session", "reponse", analysis)
+            page0 = store.chat_page("s1", page=0, page_size=4)
+            page2 = store.chat_page("s1", page=2, page_size=4)
+            if store.count_messages("s1") != 10 or [m["content"] for m in page0] != ["avis 3", "reponse 3", "avis 4", "reponse 4"]:
+                print(f"   [ERREUR] Page d'historique incorrecte: {page0}")
+                return False
+            if [m["content"] for m in page2] != ["avis 0", "reponse 0"] or page0[1]["sentiment"] != "Positif":
+                print("   [ERREUR] Derniere page ou analyse jointe incorrecte")
+                return False
+            print("[OK] Historique pagine par session, analyse jointe aux reponses")
+            
+            # Index utilisés et persistance après réouverture
+            plan = store._conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM analyses WHERE sentiment = ? ORDER BY created_at DESC",
+                ("Positif",)
+            ).fetchall()
+            store.clear_chat("s1")
+            store.close()
+            reopened = ReviewStore(path)
+            recent = reopened.recent_analyses(limit=100, sentiment="Positif")
+            stats = reopened.stats()
+            reopened.close()
+            if not any("idx_analyses_sentiment" in str(tuple(row)) for row in plan):
+                print(f"   [ERREUR] Index sentiment non utilise: {[tuple(r) for r in plan]}")
+                return False
+            if len(recent) != 8 or recent[0]["emotion_scores"] != {"joie": 0.8, "neutre": 0.2} or stats["Négatif"]["n"] != 1:
+                print("   [ERREUR] Analyses non retrouvees apres reouverture")
+                return False
+        print("[OK] Index utilises, analyses conservees apres reouverture (historique efface)")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de la base des avis: {e}")
+        return False
+
+def test_chat_view():
+    """Test 16: Vérifier le rendu par fenêtre de l'historique du chatbot"""
+    print_header("TEST 16: Historique du Chatbot par Fenêtre")
+    
+    try:
+        import tempfile
+        from review_store import ReviewStore
+        from chat_view import FragmentCache, message_html
+        
+        html = message_html({"id": 1, "role": "user", "content": "<b>hi</b>", "time": "12:00:00"})
+        if "<b>hi</b>" in html or "&lt;b&gt;" not in html:
+            print("   [ERREUR] Le texte de l'utilisateur n'est pas echappe")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ReviewStore(os.path.join(tmp, "reviews.db"))
+            analysis = {"sentiment": "Positif", "sentiment_conf": 0.9, "emotion": "joie", "emotion_conf": 0.8}
+            for i in range(30):
+                store.add_chat_exchange("s", f"avis {i}", f"**reponse {i}**", analysis)
+            
+            cache = FragmentCache(cap=30)
+            cache.render(store.chat_page("s", page_size=20))
+            formatted = cache.formatted
+            cache.render(store.chat_page("s", page_size=20))
+            if formatted != 20 or cache.formatted != 20:
+                print(f"   [ERREUR] Fragments reformates au rerun: {formatted}, {cache.formatted}")
+                return False
+            store.add_chat_exchange("s", "nouvel avis", "reponse", analysis)
+            latest = cache.render(store.chat_page("s", page_size=20))
+            if cache.formatted != 22 or "nouvel avis" not in latest or "avis 20" in latest:
+                print("   [ERREUR] Fenetre incorrecte apres un nouvel echange")
+                return False
+            print("[OK] Rerun sans reformatage, seuls les nouveaux messages sont formates")
+            
+            # Charger plus: la fenêtre s'élargit, le cache reste borné
+            cache.render(store.chat_page("s", page_size=60))
+            store.close()
+            if len(cache) > cache.cap:
+                print(f"   [ERREUR] Cache non borne: {len(cache)} fragments")
+                return False
+        print(f"[OK] Fenetre de 60 messages, {len(cache)} fragments gardes en memoire (plafond {cache.cap})")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de l'historique: {e}")
+        return False
+
+def test_analysis_queue():
+    """Test 17: Vérifier la file d'analyse en arrière-plan (lots entre sessions, rappels, erreurs)"""
+    print_header("TEST 17: File d'Analyse en Arrière-plan")
+    
+    try:
+        import tempfile
+        import threading
+        import time
+        from analysis_queue import AnalysisQueue, make_chat_analyzer
+        from emotion_detection import SimpleEmotionDetector
+        
+        batch_sizes = []
+        def analyze(texts):
+            batch_sizes.append(len(texts))
+            time.sleep(0.01)
+            if "boom" in texts:
+                raise ValueError("boom")
+            return [{"length": len(t)} for t in texts]
+        
+        work_queue = AnalysisQueue(analyze, max_batch=8, max_wait=0.05)
+        done = []
+        def user(session):
+            for i in range(5):
+                work_queue.submit(f"{session}-{i}", session, on_done=done.append)
+        threads = [threading.Thread(target=user, args=(f"s{k}",)) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        deadline = time.time() + 5
+        while work_queue.pending() and time.time() < deadline:
+            time.sleep(0.01)
+        
+        if len(done) != 20 or any(job["result"] != {"length": len(job["text"])} for job in done):
+            print(f"   [ERREUR] {len(done)} resultats recus sur 20")
+            return False
+        if len(batch_sizes) >= 20 or max(batch_sizes) > 8:
+            print(f"   [ERREUR] Avis non regroupes en lots: {batch_sizes}")
+            return False
+        print(f"[OK] 20 avis de 4 sessions en {len(batch_sizes)} lots (moyenne {work_queue.stats()['mean_batch']:.1f})")
+        
+        # Erreur d'analyse: le job est terminé en erreur, la file continue
+        failed = work_queue.submit("boom")
+        deadline = time.time() + 5
+        while work_queue.result(failed) is None and time.time() < deadline:
+            time.sleep(0.01)
+        ok_id = work_queue.submit("ok")
+        deadline = time.time() + 5
+        while (job := work_queue.result(ok_id)) is None and time.time() < deadline:
+            time.sleep(0.01)
+        work_queue.close()
+        if job is None or job["result"] != {"length": 2} or work_queue.stats()["errors"] != 1:
+            print("   [ERREUR] La file ne survit pas a une erreur d'analyse")
+            return False
+        print("[OK] Erreur d'analyse isolee, la file continue")
+        
+        # Rappel hors verrou: une autre session voit le job « persisting » sans attendre;
+        # un nombre de résultats différent du lot termine les jobs en erreur
+        seen = []
+        callback_queue = AnalysisQueue(lambda texts: [{}] * (len(texts) - ("short" in texts)), max_wait=0.0)
+        def persist(job):
+            other = threading.Thread(target=lambda: seen.append([j["status"] for j in callback_queue.pending("s1")]))
+            other.start()
+            other.join(2)
+            seen.append(not other.is_alive())
+        callback_queue.submit("persist", "s1", on_done=persist)
+        deadline = time.time() + 5
+        while callback_queue.pending() and time.time() < deadline:
+            time.sleep(0.01)
+        short_id = callback_queue.submit("short")
+        while (short := callback_queue.result(short_id)) is None and time.time() < deadline:
+            time.sleep(0.01)
+        callback_queue.close()
+        if (seen != [["persisting"], True]
+                or short is None or short["status"] != "error"):
+            print(f"   [ERREUR] Rappel sous verrou ou resultats manquants: {seen}, {short}")
+            return False
+        print("[OK] Rappels hors verrou, lot incomplet termine en erreur")
+        
+        # Jauge Prometheus des avis en attente: +1 à la soumission, -1 quand le worker les prend
+        from prometheus_metrics import QUEUE_PENDING
+        started, release = threading.Event(), threading.Event()
+        def blocking(texts):
+            started.set()
+            release.wait(5)
+            return [{} for _ in texts]
+        blocked_queue = AnalysisQueue(blocking, max_batch=8, max_wait=0.0)
+        base = QUEUE_PENDING.get()
+        blocked_queue.submit("first")
+        started.wait(5)
+        for i in range(3):
+            blocked_queue.submit(f"next-{i}")
+        queued = QUEUE_PENDING.get() - base
+        release.set()
+        deadline = time.time() + 5
+        while blocked_queue.pending() and time.time() < deadline:
+            time.sleep(0.01)
+        blocked_queue.close()
+        if queued != 3 or QUEUE_PENDING.get() != base:
+            print(f"   [ERREUR] Jauge de file incorrecte: {queued} en attente, {QUEUE_PENDING.get() - base} a la fin")
+            return False
+        print("[OK] Jauge review_analysis_queue_pending: 3 avis en attente pendant un lot, 0 apres")
+        
+        # Analyse par lots du chatbot identique à l'analyse avis par avis
+        from model_store import load_sequence_classifier
+        with tempfile.TemporaryDirectory() as tmp:
+            tokenizer, model, device = load_sequence_classifier(build_tiny_model(os.path.join(tmp, "sent")))
+            analyzer = make_chat_analyzer(tokenizer, model, device, SimpleEmotionDetector())
+            texts = ["great food", "bad slow service and cold food", "ok"]
+            batched = analyzer(texts)
+            single = [analyzer([t])[0] for t in texts]
+        if any(b["sentiment"] != s["sentiment"] or abs(b["sentiment_conf"] - s["sentiment_conf"]) > 1e-5
+               or b["emotion"] != s["emotion"] for b, s in zip(batched, single)):
+            print("   [ERREUR] Analyse par lots differente de l'analyse avis par avis")
+            return False
+        print("[OK] Analyse par lots du chatbot identique a l'analyse avis par avis")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de la file d'analyse: {e}")
+        return False
+
+def test_long_document():
+    """Test 18: Vérifier le mode documents longs (fenêtres glissantes, lots communs, agrégation)"""
+    print_header("TEST 18: Documents Longs")
+    
+    try:
+        import tempfile
+        import numpy as np
+        from long_document import (ATTENTION_TEMPERATURE, split_windows, pack_windows, aggregate_logits,
+                                   predict_long)
+        from batch_inference import run_batched_inference
+        from model_store import load_sequence_classifier
+        
+        # Agrégations comparées à une boucle par texte
+        rng = np.random.default_rng(0)
+        logits = rng.normal(size=(7, 3)).astype(np.float32)
+        owners = np.array([0, 0, 0, 1, 2, 2, 2])
+        softmax = lambda x: np.exp(x - x.max()) / np.exp(x - x.max()).sum()
+        expected = {
+            "mean": [softmax(logits[owners == d].mean(axis=0)) for d in range(3)],
+            "max": [softmax(logits[owners == d].max(axis=0)) for d in range(3)],
+            "confidence": [np.average([softmax(l) for l in logits[owners == d]], axis=0,
+                                      weights=[softmax(l).max() for l in logits[owners == d]]) for d in range(3)],
+            "attention": [softmax(np.average(logits[owners == d], axis=0, weights=softmax(np.array(
+                [(softmax(l) * np.log(softmax(l))).sum() / ATTENTION_TEMPERATURE for l in logits[owners == d]]))))
+                for d in range(3)],
+        }
+        for method, reference in expected.items():
+            if not np.allclose(aggregate_logits(logits, owners, 3, method), reference, atol=1e-6):
+                print(f"   [ERREUR] Agregation {method} incorrecte")
+                return False
+        # Attention: la fenêtre la plus tranchée domine l'avis
+        sharp = aggregate_logits(np.array([[0.1, 0.0, 0.0], [0.0, 0.0, 6.0]]), np.array([0, 0]), 1, "attention")
+        if sharp[0].argmax() != 2 or sharp[0, 2] <= aggregate_logits(
+                np.array([[0.1, 0.0, 0.0], [0.0, 0.0, 6.0]]), np.array([0, 0]), 1, "mean")[0, 2]:
+            print(f"   [ERREUR] Attention sans effet: {sharp}")
+            return False
+        print("[OK] Agregations mean / max / confidence / attention")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            tokenizer, model, device = load_sequence_classifier(build_tiny_model(os.path.join(tmp, "sent")))
+            texts = ["good food " * 40, "bad", "ok service " * 20, "food"]
+            windows, owners = split_windows(texts, tokenizer, max_length=32, stride=8)
+            
+            # Les fenêtres couvrent tout le texte long (aucun token perdu)
+            full = tokenizer(texts[0], add_special_tokens=False)["input_ids"]
+            first, *others = [w[1:-1] for w, o in zip(windows, owners) if o == 0]
+            rebuilt = first + [token for w in others for token in w[8:]]
+            if rebuilt != full or max(len(w) for w in windows) > 32:
+                print("   [ERREUR] Fenetres incompletes ou trop longues")
+                return False
+            
+            # Fenêtres de plusieurs avis dans les mêmes lots
+            batches, _ = pack_windows(windows, tokenizer, batch_size=8)
+            if not any(len(set(owners[b])) > 1 for b in batches):
+                print("   [ERREUR] Les fenetres ne sont pas regroupees entre avis")
+                return False
+            print(f"[OK] {len(texts)} avis -> {len(windows)} fenetres en {len(batches)} lots communs")
+            
+            # Un avis court (une seule fenêtre) donne le même résultat qu'avec troncature
+            probs, timings = predict_long(texts, tokenizer, model, device, max_length=32, stride=8, batch_size=8)
+            truncated, _ = run_batched_inference(texts, tokenizer, model, device, max_length=32)
+            short = softmax(truncated[1])
+            if not np.allclose(probs[1], short, atol=1e-5) or timings["windowed_texts"] != 2:
+                print("   [ERREUR] Avis court different du mode tronque")
+                return False
+        print("[OK] Avis courts identiques au mode tronque, 2 avis longs analyses en entier")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test des documents longs: {e}")
+        return False
+
+def test_emotion_category_matrix():
+    """Test 19: Vérifier le regroupement matriciel des labels du modèle en catégories"""
+    print_header("TEST 19: Matrice Labels -> Catégories")
+    
+    try:
+        import tempfile
+        import numpy as np
+        from emotion_detection import EmotionDetector, emotion_category_matrix, map_model_label, EMOTION_CATEGORIES
+        from evaluate_model import emotion_to_sentiment_matrix
+        
+        labels = {0: "anger", 1: "disgust", 2: "fear", 3: "joy", 4: "neutral", 5: "sadness", 6: "surprise"}
+        matrix = emotion_category_matrix(labels)
+        if matrix.shape != (7, 5) or matrix[1].sum() != 0 or matrix[3, EMOTION_CATEGORIES.index("joie")] != 1:
+            print(f"   [ERREUR] Matrice incorrecte:\n{matrix}")
+            return False
+        if emotion_to_sentiment_matrix(labels)[3].tolist() != [0, 0, 1] or emotion_to_sentiment_matrix(labels)[0].tolist() != [1, 0, 0]:
+            print("   [ERREUR] Matrice emotions -> sentiments incorrecte")
+            return False
+        
+        # Référence: boucle label par label (ancienne implémentation)
+        def reference(probs):
+            scores = {c: 0.0 for c in EMOTION_CATEGORIES}
+            for idx, p in enumerate(probs):
+                category = map_model_label(labels[idx])
+                if category is not None:
+                    scores[category] += float(p)
+            total = sum(scores.values())
+            return {k: v / total for k, v in scores.items()}
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            detector = EmotionDetector(build_tiny_model(os.path.join(tmp, "emo"), labels=tuple(labels.values())))
+            probs = np.random.default_rng(0).dirichlet(np.ones(7), size=200).astype(np.float32)
+            batched = detector._category_scores(probs)
+            expected = np.array([[reference(row)[c] for c in EMOTION_CATEGORIES] for row in probs])
+            if not np.allclose(batched, expected, atol=1e-6):
+                print("   [ERREUR] Scores matriciels differents de la boucle de reference")
+                return False
+            single = detector.predict_emotion("good food")
+            batch = detector.predict_emotions(["good food", "bad"])[0]
+            if any(abs(single[c] - batch[c]) > 1e-5 for c in EMOTION_CATEGORIES) or abs(sum(single.values()) - 1) > 1e-5:
+                print("   [ERREUR] predict_emotion et predict_emotions differents")
+                return False
+        print("[OK] 200 avis regroupes en un produit matriciel, identique a la boucle de reference")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de la matrice d'emotions: {e}")
+        return False
+
+def test_aspect_sentiment():
+    """Test 20: Vérifier le sentiment par aspect (propositions, lots communs, cache)"""
+    print_header("TEST 20: Sentiment par Aspect")
+    
+    try:
+        import numpy as np
+        from aspect_sentiment import (AspectSentimentAnalyzer, split_clauses, clause_aspects,
+                                      make_keyword_scorer)
+        
+        clauses = split_clauses("The food was amazing but the service was slow")
+        if clauses != ["The food was amazing", "the service was slow"] or \
+                [clause_aspects(c) for c in clauses] != [["nourriture"], ["service"]]:
+            print(f"   [ERREUR] Decoupage ou aspects incorrects: {clauses}")
+            return False
+        # Énumération séparée par des virgules et « yet » après une négation: pas de coupure
+        enumeration = split_clauses("Food, service and prices were great")
+        negated = split_clauses("We have not yet tried the desserts")
+        if [clause_aspects(c) for c in enumeration] != [["nourriture", "service", "prix"]] or \
+                negated != ["We have not yet tried the desserts"] or \
+                split_clauses("Great food, slow service") != ["Great food", "slow service"]:
+            print(f"   [ERREUR] Decoupage incorrect: {enumeration}, {negated}")
+            return False
+        print("[OK] Enumerations et « not yet » gardes dans une proposition")
+        
+        calls = []
+        keyword_scorer = make_keyword_scorer()
+        def scorer(batch):
+            calls.append(list(batch))
+            return keyword_scorer(batch)
+        
+        analyzer = AspectSentimentAnalyzer(scorer, cache_size=100)
+        texts = ["The food was amazing but the service was slow.",
+                 "Great view, the prices were too expensive and the service was slow",
+                 "Nothing to say"]
+        results = analyzer.analyze(texts)
+        if results[0]["nourriture"]["sentiment"] != "Positif" or results[0]["service"]["sentiment"] != "Négatif":
+            print(f"   [ERREUR] Sentiment par aspect incorrect: {results[0]}")
+            return False
+        if results[2] != {} or set(results[1]) != {"ambiance", "prix", "service"}:
+            print(f"   [ERREUR] Aspects incorrects: {results[1:]}")
+            return False
+        # Un seul appel pour les propositions de tous les avis, sans doublon
+        if len(calls) != 1 or len(calls[0]) != 4:
+            print(f"   [ERREUR] Propositions non regroupees: {calls}")
+            return False
+        print(f"[OK] {len(texts)} avis -> {len(calls[0])} propositions uniques evaluees en un lot")
+        
+        # Les propositions déjà vues sont servies par le cache
+        analyzer.analyze(["THE SERVICE WAS SLOW, the food was amazing"])
+        if len(calls) != 1 or analyzer.cache_hit_rate() <= 0:
+            print(f"   [ERREUR] Cache des propositions inefficace: {calls[1:]}")
+            return False
+        print(f"[OK] Propositions repetees servies par le cache ({analyzer.cache_hit_rate():.0%} de succes)")
+        
+        # Analyseur partagé par plusieurs sessions: petit cache, évictions concurrentes
+        import threading
+        shared = AspectSentimentAnalyzer(keyword_scorer, cache_size=4)
+        errors = []
+        def session(k):
+            try:
+                for i in range(200):
+                    shared.analyze([f"The food {i % 7} was great but the service {k} was slow"])
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=session, args=(k,)) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors or len(shared._cache) > 4 or shared.stats["clauses"] != 4 * 200 * 2:
+            print(f"   [ERREUR] Cache partage incoherent: {errors[:1]}, {len(shared._cache)} entrees")
+            return False
+        print("[OK] Cache partage par 4 sessions concurrentes sans erreur")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test du sentiment par aspect: {e}")
+        return False
+
+def test_embedding_index():
+    """Test 21: Vérifier l'index d'embeddings (float16 mappé, ajout incrémental, recherche exacte et IVF)"""
+    print_header("TEST 21: Index d'Embeddings")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        from model_store import load_sequence_classifier
+        from embedding_index import EmbeddingIndex, build_or_update_index, embed_texts, make_embedder
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            tokenizer, model, device = load_sequence_classifier(build_tiny_model(os.path.join(tmp, "tiny")))
+            embed = make_embedder(tokenizer, model, device, batch_size=8)
+            rng = np.random.default_rng(0)
+            reviews = [" ".join(rng.choice(["good", "bad", "food"], rng.integers(1, 10))) for _ in range(120)]
+            csv_path = os.path.join(tmp, "reviews.csv")
+            
+            pd.DataFrame({"Review": reviews[:80]}).to_csv(csv_path, index=False)
+            build_or_update_index(csv_path, embed, model_name="tiny", chunk_rows=32)
+            encoded = []
+            def counting_embed(texts):
+                encoded.extend(texts)
+                return embed(texts)
+            pd.DataFrame({"Review": reviews}).to_csv(csv_path, index=False)
+            index = build_or_update_index(csv_path, counting_embed, model_name="tiny")
+            if len(encoded) != 40 or index.n_rows != 120 or index.vectors.dtype != np.float16:
+                print(f"   [ERREUR] Ajout incremental incorrect: {len(encoded)} avis encodes, {index.n_rows} lignes")
+                return False
+            print(f"[OK] Index float16 complete: {len(encoded)} nouveaux avis encodes sur {index.n_rows}")
+            
+            queries = embed_texts(reviews[:4], tokenizer, model, device)
+            scores, ids = index.search(queries, k=5)
+            expected = np.sort(queries @ np.asarray(index.vectors, dtype=np.float32).T, axis=1)[:, ::-1][:, :5]
+            if not np.allclose(scores, expected, atol=1e-4):
+                print("   [ERREUR] Recherche exacte differente de la recherche brute")
+                return False
+            # Même résultat en lisant le fichier mappé par blocs
+            mapped = EmbeddingIndex(index.directory, max_memory_mb=0)
+            if not np.allclose(mapped.search(queries, k=5)[0], scores, atol=1e-5):
+                print("   [ERREUR] Recherche sur le fichier mappe incorrecte")
+                return False
+            if 7 in index.similar_to_row(7, k=5)[1]:
+                print("   [ERREUR] L'avis de la requete n'est pas exclu")
+                return False
+            print("[OK] Recherche exacte par blocs conforme (memoire et fichier mappe)")
+            
+            # IVF: toutes les listes explorées = recherche exacte; nouvelles lignes affectées
+            index.build_ivf(n_lists=6)
+            if not np.allclose(index.search(queries, k=5, nprobe=6)[0], scores, atol=1e-5):
+                print("   [ERREUR] IVF (toutes les listes) different de la recherche exacte")
+                return False
+            pd.DataFrame({"Review": reviews + ["good food"] * 5}).to_csv(csv_path, index=False)
+            index = build_or_update_index(csv_path, embed, model_name="tiny")
+            if not index.has_ivf or len(index.assignments) != index.n_rows:
+                print("   [ERREUR] IVF non complete avec les nouvelles lignes")
+                return False
+            print(f"[OK] IVF: {len(index.centroids)} listes, completees avec les nouveaux avis")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de l'index d'embeddings: {e}")
+        return False
+
+def test_tfidf_sentiment():
+    """Test 22: Vérifier le modèle TF-IDF + régression logistique (labels, sérialisation, hashing)"""
+    print_header("TEST 22: Modèle TF-IDF Linéaire")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        from tfidf_sentiment import LinearSentimentModel, cascade_predict, dataset_labels, train_linear_model
+        
+        words = {1.0: "awful terrible rude", 3.0: "okay average fine", 5.0: "excellent delicious lovely"}
+        rng = np.random.default_rng(0)
+        ratings = rng.choice(list(words), 300)
+        reviews = [f"{words[r]} {' '.join(rng.choice(['food', 'place', 'staff'], 3))}" for r in ratings]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            # Sans colonne label: labels dérivés des notes (rating_to_label)
+            csv_path = os.path.join(tmp, "reviews.csv")
+            df = pd.DataFrame({"Review": reviews, "Rating": ratings})
+            df.to_csv(csv_path, index=False)
+            if dataset_labels(df).tolist() != [{1.0: 0, 3.0: 1, 5.0: 2}[r] for r in ratings]:
+                print("   [ERREUR] Labels differents de rating_to_label")
+                return False
+            
+            for hashing in (False, True):
+                output = os.path.join(tmp, f"model-{hashing}")
+                model = train_linear_model(csv_path, output_dir=output, hashing=hashing)
+                accuracy = model.manifest["metrics"]["test"]["accuracy"]
+                if accuracy < 0.9:
+                    print(f"   [ERREUR] Accuracy trop faible (hashing={hashing}): {accuracy}")
+                    return False
+                loaded = LinearSentimentModel.load(output)
+                texts = ["excellent delicious food", "awful rude staff"]
+                if not np.allclose(loaded.predict_proba(texts), model.predict_proba(texts)) or \
+                        loaded.predict(texts) != ["Positif", "Négatif"]:
+                    print(f"   [ERREUR] Modele recharge different (hashing={hashing})")
+                    return False
+                print(f"[OK] hashing={hashing}: accuracy test {accuracy*100:.1f}%, modele recharge identique")
+            
+            if LinearSentimentModel.load(output).predict_proba([]).shape != (0, 3):
+                print("   [ERREUR] Prediction sur une liste vide")
+                return False
+        
+        # Cascade: seuls les avis sous le seuil passent par le second étage, en un seul appel
+        class FixedLinear:
+            def predict_proba(self, texts):
+                return np.array([[0.95, 0.03, 0.02], [0.4, 0.3, 0.3], [0.05, 0.05, 0.9]], dtype=np.float32)[:len(texts)]
+        calls = []
+        def second_stage(rest):
+            calls.append(rest)
+            return np.tile([0.0, 0.0, 1.0], (len(rest), 1))
+        probs, confident = cascade_predict(["a", "b", "c"], FixedLinear(), second_stage, threshold=0.8)
+        if calls != [["b"]] or confident.tolist() != [True, False, True] or \
+                probs.argmax(axis=1).tolist() != [0, 2, 2] or probs[0, 0] != np.float32(0.95):
+            print(f"   [ERREUR] Cascade incorrecte: appels {calls}, probabilites {probs.tolist()}")
+            return False
+        calls.clear()
+        cascade_predict(["a"], FixedLinear(), second_stage, threshold=0.8)
+        if calls:
+            print("   [ERREUR] Second etage appele alors que tous les avis sont surs")
+            return False
+        print("[OK] Cascade: 1 avis sur 3 envoye au second etage")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test du modele TF-IDF: {e}")
+        return False
+
+def test_distillation():
+    """Test 23: Vérifier la distillation (étudiant initialisé du professeur, perte, sauvegarde chargeable)"""
+    print_header("TEST 23: Distillation")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        import torch
+        from transformers import DistilBertConfig, DistilBertForSequenceClassification
+        from distill import UNLABELED, build_student, count_parameters, distill, distillation_loss
+        from model_store import load_sequence_classifier, read_manifest
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            teacher_path = build_tiny_model(os.path.join(tmp, "teacher"))
+            config = DistilBertConfig(vocab_size=8, dim=16, hidden_dim=32, n_layers=4, n_heads=2, num_labels=3)
+            DistilBertForSequenceClassification(config).save_pretrained(teacher_path)
+            teacher = DistilBertForSequenceClassification.from_pretrained(teacher_path)
+            
+            student = build_student(teacher, n_layers=2)
+            copied = student.distilbert.transformer.layer[1].ffn.lin1.weight
+            if not torch.equal(copied, teacher.distilbert.transformer.layer[3].ffn.lin1.weight):
+                print("   [ERREUR] Couches de l'etudiant non initialisees depuis le professeur")
+                return False
+            
+            # Avis non étiquetés: seule la perte de distillation compte
+            logits = torch.tensor([[2.0, 0.0, -1.0]])
+            unlabeled = distillation_loss(logits, logits, torch.tensor([UNLABELED]))
+            labeled = distillation_loss(logits, logits, torch.tensor([2]))
+            if abs(unlabeled.item()) > 1e-6 or labeled.item() <= 0:
+                print(f"   [ERREUR] Perte incorrecte: {unlabeled.item()}, {labeled.item()}")
+                return False
+            
+            # Pondération par avis: alpha * KL aussi sans label, lot mixte = moyenne des avis
+            student_logits = torch.tensor([[2.0, 0.0, -1.0], [0.5, 1.0, 0.0]])
+            teacher_logits = torch.tensor([[0.0, 1.0, 0.0], [1.0, 0.0, 2.0]])
+            rows = [distillation_loss(student_logits[i:i + 1], teacher_logits[i:i + 1], torch.tensor([label]),
+                                      alpha=0.5) for i, label in enumerate((2, UNLABELED))]
+            mixed = distillation_loss(student_logits, teacher_logits, torch.tensor([2, UNLABELED]), alpha=0.5)
+            soft_only = distillation_loss(student_logits[1:], teacher_logits[1:], torch.tensor([UNLABELED]), alpha=1.0)
+            if abs(mixed.item() - (rows[0] + rows[1]).item() / 2) > 1e-5 or \
+                    abs(rows[1].item() - 0.5 * soft_only.item()) > 1e-5:
+                print(f"   [ERREUR] Ponderation par avis incorrecte: {mixed.item()}, {[r.item() for r in rows]}")
+                return False
+            print("[OK] Etudiant initialise depuis les couches 0 et 3, perte CE ignoree sans label, "
+                  "alpha applique a chaque avis")
+            
+            rng = np.random.default_rng(0)
+            labels = rng.integers(0, 3, 90)
+            reviews = [" ".join(rng.choice([["bad"], ["food"], ["good"]][l] * 2 + ["food"], 3)) for l in labels]
+            csv_path = os.path.join(tmp, "reviews.csv")
+            pd.DataFrame({"Review": reviews, "label": labels}).to_csv(csv_path, index=False)
+            output = os.path.join(tmp, "student")
+            report = distill(teacher_path, output, csv_path, unlabeled_csv=None, n_layers=2, epochs=1,
+                             batch_size=16)
+            if report["student"]["parameters"] >= report["teacher"]["parameters"]:
+                print(f"   [ERREUR] Etudiant pas plus petit: {report['student']['parameters']}")
+                return False
+            
+            # Chargé par le même chemin que les applications
+            _, loaded, _ = load_sequence_classifier(output)
+            if loaded.config.n_layers != 2 or read_manifest(output).get("distilled_from") != teacher_path:
+                print("   [ERREUR] Etudiant sauvegarde incorrect")
+                return False
+            print(f"[OK] Etudiant {report['student']['parameters']} parametres "
+                  f"(professeur {report['teacher']['parameters']}), charge par load_sequence_classifier")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de distillation: {e}")
+        return False
+
+def test_pruning():
+    """Test 24: Vérifier l'élagage structuré (couches retirées, têtes à zéro, modèle rechargeable)"""
+    print_header("TEST 24: Elagage structure")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import pandas as pd
+        from transformers import DistilBertConfig, DistilBertForSequenceClassification
+        from model_store import load_sequence_classifier, read_manifest
+        from prune_model import prune, select_heads
+        
+        # Au moins une tête gardée par couche, même avec 100% demandé
+        heads = select_heads(np.array([[0.1, 0.9], [0.2, 0.3]]), 1.0)
+        if heads != {0: [0], 1: [0]}:
+            print(f"   [ERREUR] Selection des tetes incorrecte: {heads}")
+            return False
+        print("[OK] Tetes les moins importantes choisies, une tete gardee par couche")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = build_tiny_model(os.path.join(tmp, "model"))
+            config = DistilBertConfig(vocab_size=8, dim=16, hidden_dim=32, n_layers=4, n_heads=2, num_labels=3)
+            DistilBertForSequenceClassification(config).save_pretrained(model_path)
+            
+            rng = np.random.default_rng(0)
+            labels = rng.integers(0, 3, 90)
+            reviews = [" ".join(rng.choice([["bad"], ["food"], ["good"]][l] * 2 + ["food"], 3)) for l in labels]
+            csv_path = os.path.join(tmp, "reviews.csv")
+            pd.DataFrame({"Review": reviews, "label": labels}).to_csv(csv_path, index=False)
+            rows = prune(model_path, tmp, csv_path, levels=[(1, 0.5)], batch_size=16)
+            baseline, pruned = rows
+            # Une couche (2224 paramètres pour dim=16, hidden_dim=32) et chaque tête retirée:
+            # 8 lignes (+ biais) de q/k/v et 8 colonnes de out_lin, soit 3 * (8 * 16 + 8) + 16 * 8
+            manifest = read_manifest(pruned["path"])
+            n_heads = sum(len(h) for h in manifest["pruned_heads"].values())
+            expected = baseline["parameters"] - 2224 - n_heads * (3 * (8 * 16 + 8) + 16 * 8)
+            if (pruned["layers"] != 3 or not pruned["heads_removed"] or n_heads != 3
+                    or pruned["parameters"] != expected):
+                print(f"   [ERREUR] Niveau mal elague: {pruned} (attendu {expected} parametres)")
+                return False
+            
+            # Rechargé par le même chemin que les applications, têtes élaguées toujours retirées
+            _, loaded, _ = load_sequence_classifier(pruned["path"])
+            layer, head_ids = next(iter(manifest["pruned_heads"].items()))
+            q_lin = loaded.distilbert.transformer.layer[int(layer)].attention.q_lin.weight
+            if (loaded.config.n_layers != 3 or q_lin.shape[0] != 16 - 8 * len(head_ids)
+                    or sum(p.numel() for p in loaded.parameters()) != pruned["parameters"]):
+                print("   [ERREUR] Modele elague sauvegarde incorrect")
+                return False
+            print(f"[OK] {pruned['name']}: {pruned['parameters']} parametres "
+                  f"(origine {baseline['parameters']}), {pruned['nonzero_parameters']} non nuls")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test d'elagage: {e}")
+        return False
+
+def test_thread_tuning():
+    """Test 25: Vérifier l'autotune des threads (mesure en sous-processus, choix, application au chargement)"""
+    print_header("TEST 25: Reglage des threads")
+    
+    try:
+        import json
+        import subprocess
+        import sys
+        import tempfile
+        import thread_tuning
+        from thread_tuning import autotune, candidate_threads, select_best, tuned_batch_size
+        
+        if candidate_threads(6) != [1, 2, 4, 6] or candidate_threads(1) != [1]:
+            print(f"   [ERREUR] Threads candidats incorrects: {candidate_threads(6)}")
+            return False
+        
+        # Le débit relatif moyen départage: 2 threads gagnent malgré un modèle un peu plus lent
+        results = [
+            {"intra_op_threads": 1, "inter_op_threads": 1,
+             "throughput": {"sentiment": {"1": 10.0, "8": 40.0}, "emotion": {"1": 5.0, "8": 10.0}}},
+            {"intra_op_threads": 2, "inter_op_threads": 1,
+             "throughput": {"sentiment": {"1": 12.0, "8": 38.0}, "emotion": {"1": 9.0, "8": 20.0}}},
+        ]
+        best = select_best(results)
+        if best["intra_op_threads"] != 2 or best["batch_sizes"] != {"sentiment": 8, "emotion": 8}:
+            print(f"   [ERREUR] Mauvaise configuration choisie: {best}")
+            return False
+        print("[OK] Configuration choisie par debit relatif moyen, taille de lot par modele")
+        
+        # Taille de lot: configuration lue une fois par processus, pas à chaque lot
+        with tempfile.TemporaryDirectory() as tmp:
+            config_file = os.path.join(tmp, "threads.json")
+            with open(config_file, "w", encoding="utf-8") as f:
+                json.dump({"batch_sizes": {"emotion": 8}}, f)
+            previous, thread_tuning._config = thread_tuning._config, None
+            os.environ["THREAD_CONFIG"] = config_file
+            try:
+                first = tuned_batch_size("emotion", 32)
+                os.remove(config_file)
+                cached = tuned_batch_size("emotion", 32)
+                missing = tuned_batch_size("sentiment", 16)
+            finally:
+                del os.environ["THREAD_CONFIG"]
+                thread_tuning._config = previous
+            if (first, cached, missing) != (8, 8, 16):
+                print(f"   [ERREUR] Taille de lot relue ou incorrecte: {first}, {cached}")
+                return False
+        print("[OK] Configuration des lots lue une fois par processus")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = build_tiny_model(os.path.join(tmp, "model"))
+            config_file = os.path.join(tmp, "threads.json")
+            config = autotune({"sentiment": model_path}, threads=[1], interop_threads=[1],
+                              batch_sizes=[1, 4], csv_path=os.path.join(tmp, "absent.csv"), n_texts=8,
+                              output=config_file)
+            with open(config_file, encoding="utf-8") as f:
+                if json.load(f)["intra_op_threads"] != 1 or config["batch_sizes"]["sentiment"] not in (1, 4):
+                    print("   [ERREUR] Configuration enregistree incorrecte")
+                    return False
+            
+            # Processus neuf: le chargeur des applications applique la configuration
+            code = ("import torch; from model_store import load_sequence_classifier; "
+                    f"load_sequence_classifier({model_path!r}); "
+                    "print(torch.get_num_threads(), torch.get_num_interop_threads())")
+            env = dict(os.environ, THREAD_CONFIG=config_file)
+            output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)), timeout=300)
+            if output.stdout.split()[-2:] != ["1", "1"]:
+                print(f"   [ERREUR] Threads non appliques au chargement: {output.stdout} {output.stderr[-300:]}")
+                return False
+            print("[OK] Configuration mesuree en sous-processus, appliquee par load_sequence_classifier")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de reglage des threads: {e}")
+        return False
+
+def test_compiled_model():
+    """Test 26: Vérifier l'inférence compilée par paliers (padding au palier, repli eager)"""
+    print_header("TEST 26: Inference Compilee")
+    
+    try:
+        import tempfile
+        import torch
+        from compiled_model import bucket_length, compile_classifier
+        from model_store import load_sequence_classifier
+        
+        if bucket_length(20) != 32 or bucket_length(64) != 64 or bucket_length(300) is not None:
+            print(f"   [ERREUR] Paliers incorrects: {bucket_length(20)}, {bucket_length(300)}")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            _, model, _ = load_sequence_classifier(build_tiny_model(os.path.join(tmp, "tiny")),
+                                                   device="cpu", compile_mode="")
+            compiled = compile_classifier(model, "trace", buckets=(8, 16), batch_sizes=(1, 2))
+            if sorted(compiled._traced) != [8, 16] or compiled.config is not model.config:
+                print(f"   [ERREUR] Paliers non compiles: {sorted(compiled._traced)}")
+                return False
+            
+            # Lots de taille et longueur quelconques: mêmes logits qu'en eager après padding
+            with torch.inference_mode():
+                for batch_size, length in [(1, 5), (3, 8), (4, 11), (2, 20)]:
+                    input_ids = torch.randint(5, 8, (batch_size, length))
+                    attention_mask = torch.ones_like(input_ids)
+                    attention_mask[0, length // 2:] = 0
+                    expected = model(input_ids=input_ids, attention_mask=attention_mask).logits
+                    logits = compiled(input_ids=input_ids, attention_mask=attention_mask).logits
+                    if logits.shape != expected.shape or not torch.allclose(logits, expected, atol=1e-4):
+                        print(f"   [ERREUR] Logits differents d'eager ({batch_size}x{length})")
+                        return False
+        print("[OK] Entrees completees au palier, logits identiques a eager, repli eager au-dela")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test d'inference compilee: {e}")
+        return False
+
+def test_language_routing():
+    """Test 27: Vérifier l'identification de langue et le routage par langue des avis d'un lot"""
+    print_header("TEST 27: Routage Multilingue")
+    
+    try:
+        from emotion_detection import SimpleEmotionDetector
+        from language_routing import MultilingualEmotionDetector, default_identifier, group_by_language
+        
+        texts = ["The food was amazing, we loved it", "Le service était lent et le serveur énervé",
+                 "Disgusting food 08/21/2017", "La comida estaba muy rica, volveremos",
+                 "Le repas était délicieux et le personnel adorable", "!!!"]
+        languages = default_identifier().predict(texts)
+        if languages != ["en", "fr", "en", "es", "fr", "en"]:
+            print(f"   [ERREUR] Langues incorrectes: {languages}")
+            return False
+        if group_by_language(languages) != {"en": [0, 2, 5], "fr": [1, 4], "es": [3]}:
+            print("   [ERREUR] Regroupement par langue incorrect")
+            return False
+        print(f"[OK] Langues identifiees: {languages}")
+        
+        # Titres du dataset (anglais): presque tous restent en anglais, même très courts
+        import csv
+        with open("TA_restaurants_balanced.csv", encoding="utf-8") as f:
+            titles = [row["Review"] for row in csv.DictReader(f)]
+        routed_away = sum(language != "en" for language in default_identifier().predict(titles))
+        if routed_away > len(titles) // 200 or default_identifier().predict(["Excellent", "Decent"]) != ["en", "en"]:
+            print(f"   [ERREUR] Titres anglais routes vers une autre langue: {routed_away}/{len(titles)}")
+            return False
+        print(f"[OK] Titres anglais routes ailleurs: {routed_away}/{len(titles)}")
+        
+        # Sans lexique propre (es), tous les mots-clés
+        if "génial" not in SimpleEmotionDetector().emotion_keywords["joie"] or \
+                "génial" in SimpleEmotionDetector("en").emotion_keywords["joie"]:
+            print("   [ERREUR] Mots-cles par langue incorrects")
+            return False
+        
+        # Un appel par langue présente dans le lot, résultats remis dans l'ordre des avis
+        detector = MultilingualEmotionDetector(use_model=False)
+        calls = []
+        for language in ("en", "fr", "es"):
+            inner = detector.detector_for(language)
+            inner.predict_emotions = (lambda batch, *args, _inner=inner, _lang=language:
+                                      calls.append((_lang, len(batch))) or
+                                      [_inner.predict_emotion(text) for text in batch])
+        scores = detector.predict_emotions(texts)
+        if sorted(calls) != [("en", 3), ("es", 1), ("fr", 2)]:
+            print(f"   [ERREUR] Appels par langue incorrects: {calls}")
+            return False
+        expected = SimpleEmotionDetector("fr").predict_emotion(texts[1])
+        if scores[1] != expected or detector.get_main_emotion(texts[4])[0] != "joie":
+            print(f"   [ERREUR] Scores routes incorrects: {scores[1]}")
+            return False
+        print("[OK] Un appel par langue, mots-cles de la langue, ordre des avis conserve")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de routage multilingue: {e}")
+        return False
+
+def test_emotion_lexicon():
+    """Test 28: Vérifier la compilation des lexiques (flexions, dédoublonnage, table sauvegardée)"""
+    print_header("TEST 28: Lexiques d'Emotions")
+    
+    try:
+        import json
+        import tempfile
+        import time
+        from emotion_lexicon import LexiconMatcher, compiled_path, expand_term, load_or_compile
+        
+        lemma, forms = expand_term("heureux", "fr")
+        if lemma != "heureux" or not {"heureuse", "heureuses"} <= forms or \
+                not {"loves", "loved", "loving"} <= expand_term("love", "en")[1]:
+            print(f"   [ERREUR] Flexions incorrectes: {sorted(forms)}")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            lexicons = {
+                "en": {"joie": ["love", "great", "great"], "colère": ["angry", "fed up"]},
+                "fr": {"joie": ["heureux", "great"], "colère": ["en colère", "détester|déteste|détesté"]},
+            }
+            for language, emotions in lexicons.items():
+                with open(os.path.join(tmp, f"emotions.{language}.json"), "w", encoding="utf-8") as f:
+                    json.dump({"version": 1, "language": language, "emotions": emotions}, f)
+            
+            matcher = load_or_compile(root=tmp)
+            if matcher.keywords() != {"joie": ["love", "great", "heureux"],
+                                      "colère": ["angry", "fed up", "en colère", "détester"]}:
+                print(f"   [ERREUR] Termes dedoublonnes incorrects: {matcher.keywords()}")
+                return False
+            counts = matcher.count_batch(["We loved it, great great food", "Heureuses mais en colère",
+                                          "I was FED UP and they detest nothing", "rien"])
+            if counts.tolist() != [[2, 0], [1, 1], [0, 1], [0, 0]]:
+                print(f"   [ERREUR] Comptes incorrects: {counts.tolist()}")
+                return False
+            print(f"[OK] {len(matcher)} termes, {len(matcher.forms)} formes (flexions, expressions)")
+            
+            # Table sauvegardée rechargée telle quelle, recompilée si une source change
+            start = time.perf_counter()
+            loaded = LexiconMatcher.load(compiled_path("all", tmp))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if loaded.count("angry") != matcher.count("angry") or loaded.signature != matcher.signature:
+                print("   [ERREUR] Table sauvegardee differente")
+                return False
+            with open(os.path.join(tmp, "emotions.en.json"), "w", encoding="utf-8") as f:
+                json.dump({"version": 2, "language": "en", "emotions": {"joie": ["happy"]}}, f)
+            if load_or_compile("en", root=tmp).count("happily happier") != {"joie": 1}:
+                print("   [ERREUR] Lexique non recompile apres modification")
+                return False
+            print(f"[OK] Table rechargee en {elapsed_ms:.1f} ms, recompilee apres modification d'une source")
+        
+        # Régression: mêmes émotions que l'ancien détecteur (sous-chaînes des listes codées en dur)
+        # sur le dataset; seuls les faux positifs de sous-chaînes ("lent" dans "plenty") disparaissent
+        import csv
+        import re
+        from emotion_detection import SimpleEmotionDetector
+        from emotion_lexicon import get_matcher
+        from aggregate_cube import _source_signature
+        
+        baseline_keywords = {
+            'joie': ['excellent', 'amazing', 'wonderful', 'great', 'fantastic', 'love', 'perfect',
+                     'excellent', 'merveilleux', 'génial', 'fantastique', 'adorable', 'parfait',
+                     'superbe', 'délicieux', 'satisfait', 'content', 'heureux', 'ravie'],
+            'tristesse': ['disappointed', 'sad', 'bad', 'terrible', 'awful', 'worst', 'poor',
+                          'déçu', 'triste', 'mauvais', 'terrible', 'affreux', 'pire', 'médiocre',
+                          'décevant', 'tristesse', 'regret'],
+            'colère': ['angry', 'frustrated', 'annoyed', 'horrible', 'disgusting', 'hate', 'slow',
+                       'en colère', 'frustré', 'énervé', 'horrible', 'dégoûtant', 'déteste', 'lent',
+                       'frustration', 'colère', 'mécontent'],
+            'surprise': ['surprised', 'unexpected', 'wow', 'incredible', 'unbelievable', 'shocked',
+                         'surpris', 'inattendu', 'incroyable', 'impressionnant', 'étonnant', 'choqué'],
+        }
+        
+        def baseline_matches(text):
+            lower = text.lower()
+            return [k for words in baseline_keywords.values() for k in words if k in lower]
+        
+        with open("TA_restaurants_balanced.csv", encoding="utf-8") as f:
+            reviews = [row["Review"] for row in csv.DictReader(f)]
+        emotions = [e for e, _ in SimpleEmotionDetector().get_main_emotions(reviews)]
+        lost = [text for text, emotion in zip(reviews, emotions)
+                if emotion == "neutre" and baseline_matches(text)]
+        # Perte réelle: un mot-clé trouvé en début de mot (pas seulement à l'intérieur d'un autre mot)
+        real_losses = [text for text in lost
+                       if any(re.search(r"\b" + re.escape(k), text.lower()) for k in baseline_matches(text))]
+        if len(real_losses) > len(reviews) // 1000:
+            print(f"   [ERREUR] {len(real_losses)} avis perdent leur emotion: {real_losses[:5]}")
+            return False
+        print(f"[OK] {len(reviews)} avis: {len(lost)} faux positifs de sous-chaines retires, "
+              f"{len(real_losses)} perte(s) reelle(s)")
+        
+        # Les caches qui stockent des émotions sont indexés par la signature des lexiques
+        if get_matcher().signature not in _source_signature("TA_restaurants_balanced.csv"):
+            print("   [ERREUR] Cube non invalide par un changement de lexique")
+            return False
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test des lexiques: {e}")
+        return False
+
+def test_batch_inference():
+    """Test 29: Vérifier l'inférence par lots (tri par longueur, préchargement, encodages partagés)"""
+    print_header("TEST 29: Inference par Lots")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import torch
+        from batch_inference import length_sorted_batches, pretokenize, run_batched_inference
+        from model_store import load_sequence_classifier
+        
+        rng = np.random.default_rng(0)
+        words = ["good", "bad", "food"]
+        # Longueurs mélangées: l'ordre des lots diffère de l'ordre des textes
+        texts = [" ".join(rng.choice(words, n)) for n in rng.permutation(np.arange(1, 24))]
+        batches = length_sorted_batches(texts, 4)
+        if sorted(np.concatenate(batches).tolist()) != list(range(len(texts))):
+            print("   [ERREUR] Lots incomplets")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            tokenizer, model, device = load_sequence_classifier(build_tiny_model(os.path.join(tmp, "model")))
+            with torch.inference_mode():
+                expected = np.stack([model(**tokenizer([t], return_tensors="pt").to(device)).logits[0].cpu().numpy()
+                                     for t in texts])
+            outputs = {}
+            for prefetch in (True, False):
+                outputs[f"prefetch={prefetch}"], timings = run_batched_inference(
+                    texts, tokenizer, model, device, batch_size=4, prefetch=prefetch)
+                if timings["batches"] != len(batches) or timings["padded_tokens"] < timings["tokens"]:
+                    print(f"   [ERREUR] Temps par etape incoherents: {timings}")
+                    return False
+            shared_batches, encodings, _ = pretokenize(texts, tokenizer, batch_size=4)
+            outputs["pretokenize"], _ = run_batched_inference(texts, tokenizer, model, device,
+                                                              batches=shared_batches, encodings=encodings)
+        
+        for name, output in outputs.items():
+            if output.shape != expected.shape or not np.allclose(output, expected, atol=1e-5):
+                print(f"   [ERREUR] Sorties par lots ({name}) differentes des sorties avis par avis")
+                return False
+        print(f"[OK] {len(texts)} avis en {len(batches)} lots: sorties identiques dans l'ordre d'origine "
+              f"({', '.join(outputs)})")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test de l'inference par lots: {e}")
+        return False
+
+def test_latency_tracker():
+    """Test 30: Vérifier les percentiles, l'histogramme et les taux de cache du tracker de latence"""
+    print_header("TEST 30: Suivi de Latence")
+    
+    try:
+        from latency_tracker import LatencyTracker
+        
+        tracker = LatencyTracker(window=100)
+        # 1 à 100 ms, puis 1000 ms qui fait sortir 1 ms de la fenêtre des percentiles
+        for ms in range(1, 101):
+            tracker.record("forward", ms / 1000)
+        tracker.record("forward", 1.0)
+        p50, p95 = tracker.percentile("forward", 50), tracker.percentile("forward", 95)
+        if abs(p50 - 51.5) > 1e-6 or abs(p95 - 96.05) > 1e-6:
+            print(f"   [ERREUR] Percentiles incorrects: p50={p50}, p95={p95}")
+            return False
+        histogram = tracker.histogram("forward")
+        row = tracker.summary()[0]
+        if (histogram["1"] != 1 or histogram["10"] != 5 or histogram["1000"] != 1
+                or sum(histogram.values()) != 101 or row["Appels"] != 101
+                or abs(row["Moyenne (ms)"] - round(6050 / 101, 2)) > 1e-9 or row["Max (ms)"] != 1000):
+            print(f"   [ERREUR] Histogramme ou resume incorrect: {histogram}, {row}")
+            return False
+        print(f"[OK] p50={p50:.2f} ms, p95={p95:.2f} ms sur la fenetre, histogramme cumule sur 101 mesures")
+        
+        # 4 appels dont 1 calcul: 75% de succès; aucun appel: None
+        for _ in range(4):
+            tracker.cache_lookup("model")
+        tracker.cache_miss("model")
+        tracker.cache_miss("unused")
+        if (tracker.cache_hit_rate("model") != 0.75 or tracker.cache_hit_rate("unused") is not None
+                or tracker.cache_summary() != {"model": 0.75}):
+            print(f"   [ERREUR] Taux de cache incorrects: {tracker.cache_summary()}")
+            return False
+        print("[OK] Taux de succes du cache: 75% (4 appels, 1 calcul)")
+        return True
+        
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors du test du suivi de latence: {e}")
+        return False
+
 def run_all_tests():
     """Exécute tous les tests"""
     print("\n" + "=" * 60)
@@ -280,6 +1711,30 @@ def run_all_tests():
     results['processing'] = test_data_processing()
     results['scripts'] = test_scripts()
     results['documentation'] = test_documentation()
+    results['split'] = test_split_dataset()
+    results['metrics'] = test_prometheus_metrics()
+    results['startup'] = test_startup_imports()
+    results['model_store'] = test_model_store()
+    results['mmap'] = test_mmap_loading()
+    results['chunked'] = test_chunked_analysis()
+    results['token_index'] = test_token_index()
+    results['cube'] = test_aggregate_cube()
+    results['review_store'] = test_review_store()
+    results['chat_view'] = test_chat_view()
+    results['analysis_queue'] = test_analysis_queue()
+    results['long_document'] = test_long_document()
+    results['emotion_matrix'] = test_emotion_category_matrix()
+    results['aspects'] = test_aspect_sentiment()
+    results['embeddings'] = test_embedding_index()
+    results['tfidf'] = test_tfidf_sentiment()
+    results['distillation'] = test_distillation()
+    results['pruning'] = test_pruning()
+    results['threads'] = test_thread_tuning()
+    results['compiled'] = test_compiled_model()
+    results['languages'] = test_language_routing()
+    results['lexicons'] = test_emotion_lexicon()
+    results['batch_inference'] = test_batch_inference()
+    results['latency'] = test_latency_tracker()
     
     # Résumé final
     print_header("RÉSUMÉ DES TESTS")
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Modèle de sentiment TF-IDF + régression logistique (backend CPU rapide)
+
+Alternative légère à DistilBERT pour les gros volumes: les avis sont
+représentés par des n-grammes de mots (1-2) pondérés TF-IDF, puis classés par
+une régression logistique multinomiale sur les mêmes labels que le modèle de
+sentiment (balance_dataset.rating_to_label: 0 Négatif, 1 Neutre, 2 Positif).
+
+Par défaut les mots passent par un HashingVectorizer (pas de dictionnaire en
+mémoire, taille du modèle fixe, vocabulaire ouvert): c'est la configuration
+du premier étage, environ 70k avis/s par cœur. Option --char: n-grammes de
+caractères (3-5, limités aux mots) en plus, un peu plus précis mais environ
+5 fois plus lent (~15k avis/s). Option --vocabulary: TfidfVectorizer avec un
+vocabulaire appris au lieu du hashing.
+
+Le modèle est entraîné sur le split train sauvegardé (split_dataset), évalué
+sur val/test et sérialisé avec joblib dans MODELS_DIR/tfidf-sentiment
+(pipeline.joblib + manifest.json). En premier étage d'un traitement en masse,
+les avis dont la confiance dépasse un seuil gardent la prédiction linéaire et
+seuls les autres passent par le transformer (cascade_predict, utilisé par
+evaluate_model.py --first-stage).
+
+Utilisation:
+    python tfidf_sentiment.py train --csv TA_restaurants_balanced.csv
+    python tfidf_sentiment.py train --char --vocabulary
+    python tfidf_sentiment.py predict "The food was cold and the waiter rude"
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+MODEL_KIND = "tfidf-logreg"
+MODEL_FILE = "pipeline.joblib"
+MANIFEST_FILE = "manifest.json"
+DEFAULT_MODEL_NAME = "tfidf-sentiment"
+SENTIMENT_LABELS = ("Négatif", "Neutre", "Positif")
+# Seuil de confiance au-delà duquel la prédiction linéaire est gardée (premier étage)
+DEFAULT_CONFIDENCE = 0.8
+# Nombre de features de chaque HashingVectorizer (mots, caractères)
+HASHING_FEATURES = 2 ** 18
+
+
+def default_model_dir() -> str:
+    """Répertoire du modèle (MODELS_DIR/tfidf-sentiment)"""
+    from model_store import models_dir
+
+    return os.path.join(models_dir(), DEFAULT_MODEL_NAME)
+
+
+def is_linear_model_dir(path: str) -> bool:
+    """Vrai si le dossier contient un modèle TF-IDF sérialisé"""
+    return os.path.isfile(os.path.join(path, MODEL_FILE)) and os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def build_pipeline(hashing: bool = True, char_ngrams: bool = False, C: float = 4.0,
+                   max_features: int = 300_000):
+    """
+    Pipeline scikit-learn: features TF-IDF (mots, caractères en option) puis régression logistique
+
+    Args:
+        hashing: HashingVectorizer + TfidfTransformer au lieu de TfidfVectorizer
+        char_ngrams: Ajouter les n-grammes de caractères (3-5, dans les mots)
+        C: Inverse de la régularisation de la régression logistique
+        max_features: Taille maximale de chaque vocabulaire (sans hashing)
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import FeatureUnion, Pipeline
+
+    analyzers = [("word", "word", (1, 2), 2)]
+    if char_ngrams:
+        analyzers.append(("char", "char_wb", (3, 5), 3))
+
+    features = []
+    for name, analyzer, ngram_range, min_df in analyzers:
+        if hashing:
+            vectorizer = Pipeline([
+                ("hash", HashingVectorizer(analyzer=analyzer, ngram_range=ngram_range,
+                                           n_features=HASHING_FEATURES, alternate_sign=False,
+                                           norm=None, dtype=np.float32)),
+                ("tfidf", TfidfTransformer(sublinear_tf=True)),
+            ])
+        else:
+            vectorizer = TfidfVectorizer(analyzer=analyzer, ngram_range=ngram_range, min_df=min_df,
+                                         max_features=max_features, sublinear_tf=True, dtype=np.float32)
+        features.append((name, vectorizer))
+
+    return Pipeline([
+        ("features", FeatureUnion(features)),
+        ("clf", LogisticRegression(C=C, max_iter=2000)),
+    ])
+
+
+def dataset_labels(df) -> np.ndarray:
+    """Labels de sentiment: colonne label, sinon rating_to_label(Rating) (-1 si note absente)"""
+    from balance_dataset import rating_to_label
+
+    if "label" in df.columns:
+        return df["label"].astype(int).to_numpy()
+    return np.array([rating_to_label(r) if r == r else -1 for r in df["Rating"]], dtype=np.int64)
+
+
+def confident_mask(probs: np.ndarray, threshold: float = DEFAULT_CONFIDENCE) -> np.ndarray:
+    """Avis dont la prédiction linéaire est assez sûre pour se passer du transformer"""
+    return np.asarray(probs).max(axis=1) >= threshold
+
+
+def cascade_predict(texts: Sequence[str], linear, second_stage: Callable[[List[str]], np.ndarray],
+                    threshold: float = DEFAULT_CONFIDENCE):
+    """
+    Traitement en masse à deux étages: modèle linéaire, puis transformer pour les avis peu sûrs
+
+    Args:
+        texts: Avis à classer
+        linear: Premier étage (LinearSentimentModel ou objet avec predict_proba)
+        second_stage: Fonction textes -> probabilités [m, 3], appelée une seule fois
+            sur les avis dont la confiance linéaire est sous le seuil
+        threshold: Seuil de confiance du premier étage
+
+    Returns:
+        (probabilités [n, 3], masque des avis décidés par le premier étage)
+    """
+    texts = list(texts)
+    probs = linear.predict_proba(texts)
+    confident = confident_mask(probs, threshold)
+    rest = np.flatnonzero(~confident)
+    if len(rest):
+        probs[rest] = np.asarray(second_stage([texts[i] for i in rest]), dtype=probs.dtype)
+    return probs, confident
+
+
+class LinearSentimentModel:
+    """
+    Modèle TF-IDF + régression logistique sérialisé (probabilités Négatif, Neutre, Positif)
+    """
+
+    def __init__(self, pipeline, manifest: Optional[Dict] = None):
+        self.pipeline = pipeline
+        self.manifest = manifest or {}
+
+    @property
+    def name(self) -> str:
+        return self.manifest.get("name", DEFAULT_MODEL_NAME)
+
+    @property
+    def version(self) -> str:
+        """Version pour la traçabilité (nom@date d'entraînement)"""
+        trained_at = self.manifest.get("trained_at")
+        return f"{self.name}@{trained_at}" if trained_at else self.name
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Probabilités float32 [n, 3] (Négatif, Neutre, Positif)"""
+        if len(texts) == 0:
+            return np.empty((0, len(SENTIMENT_LABELS)), dtype=np.float32)
+        return self.pipeline.predict_proba([str(t) for t in texts]).astype(np.float32)
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        # Utilisable directement comme scorer (ex: AspectSentimentAnalyzer)
+        return self.predict_proba(texts)
+
+    def predict(self, texts: Sequence[str]) -> List[str]:
+        """Sentiment de chaque avis"""
+        return [SENTIMENT_LABELS[i] for i in self.predict_proba(texts).argmax(axis=1)]
+
+    def save(self, directory: str):
+        import joblib
+
+        os.makedirs(directory, exist_ok=True)
+        joblib.dump(self.pipeline, os.path.join(directory, MODEL_FILE))
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: Optional[str] = None) -> "LinearSentimentModel":
+        """Charge un modèle sérialisé (défaut: MODELS_DIR/tfidf-sentiment)"""
+        import joblib
+
+        directory = directory or default_model_dir()
+        if not is_linear_model_dir(directory):
+            raise FileNotFoundError(
+                f"Modele TF-IDF absent: {directory}. Lancez: python tfidf_sentiment.py train"
+            )
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("kind") != MODEL_KIND:
+            raise ValueError(f"Modele inattendu dans {directory}: {manifest.get('kind')}")
+        return cls(joblib.load(os.path.join(directory, MODEL_FILE)), manifest)
+
+
+def train_linear_model(
+    csv_path: str = "TA_restaurants_balanced.csv",
+    text_column: str = "Review",
+    output_dir: Optional[str] = None,
+    hashing: bool = True,
+    char_ngrams: bool = False,
+    C: float = 4.0,
+    seed: int = 42
+) -> LinearSentimentModel:
+    """
+    Entraîne le modèle sur le split train, l'évalue sur val/test et le sauvegarde
+
+    Args:
+        csv_path: Dataset CSV (colonne label, ou Rating convertie par rating_to_label)
+        text_column: Colonne des avis
+        output_dir: Dossier de sortie (défaut: MODELS_DIR/tfidf-sentiment)
+        hashing: HashingVectorizer au lieu d'un vocabulaire appris
+        char_ngrams: Ajouter les n-grammes de caractères (~5 fois plus lent)
+        C: Inverse de la régularisation
+        seed: Seed du split
+
+    Returns:
+        Modèle entraîné (métriques dans manifest["metrics"])
+    """
+    import pandas as pd
+    from sklearn import __version__ as sklearn_version
+    from sklearn.metrics import accuracy_score, f1_score
+    from split_dataset import load_or_build_split
+
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    df, split = load_or_build_split(csv_path, text_column=text_column,
+                                    label_column="label" if "label" in columns else None, seed=seed)
+    texts = df[text_column].astype(str).tolist()
+    labels = dataset_labels(df)
+    parts = {name: idx[labels[idx] >= 0] for name, idx in split.items()}
+
+    pipeline = build_pipeline(hashing=hashing, char_ngrams=char_ngrams, C=C)
+    start = time.perf_counter()
+    pipeline.fit([texts[i] for i in parts["train"]], labels[parts["train"]])
+    train_time = time.perf_counter() - start
+
+    model = LinearSentimentModel(pipeline)
+    metrics = {"train_seconds": round(train_time, 2), "n_train": int(len(parts["train"]))}
+    for name in ("val", "test"):
+        if len(parts[name]) == 0:
+            continue
+        part_texts = [texts[i] for i in parts[name]]
+        start = time.perf_counter()
+        probs = model.predict_proba(part_texts)
+        elapsed = time.perf_counter() - start
+        predictions = probs.argmax(axis=1)
+        confident = confident_mask(probs)
+        metrics[name] = {
+            "n": int(len(part_texts)),
+            "accuracy": round(float(accuracy_score(labels[parts[name]], predictions)), 4),
+            "f1_macro": round(float(f1_score(labels[parts[name]], predictions, average="macro")), 4),
+            "reviews_per_second": round(len(part_texts) / max(elapsed, 1e-9), 1),
+            # Premier étage: part des avis gardés et leur accuracy
+            "confident_share": round(float(confident.mean()), 4),
+            "confident_accuracy": round(float((predictions[confident] == labels[parts[name]][confident]).mean()), 4)
+            if confident.any() else None,
+        }
+
+    model.manifest = {
+        "kind": MODEL_KIND,
+        "name": DEFAULT_MODEL_NAME,
+        "labels": list(SENTIMENT_LABELS),
+        "trained_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "dataset": os.path.basename(csv_path),
+        "params": {"hashing": hashing, "char_ngrams": char_ngrams, "C": C, "seed": seed},
+        "sklearn_version": sklearn_version,
+        "metrics": metrics,
+    }
+    model.save(output_dir or default_model_dir())
+    return model
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Modele de sentiment TF-IDF + regression logistique")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Entrainer et sauvegarder le modele")
+    train_parser.add_argument("--csv", default="TA_restaurants_balanced.csv", help="Dataset CSV")
+    train_parser.add_argument("--text-column", default="Review")
+    train_parser.add_argument("--output", default=None, help="Dossier (defaut: MODELS_DIR/tfidf-sentiment)")
+    train_parser.add_argument("--vocabulary", action="store_true",
+                              help="TfidfVectorizer (vocabulaire appris) au lieu du HashingVectorizer")
+    train_parser.add_argument("--char", action="store_true",
+                              help="Ajouter les n-grammes de caracteres (plus precis, ~5 fois plus lent)")
+    train_parser.add_argument("-C", type=float, default=4.0, help="Inverse de la regularisation")
+
+    predict_parser = subparsers.add_parser("predict", help="Predire le sentiment d'avis")
+    predict_parser.add_argument("texts", nargs="+")
+    predict_parser.add_argument("--model", default=None, help="Dossier du modele")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        model = train_linear_model(args.csv, args.text_column, args.output, hashing=not args.vocabulary,
+                                   char_ngrams=args.char, C=args.C)
+        metrics = model.manifest["metrics"]
+        print(f"[OK] Modele entraine en {metrics['train_seconds']} s sur {metrics['n_train']} avis "
+              f"-> {args.output or default_model_dir()}")
+        for name in ("val", "test"):
+            if name in metrics:
+                m = metrics[name]
+                print(f"   {name:<5} accuracy {m['accuracy']*100:.2f}%  F1 macro {m['f1_macro']*100:.2f}%  "
+                      f"{m['reviews_per_second']:.0f} avis/s  confiance >= {DEFAULT_CONFIDENCE}: "
+                      f"{m['confident_share']*100:.1f}% des avis"
+                      + (f" ({m['confident_accuracy']*100:.2f}% justes)" if m["confident_accuracy"] is not None else ""))
+    else:
+        model = LinearSentimentModel.load(args.model)
+        for text, probs in zip(args.texts, model.predict_proba(args.texts)):
+            label = int(probs.argmax())
+            print(f"   {SENTIMENT_LABELS[label]:<8} {probs[label]*100:5.1f}%  {text}")
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Réglage automatique des threads PyTorch pour l'inférence CPU
+
+Sans réglage, PyTorch prend autant de threads que de cœurs visibles par l'OS:
+dans un conteneur limité (quota CPU) ou sur un nœud partagé entre plusieurs
+sessions Streamlit, les threads se marchent dessus; à l'inverse un seul thread
+laisse des cœurs inutilisés.
+
+- autotune: balaie les threads intra-op / inter-op et les tailles de lot pour
+  les modèles de sentiment et d'émotions sur la machine courante, un processus
+  neuf par configuration (les threads inter-op ne se fixent qu'une fois par
+  processus), et écrit la meilleure configuration dans MODELS_DIR/threads.json
+  (ou THREAD_CONFIG)
+- apply_thread_config: appliquée une fois par processus par
+  model_store.load_sequence_classifier, donc par toutes les applications
+- tuned_batch_size: taille de lot retenue pour un type de modèle (configuration
+  lue une fois par processus, pas à chaque lot)
+
+Utilisation:
+    python thread_tuning.py autotune
+    python thread_tuning.py autotune --threads 1,2,4 --batch-sizes 1,8,32
+    python thread_tuning.py show
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+from model_store import models_dir
+
+CONFIG_NAME = "threads.json"
+DEFAULT_MODELS = {
+    "sentiment": os.environ.get("SENTIMENT_MODEL", "distilbert-base-uncased"),
+    "emotion": "j-hartmann/emotion-english-distilroberta-base",
+}
+DEFAULT_BATCH_SIZES = (1, 8, 16, 32, 64)
+DEFAULT_N_TEXTS = 128
+DEFAULT_CSV = "TA_restaurants_ML_clean_cleaned.csv"
+
+_applied: Optional[Dict] = None
+_config: Optional[Dict] = None
+
+
+def config_path() -> str:
+    """Fichier de configuration des threads (variable THREAD_CONFIG, défaut: MODELS_DIR/threads.json)"""
+    return os.environ.get("THREAD_CONFIG") or os.path.join(models_dir(), CONFIG_NAME)
+
+
+def read_thread_config(path: Optional[str] = None) -> Dict:
+    """Configuration enregistrée par autotune ({} si absente ou illisible)"""
+    try:
+        with open(path or config_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def thread_config() -> Dict:
+    """Configuration de config_path(), lue une fois par processus"""
+    global _config
+    if _config is None:
+        _config = read_thread_config()
+    return _config
+
+
+def available_cpus() -> int:
+    """Cœurs utilisables par ce processus (affinité du conteneur si disponible)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def set_threads(intra_op: int, inter_op: Optional[int] = None) -> Dict:
+    """
+    Fixe les threads PyTorch de ce processus (une seule fois: les appels suivants sont ignorés)
+
+    Returns:
+        Threads effectivement appliqués
+    """
+    global _applied
+    import torch
+
+    if _applied is not None:
+        return _applied
+    torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Travail parallèle déjà lancé dans ce processus: valeur par défaut conservée
+            print(f"[ATTENTION] Threads inter-op non modifiables ({torch.get_num_interop_threads()} gardes)")
+    _applied = {"intra_op_threads": torch.get_num_threads(), "inter_op_threads": torch.get_num_interop_threads()}
+    return _applied
+
+
+def apply_thread_config(path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Applique la configuration d'autotune si elle existe (une fois par processus)
+
+    Returns:
+        Threads appliqués, ou None sans configuration
+    """
+    if _applied is not None:
+        return _applied
+    config = read_thread_config(path) if path else thread_config()
+    if not config.get("intra_op_threads"):
+        return None
+    return set_threads(config["intra_op_threads"], config.get("inter_op_threads"))
+
+
+def tuned_batch_size(kind: str, default: int) -> int:
+    """Taille de lot retenue par autotune pour "sentiment" ou "emotion" (default sinon)"""
+    return int(thread_config().get("batch_sizes", {}).get(kind, default))
+
+
+def candidate_threads(cpus: int) -> List[int]:
+    """1, 2, 4, ... jusqu'au nombre de cœurs (inclus)"""
+    counts, n = [], 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    return counts + [cpus]
+
+
+def sample_texts(csv_path: str = DEFAULT_CSV, n: int = DEFAULT_N_TEXTS, seed: int = 42) -> List[str]:
+    """Avis réels du dataset (longueurs représentatives), ou textes factices de 16 à 128 mots"""
+    if os.path.exists(csv_path):
+        import pandas as pd
+
+        reviews = pd.read_csv(csv_path, usecols=["Review"])["Review"].dropna().astype(str)
+        if len(reviews):
+            return reviews.sample(min(n, len(reviews)), random_state=seed).tolist()
+    return [" ".join(["good"] * (16 + (i * 37) % 113)) for i in range(n)]
+
+
+def measure(model_name: str, intra_op: int, inter_op: int, batch_sizes: Sequence[int],
+            texts: Sequence[str], max_length: int = 128) -> Dict[str, float]:
+    """
+    Débit (avis/s) de chaque taille de lot avec ces threads (à exécuter dans un processus neuf)
+
+    Returns:
+        Dictionnaire taille de lot (str) -> avis par seconde
+    """
+    import torch
+    from batch_inference import run_batched_inference
+    from model_store import load_sequence_classifier, warm_up
+
+    set_threads(intra_op, inter_op)
+    tokenizer, model, device = load_sequence_classifier(model_name, device=torch.device("cpu"))
+    warm_up(tokenizer, model, device, max_length=max_length)
+    throughput = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        run_batched_inference(list(texts), tokenizer, model, device, batch_size=batch_size,
+                              max_length=max_length, prefetch=False)
+        throughput[str(batch_size)] = len(texts) / (time.perf_counter() - start)
+    return throughput
+
+
+def run_worker(model_name: str, intra_op: int, inter_op: int, batch_sizes: Sequence[int],
+               csv_path: str, n_texts: int, timeout: float = 1800) -> Dict[str, float]:
+    """Lance measure dans un processus Python neuf et relit son résultat (JSON, dernière ligne)"""
+    command = [
+        sys.executable, os.path.abspath(__file__), "worker",
+        "--model", model_name, "--intra", str(intra_op), "--inter", str(inter_op),
+        "--batch-sizes", ",".join(map(str, batch_sizes)), "--csv", csv_path, "--n-texts", str(n_texts),
+    ]
+    # Les variables OMP/MKL héritées fixeraient les threads avant torch.set_num_threads
+    env = {k: v for k, v in os.environ.items() if k not in ("OMP_NUM_THREADS", "MKL_NUM_THREADS")}
+    result = subprocess.run(command, capture_output=True, text=True, timeout=timeout, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"Mesure echouee ({model_name}, {intra_op}x{inter_op}): {result.stderr[-500:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def select_best(results: Sequence[Dict]) -> Dict:
+    """
+    Choisit les threads qui maximisent le débit relatif moyen des modèles
+
+    Args:
+        results: Lignes {"intra_op_threads", "inter_op_threads", "throughput": {type: {lot: avis/s}}}
+
+    Returns:
+        Configuration: threads, taille de lot par type de modèle et débits retenus
+    """
+    kinds = sorted({kind for row in results for kind in row["throughput"]})
+    # Meilleur débit de chaque modèle, toutes configurations confondues (normalisation)
+    best = {kind: max(max(row["throughput"][kind].values()) for row in results) for kind in kinds}
+
+    def score(row):
+        return sum(max(row["throughput"][kind].values()) / best[kind] for kind in kinds) / len(kinds)
+
+    winner = max(results, key=score)
+    batch_sizes = {kind: int(max(winner["throughput"][kind], key=winner["throughput"][kind].get))
+                   for kind in kinds}
+    return {
+        "intra_op_threads": winner["intra_op_threads"],
+        "inter_op_threads": winner["inter_op_threads"],
+        "batch_sizes": batch_sizes,
+        "reviews_per_second": {kind: winner["throughput"][kind][str(batch_sizes[kind])] for kind in kinds},
+    }
+
+
+def autotune(
+    models: Optional[Dict[str, str]] = None,
+    threads: Optional[Sequence[int]] = None,
+    interop_threads: Sequence[int] = (1, 2),
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    csv_path: str = DEFAULT_CSV,
+    n_texts: int = DEFAULT_N_TEXTS,
+    output: Optional[str] = None
+) -> Dict:
+    """
+    Mesure chaque configuration de threads et enregistre la meilleure
+
+    Args:
+        models: Type ("sentiment", "emotion") -> modèle (défaut: modèles des applications)
+        threads: Threads intra-op testés (défaut: 1, 2, 4, ... cœurs disponibles)
+        interop_threads: Threads inter-op testés
+        batch_sizes: Tailles de lot testées
+        csv_path: Dataset dont les avis servent aux mesures
+        n_texts: Nombre d'avis mesurés par taille de lot
+        output: Fichier de configuration (défaut: config_path())
+
+    Returns:
+        Configuration enregistrée
+    """
+    models = models or DEFAULT_MODELS
+    cpus = available_cpus()
+    threads = threads or candidate_threads(cpus)
+    results = []
+    for intra_op in threads:
+        for inter_op in interop_threads:
+            row = {"intra_op_threads": intra_op, "inter_op_threads": inter_op, "throughput": {}}
+            for kind, model_name in models.items():
+                row["throughput"][kind] = run_worker(model_name, intra_op, inter_op, batch_sizes,
+                                                     csv_path, n_texts)
+                best_batch = max(row["throughput"][kind], key=row["throughput"][kind].get)
+                print(f"   {kind:<10} intra={intra_op:<3} inter={inter_op:<3} "
+                      f"{row['throughput'][kind][best_batch]:8.1f} avis/s (lot {best_batch})")
+            results.append(row)
+
+    global _config
+    config = select_best(results)
+    config.update({"cpus": cpus, "models": models, "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "results": results})
+    path = output or config_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp, path)
+    _config = None
+    print(f"[OK] Configuration enregistree: {path} (intra={config['intra_op_threads']}, "
+          f"inter={config['inter_op_threads']}, lots {config['batch_sizes']})")
+    return config
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reglage automatique des threads PyTorch (inference CPU)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tune_parser = subparsers.add_parser("autotune", help="Mesurer les configurations et enregistrer la meilleure")
+    tune_parser.add_argument("--sentiment-model", default=DEFAULT_MODELS["sentiment"])
+    tune_parser.add_argument("--emotion-model", default=DEFAULT_MODELS["emotion"])
+    tune_parser.add_argument("--threads", type=_int_list, help="Threads intra-op (defaut: 1,2,4,...,coeurs)")
+    tune_parser.add_argument("--interop", type=_int_list, default=[1, 2], help="Threads inter-op")
+    tune_parser.add_argument("--batch-sizes", type=_int_list, default=list(DEFAULT_BATCH_SIZES))
+    tune_parser.add_argument("--csv", default=DEFAULT_CSV, help="Dataset dont les avis servent aux mesures")
+    tune_parser.add_argument("--n-texts", type=int, default=DEFAULT_N_TEXTS)
+    tune_parser.add_argument("--output", help="Fichier de configuration (defaut: MODELS_DIR/threads.json)")
+
+    worker_parser = subparsers.add_parser("worker", help="Mesure d'une configuration (processus interne)")
+    worker_parser.add_argument("--model", required=True)
+    worker_parser.add_argument("--intra", type=int, required=True)
+    worker_parser.add_argument("--inter", type=int, required=True)
+    worker_parser.add_argument("--batch-sizes", type=_int_list, required=True)
+    worker_parser.add_argument("--csv", default=DEFAULT_CSV)
+    worker_parser.add_argument("--n-texts", type=int, default=DEFAULT_N_TEXTS)
+
+    subparsers.add_parser("show", help="Afficher la configuration enregistree")
+
+    args = parser.parse_args()
+    if args.command == "worker":
+        throughput = measure(args.model, args.intra, args.inter, args.batch_sizes,
+                             sample_texts(args.csv, args.n_texts))
+        print(json.dumps(throughput))
+    elif args.command == "autotune":
+        print(f"[INFO] {available_cpus()} coeurs disponibles")
+        autotune({"sentiment": args.sentiment_model, "emotion": args.emotion_model}, args.threads,
+                 args.interop, args.batch_sizes, args.csv, args.n_texts, args.output)
+    else:
+        config = read_thread_config()
+        if not config:
+            print(f"[INFO] Aucune configuration ({config_path()}): lancez python thread_tuning.py autotune")
+        else:
+            print(json.dumps({k: v for k, v in config.items() if k != "results"}, indent=2))
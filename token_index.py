@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Index des fréquences de tokens du dataset (nuages de mots)
+
+Les fréquences des mots sont calculées une seule fois, pour tout le corpus et
+par sentiment, par ville et par émotion, puis sauvegardées à côté du dataset
+(dataset.tokens.npz, matrice creuse facette x vocabulaire). Quand des avis
+sont ajoutés à la fin du CSV, seules les nouvelles lignes sont comptées.
+Les nuages de mots sont générés depuis ces fréquences
+(WordCloud.generate_from_frequencies) et mis en cache en PNG: l'affichage ne
+dépend plus de la taille du corpus.
+"""
+
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+INDEX_VERSION = 2
+ALL_FACET = "all"
+ALL_VALUE = "*"
+FACETS = ("sentiment", "city", "emotion")
+
+_TOKEN_PATTERN = re.compile(r"\b[^\W\d_]{3,}\b")
+
+# Mots vides utilisés si wordcloud n'est pas installé
+_FALLBACK_STOPWORDS = {
+    "the", "and", "was", "were", "for", "with", "this", "that", "but", "are", "have", "had",
+    "you", "not", "they", "our", "their", "there", "very", "from", "all", "which", "les",
+    "des", "est", "une", "pour", "avec", "pas", "sur", "dans", "qui", "que",
+}
+
+
+def _stopwords() -> set:
+    try:
+        from wordcloud import STOPWORDS
+        return set(STOPWORDS)
+    except ImportError:
+        return set(_FALLBACK_STOPWORDS)
+
+
+def tokenize(text, stopwords: Optional[set] = None) -> List[str]:
+    """Mots d'un avis (minuscules, au moins 3 lettres, sans mots vides)"""
+    tokens = _TOKEN_PATTERN.findall(str(text).lower())
+    if stopwords:
+        tokens = [t for t in tokens if t not in stopwords]
+    return tokens
+
+
+def index_path_for(csv_path: str) -> str:
+    """Chemin de l'index associé à un dataset (ex: dataset.tokens.npz)"""
+    root, _ = os.path.splitext(csv_path)
+    return f"{root}.tokens.npz"
+
+
+def _prefix_hash(texts) -> str:
+    """Empreinte des lignes déjà indexées (détecte un dataset modifié et pas seulement complété)"""
+    h = hashlib.blake2b(digest_size=16)
+    for text in texts:
+        h.update(str(text).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _row_facets(df, text_column: str) -> Dict[str, List[str]]:
+    """Valeur de chaque facette pour chaque ligne"""
+    from balance_dataset import LABEL_TO_SENTIMENT, rating_to_label
+    from emotion_detection import SimpleEmotionDetector
+
+    facets = {}
+    if "sentiment" in df.columns:
+        facets["sentiment"] = df["sentiment"].astype(str).tolist()
+    elif "Rating" in df.columns:
+        facets["sentiment"] = [
+            LABEL_TO_SENTIMENT[rating_to_label(r)] if r == r else "nan" for r in df["Rating"]
+        ]
+    if "City" in df.columns:
+        facets["city"] = df["City"].astype(str).tolist()
+    # Émotion du détecteur par mots-clés (rapide, pas de modèle)
+    review_column = "Review" if "Review" in df.columns else text_column
+    detector = SimpleEmotionDetector()
+    facets["emotion"] = [e for e, _ in detector.get_main_emotions(df[review_column].astype(str).tolist())]
+    return facets
+
+
+def _count(df, text_column: str, vocab: List[str], vocab_ids: Dict[str, int]) -> Dict[str, Counter]:
+    """Compte les tokens des lignes de df par clé de facette (complète vocab sur place)"""
+    stopwords = _stopwords()
+    facets = _row_facets(df, text_column)
+    counts: Dict[str, Counter] = {}
+    for row, text in enumerate(df[text_column].astype(str).tolist()):
+        if text == "nan":
+            continue
+        ids = []
+        for token in tokenize(text, stopwords):
+            token_id = vocab_ids.get(token)
+            if token_id is None:
+                token_id = vocab_ids[token] = len(vocab)
+                vocab.append(token)
+            ids.append(token_id)
+        if not ids:
+            continue
+        row_counts = Counter(ids)
+        keys = [f"{ALL_FACET}\t{ALL_VALUE}"] + [f"{facet}\t{values[row]}" for facet, values in facets.items()]
+        for key in keys:
+            counts.setdefault(key, Counter()).update(row_counts)
+    return counts
+
+
+def _merge(index: Optional[Dict], counts: Dict[str, Counter], vocab: List[str]) -> Dict:
+    """Ajoute des comptes à l'index (matrice CSR clés x vocabulaire)"""
+    keys = list(index["keys"]) if index else []
+    key_ids = {key: i for i, key in enumerate(keys)}
+    for key in counts:
+        if key not in key_ids:
+            key_ids[key] = len(keys)
+            keys.append(key)
+
+    rows, cols, values = [], [], []
+    if index:
+        old_rows = np.repeat(np.arange(len(index["indptr"]) - 1), np.diff(index["indptr"]))
+        rows.append(old_rows)
+        cols.append(index["indices"])
+        values.append(index["data"])
+    for key, counter in counts.items():
+        rows.append(np.full(len(counter), key_ids[key], dtype=np.int64))
+        cols.append(np.fromiter(counter.keys(), dtype=np.int64, count=len(counter)))
+        values.append(np.fromiter(counter.values(), dtype=np.int64, count=len(counter)))
+
+    n_keys, n_vocab = len(keys), len(vocab)
+    if rows:
+        rows, cols, values = np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+    else:
+        rows = cols = values = np.zeros(0, dtype=np.int64)
+    # Somme des doublons (clé, mot) et tri par ligne
+    flat, inverse = np.unique(rows.astype(np.int64) * max(n_vocab, 1) + cols, return_inverse=True)
+    data = np.bincount(inverse, weights=values, minlength=len(flat)).astype(np.int64)
+    row_of = flat // max(n_vocab, 1)
+    return {
+        "keys": np.array(keys, dtype=object),
+        "vocab": np.array(vocab, dtype=object),
+        "indptr": np.concatenate([[0], np.cumsum(np.bincount(row_of, minlength=n_keys))]).astype(np.int64),
+        "indices": (flat % max(n_vocab, 1)).astype(np.int32),
+        "data": data,
+    }
+
+
+def _save(index: Dict, path: str):
+    np.savez(
+        path,
+        keys=index["keys"].astype(str), vocab=index["vocab"].astype(str),
+        indptr=index["indptr"], indices=index["indices"], data=index["data"],
+        n_rows=np.array(index["n_rows"]), prefix_hash=np.array(index["prefix_hash"]),
+        params=np.array(index["params"]),
+    )
+
+
+def _load(path: str) -> Dict:
+    with np.load(path, allow_pickle=False) as saved:
+        return {
+            "keys": saved["keys"].astype(object), "vocab": saved["vocab"].astype(object),
+            "indptr": saved["indptr"], "indices": saved["indices"], "data": saved["data"],
+            "n_rows": int(saved["n_rows"]), "prefix_hash": str(saved["prefix_hash"]),
+            "params": str(saved["params"]),
+        }
+
+
+def load_or_update_token_index(
+    csv_path: str = "TA_restaurants_ML_clean_cleaned.csv",
+    text_column: Optional[str] = None,
+    rebuild: bool = False,
+    df=None
+) -> Dict:
+    """
+    Charge l'index de fréquences, en ne comptant que les lignes ajoutées depuis sa création
+
+    Args:
+        csv_path: Chemin du dataset CSV
+        text_column: Colonne des avis (défaut: Review_clean si présente, sinon Review)
+        rebuild: Forcer la reconstruction complète
+        df: DataFrame déjà chargé (évite de relire le CSV)
+
+    Returns:
+        Index (voir frequencies, facet_values, wordcloud_png)
+    """
+    import pandas as pd
+
+    if df is None:
+        df = pd.read_csv(csv_path)
+    if text_column is None:
+        text_column = "Review_clean" if "Review_clean" in df.columns else "Review"
+    from emotion_lexicon import get_matcher
+
+    # Facettes emotion calculées avec les lexiques: l'index est périmé quand ils changent
+    params = f"v{INDEX_VERSION}|{text_column}|{get_matcher().signature}"
+    texts = df[text_column].astype(str)
+    path = index_path_for(csv_path)
+
+    index = None
+    if not rebuild and os.path.exists(path):
+        index = _load(path)
+        n_rows = index["n_rows"]
+        if (index["params"] != params or n_rows > len(df)
+                or _prefix_hash(texts.iloc[:n_rows]) != index["prefix_hash"]):
+            print(f"[INFO] Index de tokens perime ({path}), reconstruction...")
+            index = None
+        elif n_rows == len(df):
+            return _with_version(index)
+
+    start_row = index["n_rows"] if index else 0
+    vocab = list(index["vocab"]) if index else []
+    vocab_ids = {token: i for i, token in enumerate(vocab)}
+    counts = _count(df.iloc[start_row:], text_column, vocab, vocab_ids)
+    merged = _merge(index, counts, vocab)
+    merged.update(n_rows=len(df), prefix_hash=_prefix_hash(texts), params=params)
+    _save(merged, path)
+    print(f"[OK] Index de tokens: {len(df) - start_row} avis ajoutes -> {path}")
+    return _with_version(merged)
+
+
+def _with_version(index: Dict) -> Dict:
+    """Ajoute une version (contenu de l'index) servant de clé de cache aux images"""
+    index["version"] = hashlib.blake2b(
+        f"{index['params']}|{index['n_rows']}|{index['prefix_hash']}".encode(), digest_size=8
+    ).hexdigest()
+    return index
+
+
+def facet_values(index: Dict, facet: str) -> List[str]:
+    """Valeurs disponibles d'une facette (ex: villes), triées"""
+    prefix = f"{facet}\t"
+    return sorted(key[len(prefix):] for key in index["keys"] if key.startswith(prefix))
+
+
+def frequencies(index: Dict, facet: str = ALL_FACET, value: str = ALL_VALUE, top_k: int = 200) -> Dict[str, int]:
+    """
+    Mots les plus fréquents pour une valeur de facette
+
+    Args:
+        index: Index de fréquences
+        facet: "all", "sentiment", "city" ou "emotion"
+        value: Valeur de la facette (ignorée pour "all")
+        top_k: Nombre de mots retournés
+
+    Returns:
+        Dictionnaire mot -> nombre d'occurrences (du plus fréquent au moins fréquent)
+    """
+    key = f"{ALL_FACET}\t{ALL_VALUE}" if facet == ALL_FACET else f"{facet}\t{value}"
+    matches = np.flatnonzero(index["keys"] == key)
+    if len(matches) == 0:
+        return {}
+    row = int(matches[0])
+    start, end = index["indptr"][row], index["indptr"][row + 1]
+    data, indices = index["data"][start:end], index["indices"][start:end]
+    if len(data) > top_k:
+        top = np.argpartition(-data, top_k)[:top_k]
+        data, indices = data[top], indices[top]
+    order = np.argsort(-data, kind="stable")
+    return {index["vocab"][indices[i]]: int(data[i]) for i in order}
+
+
+def wordcloud_png(
+    index: Dict,
+    facet: str = ALL_FACET,
+    value: str = ALL_VALUE,
+    width: int = 800,
+    height: int = 400,
+    max_words: int = 100,
+    cache_dir: Optional[str] = None
+) -> Optional[bytes]:
+    """
+    Image PNG du nuage de mots d'une facette, depuis le cache disque si possible
+
+    Returns:
+        Contenu PNG, ou None si aucun mot pour cette facette
+    """
+    key = hashlib.blake2b(
+        f"{index.get('version')}|{facet}|{value}|{width}|{height}|{max_words}".encode(), digest_size=12
+    ).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.png") if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    words = frequencies(index, facet, value, top_k=max_words)
+    if not words:
+        return None
+    import io
+    from wordcloud import WordCloud
+
+    image = WordCloud(
+        width=width, height=height, background_color="white", max_words=max_words
+    ).generate_from_frequencies(words).to_image()
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    content = buffer.getvalue()
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    return content
+
+
+def wordcloud_cache_dir(csv_path: str) -> str:
+    """Répertoire du cache des images (ex: dataset.wordclouds/)"""
+    root, _ = os.path.splitext(csv_path)
+    return f"{root}.wordclouds"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Construit / met a jour l'index des frequences de tokens")
+    parser.add_argument("--csv", default="TA_restaurants_ML_clean_cleaned.csv", help="Dataset CSV")
+    parser.add_argument("--text-column", help="Colonne des avis (defaut: Review_clean ou Review)")
+    parser.add_argument("--rebuild", action="store_true", help="Forcer la reconstruction")
+    args = parser.parse_args()
+
+    index = load_or_update_token_index(args.csv, args.text_column, rebuild=args.rebuild)
+    print(f"\nVocabulaire: {len(index['vocab'])} mots, {len(index['keys'])} facettes")
+    print("Top 10:", list(frequencies(index, top_k=10).items()))
+    for facet in FACETS:
+        values = facet_values(index, facet)
+        if values:
+            print(f"   {facet}: {len(values)} valeurs ({', '.join(values[:5])}{'...' if len(values) > 5 else ''})")